@@ -0,0 +1,55 @@
+"""add composite indexes for keyset pagination
+
+Revision ID: 002_keyset_indexes
+Revises: 001_template_fields
+Create Date: 2026-10-19
+
+为列表接口的游标分页添加 (…, created_at, id) 复合索引
+使用 CREATE INDEX CONCURRENTLY，建索引期间不阻塞写入；
+分区表（manual_create_tables.py 直接建成分区表的 audit_logs）不支持 CONCURRENTLY，改用普通 CREATE INDEX
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '002_keyset_indexes'
+down_revision: Union[str, None] = '001_template_fields'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (索引名, 表名, 列)
+INDEXES = [
+    ("idx_documents_user_created_id", "documents", "user_id, created_at, id"),
+    ("idx_files_user_created_id", "files", "user_id, created_at, id"),
+    ("idx_templates_user_created_id", "templates", "user_id, created_at, id"),
+    ("idx_audit_logs_created_id", "audit_logs", "created_at, id"),
+    ("idx_audit_logs_user_created_id", "audit_logs", "user_id, created_at, id"),
+]
+
+
+def _is_partitioned(conn, table: str) -> bool:
+    return conn.execute(sa.text(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"
+    ), {"table": table}).scalar() == "p"
+
+
+def upgrade() -> None:
+    """创建复合索引（CONCURRENTLY 不能在事务中执行）"""
+    conn = op.get_bind()
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            concurrently = "" if _is_partitioned(conn, table) else "CONCURRENTLY "
+            op.execute(f"CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+def downgrade() -> None:
+    """回滚：删除复合索引"""
+    conn = op.get_bind()
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            concurrently = "" if _is_partitioned(conn, table) else "CONCURRENTLY "
+            op.execute(f"DROP INDEX {concurrently}IF EXISTS {name}")
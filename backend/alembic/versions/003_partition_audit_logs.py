@@ -0,0 +1,137 @@
+"""partition audit_logs by month
+
+Revision ID: 003_audit_partitions
+Revises: 002_keyset_indexes
+Create Date: 2026-10-19
+
+把 audit_logs 改为按 created_at 月份范围分区的表：
+1. 原表改名为 audit_logs_legacy，新建同结构的分区表（主键改为 (id, created_at)，分区键必须包含在主键中）
+2. 创建覆盖现有数据到未来 3 个月的月分区，复制数据后删除原表
+3. created_at 使用 BRIN 索引（按时间追加写入，索引很小）；游标分页的 B-tree 复合索引保留
+
+之后的分区由应用的定时任务（audit_partition_service）提前创建、按保留期归档。
+复制数据期间审计表不可写（应用的审计写入会落盘，完成后自动补写），数据量大时请在低峰期执行。
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003_audit_partitions'
+down_revision: Union[str, None] = '002_keyset_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+MONTHS_AHEAD = 3
+COLUMNS = "id, user_id, action, resource_type, resource_id, details, ip_address, user_agent, created_at"
+INDEXES = [
+    "CREATE INDEX ix_audit_logs_id ON audit_logs (id)",
+    "CREATE INDEX idx_audit_logs_user_id ON audit_logs (user_id)",
+    "CREATE INDEX idx_audit_logs_action ON audit_logs (action)",
+    "CREATE INDEX idx_audit_logs_created_id ON audit_logs (created_at, id)",
+    "CREATE INDEX idx_audit_logs_user_created_id ON audit_logs (user_id, created_at, id)",
+]
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _is_partitioned(conn) -> bool:
+    return bool(conn.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('audit_logs')"
+    )).scalar())
+
+
+def _drop_existing_indexes(conn, table: str):
+    """删除表上除主键外的索引（索引名全局唯一，新表要使用同样的名字）"""
+    names = conn.execute(sa.text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = :table AND indexname <> :pkey"
+    ), {"table": table, "pkey": f"{table}_pkey"}).scalars().all()
+    for name in names:
+        op.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+def upgrade() -> None:
+    """把 audit_logs 转换为按月分区的表"""
+    conn = op.get_bind()
+    if _is_partitioned(conn):
+        return
+    
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_legacy")
+    op.execute("ALTER TABLE audit_logs_legacy RENAME CONSTRAINT audit_logs_pkey TO audit_logs_legacy_pkey")
+    _drop_existing_indexes(conn, "audit_logs_legacy")
+    
+    op.execute(
+        "CREATE TABLE audit_logs (LIKE audit_logs_legacy INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    op.execute("ALTER TABLE audit_logs ALTER COLUMN created_at SET DEFAULT now()")
+    op.execute("ALTER TABLE audit_logs ALTER COLUMN created_at SET NOT NULL")
+    
+    # 月分区：从最早的数据到未来 MONTHS_AHEAD 个月
+    oldest = conn.execute(sa.text("SELECT min(created_at) FROM audit_logs_legacy")).scalar()
+    current = date.today().replace(day=1)
+    month = oldest.date().replace(day=1) if oldest else current
+    while month <= _add_months(current, MONTHS_AHEAD):
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE audit_logs_y{month.year}m{month.month:02d} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{upper.isoformat()} 00:00:00+00')"
+        )
+        month = upper
+    
+    op.execute(
+        f"INSERT INTO audit_logs ({COLUMNS}) "
+        f"SELECT id, user_id, action, resource_type, resource_id, details, ip_address, user_agent, "
+        f"COALESCE(created_at, now()) FROM audit_logs_legacy"
+    )
+    
+    # 序列转给新表后再删除原表
+    op.execute(
+        "DO $$ DECLARE seq text := pg_get_serial_sequence('audit_logs_legacy', 'id'); BEGIN "
+        "IF seq IS NOT NULL THEN EXECUTE format('ALTER SEQUENCE %s OWNED BY audit_logs.id', seq); END IF; END $$"
+    )
+    op.execute("DROP TABLE audit_logs_legacy")
+    
+    op.execute("ALTER TABLE audit_logs ADD CONSTRAINT audit_logs_pkey PRIMARY KEY (id, created_at)")
+    op.execute(
+        "ALTER TABLE audit_logs ADD CONSTRAINT audit_logs_user_id_fkey "
+        "FOREIGN KEY (user_id) REFERENCES users (id)"
+    )
+    for statement in INDEXES:
+        op.execute(statement)
+    op.execute("CREATE INDEX idx_audit_logs_created_brin ON audit_logs USING brin (created_at)")
+
+
+def downgrade() -> None:
+    """回滚：转换回普通表（已归档删除的分区不会恢复）"""
+    conn = op.get_bind()
+    if not _is_partitioned(conn):
+        return
+    
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_partitioned")
+    op.execute("ALTER TABLE audit_logs_partitioned RENAME CONSTRAINT audit_logs_pkey TO audit_logs_partitioned_pkey")
+    _drop_existing_indexes(conn, "audit_logs_partitioned")
+    
+    op.execute("CREATE TABLE audit_logs (LIKE audit_logs_partitioned INCLUDING DEFAULTS)")
+    op.execute(f"INSERT INTO audit_logs ({COLUMNS}) SELECT {COLUMNS} FROM audit_logs_partitioned")
+    op.execute(
+        "DO $$ DECLARE seq text := pg_get_serial_sequence('audit_logs_partitioned', 'id'); BEGIN "
+        "IF seq IS NOT NULL THEN EXECUTE format('ALTER SEQUENCE %s OWNED BY audit_logs.id', seq); END IF; END $$"
+    )
+    op.execute("DROP TABLE audit_logs_partitioned CASCADE")
+    
+    op.execute("ALTER TABLE audit_logs ADD CONSTRAINT audit_logs_pkey PRIMARY KEY (id)")
+    op.execute(
+        "ALTER TABLE audit_logs ADD CONSTRAINT audit_logs_user_id_fkey "
+        "FOREIGN KEY (user_id) REFERENCES users (id)"
+    )
+    for statement in INDEXES:
+        op.execute(statement)
+    op.execute("CREATE INDEX idx_audit_logs_created_at ON audit_logs (created_at)")
@@ -0,0 +1,53 @@
+"""add hourly audit statistics rollup
+
+Revision ID: 004_audit_stats_rollup
+Revises: 003_audit_partitions
+Create Date: 2026-10-19
+
+新增 audit_stats_hourly（按 小时、用户、操作、资源类型 汇总的审计条数），并用现有审计日志回填。
+之后由审计写入在写审计表的同一事务中增量累加，审计统计接口只读汇总表。
+manual_create_tables.py 会先建好汇总表，部署时应用可能已在累加，所以锁表后清空并按审计表重算：
+累加与审计记录在同一事务中提交，锁表后已提交的累加都能在审计表中查到，未提交的等迁移提交后再累加
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004_audit_stats_rollup'
+down_revision: Union[str, None] = '003_audit_partitions'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """创建汇总表（已存在时跳过），并按审计表重算"""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'audit_stats_hourly' not in inspector.get_table_names():
+        op.create_table(
+            'audit_stats_hourly',
+            sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('action', sa.String(50), nullable=False),
+            sa.Column('resource_type', sa.String(50), nullable=False, server_default=''),
+            sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+            sa.PrimaryKeyConstraint('bucket', 'user_id', 'action', 'resource_type')
+        )
+    
+    # 阻塞审计写入的累加直到迁移提交，再按 UTC 小时重算
+    op.execute("LOCK TABLE audit_stats_hourly IN EXCLUSIVE MODE")
+    op.execute("TRUNCATE audit_stats_hourly")
+    op.execute(
+        "INSERT INTO audit_stats_hourly (bucket, user_id, action, resource_type, count) "
+        "SELECT date_trunc('hour', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', "
+        "user_id, action, COALESCE(resource_type, ''), count(*) "
+        "FROM audit_logs GROUP BY 1, 2, 3, 4"
+    )
+
+
+def downgrade() -> None:
+    """回滚：删除汇总表"""
+    op.drop_table('audit_stats_hourly')
@@ -0,0 +1,64 @@
+"""audit log keyword search indexes
+
+Revision ID: 005_audit_search
+Revises: 004_audit_stats_rollup
+Create Date: 2026-10-19
+
+审计日志关键词搜索：
+1. details 转为 JSONB（json 类型保留原始文本，中文可能是 \\u 转义，无法按子串搜索），加 jsonb_path_ops GIN 索引
+2. audit_search_text(details)：details 中所有字符串、数字值拼接的小写文本
+3. audit_search_grams(details)：上述文本的相邻两字 bigram 数组，在其上建 GIN 表达式索引
+
+分区表上不支持 CREATE INDEX CONCURRENTLY，建索引期间审计表不可写（应用的审计写入会落盘，完成后自动补写）
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_audit_search'
+down_revision: Union[str, None] = '004_audit_stats_rollup'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION audit_search_text(details jsonb) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT lower(coalesce(string_agg(value #>> '{}', ' '), ''))
+    FROM jsonb_path_query(details, 'strict $.** ? (@.type() == "string" || @.type() == "number")') AS value
+$$;
+
+CREATE OR REPLACE FUNCTION audit_search_grams(details jsonb) RETURNS text[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(array_agg(DISTINCT substr(t, i, 2)), '{}')
+    FROM (SELECT audit_search_text(details) AS t) AS s, generate_series(1, length(t) - 1) AS i
+$$;
+"""
+
+
+def upgrade() -> None:
+    """转换 details 为 JSONB 并创建搜索函数和索引"""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    details_type = {col['name']: col['type'] for col in inspector.get_columns('audit_logs')}['details']
+    if details_type.__class__.__name__ != 'JSONB':
+        op.execute("ALTER TABLE audit_logs ALTER COLUMN details TYPE jsonb USING details::jsonb")
+    
+    op.execute(SEARCH_FUNCTIONS)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_audit_logs_details_gin ON audit_logs USING gin (details jsonb_path_ops)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_audit_logs_search_grams ON audit_logs USING gin (audit_search_grams(details))"
+    )
+
+
+def downgrade() -> None:
+    """回滚：删除搜索索引和函数（details 保持 JSONB）"""
+    op.execute("DROP INDEX IF EXISTS idx_audit_logs_search_grams")
+    op.execute("DROP INDEX IF EXISTS idx_audit_logs_details_gin")
+    op.execute("DROP FUNCTION IF EXISTS audit_search_grams(jsonb)")
+    op.execute("DROP FUNCTION IF EXISTS audit_search_text(jsonb)")
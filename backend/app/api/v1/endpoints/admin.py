@@ -4,10 +4,22 @@
 提供规则管理和性能监控接口
 """
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 
 from app.services.local_rules_engine import get_local_rules_engine
+from app.services.cache_service import cache_service
+from app.core.redis import redis_client
+from app.core.admission import admission_controller
+from app.core.loop_monitor import loop_monitor
+from app.core.tracing import tracer
+from app.core.sql_monitor import sql_monitor
+from app.core.profiler import profiler, ProfilerBusyError, to_collapsed, top_frames
+from app.services.llm_replay_service import llm_replay_service
+from app.services.audit_writer import audit_writer
+from app.services.audit_partition_service import audit_partition_service
+from app.core.config import settings
 from app.api.v1.endpoints.auth import get_current_user
 from app.models.user import User
 
@@ -72,6 +84,11 @@ class RuleToggleRequest(BaseModel):
     enabled: bool
 
 
+class LoopDebugRequest(BaseModel):
+    """阻塞调用栈采样开关请求"""
+    enabled: bool
+
+
 @router.get("/rules/list", response_model=RulesListResponse)
 async def list_rules(
     current_user: User = Depends(get_current_user)
@@ -275,3 +292,195 @@ async def reload_rules(
             status_code=500,
             detail=f"配置重载失败: {str(e)}"
         )
+
+
+@router.get("/redis/metrics")
+async def get_redis_metrics(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取 Redis 指标
+    
+    返回连接池状态、各命令的调用次数/错误数/平均和最大耗时，以及缓存命中统计
+    """
+    return {
+        "redis": redis_client.get_metrics(),
+        "cache": cache_service.stats
+    }
+
+
+@router.get("/admission/metrics")
+async def get_admission_metrics(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取准入控制指标
+    
+    返回各路由类别的并发、排队深度、准入/排队/拒绝次数，以及事件循环延迟和连接池状态
+    """
+    return admission_controller.get_stats()
+
+
+@router.get("/loop/blocking")
+async def get_loop_blocking_report(
+    limit: int = 20,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取事件循环阻塞报告
+    
+    返回延迟统计与分布、阻塞热点（调试模式下按代码位置汇总的累计阻塞时长）和最近的阻塞事件
+    """
+    report = loop_monitor.get_blocking_report(limit)
+    report["lag_histogram"] = loop_monitor.get_lag_histogram()
+    return report
+
+
+@router.post("/loop/debug")
+async def set_loop_debug(
+    request: LoopDebugRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    开启/关闭阻塞调用栈采样
+    
+    开启后每次事件循环阻塞超过阈值时，采样事件循环线程的调用栈
+    """
+    loop_monitor.set_debug(request.enabled)
+    return {"success": True, "debug": loop_monitor.debug}
+
+
+@router.delete("/loop/blocking")
+async def reset_loop_blocking_report(
+    current_user: User = Depends(get_current_user)
+):
+    """清空阻塞事件和热点统计"""
+    loop_monitor.reset()
+    return {"success": True, "message": "阻塞统计已清空"}
+
+
+@router.get("/traces/slow")
+async def get_slow_traces(
+    limit: int = 20,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取最近的慢请求链路
+    
+    每条链路是一棵 span 树（数据库查询与提交、MinIO、大模型调用、解析、渲染、导出），
+    summary 按操作名汇总了次数和累计耗时
+    """
+    traces = tracer.get_slow_traces(limit)
+    return {"stats": tracer.get_stats(), "traces": traces}
+
+
+@router.get("/db/stats")
+async def get_db_stats(
+    limit: int = 20,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取 SQL 统计
+    
+    包括按累计耗时排序的语句、最近的慢查询（含采样的 EXPLAIN）、N+1 候选和连接池等待时间
+    """
+    return sql_monitor.get_report(limit)
+
+
+@router.delete("/db/stats")
+async def reset_db_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """清空 SQL 统计"""
+    sql_monitor.reset()
+    return {"success": True, "message": "SQL 统计已清空"}
+
+
+def _is_allowed(user: User, allowed_users: str) -> bool:
+    """用户名是否在逗号分隔的允许列表中"""
+    return user.username in [name.strip() for name in allowed_users.split(",") if name.strip()]
+
+
+@router.post("/profiler/run")
+async def run_profiler(
+    seconds: float = 10,
+    interval_ms: float = 10,
+    mode: str = "cpu",
+    format: str = "collapsed",
+    current_user: User = Depends(get_current_user)
+):
+    """
+    在当前 worker 上采样指定时长，结束后返回结果
+    
+    - mode=cpu 只采样线程调用栈；mode=async 额外采样挂起中的协程任务（await 链）
+    - format=collapsed 返回折叠栈文本，可直接交给 flamegraph.pl 或 speedscope 生成火焰图；
+      format=json 返回热点帧、按路由的样本数和采样开销
+    
+    只允许 PROFILER_ALLOWED_USERS 中的用户调用（默认为空，即关闭），同一时间只能有一次采样
+    """
+    if not _is_allowed(current_user, settings.PROFILER_ALLOWED_USERS):
+        raise HTTPException(status_code=403, detail="无权启动采样分析")
+    if mode not in ("cpu", "async"):
+        raise HTTPException(status_code=400, detail="mode 只能是 cpu 或 async")
+    if format not in ("collapsed", "json"):
+        raise HTTPException(status_code=400, detail="format 只能是 collapsed 或 json")
+    
+    try:
+        result = await profiler.profile(seconds, interval_ms, mode)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if format == "collapsed":
+        return PlainTextResponse(to_collapsed(result["stacks"]))
+    return {
+        "samples": result["samples"],
+        "duration_s": result["duration_s"],
+        "final_interval_ms": result["final_interval_ms"],
+        "overhead": result["overhead"],
+        "mode": result["mode"],
+        "routes": dict(result["routes"].most_common()),
+        "top_frames": top_frames(result["stacks"])
+    }
+
+
+@router.get("/llm/replay")
+async def get_llm_replay_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """获取大模型调用录制/回放状态（模式、录制文件、命中与未命中次数）"""
+    return llm_replay_service.get_stats()
+
+
+@router.get("/audit/writer")
+async def get_audit_writer_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """获取审计日志写入状态（缓冲条数、已写入/落盘/补写条数、最近一批耗时）"""
+    return audit_writer.get_stats()
+
+
+@router.get("/audit/partitions")
+async def get_audit_partitions(
+    current_user: User = Depends(get_current_user)
+):
+    """获取审计日志分区（估算行数、占用空间）和最近一次维护结果"""
+    return {
+        "partitions": await audit_partition_service.list_partitions(),
+        "retention_months": audit_partition_service.retention_months,
+        "last_run": audit_partition_service.last_run
+    }
+
+
+@router.post("/audit/partitions/maintain")
+async def run_audit_partition_maintenance(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    立即执行分区维护（创建未来分区、归档过期分区）
+    
+    归档会把过期分区导出到 MinIO 后删除，只允许 AUDIT_MAINTENANCE_ALLOWED_USERS 中的用户调用（默认为空，即关闭）；
+    定时维护不受影响
+    """
+    if not _is_allowed(current_user, settings.AUDIT_MAINTENANCE_ALLOWED_USERS):
+        raise HTTPException(status_code=403, detail="无权执行分区维护")
+    return await audit_partition_service.run_maintenance()
@@ -10,17 +10,23 @@
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, func, and_, or_, literal_column
 from typing import List, Optional
-from datetime import datetime, timedelta
+import logging
+from datetime import datetime, timedelta, timezone
 from app.core.database import get_db
 from app.models.user import User
-from app.models.audit_log import AuditLog
+from app.models.audit_log import AuditLog, AuditStatsHourly
 from app.api.v1.endpoints.auth import get_current_user
+from app.core.pagination import apply_keyset, split_page
+from app.services.count_service import count_rows
+from app.services.audit_search import keyword_conditions
+from app.services.audit_export_service import audit_export_jobs, export_query, iter_csv
+from app.core.minio_client import minio_client
 from pydantic import BaseModel
 from fastapi.responses import StreamingResponse
-import csv
-import io
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -39,10 +45,13 @@ class AuditLogResponse(BaseModel):
 
 
 class AuditLogListResponse(BaseModel):
-    total: int
+    total: Optional[int]  # count=none 时为空
+    total_exact: bool = True  # total 是否为精确值（否则为查询计划估算值）
+    has_next: bool = False
     items: List[AuditLogResponse]
     page: int
     page_size: int
+    next_cursor: Optional[str] = None  # 下一页游标，没有下一页时为空
 
 
 class AuditLogStatsResponse(BaseModel):
@@ -50,34 +59,19 @@ class AuditLogStatsResponse(BaseModel):
     action_stats: dict
     resource_stats: dict
     recent_activity: List[dict]
+    series: Optional[List[dict]] = None  # 按 granularity 的趋势 [{"time": UTC 时间, "count": 条数}]
 
 
-@router.get("/list", response_model=AuditLogListResponse)
-async def list_audit_logs(
-    page: int = Query(1, ge=1, description="页码"),
-    page_size: int = Query(20, ge=1, le=100, description="每页数量"),
-    action: Optional[str] = Query(None, description="操作类型"),
-    resource_type: Optional[str] = Query(None, description="资源类型"),
-    user_id: Optional[int] = Query(None, description="用户ID"),
-    start_date: Optional[str] = Query(None, description="开始日期 YYYY-MM-DD"),
-    end_date: Optional[str] = Query(None, description="结束日期 YYYY-MM-DD"),
-    keyword: Optional[str] = Query(None, description="关键词搜索"),
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """
-    查询审计日志列表
-    
-    支持多条件筛选：
-    - action: 操作类型（upload, review, generate, etc.）
-    - resource_type: 资源类型（file, document, template）
-    - user_id: 用户ID
-    - start_date/end_date: 日期范围
-    - keyword: 关键词搜索（搜索 details）
-    """
-    print(f"[AuditLog] Query: page={page}, action={action}, resource_type={resource_type}")
-    
-    # 构建查询条件
+def _filter_conditions(
+    current_user: User,
+    action: Optional[str] = None,
+    resource_type: Optional[str] = None,
+    user_id: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    keyword: Optional[str] = None
+) -> list:
+    """构建列表和导出共用的筛选条件"""
     conditions = []
     
     # 普通用户只能查看自己的日志
@@ -108,33 +102,68 @@ async def list_audit_logs(
         except ValueError:
             raise HTTPException(status_code=400, detail="结束日期格式错误，应为 YYYY-MM-DD")
     
-    # 关键词搜索（搜索 details JSON）
+    # 关键词搜索（details 中的值，bigram 索引；字段=值 时精确匹配）
     if keyword:
-        # 这里简化处理，实际可以使用 PostgreSQL 的 JSON 搜索功能
-        pass
+        conditions.extend(keyword_conditions(keyword))
     
-    # 查询总数
-    count_query = select(func.count(AuditLog.id))
-    if conditions:
-        count_query = count_query.where(and_(*conditions))
+    return conditions
+
+
+@router.get("/list", response_model=AuditLogListResponse)
+async def list_audit_logs(
+    page: int = Query(1, ge=1, description="页码"),
+    page_size: int = Query(20, ge=1, le=100, description="每页数量"),
+    action: Optional[str] = Query(None, description="操作类型"),
+    resource_type: Optional[str] = Query(None, description="资源类型"),
+    user_id: Optional[int] = Query(None, description="用户ID"),
+    start_date: Optional[str] = Query(None, description="开始日期 YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="结束日期 YYYY-MM-DD"),
+    keyword: Optional[str] = Query(None, description="关键词搜索（details 中的子串，或 字段=值）"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor），传入时忽略 page"),
+    count: str = Query("auto", pattern="^(auto|exact|estimate|none)$", description="总数统计方式"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    查询审计日志列表
+    
+    分页：按 next_cursor 翻页时只读取一页数据，深翻页也不会变慢；page/page_size（OFFSET）保留用于兼容
     
-    result = await db.execute(count_query)
-    total = result.scalar() or 0
+    总数统计方式（count）：
+    - auto: 命中行数较少时精确统计，否则返回查询计划估算值（total_exact=false）
+    - exact: 精确统计
+    - estimate: 查询计划估算值
+    - none: 不统计总数，只返回 has_next
+    统计结果按筛选条件缓存 30 秒
+    
+    支持多条件筛选：
+    - action: 操作类型（upload, review, generate, etc.）
+    - resource_type: 资源类型（file, document, template）
+    - user_id: 用户ID
+    - start_date/end_date: 日期范围
+    - keyword: 关键词搜索（details 中任意值包含该子串，支持中文；写成 字段=值 时精确匹配该字段）
+    """
+    logger.debug("Query: page=%s, action=%s, resource_type=%s", page, action, resource_type)
+    
+    conditions = _filter_conditions(current_user, action, resource_type, user_id, start_date, end_date, keyword)
+    
+    # 查询总数
+    counted = await count_rows(db, AuditLog, conditions, count, cache_prefix="audit_count")
+    total = counted["total"]
     
     # 查询数据
     query = select(AuditLog, User.username).join(
         User, AuditLog.user_id == User.id
-    ).order_by(AuditLog.created_at.desc())
+    )
     
     if conditions:
         query = query.where(and_(*conditions))
     
     # 分页
-    offset = (page - 1) * page_size
-    query = query.offset(offset).limit(page_size)
+    query = apply_keyset(query, AuditLog, cursor, (page - 1) * page_size, page_size)
     
     result = await db.execute(query)
-    rows = result.all()
+    rows, next_cursor = split_page(result.all(), page_size, key=lambda row: row[0])
     
     # 构建响应
     items = []
@@ -152,70 +181,94 @@ async def list_audit_logs(
             created_at=log.created_at
         ))
     
-    print(f"[AuditLog] Found {total} logs, returning {len(items)} items")
+    logger.debug("Found %s logs, returning %d items", total, len(items))
     
     return AuditLogListResponse(
         total=total,
+        total_exact=counted["exact"],
+        has_next=next_cursor is not None,
         items=items,
         page=page,
-        page_size=page_size
+        page_size=page_size,
+        next_cursor=next_cursor
     )
 
 
 @router.get("/stats", response_model=AuditLogStatsResponse)
 async def get_audit_stats(
     days: int = Query(7, ge=1, le=90, description="统计天数"),
+    granularity: Optional[str] = Query(None, pattern="^(hour|day)$", description="趋势时间粒度：hour / day，不传不返回趋势"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     获取审计日志统计信息
     
+    计数来自小时汇总表 audit_stats_hourly（不扫描审计日志），起点按小时对齐；
+    最近活动通过 (created_at, id) 索引只读取最近 10 条
+    
     Args:
         days: 统计最近N天的数据
+        granularity: 趋势时间粒度
     """
-    print(f"[AuditLog] Getting stats for last {days} days")
+    logger.debug("Getting stats for last %d days", days)
     
-    # 计算时间范围
-    start_date = datetime.now() - timedelta(days=days)
+    # 计算时间范围（汇总表按小时累加，起点对齐到整点）
+    start_date = datetime.now(timezone.utc) - timedelta(days=days)
+    start_bucket = start_date.replace(minute=0, second=0, microsecond=0)
     
     # 构建基础查询条件
-    base_condition = AuditLog.created_at >= start_date
+    base_condition = AuditStatsHourly.bucket >= start_bucket
     
     # 普通用户只能查看自己的统计
     if not current_user.is_active:
-        base_condition = and_(base_condition, AuditLog.user_id == current_user.id)
+        base_condition = and_(base_condition, AuditStatsHourly.user_id == current_user.id)
+    
+    total = func.coalesce(func.sum(AuditStatsHourly.count), 0)
     
     # 总数统计
-    count_query = select(func.count(AuditLog.id)).where(base_condition)
-    result = await db.execute(count_query)
+    result = await db.execute(select(total).where(base_condition))
     total_count = result.scalar() or 0
     
     # 按操作类型统计
     action_query = select(
-        AuditLog.action,
-        func.count(AuditLog.id).label('count')
-    ).where(base_condition).group_by(AuditLog.action)
+        AuditStatsHourly.action,
+        total.label('count')
+    ).where(base_condition).group_by(AuditStatsHourly.action)
     
     result = await db.execute(action_query)
     action_stats = {row.action: row.count for row in result}
     
     # 按资源类型统计
     resource_query = select(
-        AuditLog.resource_type,
-        func.count(AuditLog.id).label('count')
+        AuditStatsHourly.resource_type,
+        total.label('count')
     ).where(
-        and_(base_condition, AuditLog.resource_type.isnot(None))
-    ).group_by(AuditLog.resource_type)
+        and_(base_condition, AuditStatsHourly.resource_type != "")
+    ).group_by(AuditStatsHourly.resource_type)
     
     result = await db.execute(resource_query)
     resource_stats = {row.resource_type: row.count for row in result}
     
+    # 趋势
+    series = None
+    if granularity:
+        # 粒度已由参数校验限定为 hour/day，作为字面量写入，保证 SELECT 与 GROUP BY 是同一表达式
+        utc_bucket = func.timezone(literal_column("'UTC'"), AuditStatsHourly.bucket)
+        period = func.date_trunc(literal_column(f"'{granularity}'"), utc_bucket).label('period')
+        series_query = select(period, total.label('count')).where(base_condition).group_by(period).order_by(period)
+        result = await db.execute(series_query)
+        series = [{"time": row.period.isoformat(), "count": row.count} for row in result]
+    
     # 最近活动（最近10条）
+    log_condition = AuditLog.created_at >= start_date
+    if not current_user.is_active:
+        log_condition = and_(log_condition, AuditLog.user_id == current_user.id)
+    
     recent_query = select(AuditLog, User.username).join(
         User, AuditLog.user_id == User.id
-    ).where(base_condition).order_by(
-        AuditLog.created_at.desc()
+    ).where(log_condition).order_by(
+        AuditLog.created_at.desc(), AuditLog.id.desc()
     ).limit(10)
     
     result = await db.execute(recent_query)
@@ -231,13 +284,14 @@ async def get_audit_stats(
         for log, username in rows
     ]
     
-    print(f"[AuditLog] Stats: total={total_count}, actions={len(action_stats)}, resources={len(resource_stats)}")
+    logger.debug("Stats: total=%s, actions=%d, resources=%d", total_count, len(action_stats), len(resource_stats))
     
     return AuditLogStatsResponse(
         total_count=total_count,
         action_stats=action_stats,
         resource_stats=resource_stats,
-        recent_activity=recent_activity
+        recent_activity=recent_activity,
+        series=series
     )
 
 
@@ -247,88 +301,67 @@ async def export_audit_logs(
     resource_type: Optional[str] = Query(None),
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
-    db: AsyncSession = Depends(get_db),
+    keyword: Optional[str] = Query(None),
+    compress: bool = Query(False, description="是否 gzip 压缩（下载 .csv.gz）"),
     current_user: User = Depends(get_current_user)
 ):
     """
     导出审计日志为 CSV 文件
+    
+    边查询边发送（服务端游标分批读取），不限制导出条数，内存占用与导出量无关；
+    时间范围很大、下载可能超时时使用 POST /export/jobs 异步导出
     """
-    print(f"[AuditLog] Exporting logs: action={action}, resource_type={resource_type}")
+    logger.info("Exporting logs: action=%s, resource_type=%s", action, resource_type)
     
     # 构建查询条件（与 list 接口相同）
-    conditions = []
-    
-    if not current_user.is_active:
-        conditions.append(AuditLog.user_id == current_user.id)
-    
-    if action:
-        conditions.append(AuditLog.action == action)
-    
-    if resource_type:
-        conditions.append(AuditLog.resource_type == resource_type)
-    
-    if start_date:
-        try:
-            start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-            conditions.append(AuditLog.created_at >= start_dt)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="开始日期格式错误")
-    
-    if end_date:
-        try:
-            end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
-            conditions.append(AuditLog.created_at < end_dt)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="结束日期格式错误")
-    
-    # 查询数据（限制最多导出10000条）
-    query = select(AuditLog, User.username).join(
-        User, AuditLog.user_id == User.id
-    ).order_by(AuditLog.created_at.desc()).limit(10000)
-    
-    if conditions:
-        query = query.where(and_(*conditions))
-    
-    result = await db.execute(query)
-    rows = result.all()
-    
-    # 生成 CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # 写入表头
-    writer.writerow([
-        'ID', '用户', '操作', '资源类型', '资源ID', 
-        'IP地址', '时间', '详情'
-    ])
-    
-    # 写入数据
-    for log, username in rows:
-        writer.writerow([
-            log.id,
-            username,
-            log.action,
-            log.resource_type or '',
-            log.resource_id or '',
-            log.ip_address or '',
-            log.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            str(log.details) if log.details else ''
-        ])
-    
-    # 准备响应
-    output.seek(0)
-    
-    print(f"[AuditLog] Exported {len(rows)} logs")
+    conditions = _filter_conditions(current_user, action, resource_type, None, start_date, end_date, keyword)
     
+    filename = f"audit_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv" + (".gz" if compress else "")
     return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
+        iter_csv(export_query(conditions), compress),
+        media_type="application/gzip" if compress else "text/csv",
         headers={
-            "Content-Disposition": f"attachment; filename=audit_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            "Content-Disposition": f"attachment; filename={filename}"
         }
     )
 
 
+@router.post("/export/jobs")
+async def create_export_job(
+    action: Optional[str] = Query(None),
+    resource_type: Optional[str] = Query(None),
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    keyword: Optional[str] = Query(None),
+    compress: bool = Query(True, description="是否 gzip 压缩"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    创建异步导出任务
+    
+    后台导出到 MinIO，通过 GET /export/jobs/{job_id} 查询进度，完成后返回下载链接
+    """
+    conditions = _filter_conditions(current_user, action, resource_type, None, start_date, end_date, keyword)
+    job = await audit_export_jobs.submit(export_query(conditions), current_user.id, compress)
+    return {"job_id": job["id"], "status": job["status"]}
+
+
+@router.get("/export/jobs/{job_id}")
+async def get_export_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """查询异步导出任务状态，完成后返回下载链接（1 小时内有效）"""
+    job = await audit_export_jobs.get(job_id)
+    if not job or job["user_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="导出任务不存在")
+    
+    response = {key: job[key] for key in ("id", "status", "bytes", "error", "created_at", "finished_at")}
+    if job["status"] == "done":
+        response["download_url"] = minio_client.get_file_url(job["object_name"], inline=False)
+    return response
+
+
 @router.get("/{log_id}", response_model=AuditLogResponse)
 async def get_audit_log(
     log_id: int,
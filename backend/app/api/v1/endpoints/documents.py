@@ -8,19 +8,28 @@ from app.core.rate_limiter import ai_rate_limit, user_rate_limit
 from app.models.user import User
 from app.models.document import Document
 from app.models.file import File
-from app.models.audit_log import AuditLog
+from app.services.audit_writer import audit_writer
 from app.models.version import Version
 from app.api.v1.endpoints.auth import get_current_user
 from app.services.deepseek_service import deepseek_service
 from app.services.file_parser_service import file_parser_service
 from app.services.document_export_service import document_export_service
 from app.services.conversation_service import conversation_service
+from app.services.context_builder_service import context_builder_service
+from app.services.retrieval_service import retrieval_service
+from app.services.cache_service import cache_result, cache_service
 from app.services.health_monitor_service import get_health_monitor
 from app.services.local_rules_engine import get_local_rules_engine
+from app.services.incremental_validator import INDEX_KEY, merge_local_review, public_annotations
 from app.core.minio_client import minio_client
+from app.core.pagination import NEXT_CURSOR_HEADER, apply_keyset, split_page
+from app.core.projection import parse_fields, load_columns
 from pydantic import BaseModel
 from fastapi.responses import Response
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -57,6 +66,25 @@ class DocumentResponse(BaseModel):
     preview_url: Optional[str] = None  # 新增：预览URL
     created_at: datetime
 
+class DocumentListItem(BaseModel):
+    """文书列表项（只包含请求的字段）"""
+    id: int
+    title: Optional[str] = None
+    document_type: Optional[str] = None
+    status: Optional[str] = None
+    classification: Optional[str] = None
+    file_id: Optional[int] = None
+    template_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    content: Optional[str] = None
+    structured_content: Optional[dict] = None
+    ai_annotations: Optional[dict] = None
+
+# 列表可选字段；默认只返回摘要，正文和 JSON 字段需在 fields 中显式指定或通过详情接口获取
+DOCUMENT_LIST_FIELDS = tuple(DocumentListItem.model_fields)
+DOCUMENT_SUMMARY_FIELDS = ("id", "title", "document_type", "status", "classification", "created_at", "updated_at")
+
 class DocumentUpdateRequest(BaseModel):
     content: Optional[str] = None
     structured_content: Optional[dict] = None
@@ -64,6 +92,7 @@ class DocumentUpdateRequest(BaseModel):
     status: Optional[str] = None
     classification: Optional[str] = None  # 新增：密级
     change_description: Optional[str] = None
+    revalidate: Optional[bool] = False  # 是否使用本地规则增量重新验证
 
 class ClassificationUpdateRequest(BaseModel):
     classification: str  # public, internal, confidential, secret, top_secret
@@ -86,14 +115,14 @@ async def review_document(
     if not file:
         raise HTTPException(status_code=404, detail="文件不存在")
     
-    print(f"[Review] Starting review for file: {file.file_name} (type: {file.file_type})")
+    logger.info("Starting review for file: %s (type: %s)", file.file_name, file.file_type)
     
     # 从 MinIO 读取文件内容
     file_bytes = await minio_client.download_file(file.storage_path)
     if not file_bytes:
         raise HTTPException(status_code=500, detail="无法读取文件内容")
     
-    print(f"[Review] File downloaded: {len(file_bytes)} bytes")
+    logger.debug("File downloaded: %s bytes", len(file_bytes))
     
     # 解析文件内容
     parsed_data = await file_parser_service.parse_file(file_bytes, file.file_type)
@@ -104,7 +133,7 @@ async def review_document(
     if not file_content.strip():
         raise HTTPException(status_code=400, detail="文件内容为空，无法进行研判")
     
-    print(f"[Review] File parsed: {len(file_content)} characters")
+    logger.debug("File parsed: %s characters", len(file_content))
     
     # 检查是否需要使用降级模式
     health_monitor = get_health_monitor()
@@ -115,48 +144,38 @@ async def review_document(
     if health_monitor and health_monitor.is_fallback_mode():
         use_fallback = True
         fallback_reason = "AI 服务当前不可用，使用本地规则库进行基础校验"
-        print(f"[Review] 使用降级模式: {fallback_reason}")
+        logger.warning("使用降级模式: %s", fallback_reason)
     
     # 执行研判
     review_data = None
     
     if use_fallback and local_engine:
         # 使用本地规则引擎
-        print(f"[Review] 使用本地规则引擎进行验证...")
+        logger.debug("使用本地规则引擎进行验证...")
         try:
-            validation_result = await local_engine.validate_document(file_content, parsed_data)
+            review_data = await _validate_with_local_rules(local_engine, file_content, parsed_data)
             
-            # 转换为统一格式
-            review_data = {
-                "errors": [error.dict() for error in validation_result.errors],
-                "summary": validation_result.summary
-            }
-            
-            print(f"[Review] 本地规则验证完成: {len(validation_result.errors)} 个问题")
+            logger.info("本地规则验证完成: %s 个问题", len(review_data['errors']))
             
         except Exception as e:
-            print(f"[Review] 本地规则引擎失败: {e}")
+            logger.warning("本地规则引擎失败: %s", e)
             # 如果本地引擎也失败，尝试 AI 服务
             use_fallback = False
     
     if not use_fallback:
         # 调用 AI 研判
-        print(f"[Review] Calling AI service for review...")
+        logger.debug("Calling AI service for review...")
         try:
             review_result = await deepseek_service.review_document(file_content)
             
             if not review_result:
                 # AI 服务失败，尝试降级
                 if local_engine:
-                    print(f"[Review] AI 服务失败，降级到本地规则引擎...")
+                    logger.warning("AI 服务失败，降级到本地规则引擎...")
                     use_fallback = True
                     fallback_reason = "AI 服务调用失败，已切换到本地规则库"
                     
-                    validation_result = await local_engine.validate_document(file_content, parsed_data)
-                    review_data = {
-                        "errors": [error.dict() for error in validation_result.errors],
-                        "summary": validation_result.summary
-                    }
+                    review_data = await _validate_with_local_rules(local_engine, file_content, parsed_data)
                 else:
                     raise HTTPException(
                         status_code=500,
@@ -164,10 +183,10 @@ async def review_document(
                     )
             else:
                 # 解析 AI 返回结果
-                print(f"[Review] Parsing AI result...")
+                logger.debug("Parsing AI result...")
                 try:
                     review_data = json.loads(review_result)
-                    print(f"[Review] JSON parsed successfully")
+                    logger.debug("JSON parsed successfully")
                     
                     # 确保数据结构正确
                     if not isinstance(review_data, dict):
@@ -183,11 +202,11 @@ async def review_document(
                     if not isinstance(review_data["errors"], list):
                         review_data["errors"] = []
                     
-                    print(f"[Review] Parsed data: summary={review_data['summary'][:50]}..., errors_count={len(review_data['errors'])}")
+                    logger.debug("Parsed data: summary=%s..., errors_count=%s", review_data['summary'][:50], len(review_data['errors']))
                     
                 except json.JSONDecodeError as e:
-                    print(f"[Review] JSON解析失败: {e}")
-                    print(f"[Review] AI返回内容: {review_result[:500]}...")
+                    logger.warning("JSON解析失败: %s", e)
+                    logger.debug("AI返回内容: %s...", review_result[:500])
                     
                     # JSON解析失败，将整个返回作为summary
                     review_data = {
@@ -195,32 +214,28 @@ async def review_document(
                         "summary": review_result
                     }
                 except Exception as e:
-                    print(f"[Review] 数据处理失败: {e}")
+                    logger.warning("数据处理失败: %s", e)
                     review_data = {
                         "errors": [],
                         "summary": review_result if isinstance(review_result, str) else "研判完成"
                     }
         
         except Exception as e:
-            print(f"[Review] AI 服务异常: {e}")
+            logger.error("AI 服务异常: %s", e)
             # 尝试降级
             if local_engine:
-                print(f"[Review] 降级到本地规则引擎...")
+                logger.warning("降级到本地规则引擎...")
                 use_fallback = True
                 fallback_reason = f"AI 服务异常（{str(e)}），已切换到本地规则库"
                 
-                validation_result = await local_engine.validate_document(file_content, parsed_data)
-                review_data = {
-                    "errors": [error.dict() for error in validation_result.errors],
-                    "summary": validation_result.summary
-                }
+                review_data = await _validate_with_local_rules(local_engine, file_content, parsed_data)
             else:
                 raise HTTPException(
                     status_code=500,
                     detail=f"AI 研判服务异常: {str(e)}"
                 )
     
-    print(f"[Review] Review completed, fallback_mode: {use_fallback}")
+    logger.info("Review completed, fallback_mode: %s", use_fallback)
     
     # 确保数据结构正确
     if not isinstance(review_data.get("errors"), list):
@@ -244,8 +259,10 @@ async def review_document(
     # 更新文件状态
     file.status = "reviewed"
     
+    await db.commit()
+    
     # 记录审计日志
-    audit_log = AuditLog(
+    audit_writer.record(
         user_id=current_user.id,
         action="review",
         resource_type="document",
@@ -257,9 +274,7 @@ async def review_document(
             "errors_count": len(review_data.get("errors", []))
         }
     )
-    db.add(audit_log)
     
-    await db.commit()
     await db.refresh(document)
     
     # 创建初始版本（版本 1）
@@ -274,8 +289,9 @@ async def review_document(
     )
     db.add(version)
     await db.commit()
+    await cache_service.invalidate_tags(f"document_list:{current_user.id}", f"file_list:{current_user.id}")
     
-    print(f"[Review] Review completed for document ID: {document.id}, version 1 created")
+    logger.info("Review completed for document ID: %s, version 1 created", document.id)
     
     # 准备响应
     response = DocumentReviewResponse(
@@ -292,7 +308,7 @@ async def review_document(
             response.estimated_recovery = health_monitor.get_estimated_recovery_time()
         
         # 记录降级事件到审计日志
-        fallback_log = AuditLog(
+        audit_writer.record(
             user_id=current_user.id,
             action="fallback_review",
             resource_type="document",
@@ -303,11 +319,52 @@ async def review_document(
                 "errors_count": len(review_data.get("errors", []))
             }
         )
-        db.add(fallback_log)
-        await db.commit()
     
     return response
 
+async def _validate_with_local_rules(
+    local_engine,
+    content: str,
+    metadata: dict,
+    previous_annotations: Optional[dict] = None
+) -> dict:
+    """
+    使用本地规则引擎验证文档
+    
+    Args:
+        local_engine: 本地规则引擎
+        content: 文档内容
+        metadata: 元数据（结构化内容）
+        previous_annotations: 上次保存的 ai_annotations，包含增量索引时只重新验证变更段落
+        
+    Returns:
+        可直接存入 ai_annotations 的研判数据
+    """
+    previous_index = (previous_annotations or {}).get(INDEX_KEY)
+    validation_result, rules_index = await local_engine.validate_document_incremental(
+        content, metadata, previous_index
+    )
+    
+    review_data = {
+        "errors": [error.dict() for error in validation_result.errors],
+        "summary": validation_result.summary
+    }
+    if rules_index:
+        # 保存增量索引，下次编辑保存时复用未变更段落的结果
+        review_data[INDEX_KEY] = rules_index
+    
+    return review_data
+
+async def _load_reference_text(file: File) -> Optional[str]:
+    """下载并解析引用文件，返回文本内容"""
+    file_bytes = await minio_client.download_file(file.storage_path)
+    if not file_bytes:
+        return None
+    parsed_data = await file_parser_service.parse_file(file_bytes, file.file_type)
+    if parsed_data and parsed_data.get('text'):
+        return parsed_data['text']
+    return None
+
 @router.post("/generate", response_model=DocumentResponse)
 @ai_rate_limit
 async def generate_document(
@@ -317,11 +374,11 @@ async def generate_document(
     current_user: User = Depends(get_current_user)
 ):
     """AI 生成文书（支持多轮对话）"""
-    print(f"[Generate] Starting document generation for template ID: {request.template_id}")
-    print(f"[Generate] Session ID: {request.session_id}")
+    logger.info("Starting document generation for template ID: %s", request.template_id)
+    logger.debug("Session ID: %s", request.session_id)
     
     # 添加用户消息到对话历史
-    conversation_service.add_message(
+    await conversation_service.add_message(
         user_id=current_user.id,
         role="user",
         content=request.prompt,
@@ -332,7 +389,7 @@ async def generate_document(
     # 处理文件引用
     if request.file_references:
         for file_id in request.file_references:
-            conversation_service.add_file_reference(
+            await conversation_service.add_file_reference(
                 user_id=current_user.id,
                 file_id=file_id,
                 session_id=request.session_id
@@ -348,11 +405,11 @@ async def generate_document(
     if not template:
         raise HTTPException(status_code=404, detail="模板不存在")
     
-    print(f"[Generate] Template found: {template.name}")
+    logger.debug("Template found: %s", template.name)
     
     # 检查是否是新的 Word 模板系统
     use_word_template = bool(template.template_file_path)
-    print(f"[Generate] Using Word template system: {use_word_template}")
+    logger.debug("Using Word template system: %s", use_word_template)
     
     # 准备模板信息
     template_info = {
@@ -362,35 +419,42 @@ async def generate_document(
         "structure": template.structure or {}
     }
     
-    # 获取对话上下文（使用服务管理的上下文）
-    context = conversation_service.get_context_for_ai(
+    # 获取文件引用内容
+    file_context = ""
+    file_refs = await conversation_service.get_file_references(
         user_id=current_user.id,
         session_id=request.session_id
     )
     
-    print(f"[Generate] Using conversation context: {len(context)} messages")
+    if file_refs:
+        logger.debug("Loading %s referenced files", len(file_refs))
+        result = await db.execute(
+            select(File).where(File.id.in_(file_refs), File.user_id == current_user.id)
+        )
+        files_by_id = {file.id: file for file in result.scalars().all()}
+        files = [files_by_id[file_id] for file_id in file_refs if file_id in files_by_id]
+        
+        # 并发下载和解析引用文件（单个文件失败时跳过）
+        documents = await retrieval_service.load_documents(files, _load_reference_text)
+        
+        # 只保留与用户输入最相关的片段
+        excerpts = retrieval_service.select_excerpts(request.prompt, documents)
+        file_context = retrieval_service.format_excerpts(excerpts)
     
-    # 获取文件引用内容
-    file_context = ""
-    file_refs = conversation_service.get_file_references(
+    # 按 token 预算构建对话上下文（较早的对话以摘要形式提供；系统提示和本轮输入先从预算中扣除）
+    if use_word_template:
+        system_text = deepseek_service.field_values_system_prompt(template.fields or {})
+    else:
+        system_text = deepseek_service.generate_system_prompt(template_info)
+    context, file_context = await context_builder_service.build(
         user_id=current_user.id,
-        session_id=request.session_id
+        session_id=request.session_id,
+        prompt=request.prompt,
+        file_context=file_context,
+        system_text=system_text
     )
     
-    if file_refs:
-        print(f"[Generate] Loading {len(file_refs)} referenced files")
-        for file_id in file_refs:
-            result = await db.execute(
-                select(File).where(File.id == file_id, File.user_id == current_user.id)
-            )
-            file = result.scalar_one_or_none()
-            if file:
-                # 读取文件内容
-                file_bytes = await minio_client.download_file(file.storage_path)
-                if file_bytes:
-                    parsed_data = await file_parser_service.parse_file(file_bytes, file.file_type)
-                    if parsed_data and parsed_data.get('text'):
-                        file_context += f"\n\n--- 参考文件：{file.file_name} ---\n{parsed_data['text'][:1000]}"  # 限制长度
+    logger.debug("Using conversation context: %s messages", len(context))
     
     # 根据模板类型选择不同的生成方式
     if use_word_template:
@@ -424,7 +488,7 @@ async def _generate_with_word_template(
     )
     
     if not ai_result or not ai_result.get("success"):
-        conversation_service.add_message(
+        await conversation_service.add_message(
             user_id=current_user.id,
             role="assistant",
             content="抱歉，生成失败，请稍后重试。",
@@ -436,10 +500,10 @@ async def _generate_with_word_template(
     field_values = ai_result.get("field_values", {})
     is_complete = ai_result.get("complete", False)
     
-    print(f"[Generate] AI returned {len(field_values)} field values, complete: {is_complete}")
+    logger.info("AI returned %s field values, complete: %s", len(field_values), is_complete)
     
     # 添加 AI 回复到对话历史
-    conversation_service.add_message(
+    await conversation_service.add_message(
         user_id=current_user.id,
         role="assistant",
         content=chat_message,
@@ -461,9 +525,9 @@ async def _generate_with_word_template(
             template_bytes=template_bytes,
             context=field_values
         )
-        print(f"[Generate] Template rendered successfully: {len(rendered_bytes)} bytes")
+        logger.debug("Template rendered successfully: %s bytes", len(rendered_bytes))
     except Exception as e:
-        print(f"[Generate] Template render error: {e}")
+        logger.error("Template render error: %s", e)
         raise HTTPException(status_code=500, detail=f"模板渲染失败: {str(e)}")
     
     # 保存渲染后的文档到 MinIO
@@ -486,8 +550,10 @@ async def _generate_with_word_template(
     )
     db.add(document)
     
+    await db.commit()
+    
     # 记录审计日志
-    audit_log = AuditLog(
+    audit_writer.record(
         user_id=current_user.id,
         action="generate",
         resource_type="document",
@@ -500,9 +566,7 @@ async def _generate_with_word_template(
             "use_word_template": True
         }
     )
-    db.add(audit_log)
     
-    await db.commit()
     await db.refresh(document)
     
     # 创建初始版本
@@ -522,8 +586,9 @@ async def _generate_with_word_template(
     # 更新文档存储路径（可选，用于后续下载）
     document.content = doc_filename  # 临时存储文件路径
     await db.commit()
+    await cache_service.invalidate_tags(f"document_list:{current_user.id}")
     
-    print(f"[Generate] Document created with ID: {document.id}")
+    logger.info("Document created with ID: %s", document.id)
     
     return DocumentResponse(
         id=document.id,
@@ -552,7 +617,7 @@ async def _generate_with_json_template(
 ):
     """使用旧的 JSON 模板系统生成文书（兼容模式）"""
     # 调用 AI 生成
-    print(f"[Generate] Calling AI with prompt length: {len(request.prompt)}")
+    logger.debug("Calling AI with prompt length: %s", len(request.prompt))
     ai_response = await deepseek_service.generate_document(
         request.prompt,
         template_info,
@@ -562,7 +627,7 @@ async def _generate_with_json_template(
     
     if not ai_response:
         # 添加失败消息到对话历史
-        conversation_service.add_message(
+        await conversation_service.add_message(
             user_id=current_user.id,
             role="assistant",
             content="抱歉，生成失败，请稍后重试。",
@@ -570,7 +635,7 @@ async def _generate_with_json_template(
         )
         raise HTTPException(status_code=500, detail="AI 生成失败，请稍后重试")
     
-    print(f"[Generate] AI response received, length: {len(ai_response)}")
+    logger.debug("AI response received, length: %s", len(ai_response))
     
     # 解析AI返回的JSON格式
     chat_message = ""
@@ -580,7 +645,7 @@ async def _generate_with_json_template(
     
     try:
         ai_data = json.loads(ai_response)
-        print(f"[Generate] JSON parsed successfully")
+        logger.debug("JSON parsed successfully")
         
         # 提取各个字段
         chat_message = ai_data.get("chat_message", "")
@@ -611,28 +676,28 @@ async def _generate_with_json_template(
         
         # 确保document_content不为空
         if not document_content or len(document_content.strip()) < 10:
-            print(f"[Generate] Warning: document_content is empty or too short, using full response")
+            logger.warning("document_content is empty or too short, using full response")
             document_content = ai_response
             chat_message = "已生成文书内容"
         
-        print(f"[Generate] Parsed - chat_message: {len(chat_message)} chars, document_content: {len(document_content)} chars")
-        print(f"[Generate] Document content preview: {document_content[:200]}...")
+        logger.debug("Parsed - chat_message: %s chars, document_content: %s chars", len(chat_message), len(document_content))
+        logger.debug("Document content preview: %s...", document_content[:200])
         
     except json.JSONDecodeError as e:
-        print(f"[Generate] JSON解析失败: {e}")
-        print(f"[Generate] AI返回内容: {ai_response[:500]}...")
+        logger.warning("JSON解析失败: %s", e)
+        logger.debug("AI返回内容: %s...", ai_response[:500])
         
         # JSON解析失败，使用整个返回作为文档内容
         document_content = ai_response
         chat_message = f"已生成文书，共 {len(ai_response)} 字。"
         
     except Exception as e:
-        print(f"[Generate] 数据处理失败: {e}")
+        logger.warning("数据处理失败: %s", e)
         document_content = ai_response if isinstance(ai_response, str) else ""
         chat_message = "文书已生成"
     
     # 添加 AI 回复到对话历史（使用chat_message）
-    conversation_service.add_message(
+    await conversation_service.add_message(
         user_id=current_user.id,
         role="assistant",
         content=chat_message,
@@ -662,8 +727,10 @@ async def _generate_with_json_template(
     )
     db.add(document)
     
+    await db.commit()
+    
     # 记录审计日志
-    audit_log = AuditLog(
+    audit_writer.record(
         user_id=current_user.id,
         action="generate",
         resource_type="document",
@@ -674,12 +741,10 @@ async def _generate_with_json_template(
             "content_length": len(final_content),
             "session_id": request.session_id,
             "context_messages": len(context),
-            "file_references": len(conversation_service.get_file_references(current_user.id, request.session_id) or [])
+            "file_references": len(await conversation_service.get_file_references(current_user.id, request.session_id) or [])
         }
     )
-    db.add(audit_log)
     
-    await db.commit()
     await db.refresh(document)
     
     # 创建初始版本（版本 1）
@@ -695,8 +760,9 @@ async def _generate_with_json_template(
     )
     db.add(version)
     await db.commit()
+    await cache_service.invalidate_tags(f"document_list:{current_user.id}")
     
-    print(f"[Generate] Document created with ID: {document.id}, version 1 created")
+    logger.info("Document created with ID: %s, version 1 created", document.id)
     
     # 生成预览URL（优先使用WPS服务，降级到华为云）
     from app.core.minio_client import minio_client
@@ -733,7 +799,7 @@ async def _generate_with_json_template(
     preview_url = preview_result.get("preview_url") if preview_result else None
     service_type = preview_result.get("service_type", "unsupported") if preview_result else "unsupported"
     
-    print(f"[Generate] Preview service: {service_type}, URL: {preview_url}")
+    logger.info("Preview service: %s, URL: %s", service_type, preview_url)
     
     return DocumentResponse(
         id=document.id,
@@ -808,7 +874,7 @@ def _fill_template(template_content: str, structured_data: dict, ai_content: str
             import json
             json.loads(template_stripped)
             # 是有效的JSON，说明这是提取的模板规则，直接返回AI内容
-            print(f"[FillTemplate] 检测到JSON格式模板，直接使用AI生成内容")
+            logger.info("检测到JSON格式模板，直接使用AI生成内容")
             return ai_content
         except:
             pass  # 不是有效JSON，继续正常处理
@@ -830,35 +896,51 @@ def _fill_template(template_content: str, structured_data: dict, ai_content: str
     
     return filled_content
 
-@router.get("/list", response_model=List[DocumentResponse])
+@router.get("/list", response_model=List[DocumentListItem], response_model_exclude_unset=True)
 async def list_documents(
+    response: Response,
     skip: int = 0,
     limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取文书列表"""
-    result = await db.execute(
-        select(Document)
-        .where(Document.user_id == current_user.id)
-        .order_by(Document.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-    )
-    documents = result.scalars().all()
+    """
+    获取文书列表
     
-    return [
-        DocumentResponse(
-            id=doc.id,
-            title=doc.title,
-            content=doc.content,
-            document_type=doc.document_type,
-            status=doc.status,
-            ai_annotations=doc.ai_annotations,
-            created_at=doc.created_at
-        )
-        for doc in documents
-    ]
+    按创建时间倒序；传入上一页响应头 X-Next-Cursor 中的 cursor 时按游标翻页（忽略 skip）。
+    默认只返回摘要字段，fields 指定逗号分隔的字段（如 fields=id,title,content），正文请使用详情接口
+    """
+    selected = parse_fields(fields, DOCUMENT_LIST_FIELDS, DOCUMENT_SUMMARY_FIELDS)
+    page = await _query_document_list(db, current_user.id, skip, limit, cursor, ",".join(selected))
+    if page["next_cursor"]:
+        response.headers[NEXT_CURSOR_HEADER] = page["next_cursor"]
+    return page["items"]
+
+@cache_result("document_list", tags=["document_list:{user_id}"])
+async def _query_document_list(
+    db: AsyncSession, user_id: int, skip: int, limit: int, cursor: Optional[str] = None,
+    fields: str = ",".join(DOCUMENT_SUMMARY_FIELDS)
+) -> dict:
+    """查询文书列表（缓存，文书创建/修改时失效；只读取请求的列）"""
+    selected = fields.split(",")
+    query = document_list_query(user_id, selected)
+    query = apply_keyset(query, Document, cursor, skip, limit)
+    result = await db.execute(query)
+    documents, next_cursor = split_page(result.scalars().all(), limit)
+    
+    items = [{name: getattr(doc, name) for name in selected} for doc in documents]
+    if "ai_annotations" in selected:
+        for item in items:
+            item["ai_annotations"] = public_annotations(item["ai_annotations"])
+    return {"items": items, "next_cursor": next_cursor}
+
+def document_list_query(user_id: int, fields: List[str]):
+    """文书列表查询（只加载 fields 对应的列，游标分页还需要 created_at）"""
+    return select(Document).where(Document.user_id == user_id).options(
+        load_columns(Document, fields, "id", "created_at")
+    )
 
 @router.get("/{document_id}", response_model=DocumentResponse)
 async def get_document(
@@ -881,7 +963,7 @@ async def get_document(
         content=document.content,
         document_type=document.document_type,
         status=document.status,
-        ai_annotations=document.ai_annotations,
+        ai_annotations=public_annotations(document.ai_annotations),
         created_at=document.created_at
     )
 
@@ -915,14 +997,14 @@ async def download_document(
     if not document:
         raise HTTPException(status_code=404, detail="文档不存在")
     
-    print(f"[Download] Exporting document ID: {document_id}, format: {format}")
+    logger.info("Exporting document ID: %s, format: %s", document_id, format)
     
     content = document.content
     file_bytes = None
     
     # 检查 content 是否为 MinIO 文件路径（Word 模板生成的文档）
     if content and content.startswith("generated/") and content.endswith(".docx"):
-        print(f"[Download] Detected MinIO file path: {content}")
+        logger.debug("Detected MinIO file path: %s", content)
         # 直接从 MinIO 获取文件
         stored_bytes = await minio_client.download_file(content)
         if stored_bytes:
@@ -941,7 +1023,7 @@ async def download_document(
                     options={}
                 )
         else:
-            print(f"[Download] Failed to download from MinIO, falling back to export")
+            logger.warning("Failed to download from MinIO, falling back to export")
     
     # 如果没有从 MinIO 获取到文件，使用传统方式导出
     if not file_bytes:
@@ -973,11 +1055,11 @@ async def download_document(
                 options=export_options
             )
         except Exception as e:
-            print(f"[Download] Export error: {e}")
+            logger.error("Export error: %s", e)
             raise HTTPException(status_code=500, detail=f"文档导出失败: {str(e)}")
     
     # 记录审计日志
-    audit_log = AuditLog(
+    audit_writer.record(
         user_id=current_user.id,
         action="download",
         resource_type="document",
@@ -990,10 +1072,8 @@ async def download_document(
             "file_size": len(file_bytes)
         }
     )
-    db.add(audit_log)
-    await db.commit()
     
-    print(f"[Download] Document exported successfully: {len(file_bytes)} bytes")
+    logger.info("Document exported successfully: %s bytes", len(file_bytes))
     
     # 返回文件 - 处理中文文件名
     from urllib.parse import quote
@@ -1075,10 +1155,29 @@ async def update_document(
         )
         db.add(version)
         
-        print(f"[Update] Document {document_id} updated, version {next_version} created")
+        logger.info("Document %s updated, version %s created", document_id, next_version)
+        
+        # 增量重新验证：只重新执行受变更段落影响的规则
+        local_engine = get_local_rules_engine()
+        if request.revalidate and local_engine and document.content:
+            try:
+                previous_annotations = document.ai_annotations or {}
+                review_data = await _validate_with_local_rules(
+                    local_engine,
+                    document.content,
+                    document.structured_content or {},
+                    previous_annotations
+                )
+                rules_index = review_data.pop(INDEX_KEY, None)
+                document.ai_annotations = merge_local_review(previous_annotations, review_data, rules_index)
+                logger.info("Document %s revalidated: %s issues", document_id, len(review_data['errors']))
+            except Exception as e:
+                logger.warning("Revalidation failed: %s", e)
+    
+    await db.commit()
     
     # 记录审计日志
-    audit_log = AuditLog(
+    audit_writer.record(
         user_id=current_user.id,
         action="update",
         resource_type="document",
@@ -1089,10 +1188,9 @@ async def update_document(
             "new_version": (max_version or 0) + 1 if has_changes else None
         }
     )
-    db.add(audit_log)
     
-    await db.commit()
     await db.refresh(document)
+    await cache_service.invalidate_tags(f"document_list:{current_user.id}")
     
     return DocumentResponse(
         id=document.id,
@@ -1100,7 +1198,7 @@ async def update_document(
         content=document.content,
         document_type=document.document_type,
         status=document.status,
-        ai_annotations=document.ai_annotations,
+        ai_annotations=public_annotations(document.ai_annotations),
         created_at=document.created_at
     )
 
@@ -1128,7 +1226,7 @@ async def list_documents(
             content=doc.content,
             document_type=doc.document_type,
             status=doc.status,
-            ai_annotations=doc.ai_annotations,
+            ai_annotations=public_annotations(doc.ai_annotations),
             created_at=doc.created_at
         )
         for doc in documents
@@ -1155,7 +1253,7 @@ async def get_document(
         content=document.content,
         document_type=document.document_type,
         status=document.status,
-        ai_annotations=document.ai_annotations,
+        ai_annotations=public_annotations(document.ai_annotations),
         created_at=document.created_at
     )
 
@@ -1169,13 +1267,13 @@ async def get_conversation_history(
     current_user: User = Depends(get_current_user)
 ):
     """获取对话历史"""
-    messages = conversation_service.get_history(
+    messages = await conversation_service.get_history(
         user_id=current_user.id,
         session_id=session_id,
         limit=limit
     )
     
-    session_info = conversation_service.get_session_info(
+    session_info = await conversation_service.get_session_info(
         user_id=current_user.id,
         session_id=session_id
     )
@@ -1192,7 +1290,7 @@ async def clear_conversation(
     current_user: User = Depends(get_current_user)
 ):
     """清除对话历史"""
-    success = conversation_service.clear_history(
+    success = await conversation_service.clear_history(
         user_id=current_user.id,
         session_id=session_id
     )
@@ -1206,7 +1304,7 @@ async def get_conversation_info(
     current_user: User = Depends(get_current_user)
 ):
     """获取对话会话信息"""
-    session_info = conversation_service.get_session_info(
+    session_info = await conversation_service.get_session_info(
         user_id=current_user.id,
         session_id=session_id
     )
@@ -1243,8 +1341,10 @@ async def update_classification(
     old_classification = document.classification
     document.classification = request.classification
     
+    await db.commit()
+    
     # 记录审计日志
-    audit_log = AuditLog(
+    audit_writer.record(
         user_id=current_user.id,
         action="update_classification",
         resource_type="document",
@@ -1254,10 +1354,9 @@ async def update_classification(
             "new_classification": request.classification
         }
     )
-    db.add(audit_log)
     
-    await db.commit()
     await db.refresh(document)
+    await cache_service.invalidate_tags(f"document_list:{current_user.id}")
     
     return {
         "success": True,
@@ -1295,7 +1394,7 @@ async def get_document_preview(
     if not document:
         raise HTTPException(status_code=404, detail="文书不存在")
     
-    print(f"[Preview] Generating preview for document ID: {document_id}")
+    logger.info("Generating preview for document ID: %s", document_id)
     
     try:
         # 生成DOCX文件
@@ -1327,7 +1426,7 @@ async def get_document_preview(
         preview_url = preview_result.get("preview_url") if preview_result else None
         service_type = preview_result.get("service_type", "unsupported") if preview_result else "unsupported"
         
-        print(f"[Preview] Service: {service_type}, URL: {preview_url}")
+        logger.info("Service: %s, URL: %s", service_type, preview_url)
         
         return {
             "preview_url": preview_url,
@@ -1336,7 +1435,7 @@ async def get_document_preview(
             "document_id": document.id
         }
     except Exception as e:
-        print(f"[Preview] Error generating preview: {e}")
+        logger.error("Error generating preview: %s", e)
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"生成预览失败: {str(e)}")
@@ -1,20 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File as FastAPIFile, Request
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File as FastAPIFile, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import List, Optional
 import hashlib
+import logging
 from datetime import datetime
 from app.core.database import get_db
 from app.core.rate_limiter import upload_rate_limit, user_rate_limit
 from app.models.user import User
 from app.models.file import File
-from app.models.audit_log import AuditLog
+from app.services.audit_writer import audit_writer
 from app.api.v1.endpoints.auth import get_current_user
 from app.core.minio_client import minio_client
+from app.core.pagination import NEXT_CURSOR_HEADER, apply_keyset, split_page
 from app.services.preview_service_selector import preview_service_selector
+from app.services.cache_service import cache_result, cache_service
 from app.core.config import settings
 from pydantic import BaseModel
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 class FileResponse(BaseModel):
@@ -74,16 +79,17 @@ async def upload_file(
     )
     db.add(db_file)
     
+    await db.commit()
+    
     # 记录审计日志
-    audit_log = AuditLog(
+    audit_writer.record(
         user_id=current_user.id,
         action="upload",
         resource_type="file",
         details={"file_name": file.filename, "file_size": file_size}
     )
-    db.add(audit_log)
     
-    await db.commit()
+    await cache_service.invalidate_tags(f"file_list:{current_user.id}")
     await db.refresh(db_file)
     
     # 获取预览 URL（优先使用WPS服务）
@@ -99,7 +105,7 @@ async def upload_file(
         )
         if preview_result and preview_result.get("preview_url"):
             preview_url = preview_result["preview_url"]
-            print(f"[Upload] Preview service: {preview_result.get('service_type')}")
+            logger.debug("Preview service: %s", preview_result.get('service_type'))
     
     return FileResponse(
         id=db_file.id,
@@ -206,8 +212,10 @@ async def batch_upload_files(
             })
             failed_count += 1
     
+    await db.commit()
+    
     # 记录审计日志
-    audit_log = AuditLog(
+    audit_writer.record(
         user_id=current_user.id,
         action="batch_upload",
         resource_type="file",
@@ -217,9 +225,8 @@ async def batch_upload_files(
             "failed_count": failed_count
         }
     )
-    db.add(audit_log)
     
-    await db.commit()
+    await cache_service.invalidate_tags(f"file_list:{current_user.id}")
     
     return BatchUploadResult(
         success_count=success_count,
@@ -230,22 +237,33 @@ async def batch_upload_files(
 
 @router.get("/list", response_model=List[FileResponse])
 async def list_files(
+    response: Response,
     skip: int = 0,
     limit: int = 20,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取文件列表"""
-    result = await db.execute(
-        select(File)
-        .where(File.user_id == current_user.id)
-        .order_by(File.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-    )
-    files = result.scalars().all()
-    
-    return [
+    """
+    获取文件列表
+    
+    按上传时间倒序；传入上一页响应头 X-Next-Cursor 中的 cursor 时按游标翻页（忽略 skip）
+    """
+    page = await _query_file_list(db, current_user.id, skip, limit, cursor)
+    if page["next_cursor"]:
+        response.headers[NEXT_CURSOR_HEADER] = page["next_cursor"]
+    return page["items"]
+
+@cache_result("file_list", tags=["file_list:{user_id}"])
+async def _query_file_list(
+    db: AsyncSession, user_id: int, skip: int, limit: int, cursor: Optional[str] = None
+) -> dict:
+    """查询文件列表（缓存，文件上传/删除/状态变化时失效）"""
+    query = apply_keyset(select(File).where(File.user_id == user_id), File, cursor, skip, limit)
+    result = await db.execute(query)
+    files, next_cursor = split_page(result.scalars().all(), limit)
+    
+    items = [
         FileResponse(
             id=f.id,
             file_name=f.file_name,
@@ -253,9 +271,10 @@ async def list_files(
             file_size=f.file_size,
             status=f.status,
             created_at=f.created_at
-        )
+        ).dict(exclude_none=True)
         for f in files
     ]
+    return {"items": items, "next_cursor": next_cursor}
 
 @router.get("/{file_id}/preview")
 async def get_file_preview(
@@ -283,7 +302,7 @@ async def get_file_preview(
         file_ext = file.file_type.lower().lstrip('.')
         
         if file_ext in supported_types:
-            print(f"[Preview] Using ONLYOFFICE for {file_ext} file")
+            logger.debug("Using ONLYOFFICE for %s file", file_ext)
             return {
                 "preview_url": "use_onlyoffice_component",
                 "file_url": file_url,
@@ -303,7 +322,7 @@ async def get_file_preview(
         preview_url = preview_result.get("preview_url") if preview_result else None
         service_type = preview_result.get("service_type", "unsupported") if preview_result else "unsupported"
         
-        print(f"[Preview] Service: {service_type}, URL: {preview_url}")
+        logger.debug("Preview service: %s, URL: %s", service_type, preview_url)
         
         return {
             "preview_url": preview_url,
@@ -315,9 +334,7 @@ async def get_file_preview(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Preview error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Preview error: %s", e)
         raise HTTPException(status_code=500, detail=f"预览失败: {str(e)}")
 
 @router.get("/{file_id}/content")
@@ -408,16 +425,17 @@ async def delete_file(
     # 从数据库删除
     await db.delete(file)
     
+    await db.commit()
+    
     # 记录审计日志
-    audit_log = AuditLog(
+    audit_writer.record(
         user_id=current_user.id,
         action="delete",
         resource_type="file",
         resource_id=file_id,
         details={"file_name": file.file_name}
     )
-    db.add(audit_log)
     
-    await db.commit()
+    await cache_service.invalidate_tags(f"file_list:{current_user.id}")
     
     return {"message": "文件已删除"}
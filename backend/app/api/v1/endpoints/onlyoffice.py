@@ -10,6 +10,7 @@ from typing import Optional
 from pydantic import BaseModel
 import httpx
 import io
+import logging
 
 from app.core.database import get_db
 from app.models.user import User
@@ -18,6 +19,9 @@ from app.models.document import Document
 from app.api.v1.endpoints.auth import get_current_user
 from app.services.onlyoffice_service import onlyoffice_service
 from app.core.minio_client import minio_client
+from app.services.cache_service import cache_service
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -114,11 +118,9 @@ async def download_file_for_onlyoffice(
     注意：此端点不需要认证，因为ONLYOFFICE服务器无法提供用户token
     """
     
-    print(f"[OnlyOffice] ========== Download Request ==========")
-    print(f"[OnlyOffice] File ID: {file_id}")
-    print(f"[OnlyOffice] Client IP: {request.client.host if request.client else 'unknown'}")
-    print(f"[OnlyOffice] User-Agent: {request.headers.get('user-agent', 'unknown')}")
-    print(f"[OnlyOffice] Headers: {dict(request.headers)}")
+    logger.info("Download request for file %s from %s", file_id, request.client.host if request.client else 'unknown')
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Request headers: %s", dict(request.headers))
     
     # 查询文件
     result = await db.execute(
@@ -127,12 +129,12 @@ async def download_file_for_onlyoffice(
     file = result.scalar_one_or_none()
     
     if not file:
-        print(f"[OnlyOffice] ERROR: File {file_id} not found in database")
+        logger.warning("File %s not found in database", file_id)
         raise HTTPException(status_code=404, detail="文件不存在")
     
-    print(f"[OnlyOffice] File found: {file.file_name}")
-    print(f"[OnlyOffice] Storage path: {file.storage_path}")
-    print(f"[OnlyOffice] File type: {file.file_type}")
+    logger.debug("File found: %s", file.file_name)
+    logger.debug("Storage path: %s", file.storage_path)
+    logger.debug("File type: %s", file.file_type)
     
     # 根据文件类型确定MIME类型
     mime_types = {
@@ -145,7 +147,7 @@ async def download_file_for_onlyoffice(
         'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
     }
     content_type = mime_types.get(file.file_type.lower(), 'application/octet-stream')
-    print(f"[OnlyOffice] Content type: {content_type}")
+    logger.debug("Content type: %s", content_type)
     
     # 对文件名进行URL编码以支持中文
     from urllib.parse import quote
@@ -153,7 +155,7 @@ async def download_file_for_onlyoffice(
     
     # 如果是HEAD请求，只返回头部信息
     if request.method == "HEAD":
-        print(f"[OnlyOffice] HEAD request - returning headers only")
+        logger.debug("HEAD request - returning headers only")
         return StreamingResponse(
             io.BytesIO(b""),
             media_type=content_type,
@@ -167,10 +169,10 @@ async def download_file_for_onlyoffice(
     
     try:
         # 从MinIO下载文件
-        print(f"[OnlyOffice] Downloading from MinIO...")
+        logger.debug("Downloading from MinIO...")
         file_data = await minio_client.download_file(file.storage_path)
         
-        print(f"[OnlyOffice] SUCCESS: File downloaded from MinIO, size: {len(file_data)} bytes")
+        logger.info("File downloaded from MinIO, size: %s bytes", len(file_data))
         
         # 对文件名进行URL编码以支持中文
         from urllib.parse import quote
@@ -189,7 +191,7 @@ async def download_file_for_onlyoffice(
             }
         )
     except Exception as e:
-        print(f"[OnlyOffice] ERROR downloading file: {e}")
+        logger.error("Error downloading file: %s", e)
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"文件下载失败: {str(e)}")
@@ -207,10 +209,8 @@ async def download_document_for_onlyoffice(
     注意：此端点不需要认证，因为ONLYOFFICE服务器无法提供用户token
     """
     
-    print(f"[OnlyOffice] ========== Download Request ==========")
-    print(f"[OnlyOffice] Document ID: {document_id}")
-    print(f"[OnlyOffice] Client IP: {request.client.host if request.client else 'unknown'}")
-    print(f"[OnlyOffice] User-Agent: {request.headers.get('user-agent', 'unknown')}")
+    logger.info("Download request for document %s from %s", document_id, request.client.host if request.client else 'unknown')
+    logger.debug("User-Agent: %s", request.headers.get('user-agent', 'unknown'))
     
     # 查询文书
     result = await db.execute(
@@ -219,14 +219,14 @@ async def download_document_for_onlyoffice(
     document = result.scalar_one_or_none()
     
     if not document:
-        print(f"[OnlyOffice] ERROR: Document {document_id} not found in database")
+        logger.warning("Document %s not found in database", document_id)
         raise HTTPException(status_code=404, detail="文书不存在")
     
-    print(f"[OnlyOffice] Document found: {document.title}")
+    logger.debug("Document found: %s", document.title)
     
     # 生成文件路径（与生成时保持一致）
     file_path = f"temp_preview/{document.user_id}/{document.id}.docx"
-    print(f"[OnlyOffice] Storage path: {file_path}")
+    logger.debug("Storage path: %s", file_path)
     
     # 对文件名进行URL编码以支持中文
     from urllib.parse import quote
@@ -234,7 +234,7 @@ async def download_document_for_onlyoffice(
     
     # 如果是HEAD请求，只返回头部信息
     if request.method == "HEAD":
-        print(f"[OnlyOffice] HEAD request - returning headers only")
+        logger.debug("HEAD request - returning headers only")
         return StreamingResponse(
             io.BytesIO(b""),
             media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
@@ -248,12 +248,12 @@ async def download_document_for_onlyoffice(
     
     try:
         # 从MinIO下载文书
-        print(f"[OnlyOffice] Downloading from MinIO...")
+        logger.debug("Downloading from MinIO...")
         file_data = await minio_client.download_file(file_path)
         
         # 如果文件不存在，尝试重新生成
         if not file_data:
-            print(f"[OnlyOffice] File not found in MinIO, regenerating...")
+            logger.warning("File not found in MinIO, regenerating...")
             from app.services.document_export_service import document_export_service
             
             # 重新生成 DOCX 文件
@@ -271,9 +271,9 @@ async def download_document_for_onlyoffice(
             )
             
             file_data = docx_bytes
-            print(f"[OnlyOffice] File regenerated and uploaded, size: {len(file_data)} bytes")
+            logger.info("File regenerated and uploaded, size: %s bytes", len(file_data))
         
-        print(f"[OnlyOffice] SUCCESS: Document downloaded from MinIO, size: {len(file_data)} bytes")
+        logger.info("Document downloaded from MinIO, size: %s bytes", len(file_data))
         
         # 返回文件流
         return StreamingResponse(
@@ -288,7 +288,7 @@ async def download_document_for_onlyoffice(
             }
         )
     except Exception as e:
-        print(f"[OnlyOffice] ERROR downloading document: {e}")
+        logger.error("Error downloading document: %s", e)
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"文书下载失败: {str(e)}")
@@ -307,7 +307,7 @@ async def handle_callback(
     # 获取回调数据
     callback_data = await request.json()
     
-    print(f"[OnlyOffice] Callback received: {callback_data}")
+    logger.debug("Callback received: %s", callback_data)
     
     # 从查询参数获取ID和类型
     file_id = request.query_params.get('fileId')
@@ -354,8 +354,9 @@ async def handle_callback(
                             # 更新文件记录
                             file.file_size = len(file_bytes)
                             await db.commit()
+                            await cache_service.invalidate_tags(f"file_list:{file.user_id}")
                             
-                            print(f"[OnlyOffice] File {file_id} saved successfully")
+                            logger.info("File %s saved successfully", file_id)
                     
                     elif document_id:
                         # 更新文书
@@ -376,12 +377,12 @@ async def handle_callback(
                             document.file_size = len(file_bytes)
                             await db.commit()
                             
-                            print(f"[OnlyOffice] Document {document_id} saved successfully")
+                            logger.info("Document %s saved successfully", document_id)
                 else:
-                    print(f"[OnlyOffice] Failed to download from ONLYOFFICE: {response.status_code}")
+                    logger.warning("Failed to download from ONLYOFFICE: %s", response.status_code)
                     return {"error": 1, "message": "Failed to download edited file"}
         except Exception as e:
-            print(f"[OnlyOffice] Error saving file: {e}")
+            logger.error("Error saving file: %s", e)
             import traceback
             traceback.print_exc()
             return {"error": 1, "message": f"Save failed: {str(e)}"}
@@ -5,17 +5,22 @@ from sqlalchemy import select
 from typing import List, Optional
 from datetime import datetime
 import json
+import logging
 from app.core.database import get_db
 from app.core.rate_limiter import ai_rate_limit, user_rate_limit
 from app.core.minio_client import minio_client
+from app.core.pagination import NEXT_CURSOR_HEADER, apply_keyset, split_page
 from app.models.user import User
 from app.models.template import Template
-from app.models.audit_log import AuditLog
+from app.services.audit_writer import audit_writer
 from app.api.v1.endpoints.auth import get_current_user
 from app.services.template_processor_service import template_processor_service
 from app.services.docx_render_service import docx_render_service
+from app.services.cache_service import cache_result, cache_service
 from pydantic import BaseModel
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -84,7 +89,7 @@ async def upload_and_process_template(
     try:
         # 读取文件内容
         file_bytes = await file.read()
-        print(f"[TemplateUpload] File uploaded: {file.filename}, {len(file_bytes)} bytes")
+        logger.debug("Template uploaded: %s, %d bytes", file.filename, len(file_bytes))
         
         # 调用模板处理服务
         result = await template_processor_service.process_template(file_bytes, file.filename)
@@ -109,7 +114,7 @@ async def upload_and_process_template(
             "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
         )
         
-        print(f"[TemplateUpload] Temp files saved: {temp_template_path}")
+        logger.debug("Temp files saved: %s", temp_template_path)
         
         return TemplatePreviewResponse(
             success=True,
@@ -123,9 +128,7 @@ async def upload_and_process_template(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[TemplateUpload] Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Template upload error: %s", e)
         raise HTTPException(status_code=500, detail=f"模板处理失败: {str(e)}")
 
 
@@ -156,7 +159,7 @@ async def get_temp_preview(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[TempPreview] Error: {e}")
+        logger.error("Temp preview error: %s", e)
         raise HTTPException(status_code=500, detail="获取预览失败")
 
 
@@ -213,8 +216,10 @@ async def confirm_template(
         )
         db.add(template)
         
+        await db.commit()
+        
         # 记录审计日志
-        audit_log = AuditLog(
+        audit_writer.record(
             user_id=current_user.id,
             action="create_template",
             resource_type="template",
@@ -224,12 +229,11 @@ async def confirm_template(
                 "field_count": len(request.fields)
             }
         )
-        db.add(audit_log)
         
-        await db.commit()
         await db.refresh(template)
+        await cache_service.invalidate_tags(f"template_list:{current_user.id}")
         
-        print(f"[TemplateConfirm] Template saved: ID={template.id}, name={request.name}")
+        logger.info("Template saved: ID=%s, name=%s", template.id, request.name)
         
         return TemplateResponse(
             id=template.id,
@@ -245,35 +249,55 @@ async def confirm_template(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[TemplateConfirm] Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Template confirm error: %s", e)
         raise HTTPException(status_code=500, detail=f"模板保存失败: {str(e)}")
 
 
 @router.get("/list", response_model=List[TemplateResponse])
 async def list_templates(
+    response: Response,
     document_type: str = None,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取模板列表"""
+    """
+    获取模板列表
+    
+    按创建时间倒序；传入上一页响应头 X-Next-Cursor 中的 cursor 时按游标翻页（忽略 skip）
+    """
+    page = await _query_template_list(db, current_user.id, document_type, skip, limit, cursor)
+    if page["next_cursor"]:
+        response.headers[NEXT_CURSOR_HEADER] = page["next_cursor"]
+    return page["items"]
+
+
+@cache_result("template_list", tags=["template_list:{user_id}"])
+async def _query_template_list(
+    db: AsyncSession,
+    user_id: int,
+    document_type: Optional[str],
+    skip: int,
+    limit: int,
+    cursor: Optional[str] = None
+) -> dict:
+    """查询模板列表（缓存，模板创建/删除时失效）"""
     query = select(Template).where(
-        Template.user_id == current_user.id, 
+        Template.user_id == user_id, 
         Template.is_active == True
     )
     
     if document_type:
         query = query.where(Template.document_type == document_type)
     
-    query = query.order_by(Template.created_at.desc()).offset(skip).limit(limit)
+    query = apply_keyset(query, Template, cursor, skip, limit)
     
     result = await db.execute(query)
-    templates = result.scalars().all()
+    templates, next_cursor = split_page(result.scalars().all(), limit)
     
-    return [
+    items = [
         TemplateResponse(
             id=t.id,
             name=t.name,
@@ -283,9 +307,10 @@ async def list_templates(
             is_active=t.is_active,
             version=t.version,
             created_at=t.created_at
-        )
+        ).dict()
         for t in templates
     ]
+    return {"items": items, "next_cursor": next_cursor}
 
 
 @router.get("/{template_id}", response_model=TemplateResponse)
@@ -369,16 +394,17 @@ async def delete_template(
     # 软删除
     template.is_active = False
     
+    await db.commit()
+    
     # 记录审计日志
-    audit_log = AuditLog(
+    audit_writer.record(
         user_id=current_user.id,
         action="delete_template",
         resource_type="template",
         resource_id=template_id,
         details={"name": template.name}
     )
-    db.add(audit_log)
     
-    await db.commit()
+    await cache_service.invalidate_tags(f"template_list:{current_user.id}")
     
     return {"success": True, "message": "模板已删除"}
@@ -7,9 +7,11 @@ from app.core.database import get_db
 from app.models.user import User
 from app.models.version import Version
 from app.models.document import Document
-from app.models.audit_log import AuditLog
+from app.services.audit_writer import audit_writer
 from app.api.v1.endpoints.auth import get_current_user
 from app.services.version_compare_service import version_compare_service
+from app.services.cache_service import cache_service
+from app.core.projection import parse_fields, load_columns
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -30,6 +32,24 @@ class VersionResponse(BaseModel):
     rollback_from_version: Optional[int]
     created_at: datetime
 
+class VersionListItem(BaseModel):
+    """版本列表项（只包含请求的字段）"""
+    id: int
+    document_id: Optional[int] = None
+    version_number: Optional[int] = None
+    change_description: Optional[str] = None
+    is_rollback: Optional[int] = None
+    rollback_from_version: Optional[int] = None
+    created_at: Optional[datetime] = None
+    content: Optional[str] = None
+    structured_content: Optional[dict] = None
+
+# 列表可选字段；默认不返回各版本正文，需要时在 fields 中指定或通过版本详情接口获取
+VERSION_LIST_FIELDS = tuple(VersionListItem.model_fields)
+VERSION_SUMMARY_FIELDS = (
+    "id", "document_id", "version_number", "change_description", "is_rollback", "rollback_from_version", "created_at"
+)
+
 class RollbackRequest(BaseModel):
     document_id: int
     target_version: int
@@ -90,17 +110,17 @@ async def create_version(
     )
     db.add(version)
     
+    await db.commit()
+    
     # 记录审计日志
-    audit_log = AuditLog(
+    audit_writer.record(
         user_id=current_user.id,
         action="create_version",
         resource_type="version",
         resource_id=version_data.document_id,
         details={"version_number": next_version}
     )
-    db.add(audit_log)
     
-    await db.commit()
     await db.refresh(version)
     
     return VersionResponse(
@@ -114,43 +134,41 @@ async def create_version(
         created_at=version.created_at
     )
 
-@router.get("/list/{document_id}", response_model=List[VersionResponse])
+@router.get("/list/{document_id}", response_model=List[VersionListItem], response_model_exclude_unset=True)
 async def list_versions(
     document_id: int,
+    fields: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取文书版本列表"""
+    """
+    获取文书版本列表
+    
+    默认只返回摘要字段，fields 指定逗号分隔的字段（如 fields=id,version_number,content）
+    """
+    selected = parse_fields(fields, VERSION_LIST_FIELDS, VERSION_SUMMARY_FIELDS)
+    
     # 验证文档所有权
     result = await db.execute(
-        select(Document).where(Document.id == document_id, Document.user_id == current_user.id)
+        select(Document.id).where(Document.id == document_id, Document.user_id == current_user.id)
     )
-    document = result.scalar_one_or_none()
-    
-    if not document:
+    if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="文书不存在")
     
-    # 获取版本列表
-    result = await db.execute(
+    # 获取版本列表（只读取请求的列）
+    result = await db.execute(version_list_query(document_id, selected))
+    versions = result.scalars().all()
+    
+    return [{name: getattr(v, name) for name in selected} for v in versions]
+
+def version_list_query(document_id: int, fields: List[str]):
+    """版本列表查询（只加载 fields 对应的列）"""
+    return (
         select(Version)
         .where(Version.document_id == document_id)
+        .options(load_columns(Version, fields, "id", "version_number"))
         .order_by(Version.version_number.desc())
     )
-    versions = result.scalars().all()
-    
-    return [
-        VersionResponse(
-            id=v.id,
-            document_id=v.document_id,
-            version_number=v.version_number,
-            content=v.content,
-            change_description=v.change_description,
-            is_rollback=v.is_rollback,
-            rollback_from_version=v.rollback_from_version,
-            created_at=v.created_at
-        )
-        for v in versions
-    ]
 
 @router.post("/rollback", response_model=VersionResponse)
 async def rollback_version(
@@ -207,8 +225,10 @@ async def rollback_version(
     document.content = target_version.content
     document.structured_content = target_version.structured_content
     
+    await db.commit()
+    
     # 记录审计日志
-    audit_log = AuditLog(
+    audit_writer.record(
         user_id=current_user.id,
         action="rollback",
         resource_type="version",
@@ -219,9 +239,8 @@ async def rollback_version(
             "reason": request.rollback_reason
         }
     )
-    db.add(audit_log)
     
-    await db.commit()
+    await cache_service.invalidate_tags(f"document_list:{current_user.id}")
     await db.refresh(rollback_version)
     
     return VersionResponse(
@@ -299,7 +318,7 @@ async def compare_versions(
     highlights = version_compare_service.get_change_highlights(diff_result)
     
     # 记录审计日志
-    audit_log = AuditLog(
+    audit_writer.record(
         user_id=current_user.id,
         action="compare_versions",
         resource_type="version",
@@ -310,8 +329,6 @@ async def compare_versions(
             "compare_type": request.compare_type
         }
     )
-    db.add(audit_log)
-    await db.commit()
     
     return CompareResponse(
         version1_number=diff_result['version1_number'],
@@ -0,0 +1,259 @@
+"""
+准入控制与过载保护中间件
+
+1. 全局限流：按客户端 IP 执行 RATE_LIMIT_GLOBAL（经受信任代理转发时按 X-Forwarded-For 识别，见 app.core.proxy）
+2. 按路由类别（AI / 上传 / 读 / 其他）限制并发，超出并发的请求排队，
+   排队超过期限或队列已满时直接拒绝
+3. 事件循环平滑延迟过高或数据库连接池耗尽时，新请求直接拒绝
+   （只看平滑值：单次阻塞不会让整个采样周期内的请求都被拒绝）
+
+被拒绝的请求立即返回 503 + Retry-After，避免请求堆积在事件循环上，
+直到 LLM、MinIO、数据库的超时连锁触发
+"""
+from typing import Dict, Any, Optional
+from collections import deque
+import asyncio
+import logging
+import time
+
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import ADMISSION_SHED
+from app.core.proxy import client_host
+from app.core.rate_limiter import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# 不受准入控制的路径（健康检查、监控）
+EXEMPT_PATHS = ("/", "/health", "/metrics", "/docs", "/redoc", "/openapi.json")
+EXEMPT_PREFIXES = ("/api/v1/health", "/api/v1/admin")
+
+# AI 类接口（调用大模型，耗时长）
+AI_PATH_SUFFIXES = ("/documents/generate", "/documents/review", "/templates/upload")
+
+
+def classify_route(method: str, path: str) -> str:
+    """
+    按请求方法和路径划分路由类别
+    
+    Returns:
+        ai / upload / read / write
+    """
+    if path.endswith(AI_PATH_SUFFIXES):
+        return "ai"
+    if path.endswith("upload"):
+        return "upload"
+    if method in ("GET", "HEAD"):
+        return "read"
+    return "write"
+
+
+class ShedError(Exception):
+    """请求被拒绝"""
+    
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ConcurrencyLimiter:
+    """带有界等待队列和排队期限的并发限制器"""
+    
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        
+        self.in_flight = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        
+        self.stats = {"admitted": 0, "queued": 0, "shed": {}, "queue_wait_ms_total": 0.0}
+    
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+    
+    async def acquire(self):
+        """获取执行名额，失败时抛出 ShedError"""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return
+        
+        if len(self._waiters) >= self.max_queue:
+            raise ShedError("queue_full")
+        
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.stats["queued"] += 1
+        start = time.perf_counter()
+        
+        try:
+            # 名额由 release 直接转交给等待者（in_flight 已在 release 中计入）
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # 超时的同时刚好拿到名额，直接使用
+                pass
+            else:
+                future.cancel()
+                self._remove_waiter(future)
+                raise ShedError("queue_timeout")
+        except asyncio.CancelledError:
+            # 客户端断开：已拿到的名额要归还
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+                self._remove_waiter(future)
+            raise
+        finally:
+            self.stats["queue_wait_ms_total"] += (time.perf_counter() - start) * 1000
+        
+        self.stats["admitted"] += 1
+    
+    def release(self):
+        """归还名额，优先转交给队首的等待者"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+    
+    def _remove_waiter(self, future: asyncio.Future):
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+    
+    def record_shed(self, reason: str):
+        self.stats["shed"][reason] = self.stats["shed"].get(reason, 0) + 1
+        ADMISSION_SHED.labels(route_class=self.name, reason=reason).inc()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "admitted": self.stats["admitted"],
+            "queued": self.stats["queued"],
+            "shed": dict(self.stats["shed"]),
+            "avg_queue_wait_ms": round(self.stats["queue_wait_ms_total"] / self.stats["queued"], 2)
+            if self.stats["queued"] else 0
+        }
+
+
+class AdmissionController:
+    """准入控制器"""
+    
+    def __init__(self):
+        self.enabled = settings.ADMISSION_ENABLED
+        self.max_loop_lag_ms = settings.ADMISSION_MAX_LOOP_LAG_MS
+        self.retry_after = settings.ADMISSION_RETRY_AFTER
+        
+        queue_timeout = settings.ADMISSION_QUEUE_TIMEOUT
+        self.limiters: Dict[str, ConcurrencyLimiter] = {
+            "ai": ConcurrencyLimiter("ai", settings.ADMISSION_AI_CONCURRENCY, settings.ADMISSION_AI_CONCURRENCY * 2, queue_timeout),
+            "upload": ConcurrencyLimiter("upload", settings.ADMISSION_UPLOAD_CONCURRENCY, settings.ADMISSION_UPLOAD_CONCURRENCY * 2, queue_timeout),
+            "read": ConcurrencyLimiter("read", settings.ADMISSION_READ_CONCURRENCY, settings.ADMISSION_READ_CONCURRENCY, queue_timeout),
+            "write": ConcurrencyLimiter("write", settings.ADMISSION_WRITE_CONCURRENCY, settings.ADMISSION_WRITE_CONCURRENCY, queue_timeout),
+        }
+        self.global_limited = 0
+    
+    def check_overload(self) -> Optional[str]:
+        """检查系统是否过载，返回拒绝原因"""
+        if loop_monitor.smoothed_lag_ms > self.max_loop_lag_ms:
+            return "loop_lag"
+        if self._db_pool_saturated():
+            return "db_pool"
+        return None
+    
+    @staticmethod
+    def _db_pool_saturated() -> bool:
+        """数据库连接池是否已全部借出（再来的请求只能等待连接）"""
+        try:
+            from app.core.database import engine
+            pool = engine.sync_engine.pool
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            return pool.checkedout() >= capacity
+        except Exception:
+            return False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取准入控制统计"""
+        return {
+            "enabled": self.enabled,
+            "loop_lag_ms": round(loop_monitor.smoothed_lag_ms, 2),
+            "max_loop_lag_ms": self.max_loop_lag_ms,
+            "db_pool_saturated": self._db_pool_saturated(),
+            "global_rate_limited": self.global_limited,
+            "classes": {name: limiter.get_stats() for name, limiter in self.limiters.items()}
+        }
+
+
+# 全局实例
+admission_controller = AdmissionController()
+
+
+class AdmissionControlMiddleware:
+    """准入控制中间件（纯 ASGI 实现）"""
+    
+    def __init__(self, app, controller: AdmissionController = None):
+        self.app = app
+        self.controller = controller or admission_controller
+    
+    async def __call__(self, scope, receive, send):
+        controller = self.controller
+        if scope["type"] != "http" or not controller.enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope["method"]
+        path = scope["path"]
+        if method == "OPTIONS" or path in EXEMPT_PATHS or path.startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        
+        # 全局限流（按客户端 IP）
+        if rate_limiter.enabled:
+            result = await rate_limiter.hit(f"global:ip:{client_host(scope)}", settings.RATE_LIMIT_GLOBAL)
+            if not result.allowed:
+                controller.global_limited += 1
+                response = JSONResponse(
+                    {"detail": f"Rate limit exceeded: {settings.RATE_LIMIT_GLOBAL}"},
+                    status_code=429,
+                    headers=result.headers()
+                )
+                await response(scope, receive, send)
+                return
+        
+        limiter = controller.limiters[classify_route(method, path)]
+        
+        reason = controller.check_overload()
+        if reason is None:
+            try:
+                await limiter.acquire()
+            except ShedError as e:
+                reason = e.reason
+        
+        if reason is not None:
+            limiter.record_shed(reason)
+            logger.warning("Shed %s %s (%s): %s", method, path, limiter.name, reason)
+            response = JSONResponse(
+                {"detail": "服务繁忙，请稍后重试", "reason": reason},
+                status_code=503,
+                headers={"Retry-After": str(controller.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+        
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -38,6 +38,12 @@ class Settings(BaseSettings):
     REDIS_PORT: int
     REDIS_PASSWORD: str = ""
     REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 50  # 连接池最大连接数
+    REDIS_SOCKET_TIMEOUT: float = 5.0  # 命令超时（秒）
+    REDIS_CONNECT_TIMEOUT: float = 5.0  # 建立连接超时（秒）
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30  # 空闲连接健康检查间隔（秒）
+    REDIS_RECONNECT_MAX_BACKOFF: int = 60  # 启动时连接失败后，后台重连的最大间隔（秒）
+    REDIS_CODEC: str = "orjson"  # 值编解码：orjson / json（orjson 未安装时自动回退到 json）
     
     # MinIO
     MINIO_ENDPOINT: str
@@ -73,13 +79,99 @@ class Settings(BaseSettings):
     def API_RETRY_DELAYS_LIST(self) -> List[int]:
         return [int(d) for d in self.API_RETRY_DELAYS.split(",")]
     
+    # 大模型调用录制/回放（用于离线压测与性能分析）
+    LLM_REPLAY_MODE: str = "off"  # off / record（录制真实响应）/ replay（从录制文件返回）
+    LLM_REPLAY_STORE: str = "llm_replay.jsonl"  # 录制文件（JSON Lines）
+    LLM_REPLAY_LATENCY_SCALE: float = 0.0  # 回放时按录制延迟的倍数等待，0 表示立即返回
+    LLM_REPLAY_ON_MISS: str = "fail"  # 回放未命中时：fail（按调用失败处理）/ passthrough（调用真实接口）
+    
+    # 对话上下文配置
+    CONTEXT_TOKEN_BUDGET: int = 6000  # 单次生成请求的 token 预算（系统提示、本轮输入、参考文件、历史对话）
+    CONTEXT_FILE_BUDGET_RATIO: float = 0.4  # 扣除系统提示和本轮输入后，参考文件最多占用的比例
+    CONTEXT_SUMMARY_MAX_TOKENS: int = 800  # 滚动摘要的最大 token 数
+    RETRIEVAL_TOP_K: int = 6  # 参考文件中选取的相关片段数
+    RETRIEVAL_CHUNK_SIZE: int = 400  # 参考文件切分片段的字符数
+    
     # API 限流配置
     RATE_LIMIT_ENABLED: bool = True  # 使用自定义限流实现
-    RATE_LIMIT_GLOBAL: str = "100/minute"  # 全局限流：每分钟 100 次
+    RATE_LIMIT_GLOBAL: str = "100/minute"  # 全局限流：每个客户端 IP 每分钟 100 次
+    # 受信任的反向代理（逗号分隔的 IP 或网段）：来自这些地址的请求按 X-Forwarded-For 识别客户端 IP。
+    # 经 Nginx 容器转发时需包含容器网络的网段（docker-compose 中已设置），否则所有请求共用代理的 IP
+    TRUSTED_PROXY_IPS: str = "127.0.0.1,::1"
     RATE_LIMIT_USER: str = "50/minute"  # 用户级限流：每分钟 50 次
     RATE_LIMIT_AI: str = "10/minute"  # AI 接口限流：每分钟 10 次
     RATE_LIMIT_UPLOAD: str = "20/minute"  # 上传接口限流：每分钟 20 次
     
+    # 准入控制配置（过载保护）
+    ADMISSION_ENABLED: bool = True  # 是否启用准入控制
+    ADMISSION_AI_CONCURRENCY: int = 8  # AI 接口最大并发（每个 worker）
+    ADMISSION_UPLOAD_CONCURRENCY: int = 8  # 上传接口最大并发
+    ADMISSION_READ_CONCURRENCY: int = 64  # 读接口最大并发
+    ADMISSION_WRITE_CONCURRENCY: int = 32  # 其他写接口最大并发
+    ADMISSION_QUEUE_TIMEOUT: float = 2.0  # 排队最长等待时间（秒），超时返回 503
+    ADMISSION_MAX_LOOP_LAG_MS: float = 200  # 事件循环延迟超过该值时拒绝新请求（毫秒）
+    ADMISSION_RETRY_AFTER: int = 5  # 503 响应的 Retry-After（秒）
+    
+    # 事件循环阻塞检测
+    LOOP_BLOCK_THRESHOLD_MS: float = 100  # 事件循环延迟超过该值记为一次阻塞（毫秒）
+    LOOP_BLOCK_DEBUG: bool = False  # 阻塞期间是否采样调用栈（可通过管理接口临时开启）
+    
+    # 日志
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # text 或 json
+    LOG_LEVELS: str = "sqlalchemy.engine=WARNING"  # 按模块设置级别，如 "app.services.cache_service=DEBUG,sqlalchemy.engine=INFO"
+    LOG_QUEUE_SIZE: int = 10000  # 日志队列上限，写出跟不上时丢弃
+    DB_ECHO: bool = False  # 是否输出每条 SQL（调试用，开启后日志量很大）
+    
+    # 链路追踪
+    TRACING_ENABLED: bool = True
+    TRACE_SAMPLE_RATE: float = 0.01  # 普通请求的导出采样率（慢请求总是导出）
+    TRACE_SLOW_MS: float = 5000  # 超过该耗时的请求记为慢请求（毫秒）
+    TRACE_SLOW_KEEP: int = 50  # 内存中保留的最近慢请求链路数
+    TRACE_EXPORT_FILE: str = ""  # 导出到本地文件（JSON Lines），为空不导出
+    TRACE_OTLP_ENDPOINT: str = ""  # OTLP/HTTP 收集器地址，如 http://localhost:4318，为空不导出
+    TRACE_SERVICE_NAME: str = "petition-backend"
+    
+    # SQL 监控
+    SQL_SLOW_QUERY_MS: float = 200  # 慢查询阈值（毫秒）
+    SQL_EXPLAIN_ENABLED: bool = True  # 是否对慢查询采集 EXPLAIN
+    SQL_EXPLAIN_SAMPLE_RATE: float = 0.1  # 慢查询采集 EXPLAIN 的采样率
+    SQL_EXPLAIN_INTERVAL: int = 300  # 同一语句两次采集 EXPLAIN 的最小间隔（秒）
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5  # 同一请求内同一语句执行达到该次数记为 N+1 候选
+    SQL_STATEMENT_STATS_MAX: int = 500  # 按语句汇总的最大条数
+    
+    # 采样分析器（管理接口按需启动）
+    PROFILER_MAX_SECONDS: int = 60  # 单次采样最长时间（秒）
+    PROFILER_MAX_OVERHEAD: float = 0.05  # 采样耗时占采样间隔的上限，超过时自动拉长间隔
+    PROFILER_ALLOWED_USERS: str = ""  # 允许启动采样的用户名，逗号分隔；为空时禁用
+    
+    # 列表总数统计
+    COUNT_EXACT_THRESHOLD: int = 10000  # auto 模式下估算行数不超过该值时精确统计
+    COUNT_CACHE_TTL: int = 30  # 总数缓存时间（秒）
+    
+    # 审计日志异步批量写入
+    AUDIT_BATCH_SIZE: int = 200  # 缓冲区达到该条数时立即写入
+    AUDIT_FLUSH_INTERVAL: float = 1.0  # 定时写入间隔（秒）
+    AUDIT_BUFFER_MAX: int = 10000  # 缓冲区上限，超过时落盘
+    AUDIT_INSERT_TIMEOUT: float = 5.0  # 单批写入超时（秒），超时的批次落盘
+    AUDIT_SPILL_DIR: str = "logs/audit_spill"  # 落盘目录（需持久化：docker-compose 中 logs 目录挂载到宿主机，重建容器不丢失）
+    AUDIT_SPILL_RETRY_INTERVAL: int = 30  # 写入失败后，隔多久再补写落盘文件（秒）
+    
+    # 审计日志分区（按月分区，过期分区归档到 MinIO 后删除）
+    AUDIT_PARTITION_MONTHS_AHEAD: int = 3  # 提前创建的月分区数
+    AUDIT_RETENTION_MONTHS: int = 0  # 数据库中保留的月数（含当月），0 表示不归档
+    AUDIT_ARCHIVE_PREFIX: str = "audit-archive"  # 归档文件在 MinIO 中的前缀
+    AUDIT_PARTITION_CHECK_INTERVAL: int = 21600  # 分区维护间隔（秒）
+    AUDIT_MAINTENANCE_ALLOWED_USERS: str = ""  # 允许手动执行分区维护的用户名，逗号分隔；为空时禁用
+    
+    # 审计日志导出
+    AUDIT_EXPORT_BATCH_ROWS: int = 1000  # 流式导出每批从数据库读取的行数
+    AUDIT_EXPORT_MAX_JOBS: int = 2  # 每个进程同时运行的异步导出任务数
+    AUDIT_EXPORT_PREFIX: str = "audit-exports"  # 异步导出文件在 MinIO 中的前缀
+    
+    # 监控指标（多进程部署时需设置环境变量 PROMETHEUS_MULTIPROC_DIR）
+    METRICS_SAMPLE_INTERVAL: float = 5  # 连接池、降级状态等仪表的刷新间隔（秒）
+    
     # 降级功能配置
     FALLBACK_ENABLED: bool = True  # 是否启用降级功能
     HEALTH_CHECK_INTERVAL: int = 30  # 健康检查间隔（秒）
@@ -1,17 +1,25 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.core.config import settings
+from app.core.tracing import instrument_engine
+from app.core.sql_monitor import sql_monitor, InstrumentedAsyncQueuePool
 
 # 创建异步引擎（使用 psycopg）
 engine = create_async_engine(
     settings.DATABASE_URL,
-    echo=True,
+    echo=settings.DB_ECHO,
     future=True,
     pool_pre_ping=True,
+    poolclass=InstrumentedAsyncQueuePool,
     pool_size=10,
     max_overflow=20
 )
 
+# 记录请求内的 SQL 和提交耗时
+instrument_engine(engine)
+# 语句耗时、每请求查询数、N+1、慢查询
+sql_monitor.instrument(engine)
+
 # 创建会话工厂
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -0,0 +1,169 @@
+"""
+日志配置
+
+1. 异步写出：所有日志经 QueueHandler 放入有界队列，由后台线程（QueueListener）格式化并写到 stdout，
+   请求处理路径上只做一次入队，不做 I/O；队列满时丢弃并计数，不阻塞事件循环
+2. 请求关联：RequestIdMiddleware 为每个请求设置 request_id（沿用请求头 X-Request-ID 或新生成），
+   同一请求内（包括其创建的后台任务）的日志都带这个 ID，并在响应头中返回
+3. 格式与级别：支持 text / json 两种格式，LOG_LEVELS 按模块单独设置级别
+
+使用方式与标准库一致：
+    logger = logging.getLogger(__name__)
+    logger.info("Document %s created", document.id)
+"""
+from typing import Dict, Optional
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+import json
+import logging
+import queue
+import re
+import sys
+import uuid
+
+from app.core.config import settings
+
+# 当前请求的 ID，不在请求中时为 "-"
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s [%(name)s] [%(request_id)s] %(message)s"
+
+# 客户端传入的请求 ID 只接受这些字符，避免日志注入
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class RequestIdFilter(logging.Filter):
+    """给日志记录附加 request_id（在调用线程中执行，此时上下文变量仍可读取）"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON，便于日志平台检索"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """队列满时丢弃日志而不是阻塞或报错"""
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[DroppingQueueHandler] = None
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """
+    解析按模块设置的日志级别
+    
+    Args:
+        spec: 如 "sqlalchemy.engine=WARNING,app.services.cache_service=DEBUG"
+    
+    Returns:
+        模块名 -> 级别
+    """
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging():
+    """配置根日志器（重复调用无副作用）"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+    
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _queue_handler = DroppingQueueHandler(log_queue)
+    _queue_handler.addFilter(RequestIdFilter())
+    
+    root = logging.getLogger()
+    root.handlers = [_queue_handler]
+    root.setLevel(settings.LOG_LEVEL.upper())
+    for name, level in parse_levels(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+    
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """停止后台写出线程（会先写完队列中剩余的日志）"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None and _queue_handler.dropped:
+        print(f"[Logging] {_queue_handler.dropped} log records dropped (queue full)")
+
+
+def get_dropped_count() -> int:
+    """因队列满被丢弃的日志条数"""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+class RequestIdMiddleware:
+    """为每个请求设置 request_id 并写入响应头（纯 ASGI 实现）"""
+    
+    HEADER = b"x-request-id"
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == self.HEADER:
+                candidate = value.decode("latin-1")
+                if REQUEST_ID_PATTERN.match(candidate):
+                    request_id = candidate
+                break
+        request_id = request_id or uuid.uuid4().hex
+        
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(self.HEADER, request_id.encode())]
+            await send(message)
+        
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
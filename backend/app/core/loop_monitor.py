@@ -0,0 +1,288 @@
+"""
+事件循环延迟监控与阻塞检测
+
+1. 延迟监控：后台任务按固定间隔 sleep，实际唤醒时间与预期的差值即为事件循环延迟，
+   同步代码阻塞事件循环时，所有协程（包括这个任务）都会被推迟
+2. 阻塞检测：看门狗线程检查延迟任务的心跳，超过阈值即判定事件循环被阻塞，
+   记录阻塞事件（时长、当时运行的任务）；调试模式下在阻塞期间持续采样事件循环线程的调用栈，
+   按代码位置汇总，定位阻塞事件循环的同步代码（MinIO SDK、文件解析、PDF 生成、bcrypt 等）
+"""
+from typing import Optional, Dict, Any, List
+from collections import deque
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+from app.core.config import settings
+from app.core.metrics import EVENT_LOOP_LAG, EVENT_LOOP_BLOCKS
+
+logger = logging.getLogger(__name__)
+
+# 延迟分布的桶上界（毫秒）
+LAG_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# 汇总阻塞位置时只看应用自身代码
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LoopLagMonitor:
+    """事件循环延迟监控器"""
+    
+    def __init__(
+        self,
+        interval: float = 0.1,
+        decay: float = 0.8,
+        block_threshold_ms: float = None,
+        debug: bool = None,
+        max_events: int = 100
+    ):
+        """
+        Args:
+            interval: 采样间隔（秒）
+            decay: 平滑系数，越大越平滑
+            block_threshold_ms: 判定为阻塞的延迟阈值（毫秒）
+            debug: 是否在阻塞期间采样调用栈
+            max_events: 保留的最近阻塞事件数
+        """
+        self.interval = interval
+        self.decay = decay
+        self.block_threshold_ms = block_threshold_ms if block_threshold_ms is not None else settings.LOOP_BLOCK_THRESHOLD_MS
+        self.debug = debug if debug is not None else settings.LOOP_BLOCK_DEBUG
+        
+        self.last_lag_ms = 0.0
+        self.smoothed_lag_ms = 0.0  # 指数平滑后的延迟
+        self.max_lag_ms = 0.0
+        self.samples = 0
+        self.lag_buckets = [0] * (len(LAG_BUCKETS_MS) + 1)  # 最后一个桶为 +Inf
+        self.lag_sum_ms = 0.0
+        
+        # 阻塞事件
+        self.block_count = 0
+        self.block_total_ms = 0.0
+        self.events: "deque[Dict[str, Any]]" = deque(maxlen=max_events)
+        self.hotspots: Dict[str, Dict[str, Any]] = {}  # 代码位置 -> {samples, blocks, total_ms}
+        
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = 0.0
+        self._current_event: Optional[Dict[str, Any]] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+    
+    @property
+    def lag_ms(self) -> float:
+        """当前延迟：取最近一次与平滑值中较大者，对突发阻塞敏感、对抖动不敏感"""
+        return max(self.last_lag_ms, self.smoothed_lag_ms)
+    
+    def start(self):
+        """启动监控（需要在事件循环中调用）"""
+        if self._task and not self._task.done():
+            return
+        
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        self._task = asyncio.create_task(self._run())
+        
+        self._stop_event.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-block-watchdog", daemon=True)
+        self._watchdog.start()
+        
+        logger.info(
+            "Started, interval: %.0fms, block threshold: %.0fms, debug: %s",
+            self.interval * 1000, self.block_threshold_ms, self.debug
+        )
+    
+    async def stop(self):
+        """停止监控"""
+        self._stop_event.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+    
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self._heartbeat = now
+            self.record((now - start - self.interval) * 1000)
+    
+    def record(self, lag_ms: float):
+        """记录一次延迟采样"""
+        lag_ms = max(0.0, lag_ms)
+        self.last_lag_ms = lag_ms
+        self.smoothed_lag_ms = self.decay * self.smoothed_lag_ms + (1 - self.decay) * lag_ms
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        self.samples += 1
+        self.lag_sum_ms += lag_ms
+        EVENT_LOOP_LAG.observe(lag_ms / 1000)
+        
+        for index, bound in enumerate(LAG_BUCKETS_MS):
+            if lag_ms <= bound:
+                self.lag_buckets[index] += 1
+                break
+        else:
+            self.lag_buckets[-1] += 1
+        
+        # 阻塞结束：用实际延迟补全事件时长
+        with self._lock:
+            event = self._current_event
+            if event is not None:
+                self._current_event = None
+                event["duration_ms"] = round(lag_ms, 1)
+                event["ongoing"] = False
+                self.block_total_ms += lag_ms
+                for site in event.pop("_sites", set()):
+                    self.hotspots[site]["total_ms"] += lag_ms
+    
+    def _watch(self):
+        """看门狗线程：心跳超时即判定事件循环被阻塞"""
+        check_interval = max(self.block_threshold_ms / 4000, 0.005)
+        while not self._stop_event.wait(check_interval):
+            blocked_ms = (time.perf_counter() - self._heartbeat - self.interval) * 1000
+            if blocked_ms < self.block_threshold_ms:
+                continue
+            
+            with self._lock:
+                event = self._current_event
+                if event is None:
+                    event = self._start_event()
+                event["duration_ms"] = round(blocked_ms, 1)
+                if self.debug:
+                    self._sample_stack(event)
+    
+    def _start_event(self) -> Dict[str, Any]:
+        """记录新的阻塞事件（在看门狗线程中调用，需持有锁）"""
+        task_name = None
+        coroutine = None
+        try:
+            # 跨线程读取当前任务仅用于诊断，读到旧值也无妨
+            task = asyncio.current_task(self._loop)
+            if task is not None:
+                task_name = task.get_name()
+                coroutine = getattr(task.get_coro(), "__qualname__", None)
+        except Exception:
+            pass
+        
+        event = {
+            "started_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "duration_ms": 0.0,
+            "ongoing": True,
+            "task": task_name,
+            "coroutine": coroutine,
+            "stack": None,
+            "_sites": set()
+        }
+        self._current_event = event
+        self.events.append(event)
+        self.block_count += 1
+        EVENT_LOOP_BLOCKS.inc()
+        return event
+    
+    def _sample_stack(self, event: Dict[str, Any]):
+        """采样事件循环线程的调用栈（在看门狗线程中调用，需持有锁）"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        
+        stack = traceback.extract_stack(frame, limit=30)
+        if event["stack"] is None:
+            event["stack"] = [f"{entry.filename}:{entry.lineno} {entry.name}" for entry in stack]
+        
+        # 最内层的应用代码帧即阻塞点（库代码由它调用）
+        site = None
+        for entry in reversed(stack):
+            if entry.filename.startswith(APP_ROOT) and entry.filename != __file__:
+                site = f"{os.path.relpath(entry.filename, os.path.dirname(APP_ROOT))}:{entry.lineno} {entry.name}"
+                break
+        if site is None:
+            site = f"{stack[-1].filename}:{stack[-1].lineno} {stack[-1].name}" if stack else "unknown"
+        
+        hotspot = self.hotspots.setdefault(site, {"samples": 0, "blocks": 0, "total_ms": 0.0})
+        hotspot["samples"] += 1
+        if site not in event["_sites"]:
+            event["_sites"].add(site)
+            hotspot["blocks"] += 1
+    
+    def set_debug(self, enabled: bool):
+        """开启/关闭调用栈采样"""
+        self.debug = enabled
+        logger.info("Stack sampling %s", 'enabled' if enabled else 'disabled')
+    
+    def reset(self):
+        """清空阻塞事件和热点统计"""
+        with self._lock:
+            self.events.clear()
+            self.hotspots.clear()
+            self.block_count = 0
+            self.block_total_ms = 0.0
+            self.max_lag_ms = 0.0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取延迟统计"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "last_lag_ms": round(self.last_lag_ms, 2),
+            "smoothed_lag_ms": round(self.smoothed_lag_ms, 2),
+            "max_lag_ms": round(self.max_lag_ms, 2),
+            "samples": self.samples,
+            "block_threshold_ms": self.block_threshold_ms,
+            "block_count": self.block_count,
+            "block_total_ms": round(self.block_total_ms, 1),
+            "debug": self.debug
+        }
+    
+    def get_lag_histogram(self) -> Dict[str, Any]:
+        """获取延迟分布（累计计数）"""
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(list(LAG_BUCKETS_MS) + ["+Inf"], self.lag_buckets):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {"buckets": buckets, "count": self.samples, "sum_ms": round(self.lag_sum_ms, 2)}
+    
+    def get_blocking_report(self, limit: int = 20) -> Dict[str, Any]:
+        """
+        获取阻塞报告
+        
+        Args:
+            limit: 返回的热点和事件数量
+        
+        Returns:
+            热点（按累计阻塞时长排序）和最近的阻塞事件
+        """
+        with self._lock:
+            hotspots = sorted(
+                ({"site": site, **{k: round(v, 1) if isinstance(v, float) else v for k, v in data.items()}}
+                 for site, data in self.hotspots.items()),
+                key=lambda item: item["total_ms"],
+                reverse=True
+            )[:limit]
+            events = [
+                {k: v for k, v in event.items() if not k.startswith("_")}
+                for event in list(self.events)[-limit:]
+            ]
+        
+        return {
+            "stats": self.get_stats(),
+            "hotspots": hotspots,
+            "recent_events": list(reversed(events))
+        }
+
+
+# 全局实例
+loop_monitor = LoopLagMonitor()
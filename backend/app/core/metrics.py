@@ -0,0 +1,273 @@
+"""
+Prometheus 指标
+
+各模块在关键路径上直接更新这里定义的指标，/metrics 接口按 Prometheus 文本格式输出
+
+多进程部署（uvicorn --workers / gunicorn）：启动前把环境变量 PROMETHEUS_MULTIPROC_DIR
+指向一个所有 worker 共享的空目录，各 worker 把指标写入该目录下的 mmap 文件，
+/metrics 汇总所有 worker 的数据（计数器、直方图求和，仪表按 multiprocess_mode 合并）；
+未设置时只统计当前进程
+"""
+from typing import Optional, Tuple
+from functools import wraps
+import asyncio
+import logging
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# 直方图桶（秒 / 字节）
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LLM_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+OPERATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+REDIS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+LOOP_LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 5 * 1024 ** 2, 20 * 1024 ** 2, 100 * 1024 ** 2)
+
+# HTTP
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时",
+    ["method", "route", "status"], buckets=REQUEST_BUCKETS
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "处理中的 HTTP 请求数",
+    ["method"], multiprocess_mode="livesum"
+)
+
+# 大模型
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds", "单次大模型 API 调用耗时",
+    ["outcome"], buckets=LLM_BUCKETS
+)
+LLM_TOKENS = Counter("llm_tokens_total", "大模型 token 用量", ["type"])
+LLM_RETRIES = Counter("llm_retries_total", "大模型 API 重试次数")
+LLM_FAILURES = Counter("llm_failures_total", "重试全部失败的大模型调用次数")
+
+# MinIO
+MINIO_OPERATION_DURATION = Histogram(
+    "minio_operation_duration_seconds", "MinIO 操作耗时",
+    ["operation", "outcome"], buckets=OPERATION_BUCKETS
+)
+MINIO_OBJECT_BYTES = Histogram(
+    "minio_object_bytes", "MinIO 上传/下载的对象大小",
+    ["operation"], buckets=SIZE_BUCKETS
+)
+
+# 解析、渲染、导出等耗时操作（由 PerformanceMonitor.measure_time 记录）
+OPERATION_DURATION = Histogram(
+    "operation_duration_seconds", "业务操作耗时",
+    ["operation", "outcome"], buckets=OPERATION_BUCKETS
+)
+
+# 缓存
+CACHE_EVENTS = Counter(
+    "cache_events_total", "缓存访问结果（local_hits / redis_hits / stale_hits / misses / refreshes）",
+    ["event"]
+)
+
+# Redis
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds", "Redis 命令耗时",
+    ["command"], buckets=REDIS_BUCKETS
+)
+REDIS_COMMAND_ERRORS = Counter("redis_command_errors_total", "Redis 命令错误次数", ["command"])
+REDIS_CONNECTED = Gauge("redis_connected", "Redis 是否已连接", multiprocess_mode="liveall")
+
+# 数据库连接池
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "数据库连接池连接数（checked_out / idle / overflow）",
+    ["state"], multiprocess_mode="livesum"
+)
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL 语句耗时",
+    ["operation"], buckets=REDIS_BUCKETS + (1, 2.5, 5)
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "每个请求的 SQL 语句数",
+    ["route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+)
+DB_N_PLUS_ONE = Counter("db_n_plus_one_total", "检测到 N+1 候选的请求数", ["route"])
+DB_POOL_WAIT = Histogram("db_pool_wait_seconds", "从连接池取连接的等待时间", buckets=REDIS_BUCKETS + (1, 2.5, 5, 10, 30))
+# 降级状态（任一存活 worker 处于降级即为 1，退出的 worker 由 mark_process_dead 清理）
+# 降级状态（任一存活 worker 处于降级即为 1；live* 模式下退出的 worker 由 mark_process_dead 清理，不会一直占住取值）
+FALLBACK_MODE = Gauge("fallback_mode", "是否处于降级模式", multiprocess_mode="livemax")
+AI_SERVICE_HEALTHY = Gauge("ai_service_healthy", "AI 服务健康检查结果", multiprocess_mode="livemin")
+
+# 事件循环
+EVENT_LOOP_LAG = Histogram("event_loop_lag_seconds", "事件循环延迟", buckets=LOOP_LAG_BUCKETS)
+EVENT_LOOP_BLOCKS = Counter("event_loop_blocks_total", "事件循环阻塞次数")
+
+# 准入控制
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight", "各路由类别执行中的请求数",
+    ["route_class"], multiprocess_mode="livesum"
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth", "各路由类别排队中的请求数",
+    ["route_class"], multiprocess_mode="livesum"
+)
+ADMISSION_SHED = Counter("admission_shed_total", "被拒绝的请求数", ["route_class", "reason"])
+
+
+def update_gauges():
+    """刷新由其他组件状态计算出的仪表（连接池、降级状态、准入控制）"""
+    try:
+        from app.core.database import engine
+        pool = engine.sync_engine.pool
+        checked_out = pool.checkedout()
+        DB_POOL_CONNECTIONS.labels(state="checked_out").set(checked_out)
+        DB_POOL_CONNECTIONS.labels(state="idle").set(pool.checkedin())
+        DB_POOL_CONNECTIONS.labels(state="overflow").set(max(pool.overflow(), 0))
+    except Exception:
+        pass
+    
+    from app.core.redis import redis_client
+    REDIS_CONNECTED.set(1 if redis_client.redis else 0)
+    
+    from app.services.health_monitor_service import get_health_monitor
+    health_monitor = get_health_monitor()
+    if health_monitor:
+        FALLBACK_MODE.set(1 if health_monitor.is_fallback_mode() else 0)
+        AI_SERVICE_HEALTHY.set(1 if health_monitor.ai_service_healthy else 0)
+    
+    from app.core.admission import admission_controller
+    for name, limiter in admission_controller.limiters.items():
+        ADMISSION_IN_FLIGHT.labels(route_class=name).set(limiter.in_flight)
+        ADMISSION_QUEUE_DEPTH.labels(route_class=name).set(limiter.queue_depth)
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """
+    生成 Prometheus 文本格式的指标
+    
+    Returns:
+        (指标内容, Content-Type)
+    """
+    update_gauges()
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """worker 退出时清理其仪表文件，避免 live* 模式的仪表保留已退出进程的值"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsSampler:
+    """
+    定时刷新仪表
+    
+    多进程模式下每个 worker 的仪表各自存放，抓取请求只会落到其中一个 worker，
+    所以每个 worker 都需要定时刷新自己的值
+    """
+    
+    def __init__(self, interval: float = None):
+        self.interval = interval or settings.METRICS_SAMPLE_INTERVAL
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        while True:
+            try:
+                update_gauges()
+            except Exception as e:
+                logger.error("Update gauges error: %s", e)
+            await asyncio.sleep(self.interval)
+
+
+# 全局实例
+metrics_sampler = MetricsSampler()
+
+
+def timed_operation(histogram: Histogram, **labels):
+    """
+    记录协程耗时的装饰器，按是否抛出异常区分 outcome
+    
+    使用示例：
+    @timed_operation(MINIO_OPERATION_DURATION, operation="upload")
+    async def upload_file(...):
+        ...
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await func(*args, **kwargs)
+                outcome = "success"
+                return result
+            finally:
+                histogram.labels(outcome=outcome, **labels).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """按路由模板、方法、状态码记录请求耗时（纯 ASGI 实现）"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope["method"]
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method=method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            # 用路由模板（如 /api/v1/documents/{document_id}）作为标签，避免路径参数导致标签爆炸
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.labels(
+                method=method, route=route_path, status=str(status_code)
+            ).observe(time.perf_counter() - start)
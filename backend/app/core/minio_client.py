@@ -1,8 +1,14 @@
 from minio import Minio
 from minio.error import S3Error
 from app.core.config import settings
+from app.core.metrics import MINIO_OPERATION_DURATION, MINIO_OBJECT_BYTES, timed_operation
+from app.core.tracing import span
 from datetime import timedelta
+import asyncio
 import io
+import logging
+
+logger = logging.getLogger(__name__)
 
 class MinIOClient:
     def __init__(self):
@@ -20,39 +26,71 @@ class MinIOClient:
             if not self.client.bucket_exists(settings.MINIO_BUCKET):
                 self.client.make_bucket(settings.MINIO_BUCKET)
         except S3Error as e:
-            print(f"MinIO bucket error: {e}")
+            logger.error("MinIO bucket error: %s", e)
     
+    @timed_operation(MINIO_OPERATION_DURATION, operation="upload")
     async def upload_file(self, file_name: str, file_data: bytes, content_type: str):
         """上传文件"""
+        MINIO_OBJECT_BYTES.labels(operation="upload").observe(len(file_data))
         try:
-            self.client.put_object(
-                settings.MINIO_BUCKET,
-                file_name,
-                io.BytesIO(file_data),
-                length=len(file_data),
-                content_type=content_type
-            )
+            with span("minio.upload", object=file_name, bytes=len(file_data)):
+                self.client.put_object(
+                    settings.MINIO_BUCKET,
+                    file_name,
+                    io.BytesIO(file_data),
+                    length=len(file_data),
+                    content_type=content_type
+                )
             return True
         except S3Error as e:
-            print(f"Upload error: {e}")
+            logger.error("Upload error: %s", e)
             return False
     
+    @timed_operation(MINIO_OPERATION_DURATION, operation="upload")
+    async def upload_local_file(self, file_name: str, path: str, content_type: str):
+        """上传本地文件（分片流式上传，不把整个文件读入内存）"""
+        try:
+            with span("minio.upload", object=file_name):
+                await asyncio.to_thread(
+                    self.client.fput_object, settings.MINIO_BUCKET, file_name, path, content_type=content_type
+                )
+            return True
+        except S3Error as e:
+            logger.error("Upload error: %s", e)
+            return False
+    
+    @timed_operation(MINIO_OPERATION_DURATION, operation="download")
     async def download_file(self, file_name: str):
-        """下载文件"""
+        """下载文件（在线程中执行，不阻塞事件循环）"""
         try:
-            response = self.client.get_object(settings.MINIO_BUCKET, file_name)
-            return response.read()
+            with span("minio.download", object=file_name) as download_span:
+                data = await asyncio.to_thread(self._download, file_name)
+                if download_span:
+                    download_span.set_attribute("bytes", len(data))
+                return data
         except S3Error as e:
-            print(f"Download error: {e}")
+            logger.error("Download error: %s", e)
             return None
     
+    def _download(self, file_name: str) -> bytes:
+        response = self.client.get_object(settings.MINIO_BUCKET, file_name)
+        try:
+            data = response.read()
+            MINIO_OBJECT_BYTES.labels(operation="download").observe(len(data))
+            return data
+        finally:
+            response.close()
+            response.release_conn()
+    
+    @timed_operation(MINIO_OPERATION_DURATION, operation="delete")
     async def delete_file(self, file_name: str):
         """删除文件"""
         try:
-            self.client.remove_object(settings.MINIO_BUCKET, file_name)
+            with span("minio.delete", object=file_name):
+                self.client.remove_object(settings.MINIO_BUCKET, file_name)
             return True
         except S3Error as e:
-            print(f"Delete error: {e}")
+            logger.error("Delete error: %s", e)
             return False
     
     def get_file_url(self, file_name: str, expires: int = 3600, inline: bool = True):
@@ -76,7 +114,7 @@ class MinIOClient:
                 response_headers=response_headers if response_headers else None
             )
         except S3Error as e:
-            print(f"Get URL error: {e}")
+            logger.error("Get URL error: %s", e)
             return None
 
 minio_client = MinIOClient()
@@ -0,0 +1,93 @@
+"""
+游标分页（keyset pagination）
+
+列表按 (created_at DESC, id DESC) 排序，下一页的条件是 (created_at, id) < 上一页最后一行，
+配合 (…, created_at, id) 复合索引，任意深度的翻页都只读取一页的数据；OFFSET 分页需要扫描并丢弃前面所有行。
+
+游标是最后一行 (created_at, id) 的 base64 编码，对客户端不透明，只需原样传回。
+为兼容旧客户端，列表接口保留 skip/limit（或 page/page_size）参数，响应中同时给出下一页游标。
+"""
+from typing import Optional, Tuple, List, Any
+from datetime import datetime
+import base64
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+# 下一页游标的响应头（返回列表的接口使用）
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """
+    生成游标
+    
+    Args:
+        created_at: 最后一行的创建时间
+        row_id: 最后一行的 ID
+    
+    Returns:
+        不透明的游标字符串
+    """
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    解析游标
+    
+    Raises:
+        HTTPException: 游标格式错误（400）
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def apply_keyset(query, model, cursor: Optional[str], skip: int, limit: int):
+    """
+    为查询加上排序和分页条件
+    
+    有游标时按游标定位（忽略 skip），否则使用 OFFSET；多取一行用于判断是否还有下一页
+    
+    Args:
+        query: select 查询
+        model: 含 created_at、id 列的模型
+        cursor: 上一页返回的游标
+        skip: OFFSET 模式的偏移量
+        limit: 每页数量
+    
+    Returns:
+        加上条件后的查询
+    """
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.where(tuple_(model.created_at, model.id) < (created_at, row_id))
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit + 1)
+
+
+def split_page(rows: List[Any], limit: int, key=lambda row: row) -> Tuple[List[Any], Optional[str]]:
+    """
+    截取一页并计算下一页游标
+    
+    Args:
+        rows: apply_keyset 查询的结果（最多 limit + 1 行）
+        limit: 每页数量
+        key: 从结果行中取出模型对象（如 lambda row: row[0]）
+    
+    Returns:
+        (本页数据, 下一页游标，没有下一页时为 None)
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = key(page[-1])
+    return page, encode_cursor(last.created_at, last.id)
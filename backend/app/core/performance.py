@@ -1,19 +1,47 @@
 """
 性能监控工具
+
+耗时记录到 Prometheus 直方图 operation_duration_seconds（按操作名和结果区分），
+在请求内同时记录为链路追踪的子 span；只有慢操作和失败才打印日志
 """
+import logging
 import time
 from functools import wraps
 from typing import Callable
 import asyncio
 
+from app.core.metrics import OPERATION_DURATION
+from app.core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# 超过该耗时打印警告 / 慢操作日志（秒）
+WARN_THRESHOLD = 0.5
+SLOW_THRESHOLD = 1.0
+
+
 class PerformanceMonitor:
     """性能监控器"""
     
+    @staticmethod
+    def _record(name: str, elapsed: float, error: Exception = None):
+        """记录一次执行耗时"""
+        OPERATION_DURATION.labels(operation=name, outcome="error" if error else "success").observe(elapsed)
+        
+        if error is not None:
+            logger.error("%s failed after %.2fs: %s", name, elapsed, error)
+        elif elapsed > SLOW_THRESHOLD:
+            logger.warning("SLOW: %s took %.2fs", name, elapsed)
+        elif elapsed > WARN_THRESHOLD:
+            logger.info("%s took %.2fs", name, elapsed)
+    
     @staticmethod
     def measure_time(func_name: str = None):
         """
         测量函数执行时间的装饰器
         
+        操作名会作为指标标签，应使用固定的名称，不要包含 ID 等变化的值
+        
         使用示例：
         @PerformanceMonitor.measure_time("查询文档列表")
         async def get_documents():
@@ -24,44 +52,27 @@ class PerformanceMonitor:
             
             @wraps(func)
             async def async_wrapper(*args, **kwargs):
-                start_time = time.time()
+                start_time = time.perf_counter()
                 try:
-                    result = await func(*args, **kwargs)
-                    elapsed = time.time() - start_time
-                    
-                    # 记录执行时间
-                    if elapsed > 1.0:  # 超过 1 秒的慢查询
-                        print(f"[Performance] SLOW: {name} took {elapsed:.2f}s")
-                    elif elapsed > 0.5:  # 超过 0.5 秒的警告
-                        print(f"[Performance] WARN: {name} took {elapsed:.2f}s")
-                    else:
-                        print(f"[Performance] {name} took {elapsed:.3f}s")
-                    
-                    return result
+                    with span(name):
+                        result = await func(*args, **kwargs)
                 except Exception as e:
-                    elapsed = time.time() - start_time
-                    print(f"[Performance] ERROR: {name} failed after {elapsed:.2f}s: {str(e)}")
+                    PerformanceMonitor._record(name, time.perf_counter() - start_time, e)
                     raise
+                PerformanceMonitor._record(name, time.perf_counter() - start_time)
+                return result
             
             @wraps(func)
             def sync_wrapper(*args, **kwargs):
-                start_time = time.time()
+                start_time = time.perf_counter()
                 try:
-                    result = func(*args, **kwargs)
-                    elapsed = time.time() - start_time
-                    
-                    if elapsed > 1.0:
-                        print(f"[Performance] SLOW: {name} took {elapsed:.2f}s")
-                    elif elapsed > 0.5:
-                        print(f"[Performance] WARN: {name} took {elapsed:.2f}s")
-                    else:
-                        print(f"[Performance] {name} took {elapsed:.3f}s")
-                    
-                    return result
+                    with span(name):
+                        result = func(*args, **kwargs)
                 except Exception as e:
-                    elapsed = time.time() - start_time
-                    print(f"[Performance] ERROR: {name} failed after {elapsed:.2f}s: {str(e)}")
+                    PerformanceMonitor._record(name, time.perf_counter() - start_time, e)
                     raise
+                PerformanceMonitor._record(name, time.perf_counter() - start_time)
+                return result
             
             # 判断是否为异步函数
             if asyncio.iscoroutinefunction(func):
@@ -0,0 +1,230 @@
+"""
+采样分析器
+
+在运行中的 worker 上按需采样一段时间，不需要重启、不需要额外依赖：
+1. 后台线程按固定间隔读取所有线程的调用栈（sys._current_frames），汇总为折叠栈
+   （flamegraph.pl / speedscope 可直接读取）
+2. 事件循环线程的栈以当时正在处理的路由为根，便于按接口查看耗时
+3. async 模式下额外采样所有挂起中的协程任务的 await 链，用于定位在等待什么（数据库、大模型、MinIO）
+
+开销控制：同一时间只允许一次采样；采样时长、间隔有上下限，到时自动停止；
+采样本身的耗时超过 PROFILER_MAX_OVERHEAD 时自动拉长间隔
+"""
+from typing import Optional, Dict, Any, List
+from collections import Counter
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 64
+MIN_INTERVAL_MS = 5
+
+
+class ProfilerBusyError(Exception):
+    """已有采样在进行"""
+    pass
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _thread_stack(frame) -> List[str]:
+    """线程调用栈，从外到内"""
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _await_chain(coro) -> List[str]:
+    """挂起中协程的 await 链，从外到内"""
+    stack = []
+    while coro is not None and len(stack) < MAX_STACK_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is not None:
+            stack.append(_frame_label(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return stack
+
+
+class SamplingProfiler:
+    """采样分析器"""
+    
+    def __init__(self):
+        self.max_seconds = settings.PROFILER_MAX_SECONDS
+        self.max_overhead = settings.PROFILER_MAX_OVERHEAD
+        
+        self.running = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        # 正在处理的请求：任务 -> ASGI scope（仅在采样期间登记）
+        self._active_requests: Dict[asyncio.Task, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def register_request(self, task: asyncio.Task, scope: Dict[str, Any]):
+        self._active_requests[task] = scope
+    
+    def unregister_request(self, task: asyncio.Task):
+        self._active_requests.pop(task, None)
+    
+    def _route_label(self, task: Optional[asyncio.Task]) -> str:
+        scope = self._active_requests.get(task) if task is not None else None
+        if scope is None:
+            return "[no request]"
+        route = getattr(scope.get("route"), "path", None) or scope.get("path", "?")
+        return f"[{scope.get('method', '')} {route}]"
+    
+    async def profile(self, seconds: float, interval_ms: float = 10, mode: str = "cpu") -> Dict[str, Any]:
+        """
+        采样指定时长
+        
+        Args:
+            seconds: 采样时长（秒），不超过 PROFILER_MAX_SECONDS
+            interval_ms: 采样间隔（毫秒），不小于 5
+            mode: cpu 只采样线程栈；async 额外采样挂起中的协程任务
+        
+        Returns:
+            折叠栈计数、按路由的样本数和采样统计
+        """
+        with self._lock:
+            if self.running:
+                raise ProfilerBusyError("已有采样在进行")
+            self.running = True
+        
+        seconds = min(max(seconds, 0.1), self.max_seconds)
+        interval = max(interval_ms, MIN_INTERVAL_MS) / 1000
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        
+        result: Dict[str, Any] = {}
+        thread = threading.Thread(
+            target=self._sample_loop, args=(seconds, interval, mode, result),
+            name="sampling-profiler", daemon=True
+        )
+        logger.info("Profiling for %.1fs (interval %.0fms, mode %s)", seconds, interval * 1000, mode)
+        try:
+            thread.start()
+            # 等待采样线程结束（采样期间事件循环照常处理请求）
+            await asyncio.to_thread(thread.join, seconds + 5)
+        finally:
+            self._active_requests.clear()
+            self.running = False
+        return result
+    
+    def _sample_loop(self, seconds: float, interval: float, mode: str, result: Dict[str, Any]):
+        stacks: Counter = Counter()
+        routes: Counter = Counter()
+        samples = 0
+        sampling_time = 0.0
+        thread_names = {}
+        
+        start = time.perf_counter()
+        deadline = start + seconds
+        own_id = threading.get_ident()
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            
+            sample_start = time.perf_counter()
+            if not thread_names or samples % 100 == 0:
+                thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            
+            current_task = None
+            try:
+                # 跨线程读取当前任务仅用于归类，读到旧值也无妨
+                current_task = asyncio.current_task(self._loop)
+            except Exception:
+                pass
+            route = self._route_label(current_task)
+            
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = _thread_stack(frame)
+                if thread_id == self._loop_thread_id:
+                    stacks[";".join(["event-loop", route] + stack)] += 1
+                    routes[route] += 1
+                else:
+                    stacks[";".join([f"thread:{thread_names.get(thread_id, thread_id)}"] + stack)] += 1
+            
+            if mode == "async":
+                try:
+                    tasks = list(asyncio.all_tasks(self._loop))
+                except RuntimeError:
+                    # 任务集合在遍历时被事件循环修改，跳过这一次
+                    tasks = []
+                for task in tasks:
+                    if task is current_task or task.done():
+                        continue
+                    chain = _await_chain(task.get_coro())
+                    if chain:
+                        stacks[";".join(["await", self._route_label(task)] + chain)] += 1
+            
+            samples += 1
+            elapsed = time.perf_counter() - sample_start
+            sampling_time += elapsed
+            
+            # 采样耗时占比过高时拉长间隔
+            if elapsed > interval * self.max_overhead:
+                interval = min(interval * 2, 1.0)
+            time.sleep(max(interval - elapsed, 0))
+        
+        wall = time.perf_counter() - start
+        result.update({
+            "stacks": stacks,
+            "routes": routes,
+            "samples": samples,
+            "duration_s": round(wall, 2),
+            "final_interval_ms": round(interval * 1000, 1),
+            "overhead": round(sampling_time / wall, 4) if wall else 0,
+            "mode": mode,
+        })
+        logger.info("Profiling finished: %s samples, overhead %.2f%%", samples, result["overhead"] * 100)
+
+
+def to_collapsed(stacks: Counter) -> str:
+    """折叠栈文本：每行 "帧1;帧2;... 次数" """
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+
+
+def top_frames(stacks: Counter, limit: int = 30) -> List[Dict[str, Any]]:
+    """按自身样本数（栈顶）排序的热点帧"""
+    own: Counter = Counter()
+    for stack, count in stacks.items():
+        own[stack.rsplit(";", 1)[-1]] += count
+    return [{"frame": frame, "samples": count} for frame, count in own.most_common(limit)]
+
+
+# 全局实例
+profiler = SamplingProfiler()
+
+
+class ProfilerMiddleware:
+    """采样期间登记每个请求所在的任务，用于把样本归到路由（纯 ASGI 实现，未采样时只做一次判断）"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.running:
+            await self.app(scope, receive, send)
+            return
+        
+        task = asyncio.current_task()
+        profiler.register_request(task, scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.unregister_request(task)
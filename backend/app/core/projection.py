@@ -0,0 +1,55 @@
+"""
+列表字段投影
+
+列表接口默认只返回摘要字段，查询时只加载这些列（load_only），正文等大字段（Text/JSON）不读取也不返回；
+客户端可以用 fields=id,title,content 指定要返回的字段，正文一般通过详情接口获取。
+"""
+from typing import Optional, List, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy.orm import load_only
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str], default: Sequence[str]) -> List[str]:
+    """
+    解析 fields 参数
+    
+    Args:
+        fields: 逗号分隔的字段名，为空时使用默认字段
+        allowed: 允许返回的字段
+        default: 默认字段（摘要）
+    
+    Returns:
+        字段列表（按 allowed 中的顺序，始终包含 id）
+    
+    Raises:
+        HTTPException: 包含不支持的字段时返回 400
+    """
+    if not fields:
+        return list(default)
+    
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的字段: {', '.join(sorted(unknown))}（可选: {', '.join(allowed)}）"
+        )
+    requested.add("id")
+    return [name for name in allowed if name in requested]
+
+
+def load_columns(model, fields: Sequence[str], *required: str):
+    """
+    只加载指定列的查询选项
+    
+    Args:
+        model: ORM 模型
+        fields: 要返回的字段
+        required: 查询本身需要的其他列（如游标分页的 created_at）
+    
+    Returns:
+        load_only 选项
+    """
+    names = dict.fromkeys([*fields, *required])
+    return load_only(*(getattr(model, name) for name in names))
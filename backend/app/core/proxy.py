@@ -0,0 +1,70 @@
+"""
+反向代理后的客户端 IP
+
+请求经 Nginx 转发时，连接的对端是代理而不是用户。只有对端在 TRUSTED_PROXY_IPS（IP 或网段）中时才读取
+X-Forwarded-For：从右向左跳过受信任的代理地址，第一个不受信任的地址即客户端 IP；
+直连请求伪造的 X-Forwarded-For 不会被采用
+"""
+from typing import Optional, List, Union
+import ipaddress
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_networks(value: str) -> List[Network]:
+    """解析逗号分隔的 IP / 网段列表（无效项记录警告后忽略）"""
+    networks = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning("Ignoring invalid trusted proxy entry: %s", item)
+    return networks
+
+
+def _is_trusted(host: Optional[str], networks: List[Network]) -> bool:
+    if not host:
+        return False
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+_trusted_networks = parse_networks(settings.TRUSTED_PROXY_IPS)
+
+
+def client_host(scope, networks: Optional[List[Network]] = None) -> str:
+    """
+    解析客户端 IP
+    
+    Args:
+        scope: ASGI scope（Request 对象可传 request.scope）
+        networks: 受信任的代理网段，默认读取 TRUSTED_PROXY_IPS
+    
+    Returns:
+        客户端 IP，无法确定时为 "unknown"
+    """
+    networks = _trusted_networks if networks is None else networks
+    client = scope.get("client")
+    peer = client[0] if client else None
+    
+    if _is_trusted(peer, networks):
+        forwarded = [
+            value.decode("latin1") for name, value in scope.get("headers", []) if name == b"x-forwarded-for"
+        ]
+        hosts = [host.strip() for host in ",".join(forwarded).split(",") if host.strip()]
+        for host in reversed(hosts):
+            if not _is_trusted(host, networks):
+                return host
+    
+    return peer or "unknown"
@@ -1,24 +1,82 @@
 """
 API 限流中间件
-简单的内存限流实现（避免 slowapi 的编码问题）
+
+使用 GCRA（通用信元速率算法）限流：
+- 每个键只保存一个“理论到达时间”（TAT），内存占用 O(1)
+- Redis 可用时由 Lua 脚本原子执行，多个 worker 共享同一限额
+- Redis 不可用时回退到进程内实现（各 worker 分别计数）
+- 被限流时返回 Retry-After，所有受限接口的响应都带 X-RateLimit-* 头
 """
 from fastapi import Request, HTTPException
 from functools import wraps
-from collections import defaultdict
-from datetime import datetime, timedelta
-from typing import Dict, Tuple
-import asyncio
+from collections import OrderedDict
+from typing import Dict, Tuple, NamedTuple
+import logging
+import math
+import time
 
 from app.core.config import settings
+from app.core.proxy import client_host
+from app.core.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1]: 限流键
+# ARGV[1]: 发放间隔（毫秒）= 周期 / 次数
+# ARGV[2]: 周期（毫秒），即允许的最大突发量对应的时长
+# 返回: {是否允许, 新的 TAT 距现在的毫秒数}
+GCRA_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+
+local new_tat = tat + interval
+if new_tat - now > period then
+    return {0, tat - now}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return {1, new_tat - now}
+"""
+
+
+class RateLimitResult(NamedTuple):
+    """限流检查结果"""
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # 额度完全恢复所需秒数
+    retry_after: float  # 被限流时需要等待的秒数
+    
+    def headers(self) -> Dict[str, str]:
+        """转换为响应头"""
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
 
 class SimpleRateLimiter:
-    """简单的内存限流器"""
+    """GCRA 限流器（Redis 优先，进程内回退）"""
+    
+    KEY_PREFIX = "ratelimit"
     
     def __init__(self):
-        # 存储格式: {key: [(timestamp, count)]}
-        self.requests: Dict[str, list] = defaultdict(list)
         self.enabled = settings.RATE_LIMIT_ENABLED
-        self.lock = asyncio.Lock()
+        # 进程内回退存储：键 -> TAT（秒），按最近更新排序，便于淘汰空闲键
+        self._local_tat: "OrderedDict[str, float]" = OrderedDict()
+        self._script = None
+        self._script_client = None
     
     def _parse_limit(self, limit_str: str) -> Tuple[int, int]:
         """解析限流字符串，如 '10/minute' -> (10, 60)"""
@@ -36,54 +94,114 @@ class SimpleRateLimiter:
         
         return count, seconds
     
+    async def hit(self, key: str, limit_str: str) -> RateLimitResult:
+        """
+        记录一次请求并返回限流结果
+        
+        Args:
+            key: 限流键（如 ai:user:1）
+            limit_str: 限流规则（如 10/minute）
+        
+        Returns:
+            限流结果
+        """
+        max_requests, window_seconds = self._parse_limit(limit_str)
+        interval = window_seconds / max_requests
+        
+        tat_offset = None
+        if redis_client.redis:
+            try:
+                allowed, tat_offset_ms = await self._redis_hit(key, interval, window_seconds)
+                tat_offset = tat_offset_ms / 1000
+            except Exception as e:
+                logger.warning("Redis error: %s, using local limiter", e)
+        
+        if tat_offset is None:
+            allowed, tat_offset = self._local_hit(key, interval, window_seconds)
+        
+        # TAT 距现在越远，已用额度越多
+        remaining = max(0, int((window_seconds - tat_offset) // interval))
+        retry_after = 0.0 if allowed else tat_offset + interval - window_seconds
+        
+        return RateLimitResult(
+            allowed=bool(allowed),
+            limit=max_requests,
+            remaining=remaining,
+            reset_after=tat_offset,
+            retry_after=retry_after
+        )
+    
     async def check_limit(self, key: str, limit_str: str) -> bool:
         """检查是否超过限流"""
         if not self.enabled:
             return True
+        result = await self.hit(key, limit_str)
+        return result.allowed
+    
+    async def _redis_hit(self, key: str, interval: float, window_seconds: int) -> Tuple[int, float]:
+        """在 Redis 中原子执行 GCRA"""
+        client = redis_client.redis
+        if self._script is None or self._script_client is not client:
+            # 脚本对象绑定客户端，重连后重新注册（EVALSHA 失败时自动回退到 EVAL）
+            self._script = client.register_script(GCRA_SCRIPT)
+            self._script_client = client
         
-        max_requests, window_seconds = self._parse_limit(limit_str)
-        now = datetime.now()
-        window_start = now - timedelta(seconds=window_seconds)
+        allowed, tat_offset_ms = await self._script(
+            keys=[f"{self.KEY_PREFIX}:{key}"],
+            args=[interval * 1000, window_seconds * 1000]
+        )
+        return int(allowed), float(tat_offset_ms)
+    
+    def _local_hit(self, key: str, interval: float, window_seconds: int) -> Tuple[bool, float]:
+        """
+        进程内 GCRA
         
-        async with self.lock:
-            # 清理过期记录
-            self.requests[key] = [
-                ts for ts in self.requests[key]
-                if ts > window_start
-            ]
-            
-            # 检查是否超限
-            if len(self.requests[key]) >= max_requests:
-                return False
-            
-            # 记录本次请求
-            self.requests[key].append(now)
-            return True
+        整个检查过程没有 await，在事件循环中天然是原子的，不需要加锁
+        """
+        now = time.monotonic()
+        self._evict_idle(now)
+        
+        tat = max(self._local_tat.get(key, now), now)
+        new_tat = tat + interval
+        if new_tat - now > window_seconds:
+            return False, tat - now
+        
+        self._local_tat[key] = new_tat
+        self._local_tat.move_to_end(key)
+        return True, new_tat - now
+    
+    def _evict_idle(self, now: float):
+        """淘汰额度已完全恢复的键（从最久未更新的开始，均摊 O(1)）"""
+        while self._local_tat:
+            key, tat = next(iter(self._local_tat.items()))
+            if tat > now:
+                break
+            self._local_tat.popitem(last=False)
     
-    def get_user_identifier(self, request: Request) -> str:
+    def get_user_identifier(self, request: Request, user=None) -> str:
         """获取用户标识符"""
-        # 尝试从请求状态中获取用户信息
-        user = getattr(request.state, "user", None)
+        # 优先使用已认证用户，其次尝试从请求状态中获取用户信息
+        user = user or getattr(request.state, "user", None)
         if user and hasattr(user, "id"):
             return f"user:{user.id}"
         
-        # 回退到 IP 地址
-        client_host = request.client.host if request.client else "unknown"
-        return f"ip:{client_host}"
+        # 回退到 IP 地址（经受信任代理转发时取 X-Forwarded-For 中的客户端地址）
+        return f"ip:{client_host(request.scope)}"
 
 # 全局限流器实例
 rate_limiter = SimpleRateLimiter()
 
-print(f"[RateLimiter] Initialized simple rate limiter")
-print(f"[RateLimiter] Enabled: {settings.RATE_LIMIT_ENABLED}")
+logger.info("Initialized GCRA rate limiter, enabled: %s", settings.RATE_LIMIT_ENABLED)
 
 # 限流装饰器
-def rate_limit(limit_str: str):
+def rate_limit(limit_str: str, scope: str = "default"):
     """
     限流装饰器
     
+    同一 scope 的接口共享限额
+    
     使用示例：
-    @rate_limit("10/minute")
+    @rate_limit("10/minute", scope="ai")
     async def my_endpoint(request: Request):
         pass
     """
@@ -92,20 +210,22 @@ def rate_limit(limit_str: str):
         async def wrapper(*args, **kwargs):
             # 从参数中找到 Request 对象
             request = None
-            for arg in args:
+            for arg in list(args) + [kwargs.get('req'), kwargs.get('request')]:
                 if isinstance(arg, Request):
                     request = arg
                     break
-            if not request:
-                request = kwargs.get('req') or kwargs.get('request')
             
             if request and rate_limiter.enabled:
-                key = rate_limiter.get_user_identifier(request)
-                if not await rate_limiter.check_limit(key, limit_str):
+                identifier = rate_limiter.get_user_identifier(request, kwargs.get('current_user'))
+                result = await rate_limiter.hit(f"{scope}:{identifier}", limit_str)
+                if not result.allowed:
                     raise HTTPException(
                         status_code=429,
-                        detail=f"Rate limit exceeded: {limit_str}"
+                        detail=f"Rate limit exceeded: {limit_str}",
+                        headers=result.headers()
                     )
+                # 由 RateLimitHeadersMiddleware 写入响应头
+                request.state.rate_limit_headers = result.headers()
             
             return await func(*args, **kwargs)
         return wrapper
@@ -113,13 +233,39 @@ def rate_limit(limit_str: str):
 
 # 预定义的限流装饰器
 def user_rate_limit(func):
-    return rate_limit(settings.RATE_LIMIT_USER)(func)
+    return rate_limit(settings.RATE_LIMIT_USER, scope="user")(func)
 
 def ai_rate_limit(func):
-    return rate_limit(settings.RATE_LIMIT_AI)(func)
+    return rate_limit(settings.RATE_LIMIT_AI, scope="ai")(func)
 
 def upload_rate_limit(func):
-    return rate_limit(settings.RATE_LIMIT_UPLOAD)(func)
+    return rate_limit(settings.RATE_LIMIT_UPLOAD, scope="upload")(func)
+
+
+class RateLimitHeadersMiddleware:
+    """把限流装饰器记录的 X-RateLimit-* 头写入成功响应（纯 ASGI 实现，开销很小）"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = scope.get("state", {}).get("rate_limit_headers")
+                if headers:
+                    raw_headers = list(message.get("headers", []))
+                    existing = {name.lower() for name, _ in raw_headers}
+                    for name, value in headers.items():
+                        if name.lower().encode() not in existing:
+                            raw_headers.append((name.lower().encode(), value.encode()))
+                    message["headers"] = raw_headers
+            await send(message)
+        
+        await self.app(scope, receive, send_with_headers)
 
 # 为了兼容性，创建一个 limiter 对象
 class LimiterCompat:
@@ -1,40 +1,186 @@
 import redis.asyncio as redis
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
 from app.core.config import settings
-from typing import Optional, Any
+from app.core.metrics import REDIS_COMMAND_DURATION, REDIS_COMMAND_ERRORS
+from typing import Optional, Any, Dict, List, Iterable
+from contextlib import asynccontextmanager
+import asyncio
 import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # orjson 未安装时回退到标准库 json
+    orjson = None
+
+
+class JSONCodec:
+    """标准库 json 编解码"""
+    name = "json"
+    
+    def dumps(self, value: Any) -> str:
+        return json.dumps(value, ensure_ascii=False, default=str)
+    
+    def loads(self, raw: str) -> Any:
+        return json.loads(raw)
+
+
+class OrjsonCodec:
+    """orjson 编解码（比标准库快数倍，输出与 json 兼容，可以读取旧数据）"""
+    name = "orjson"
+    
+    def dumps(self, value: Any) -> str:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, raw: str) -> Any:
+        return orjson.loads(raw)
+
+
+def get_codec(name: str):
+    """按名称获取编解码器，orjson 不可用时回退到 json"""
+    if name == "orjson" and orjson is not None:
+        return OrjsonCodec()
+    if name not in ("json", "orjson"):
+        logger.warning("Unknown codec '%s', using json", name)
+    return JSONCodec()
+
 
 class RedisClient:
     def __init__(self):
         self.redis = None
+        self.codec = get_codec(settings.REDIS_CODEC)
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._closing = False
+        
+        # 每个命令的耗时统计：命令 -> {count, errors, total_ms, max_ms}
+        self.metrics: Dict[str, Dict[str, float]] = {}
+    
+    def _create_client(self):
+        """按配置创建带连接池和重试的客户端"""
+        pool = redis.ConnectionPool.from_url(
+            f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}",
+            password=settings.REDIS_PASSWORD if settings.REDIS_PASSWORD else None,
+            encoding="utf-8",
+            decode_responses=True,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            # 单个命令遇到连接错误时按指数退避重试
+            retry=Retry(ExponentialBackoff(cap=1, base=0.05), 3),
+            retry_on_error=[RedisConnectionError, RedisTimeoutError]
+        )
+        return redis.Redis(connection_pool=pool)
     
     async def connect(self):
-        """连接 Redis"""
+        """连接 Redis（失败时在后台按指数退避重连）"""
+        self._closing = False
+        if not await self._try_connect():
+            logger.info("Continuing without cache, will retry in background...")
+            self._start_reconnect()
+    
+    async def _try_connect(self) -> bool:
+        client = self._create_client()
         try:
-            self.redis = await redis.from_url(
-                f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}",
-                password=settings.REDIS_PASSWORD if settings.REDIS_PASSWORD else None,
-                encoding="utf-8",
-                decode_responses=True
-            )
-            print(f"[Redis] Connected to {settings.REDIS_HOST}:{settings.REDIS_PORT}")
+            # 连接池不会立即建立连接，这里主动 ping 确认 Redis 可用
+            await client.ping()
         except Exception as e:
-            print(f"[Redis] Connection failed: {e}. Continuing without cache...")
-            self.redis = None
+            logger.warning("Connection failed: %s", e)
+            await client.close(close_connection_pool=True)
+            return False
+        
+        self.redis = client
+        logger.info("Connected to %s:%s (codec: %s)", settings.REDIS_HOST, settings.REDIS_PORT, self.codec.name)
+        return True
+    
+    def _start_reconnect(self):
+        if self._reconnect_task and not self._reconnect_task.done():
+            return
+        self._reconnect_task = asyncio.create_task(self._reconnect_loop())
+    
+    async def _reconnect_loop(self):
+        """后台重连，间隔从 1 秒开始翻倍，最长 REDIS_RECONNECT_MAX_BACKOFF 秒"""
+        delay = 1
+        while not self._closing and not self.redis:
+            await asyncio.sleep(delay)
+            if await self._try_connect():
+                return
+            delay = min(delay * 2, settings.REDIS_RECONNECT_MAX_BACKOFF)
     
     async def close(self):
         """关闭连接"""
+        self._closing = True
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
         if self.redis:
-            await self.redis.close()
-            print("[Redis] Connection closed")
+            await self.redis.close(close_connection_pool=True)
+            self.redis = None
+            logger.info("Connection closed")
+    
+    @asynccontextmanager
+    async def _timed(self, command: str):
+        """记录命令耗时和错误次数"""
+        metric = self.metrics.get(command)
+        if metric is None:
+            metric = self.metrics[command] = {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+        
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            metric["errors"] += 1
+            REDIS_COMMAND_ERRORS.labels(command=command).inc()
+            raise
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            REDIS_COMMAND_DURATION.labels(command=command).observe(elapsed / 1000)
+            metric["count"] += 1
+            metric["total_ms"] += elapsed
+            if elapsed > metric["max_ms"]:
+                metric["max_ms"] = elapsed
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取连接状态和各命令的耗时统计"""
+        commands = {}
+        for command, metric in self.metrics.items():
+            commands[command] = {
+                "count": metric["count"],
+                "errors": metric["errors"],
+                "avg_ms": round(metric["total_ms"] / metric["count"], 3) if metric["count"] else 0,
+                "max_ms": round(metric["max_ms"], 3)
+            }
+        
+        pool = None
+        if self.redis:
+            connection_pool = self.redis.connection_pool
+            pool = {
+                "max_connections": getattr(connection_pool, "max_connections", None),
+                "in_use": len(getattr(connection_pool, "_in_use_connections", ())),
+                "available": len(getattr(connection_pool, "_available_connections", ()))
+            }
+        
+        return {
+            "connected": self.redis is not None,
+            "codec": self.codec.name,
+            "pool": pool,
+            "commands": commands
+        }
     
     async def get(self, key: str) -> Optional[str]:
         """获取值"""
         if not self.redis:
             return None
         try:
-            return await self.redis.get(key)
+            async with self._timed("get"):
+                return await self.redis.get(key)
         except Exception as e:
-            print(f"[Redis] Get error: {e}")
+            logger.error("Get error: %s", e)
             return None
     
     async def set(self, key: str, value: str, expire: int = None):
@@ -42,45 +188,147 @@ class RedisClient:
         if not self.redis:
             return
         try:
-            await self.redis.set(key, value, ex=expire)
+            async with self._timed("set"):
+                await self.redis.set(key, value, ex=expire)
         except Exception as e:
-            print(f"[Redis] Set error: {e}")
+            logger.error("Set error: %s", e)
     
     async def delete(self, key: str):
         """删除键"""
         if not self.redis:
             return
         try:
-            await self.redis.delete(key)
+            async with self._timed("delete"):
+                await self.redis.delete(key)
         except Exception as e:
-            print(f"[Redis] Delete error: {e}")
+            logger.error("Delete error: %s", e)
     
     async def get_json(self, key: str) -> Optional[Any]:
         """获取 JSON 值"""
         value = await self.get(key)
         if value:
             try:
-                return json.loads(value)
-            except json.JSONDecodeError:
+                return self.codec.loads(value)
+            except ValueError:
                 return None
         return None
     
     async def set_json(self, key: str, value: Any, expire: int = None):
         """设置 JSON 值"""
         try:
-            json_str = json.dumps(value, ensure_ascii=False)
+            json_str = self.codec.dumps(value)
             await self.set(key, json_str, expire)
         except Exception as e:
-            print(f"[Redis] Set JSON error: {e}")
+            logger.error("Set JSON error: %s", e)
+    
+    async def mget_json(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        批量获取 JSON 值（一次往返）
+        
+        Args:
+            keys: 键列表
+        
+        Returns:
+            与键顺序一致的值列表，不存在或无法解析的为 None
+        """
+        if not self.redis or not keys:
+            return [None] * len(keys)
+        try:
+            async with self._timed("mget"):
+                values = await self.redis.mget(keys)
+        except Exception as e:
+            logger.error("MGET error: %s", e)
+            return [None] * len(keys)
+        
+        results = []
+        for value in values:
+            try:
+                results.append(self.codec.loads(value) if value else None)
+            except ValueError:
+                results.append(None)
+        return results
+    
+    async def mset_json(self, mapping: Dict[str, Any], expire: int = None):
+        """
+        批量设置 JSON 值（一次往返）
+        
+        MSET 不支持过期时间，设置 expire 时改用流水线逐个 SET EX
+        
+        Args:
+            mapping: 键值字典
+            expire: 过期时间（秒）
+        """
+        if not self.redis or not mapping:
+            return
+        try:
+            encoded = {key: self.codec.dumps(value) for key, value in mapping.items()}
+            async with self._timed("mset"):
+                if expire is None:
+                    await self.redis.mset(encoded)
+                else:
+                    pipe = self.redis.pipeline(transaction=False)
+                    for key, value in encoded.items():
+                        pipe.set(key, value, ex=expire)
+                    await pipe.execute()
+        except Exception as e:
+            logger.error("MSET error: %s", e)
+    
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        """批量删除键（一次往返）"""
+        keys = list(keys)
+        if not self.redis or not keys:
+            return 0
+        try:
+            async with self._timed("delete_many"):
+                return await self.redis.delete(*keys)
+        except Exception as e:
+            logger.error("Delete many error: %s", e)
+            return 0
+    
+    async def delete_by_tags(self, tag_keys: List[str]) -> int:
+        """
+        删除标签集合中记录的所有键及标签集合本身
+        
+        先用一次流水线读取所有标签成员，再在一个事务中删除，共两次往返
+        
+        Args:
+            tag_keys: 标签集合的键列表
+        
+        Returns:
+            删除的成员键数量
+        """
+        if not self.redis or not tag_keys:
+            return 0
+        try:
+            async with self._timed("delete_by_tags"):
+                pipe = self.redis.pipeline(transaction=False)
+                for tag_key in tag_keys:
+                    pipe.smembers(tag_key)
+                members = await pipe.execute()
+                
+                keys = set()
+                for tag_members in members:
+                    keys.update(tag_members)
+                
+                pipe = self.redis.pipeline(transaction=True)
+                if keys:
+                    pipe.delete(*keys)
+                pipe.delete(*tag_keys)
+                await pipe.execute()
+                return len(keys)
+        except Exception as e:
+            logger.error("Delete by tags error: %s", e)
+            return 0
     
     async def exists(self, key: str) -> bool:
         """检查键是否存在"""
         if not self.redis:
             return False
         try:
-            return await self.redis.exists(key) > 0
+            async with self._timed("exists"):
+                return await self.redis.exists(key) > 0
         except Exception as e:
-            print(f"[Redis] Exists error: {e}")
+            logger.error("Exists error: %s", e)
             return False
     
     async def expire(self, key: str, seconds: int):
@@ -88,18 +336,20 @@ class RedisClient:
         if not self.redis:
             return
         try:
-            await self.redis.expire(key, seconds)
+            async with self._timed("expire"):
+                await self.redis.expire(key, seconds)
         except Exception as e:
-            print(f"[Redis] Expire error: {e}")
+            logger.error("Expire error: %s", e)
     
     async def ttl(self, key: str) -> int:
         """获取剩余过期时间"""
         if not self.redis:
             return -1
         try:
-            return await self.redis.ttl(key)
+            async with self._timed("ttl"):
+                return await self.redis.ttl(key)
         except Exception as e:
-            print(f"[Redis] TTL error: {e}")
+            logger.error("TTL error: %s", e)
             return -1
 
 redis_client = RedisClient()
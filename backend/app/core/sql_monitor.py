@@ -0,0 +1,298 @@
+"""
+SQL 监控
+
+通过 SQLAlchemy 引擎事件记录数据库访问情况：
+1. 每条语句的耗时：按语句指纹（参数替换为 ?）汇总次数、累计/最大耗时，并写入 Prometheus 直方图
+2. 每个请求的查询次数和数据库总耗时：写入指标，并通过 Server-Timing 响应头返回
+3. N+1 检测：同一请求内同一语句指纹重复执行达到 SQL_N_PLUS_ONE_THRESHOLD 次，记为 N+1 候选
+4. 慢查询日志：超过 SQL_SLOW_QUERY_MS 的语句写日志；按 SQL_EXPLAIN_SAMPLE_RATE 采样，
+   对 SELECT 在后台另开连接执行 EXPLAIN，同一指纹在 SQL_EXPLAIN_INTERVAL 内只采集一次
+5. 连接池等待：从连接池取连接（包括新建连接）的耗时
+"""
+from typing import Optional, Dict, Any
+from collections import Counter, OrderedDict, deque
+from contextvars import ContextVar
+import asyncio
+import contextvars
+import logging
+import random
+import re
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import settings
+from app.core.metrics import DB_QUERY_DURATION, DB_QUERIES_PER_REQUEST, DB_N_PLUS_ONE, DB_POOL_WAIT
+
+logger = logging.getLogger(__name__)
+
+_PARAM_PATTERN = re.compile(r"%\(\w+\)s|%s|\$\d+|\?|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST_PATTERN = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """
+    语句指纹：参数、字面量替换为 ?，IN 列表折叠为 (...)，合并空白
+    
+    同一条 ORM 查询无论参数如何都得到相同的指纹，用于汇总和 N+1 检测
+    """
+    normalized = _WHITESPACE_PATTERN.sub(" ", statement).strip()
+    normalized = _PARAM_PATTERN.sub("?", normalized)
+    normalized = _IN_LIST_PATTERN.sub("(...)", normalized)
+    return normalized[:500]
+
+
+def statement_operation(statement: str) -> str:
+    """语句类型（SELECT / INSERT / UPDATE / DELETE / 其他）"""
+    head = statement.lstrip()[:10].upper()
+    for operation in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+        if head.startswith(operation):
+            return "SELECT" if operation == "WITH" else operation
+    return "OTHER"
+
+
+class RequestQueryStats:
+    """单个请求内的查询统计"""
+    
+    __slots__ = ("count", "total_ms", "fingerprints")
+    
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.fingerprints: Counter = Counter()
+
+
+_request_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("sql_request_stats", default=None)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """记录取连接等待时间的连接池"""
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            sql_monitor.record_pool_wait((time.perf_counter() - start) * 1000)
+
+
+class SQLMonitor:
+    """SQL 监控器"""
+    
+    def __init__(self):
+        self.slow_query_ms = settings.SQL_SLOW_QUERY_MS
+        self.explain_enabled = settings.SQL_EXPLAIN_ENABLED
+        self.explain_sample_rate = settings.SQL_EXPLAIN_SAMPLE_RATE
+        self.explain_interval = settings.SQL_EXPLAIN_INTERVAL
+        self.n_plus_one_threshold = settings.SQL_N_PLUS_ONE_THRESHOLD
+        self.max_statements = settings.SQL_STATEMENT_STATS_MAX
+        
+        self.engine = None
+        # 语句指纹 -> {count, total_ms, max_ms, operation}，按最近使用排序，超出上限时淘汰最久未用的
+        self.statements: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.slow_queries: "deque[Dict[str, Any]]" = deque(maxlen=100)
+        # (路由, 语句指纹) -> {count, max_repeats}
+        self.n_plus_one: Dict[tuple, Dict[str, Any]] = {}
+        self.pool_wait = {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+        self.request_count = 0
+        
+        self._explained_at: Dict[str, float] = {}
+        self._tasks: set = set()
+    
+    def instrument(self, engine):
+        """
+        注册引擎事件
+        
+        Args:
+            engine: AsyncEngine（EXPLAIN 采集需要异步引擎）或 Engine
+        """
+        self.engine = engine if hasattr(engine, "sync_engine") else None
+        sync_engine = getattr(engine, "sync_engine", engine)
+        
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("sql_monitor_start", []).append(time.perf_counter())
+        
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            starts = conn.info.get("sql_monitor_start")
+            if starts:
+                self.record_query(statement, parameters, (time.perf_counter() - starts.pop()) * 1000)
+        
+        @event.listens_for(sync_engine, "handle_error")
+        def _handle_error(exception_context):
+            connection = exception_context.connection
+            starts = connection.info.get("sql_monitor_start") if connection is not None else None
+            if starts:
+                starts.pop()
+    
+    def record_query(self, statement: str, parameters: Any, elapsed_ms: float):
+        """记录一条语句的执行"""
+        key = fingerprint(statement)
+        operation = statement_operation(statement)
+        DB_QUERY_DURATION.labels(operation=operation).observe(elapsed_ms / 1000)
+        
+        stats = self.statements.get(key)
+        if stats is None:
+            stats = self.statements[key] = {"operation": operation, "count": 0, "total_ms": 0.0, "max_ms": 0.0}
+            if len(self.statements) > self.max_statements:
+                self.statements.popitem(last=False)
+        else:
+            self.statements.move_to_end(key)
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        if elapsed_ms > stats["max_ms"]:
+            stats["max_ms"] = elapsed_ms
+        
+        request_stats = _request_stats.get()
+        if request_stats is not None:
+            request_stats.count += 1
+            request_stats.total_ms += elapsed_ms
+            request_stats.fingerprints[key] += 1
+        
+        if elapsed_ms >= self.slow_query_ms:
+            self._record_slow_query(key, operation, statement, parameters, elapsed_ms)
+    
+    def _record_slow_query(self, key: str, operation: str, statement: str, parameters: Any, elapsed_ms: float):
+        entry = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "duration_ms": round(elapsed_ms, 2),
+            "fingerprint": key,
+            "explain": None
+        }
+        self.slow_queries.append(entry)
+        logger.warning("Slow query (%.0fms): %s", elapsed_ms, key)
+        
+        if (
+            self.explain_enabled
+            and self.engine is not None
+            and operation == "SELECT"
+            and random.random() < self.explain_sample_rate
+            and time.time() - self._explained_at.get(key, 0) >= self.explain_interval
+        ):
+            self._explained_at[key] = time.time()
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            # 在空白上下文中执行，EXPLAIN 不计入当前请求的查询统计，也不挂到当前请求的链路上
+            task = loop.create_task(self._explain(entry, statement, parameters), context=contextvars.Context())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _explain(self, entry: Dict[str, Any], statement: str, parameters: Any):
+        """另开连接执行 EXPLAIN（不带 ANALYZE，不会真正执行语句）"""
+        try:
+            async with self.engine.connect() as conn:
+                result = await conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+                entry["explain"] = [row[0] for row in result]
+            logger.info("EXPLAIN for slow query %s:\n%s", entry["fingerprint"], "\n".join(entry["explain"]))
+        except Exception as e:
+            entry["explain"] = [f"EXPLAIN failed: {e}"]
+    
+    def record_pool_wait(self, elapsed_ms: float):
+        """记录一次取连接的等待时间"""
+        DB_POOL_WAIT.observe(elapsed_ms / 1000)
+        self.pool_wait["count"] += 1
+        self.pool_wait["total_ms"] += elapsed_ms
+        if elapsed_ms > self.pool_wait["max_ms"]:
+            self.pool_wait["max_ms"] = elapsed_ms
+    
+    def start_request(self):
+        """开始统计一个请求，返回 (统计对象, 上下文令牌)"""
+        stats = RequestQueryStats()
+        return stats, _request_stats.set(stats)
+    
+    def end_request(self, stats: RequestQueryStats, token, route: str):
+        """结束请求统计：写入指标并检测 N+1"""
+        _request_stats.reset(token)
+        self.request_count += 1
+        DB_QUERIES_PER_REQUEST.labels(route=route).observe(stats.count)
+        
+        for key, repeats in stats.fingerprints.items():
+            if repeats < self.n_plus_one_threshold:
+                continue
+            DB_N_PLUS_ONE.labels(route=route).inc()
+            candidate = self.n_plus_one.setdefault((route, key), {"count": 0, "max_repeats": 0})
+            candidate["count"] += 1
+            candidate["max_repeats"] = max(candidate["max_repeats"], repeats)
+            logger.warning("Possible N+1 in %s: statement executed %s times: %s", route, repeats, key)
+    
+    def reset(self):
+        """清空统计"""
+        self.statements.clear()
+        self.slow_queries.clear()
+        self.n_plus_one.clear()
+        self.pool_wait = {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+        self.request_count = 0
+    
+    def get_report(self, limit: int = 20) -> Dict[str, Any]:
+        """
+        获取 SQL 统计报告
+        
+        Args:
+            limit: 各列表返回的条数
+        
+        Returns:
+            按累计耗时排序的语句、最近的慢查询、N+1 候选、连接池等待
+        """
+        statements = sorted(self.statements.items(), key=lambda item: item[1]["total_ms"], reverse=True)[:limit]
+        n_plus_one = sorted(self.n_plus_one.items(), key=lambda item: item[1]["count"], reverse=True)[:limit]
+        pool_wait_count = self.pool_wait["count"]
+        
+        return {
+            "requests": self.request_count,
+            "statements": [
+                {
+                    "fingerprint": key,
+                    "operation": stats["operation"],
+                    "count": stats["count"],
+                    "total_ms": round(stats["total_ms"], 2),
+                    "avg_ms": round(stats["total_ms"] / stats["count"], 2),
+                    "max_ms": round(stats["max_ms"], 2)
+                }
+                for key, stats in statements
+            ],
+            "slow_queries": list(reversed(self.slow_queries))[:limit],
+            "n_plus_one": [
+                {"route": route, "fingerprint": key, **candidate}
+                for (route, key), candidate in n_plus_one
+            ],
+            "pool_wait": {
+                "count": pool_wait_count,
+                "avg_ms": round(self.pool_wait["total_ms"] / pool_wait_count, 3) if pool_wait_count else 0,
+                "max_ms": round(self.pool_wait["max_ms"], 3)
+            }
+        }
+
+
+# 全局实例
+sql_monitor = SQLMonitor()
+
+
+class SQLStatsMiddleware:
+    """统计每个请求的查询次数和数据库耗时，并写入 Server-Timing 响应头（纯 ASGI 实现）"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        stats, token = sql_monitor.start_request()
+        
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                timing = f'db;dur={stats.total_ms:.1f};desc="{stats.count} queries"'
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            sql_monitor.end_request(stats, token, route)
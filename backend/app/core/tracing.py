@@ -0,0 +1,424 @@
+"""
+请求链路追踪
+
+每个 HTTP 请求创建一个根 span，请求内的数据库查询与提交、MinIO 操作、大模型调用、
+文件解析、模板渲染、文档导出等各自记录子 span，形成一棵调用树，用于定位慢请求的耗时分布
+
+1. 当前 span 保存在上下文变量中，随 await 和请求内创建的任务自动传递，不需要显式传参
+2. 只有请求内才记录 span；请求之外（启动、定时任务）的调用直接跳过，没有额外开销
+3. 请求结束后：
+   - 超过 TRACE_SLOW_MS 的慢请求一定保留（最近 TRACE_SLOW_KEEP 条，可在管理接口查看）并打印耗时分布
+   - 其余请求按 TRACE_SAMPLE_RATE 采样
+   - 保留和采样的链路由后台线程导出到本地文件（JSON Lines）和/或 OTLP/HTTP 收集器
+"""
+from typing import Optional, Dict, Any, List
+from collections import deque
+from contextvars import ContextVar
+from functools import wraps
+import asyncio
+import json
+import logging
+import queue
+import random
+import secrets
+import threading
+import time
+
+from app.core.config import settings
+from app.core.logging_config import request_id_var
+
+logger = logging.getLogger(__name__)
+
+# 属性值过长时截断（如 SQL 语句）
+MAX_ATTRIBUTE_LENGTH = 300
+
+
+class Span:
+    """一次操作的耗时记录"""
+    
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "attributes", "children",
+        "start_unix_ns", "_start", "duration_ms", "error"
+    )
+    
+    def __init__(self, name: str, parent: "Span" = None, attributes: Dict[str, Any] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes) if attributes else {}
+        self.children: List["Span"] = []
+        self.start_unix_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        if parent is not None:
+            parent.children.append(self)
+    
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+    
+    def finish(self, error: BaseException = None):
+        if self.duration_ms is not None:
+            return
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+    
+    def iter_spans(self):
+        """深度优先遍历整棵树"""
+        yield self
+        for child in self.children:
+            yield from child.iter_spans()
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为嵌套字典（子 span 按开始时间排序）"""
+        data = {
+            "name": self.name,
+            "span_id": self.span_id,
+            "start_unix_ns": self.start_unix_ns,
+            "duration_ms": round(self.duration_ms, 2) if self.duration_ms is not None else None,
+            "attributes": self.attributes,
+        }
+        if self.parent_id is None:
+            data["trace_id"] = self.trace_id
+        if self.error:
+            data["error"] = self.error
+        if self.children:
+            data["children"] = [child.to_dict() for child in sorted(self.children, key=lambda s: s._start)]
+        return data
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    """当前上下文中的 span，不在请求中时为 None"""
+    return _current_span.get()
+
+
+class span:
+    """
+    记录一个子 span（同步和异步上下文管理器均可）
+    
+    使用示例：
+    async with span("minio.download", object=file_name) as s:
+        data = await ...
+        if s:
+            s.set_attribute("bytes", len(data))
+    """
+    
+    __slots__ = ("name", "attributes", "span", "_token")
+    
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.span: Optional[Span] = None
+        self._token = None
+    
+    def __enter__(self) -> Optional[Span]:
+        parent = _current_span.get()
+        if parent is None:
+            return None
+        self.span = Span(self.name, parent, self.attributes)
+        self._token = _current_span.set(self.span)
+        return self.span
+    
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is not None:
+            self.span.finish(exc)
+            _current_span.reset(self._token)
+        return False
+    
+    async def __aenter__(self) -> Optional[Span]:
+        return self.__enter__()
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+def traced(name: str, **attributes):
+    """
+    把整个函数记录为一个 span 的装饰器
+    
+    使用示例：
+    @traced("minio.upload")
+    async def upload_file(...):
+        ...
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+        
+        @wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return func(*args, **kwargs)
+        return sync_wrapper
+    return decorator
+
+
+def summarize(root: Span) -> Dict[str, Dict[str, float]]:
+    """按 span 名称汇总次数和累计耗时（不含根 span）"""
+    summary: Dict[str, Dict[str, float]] = {}
+    for item in root.iter_spans():
+        if item is root or item.duration_ms is None:
+            continue
+        entry = summary.setdefault(item.name, {"count": 0, "total_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] += item.duration_ms
+    for entry in summary.values():
+        entry["total_ms"] = round(entry["total_ms"], 2)
+    return dict(sorted(summary.items(), key=lambda item: item[1]["total_ms"], reverse=True))
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(root: Span) -> Dict[str, Any]:
+    """转换为 OTLP/HTTP JSON 格式（ExportTraceServiceRequest）"""
+    spans = []
+    for item in root.iter_spans():
+        duration_ns = int((item.duration_ms or 0) * 1_000_000)
+        otlp_span = {
+            "traceId": item.trace_id,
+            "spanId": item.span_id,
+            "name": item.name,
+            "kind": 2 if item is root else 1,  # SERVER / INTERNAL
+            "startTimeUnixNano": str(item.start_unix_ns),
+            "endTimeUnixNano": str(item.start_unix_ns + duration_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in item.attributes.items()],
+            "status": {"code": 2, "message": item.error} if item.error else {"code": 1},
+        }
+        if item.parent_id:
+            otlp_span["parentSpanId"] = item.parent_id
+        spans.append(otlp_span)
+    
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": settings.TRACE_SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}]
+        }]
+    }
+
+
+class Tracer:
+    """链路追踪器：管理请求根 span、采样和导出"""
+    
+    def __init__(self):
+        self.enabled = settings.TRACING_ENABLED
+        self.sample_rate = settings.TRACE_SAMPLE_RATE
+        self.slow_ms = settings.TRACE_SLOW_MS
+        self.export_file = settings.TRACE_EXPORT_FILE
+        self.otlp_endpoint = settings.TRACE_OTLP_ENDPOINT
+        
+        self.slow_traces: "deque[Dict[str, Any]]" = deque(maxlen=settings.TRACE_SLOW_KEEP)
+        self.stats = {"traces": 0, "slow": 0, "exported": 0, "export_errors": 0, "dropped": 0}
+        
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=1000)
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def has_exporter(self) -> bool:
+        return bool(self.export_file or self.otlp_endpoint)
+    
+    def start_trace(self, name: str, **attributes):
+        """开始一条链路，返回 (根 span, 上下文令牌)"""
+        root = Span(name, None, attributes)
+        token = _current_span.set(root)
+        return root, token
+    
+    def end_trace(self, root: Span, token, error: BaseException = None):
+        """结束链路：判断慢请求、采样并提交导出"""
+        root.finish(error)
+        _current_span.reset(token)
+        self.stats["traces"] += 1
+        
+        slow = root.duration_ms >= self.slow_ms
+        if slow:
+            self.stats["slow"] += 1
+            summary = summarize(root)
+            trace = root.to_dict()
+            trace["summary"] = summary
+            self.slow_traces.append(trace)
+            logger.warning(
+                "Slow request %s took %.0fms (trace %s): %s",
+                root.name, root.duration_ms, root.trace_id,
+                ", ".join(f"{name} x{entry['count']} {entry['total_ms']:.0f}ms" for name, entry in summary.items())
+            )
+        
+        if self.has_exporter and (slow or random.random() < self.sample_rate):
+            self._ensure_worker()
+            try:
+                self._queue.put_nowait(root)
+            except queue.Full:
+                self.stats["dropped"] += 1
+    
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+                self._worker.start()
+    
+    def _export_loop(self):
+        """后台线程：写文件、发送到收集器，不占用事件循环"""
+        client = None
+        while True:
+            root = self._queue.get()
+            if root is None:
+                break
+            try:
+                if self.export_file:
+                    with open(self.export_file, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(root.to_dict(), ensure_ascii=False, default=str) + "\n")
+                if self.otlp_endpoint:
+                    import httpx
+                    client = client or httpx.Client(timeout=5)
+                    response = client.post(f"{self.otlp_endpoint.rstrip('/')}/v1/traces", json=to_otlp(root))
+                    response.raise_for_status()
+                self.stats["exported"] += 1
+            except Exception as e:
+                self.stats["export_errors"] += 1
+                logger.warning("Trace export failed: %s", e)
+        if client is not None:
+            client.close()
+    
+    def shutdown(self, timeout: float = 2.0):
+        """停止导出线程（先导出队列中剩余的链路）"""
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join(timeout)
+        self._worker = None
+    
+    def get_slow_traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """最近的慢请求链路（最新的在前）"""
+        return list(reversed(self.slow_traces))[:limit]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "slow_ms": self.slow_ms,
+            "export_file": self.export_file or None,
+            "otlp_endpoint": self.otlp_endpoint or None,
+            **self.stats
+        }
+
+
+# 全局实例
+tracer = Tracer()
+
+
+def instrument_engine(engine):
+    """
+    为 SQLAlchemy 引擎注册 span 钩子
+    
+    - 每条 SQL 记录为 db.query（语句截断）
+    - 每次会话提交（包括提交前的 flush）记录为 db.commit
+    
+    异步引擎的同步代码在 greenlet 中执行，greenlet 继承调用协程的上下文，所以能取到当前 span
+    
+    Args:
+        engine: AsyncEngine 或 Engine
+    """
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    
+    sync_engine = getattr(engine, "sync_engine", engine)
+    
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        parent = _current_span.get()
+        if parent is None:
+            return
+        query_span = Span("db.query", parent, {"db.statement": statement[:MAX_ATTRIBUTE_LENGTH]})
+        conn.info.setdefault("trace_spans", []).append(query_span)
+    
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            query_span = spans.pop()
+            query_span.set_attribute("db.rowcount", cursor.rowcount)
+            query_span.finish()
+    
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        connection = exception_context.connection
+        spans = connection.info.get("trace_spans") if connection is not None else None
+        if spans:
+            spans.pop().finish(exception_context.original_exception)
+    
+    if getattr(Session, "_trace_instrumented", False):
+        return
+    Session._trace_instrumented = True
+    
+    @event.listens_for(Session, "before_commit")
+    def _before_commit(session):
+        parent = _current_span.get()
+        if parent is not None:
+            session.info["trace_commit_span"] = Span("db.commit", parent)
+    
+    @event.listens_for(Session, "after_commit")
+    def _after_commit(session):
+        commit_span = session.info.pop("trace_commit_span", None)
+        if commit_span is not None:
+            commit_span.finish()
+    
+    @event.listens_for(Session, "after_rollback")
+    def _after_rollback(session):
+        commit_span = session.info.pop("trace_commit_span", None)
+        if commit_span is not None:
+            commit_span.error = "rolled back"
+            commit_span.finish()
+
+
+class TracingMiddleware:
+    """为每个请求创建根 span（纯 ASGI 实现）"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope["method"]
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        root, token = tracer.start_trace(f"{method} {scope['path']}", **{"http.method": method, "http.target": scope["path"]})
+        error = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            route = scope.get("route")
+            if getattr(route, "path", None):
+                root.name = f"{method} {route.path}"
+                root.set_attribute("http.route", route.path)
+            root.set_attribute("http.status_code", status_code)
+            root.set_attribute("request_id", request_id_var.get())
+            tracer.end_trace(root, token, error)
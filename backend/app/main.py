@@ -1,17 +1,46 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.core.config import settings
+from app.core.logging_config import setup_logging, shutdown_logging, RequestIdMiddleware
 from app.core.database import init_db
+from app.core.redis import redis_client
+from app.core.rate_limiter import RateLimitHeadersMiddleware
+from app.core.admission import AdmissionControlMiddleware
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import MetricsMiddleware, metrics_sampler, render_latest, mark_process_dead
+from app.core.tracing import TracingMiddleware, tracer
+from app.core.sql_monitor import SQLStatsMiddleware
+from app.core.profiler import ProfilerMiddleware
 from app.api.v1 import api_router
 from app.services.health_monitor_service import init_health_monitor
 from app.services.local_rules_engine import init_local_rules_engine
+from app.services.audit_writer import audit_writer
+from app.services.audit_partition_service import audit_partition_service
 import asyncio
 
+# 在其他模块输出日志之前配置好日志（异步写出、request_id、按模块级别）
+setup_logging()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 启动时不初始化数据库（表已手动创建）
     print("✓ 应用启动，跳过数据库初始化")
+    
+    # 连接 Redis（对话上下文、缓存共享存储；连接失败时各服务回退到进程内存储）
+    await redis_client.connect()
+    
+    # 事件循环延迟监控（准入控制据此判断过载）
+    loop_monitor.start()
+    
+    # 定时刷新连接池、降级状态等仪表
+    metrics_sampler.start()
+    
+    # 审计日志批量写入（补写上次未写入数据库的落盘记录）
+    audit_writer.start()
+    # 审计日志分区维护（提前创建分区、归档过期分区）
+    audit_partition_service.start()
+    
     if settings.RATE_LIMIT_ENABLED:
         print(f"✓ API 限流已启用")
         print(f"  - 全局限流: {settings.RATE_LIMIT_GLOBAL}")
@@ -77,6 +106,16 @@ async def lifespan(app: FastAPI):
                 print("✓ 配置文件监控已停止")
         except Exception as e:
             print(f"⚠ 清理资源时出错: {e}")
+    
+    await metrics_sampler.stop()
+    await loop_monitor.stop()
+    await audit_partition_service.stop()
+    # 写完缓冲区中的审计日志（在关闭 Redis 和日志之前）
+    await audit_writer.stop()
+    await redis_client.close()
+    mark_process_dead()
+    tracer.shutdown()
+    shutdown_logging()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -84,6 +123,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 准入控制（在 CORS 之内，503 响应也带 CORS 头）
+app.add_middleware(AdmissionControlMiddleware)
+
 # CORS 配置
 app.add_middleware(
     CORSMiddleware,
@@ -93,6 +135,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 限流响应头
+app.add_middleware(RateLimitHeadersMiddleware)
+
+# 请求耗时指标（包含准入控制拒绝的请求）
+app.add_middleware(MetricsMiddleware)
+
+# 每个请求的 SQL 次数与耗时、N+1 检测
+app.add_middleware(SQLStatsMiddleware)
+
+# 采样分析期间把样本归到路由（未采样时直接放行）
+app.add_middleware(ProfilerMiddleware)
+
+# 链路追踪（每个请求一个根 span）
+app.add_middleware(TracingMiddleware)
+
+# 请求 ID（最外层，后续所有中间件和处理函数的日志都带上 request_id）
+app.add_middleware(RequestIdMiddleware)
+
 # 注册路由
 app.include_router(api_router, prefix="/api/v1")
 
@@ -104,4 +164,10 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标"""
+    content, content_type = render_latest()
+    return Response(content=content, media_type=content_type)
+
 
@@ -1,16 +1,38 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from app.core.database import Base
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    # 按 created_at 月份范围分区（分区由 audit_partition_service 创建和归档），主键需包含分区键
+    # 列表按 (created_at DESC, id DESC) 游标分页；时间范围扫描使用 BRIN 索引
+    __table_args__ = (
+        Index("idx_audit_logs_created_id", "created_at", "id"),
+        Index("idx_audit_logs_user_created_id", "user_id", "created_at", "id"),
+        Index("idx_audit_logs_created_brin", "created_at", postgresql_using="brin"),
+        # details 精确匹配（@>）；关键词搜索的 bigram 表达式索引依赖数据库函数，由迁移 005 创建
+        Index("idx_audit_logs_details_gin", "details", postgresql_using="gin", postgresql_ops={"details": "jsonb_path_ops"}),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     action = Column(String(50), nullable=False, index=True)  # upload, review, generate, edit, rollback, etc.
     resource_type = Column(String(50))  # file, document, template
     resource_id = Column(Integer)
-    details = Column(JSON)  # 操作详情
+    details = Column(JSONB)  # 操作详情
     ip_address = Column(String(50))
     user_agent = Column(String(500))
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+
+
+class AuditStatsHourly(Base):
+    """审计日志按小时汇总（由审计写入在同一事务中增量累加，统计接口只读此表）"""
+    __tablename__ = "audit_stats_hourly"
+    
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # 小时起点（UTC）
+    user_id = Column(Integer, primary_key=True)
+    action = Column(String(50), primary_key=True)
+    resource_type = Column(String(50), primary_key=True, default="")  # 空字符串表示无资源类型
+    count = Column(Integer, nullable=False, default=0)
@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
 class Document(Base):
     __tablename__ = "documents"
+    # 列表按 (created_at DESC, id DESC) 游标分页
+    __table_args__ = (
+        Index("idx_documents_user_created_id", "user_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -81,6 +81,7 @@ class ValidationResult(BaseModel):
     estimated_recovery: Optional[int] = Field(None, description="预计恢复时间（秒）")
     execution_time: float = Field(..., description="执行时间（秒）")
     rules_executed: int = Field(..., description="执行的规则数量")
+    incremental_stats: Optional[Dict[str, Any]] = Field(None, description="增量验证统计（变更段落数、复用规则数等）")
     
     class Config:
         use_enum_values = True
@@ -0,0 +1,174 @@
+"""
+审计日志导出
+
+1. 流式导出：服务端游标按 AUDIT_EXPORT_BATCH_ROWS 行分批读取，逐批写成 CSV（可选 gzip）发给客户端，
+   内存占用与导出行数无关
+2. 异步导出任务：时间范围很大时在后台写入临时文件并上传到 MinIO，客户端轮询任务状态获取下载链接；
+   任务状态保存在 Redis（不可用时保存在进程内），同一进程最多同时运行 AUDIT_EXPORT_MAX_JOBS 个任务
+
+流式导出在生成器内自行打开数据库会话：请求依赖中的会话在响应开始发送前就会关闭
+"""
+from typing import Optional, Dict, Any, AsyncIterator, List
+from datetime import datetime, timezone
+import asyncio
+import contextvars
+import csv
+import io
+import logging
+import os
+import tempfile
+import uuid
+import zlib
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.redis import redis_client
+from app.models.audit_log import AuditLog
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+CSV_HEADER = ['ID', '用户', '操作', '资源类型', '资源ID', 'IP地址', '时间', '详情']
+JOB_KEY_PREFIX = "audit_export_job"
+JOB_TTL = 86400  # 任务状态保留时间（秒）
+
+
+def export_query(conditions: List[Any]):
+    """导出查询（只取导出列，按时间倒序，走 (created_at, id) 索引）"""
+    query = select(
+        AuditLog.id, User.username, AuditLog.action, AuditLog.resource_type, AuditLog.resource_id,
+        AuditLog.ip_address, AuditLog.created_at, AuditLog.details
+    ).join(User, AuditLog.user_id == User.id)
+    if conditions:
+        query = query.where(*conditions)
+    return query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc())
+
+
+def _csv_chunk(rows, header: bool = False) -> bytes:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    if header:
+        writer.writerow(CSV_HEADER)
+    for row in rows:
+        writer.writerow([
+            row.id,
+            row.username,
+            row.action,
+            row.resource_type or '',
+            row.resource_id or '',
+            row.ip_address or '',
+            row.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            str(row.details) if row.details else ''
+        ])
+    return output.getvalue().encode("utf-8")
+
+
+async def iter_csv(query, compress: bool = False) -> AsyncIterator[bytes]:
+    """
+    流式生成 CSV
+    
+    Args:
+        query: export_query 构建的查询
+        compress: 是否 gzip 压缩
+    
+    Yields:
+        CSV（或 gzip）数据块
+    """
+    from app.core.database import AsyncSessionLocal
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    rows = 0
+    
+    def encode(chunk: bytes) -> bytes:
+        return compressor.compress(chunk) if compressor else chunk
+    
+    yield encode(_csv_chunk([], header=True))
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(query.execution_options(yield_per=settings.AUDIT_EXPORT_BATCH_ROWS))
+        async for partition in result.partitions():
+            rows += len(partition)
+            data = encode(_csv_chunk(partition))
+            if data:
+                yield data
+    
+    if compressor:
+        yield compressor.flush()
+    logger.info("Exported %s audit log rows", rows)
+
+
+class AuditExportJobs:
+    """异步导出任务"""
+    
+    def __init__(self, max_jobs: Optional[int] = None):
+        self._semaphore = asyncio.Semaphore(max_jobs or settings.AUDIT_EXPORT_MAX_JOBS)
+        self._local: Dict[str, Dict[str, Any]] = {}  # Redis 不可用时的任务状态
+        self._tasks: set = set()
+    
+    async def _save(self, job: Dict[str, Any]):
+        self._local[job["id"]] = job
+        await redis_client.set_json(f"{JOB_KEY_PREFIX}:{job['id']}", job, expire=JOB_TTL)
+    
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务状态（其他 worker 创建的任务从 Redis 读取）"""
+        return await redis_client.get_json(f"{JOB_KEY_PREFIX}:{job_id}") or self._local.get(job_id)
+    
+    async def submit(self, query, user_id: int, compress: bool = True) -> Dict[str, Any]:
+        """
+        创建导出任务
+        
+        Args:
+            query: export_query 构建的查询
+            user_id: 创建任务的用户
+            compress: 是否 gzip 压缩
+        
+        Returns:
+            任务状态
+        """
+        job_id = uuid.uuid4().hex
+        suffix = ".csv.gz" if compress else ".csv"
+        job = {
+            "id": job_id,
+            "user_id": user_id,
+            "status": "pending",
+            "object_name": f"{settings.AUDIT_EXPORT_PREFIX}/{job_id}{suffix}",
+            "bytes": None,
+            "error": None,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "finished_at": None
+        }
+        await self._save(job)
+        
+        # 在空白上下文中运行，不挂到创建任务的请求链路上
+        task = asyncio.get_running_loop().create_task(self._run(job, query, compress), context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+    
+    async def _run(self, job: Dict[str, Any], query, compress: bool):
+        from app.core.minio_client import minio_client
+        fd, path = tempfile.mkstemp(suffix=".csv.gz" if compress else ".csv")
+        os.close(fd)
+        try:
+            async with self._semaphore:
+                job["status"] = "running"
+                await self._save(job)
+                
+                with open(path, "wb") as f:
+                    async for chunk in iter_csv(query, compress):
+                        await asyncio.to_thread(f.write, chunk)
+                content_type = "application/gzip" if compress else "text/csv"
+                if not await minio_client.upload_local_file(job["object_name"], path, content_type):
+                    raise RuntimeError("upload to MinIO failed")
+                
+                job.update(status="done", bytes=os.path.getsize(path))
+        except Exception as e:
+            logger.error("Audit export job %s failed: %s", job["id"], e)
+            job.update(status="failed", error=str(e))
+        finally:
+            os.remove(path)
+            job["finished_at"] = datetime.now(timezone.utc).isoformat()
+            await self._save(job)
+
+
+# 全局实例
+audit_export_jobs = AuditExportJobs()
@@ -0,0 +1,233 @@
+"""
+审计日志分区维护
+
+audit_logs 按 created_at 月份范围分区（迁移 003），分区名为 audit_logs_y<年>m<月>。定时任务：
+1. 提前创建未来 AUDIT_PARTITION_MONTHS_AHEAD 个月的分区（没有默认分区，超出范围的写入会失败并由审计写入落盘重试）
+2. AUDIT_RETENTION_MONTHS > 0 时，把早于保留期的分区导出为 gzip 压缩的 JSON Lines 上传到 MinIO，
+   上传成功后 DETACH 并删除该分区
+
+多个 worker 同时运行时通过 PostgreSQL advisory lock 保证同一时刻只有一个在维护。
+按时间范围查询时 PostgreSQL 只扫描范围内的分区（分区裁剪），统计最近 N 天只读最近一两个分区
+"""
+from typing import Optional, List, Dict, Any
+from datetime import date, datetime, timezone
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import tempfile
+
+from sqlalchemy import text
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "audit_logs"
+PARTITION_PATTERN = re.compile(r"^audit_logs_y(\d{4})m(\d{2})$")
+# advisory lock 键（任意固定值，只需与其他 advisory lock 不冲突）
+MAINTENANCE_LOCK_KEY = 7_302_046
+EXPORT_CHUNK_ROWS = 5000
+
+
+def add_months(month: date, months: int) -> date:
+    """月份加减（返回该月 1 日）"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """月份对应的分区名"""
+    return f"{PARENT_TABLE}_y{month.year}m{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """从分区名解析月份，不是按月命名的分区返回 None"""
+    match = PARTITION_PATTERN.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def partition_ddl(month: date) -> str:
+    """创建月分区的语句（边界按 UTC）"""
+    upper = add_months(month, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{upper.isoformat()} 00:00:00+00')"
+    )
+
+
+def expired_partitions(names: List[str], today: date, retention_months: int) -> List[str]:
+    """
+    超过保留期的分区
+    
+    Args:
+        names: 现有分区名
+        today: 当前日期（UTC）
+        retention_months: 保留月数（含当月），0 表示不清理
+    
+    Returns:
+        需要归档的分区名（按月份升序）
+    """
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(today.replace(day=1), -(retention_months - 1))
+    expired = [(partition_month(name), name) for name in names]
+    return [name for month, name in sorted(e for e in expired if e[0]) if month < cutoff]
+
+
+class AuditPartitionService:
+    """审计日志分区的创建与归档"""
+    
+    def __init__(
+        self,
+        months_ahead: Optional[int] = None,
+        retention_months: Optional[int] = None,
+        check_interval: Optional[int] = None
+    ):
+        self.months_ahead = settings.AUDIT_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+        self.retention_months = settings.AUDIT_RETENTION_MONTHS if retention_months is None else retention_months
+        self.check_interval = check_interval or settings.AUDIT_PARTITION_CHECK_INTERVAL
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+    
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        while True:
+            try:
+                await self.run_maintenance()
+            except Exception as e:
+                logger.error("Audit partition maintenance error: %s", e)
+            await asyncio.sleep(self.check_interval)
+    
+    @staticmethod
+    async def _is_partitioned(conn) -> bool:
+        result = await conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"
+        ), {"table": PARENT_TABLE})
+        return result.scalar() is not None
+    
+    @staticmethod
+    async def _partition_names(conn) -> List[str]:
+        result = await conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+        ), {"table": PARENT_TABLE})
+        return list(result.scalars().all())
+    
+    async def list_partitions(self) -> List[Dict[str, Any]]:
+        """现有分区及估算行数、占用空间"""
+        from app.core.database import engine
+        async with engine.connect() as conn:
+            result = await conn.execute(text(
+                "SELECT c.relname, c.reltuples::bigint AS rows, pg_total_relation_size(c.oid) AS bytes "
+                "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+            ), {"table": PARENT_TABLE})
+            return [
+                {"name": row.relname, "estimated_rows": max(row.rows, 0), "bytes": row.bytes}
+                for row in result
+            ]
+    
+    async def run_maintenance(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """
+        创建未来分区并归档过期分区
+        
+        Args:
+            today: 当前日期，默认取 UTC 当天
+        
+        Returns:
+            {"created": [...], "archived": [...], "skipped": 原因}
+        """
+        from app.core.database import engine
+        today = today or datetime.now(timezone.utc).date()
+        report: Dict[str, Any] = {"created": [], "archived": [], "skipped": None}
+        
+        async with engine.connect() as conn:
+            if not await self._is_partitioned(conn):
+                report["skipped"] = "audit_logs is not partitioned (run alembic upgrade head)"
+                await conn.rollback()
+                self.last_run = report
+                return report
+            
+            locked = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})).scalar()
+            await conn.commit()
+            if not locked:
+                report["skipped"] = "maintenance running in another worker"
+                self.last_run = report
+                return report
+            
+            try:
+                existing = set(await self._partition_names(conn))
+                current = today.replace(day=1)
+                for offset in range(self.months_ahead + 1):
+                    month = add_months(current, offset)
+                    if partition_name(month) not in existing:
+                        await conn.execute(text(partition_ddl(month)))
+                        await conn.commit()
+                        report["created"].append(partition_name(month))
+                        logger.info("Created audit partition %s", partition_name(month))
+                
+                for name in expired_partitions(sorted(existing), today, self.retention_months):
+                    report["archived"].append(await self._archive_partition(conn, name))
+            finally:
+                # 出错时先回滚未完成的事务，再释放锁
+                await conn.rollback()
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+                await conn.commit()
+        
+        report["finished_at"] = datetime.now(timezone.utc).isoformat()
+        self.last_run = report
+        return report
+    
+    async def _archive_partition(self, conn, name: str) -> Dict[str, Any]:
+        """导出分区到 MinIO，上传成功后卸载并删除分区"""
+        from app.core.minio_client import minio_client
+        object_name = f"{settings.AUDIT_ARCHIVE_PREFIX}/{name}.jsonl.gz"
+        fd, path = tempfile.mkstemp(suffix=".jsonl.gz")
+        os.close(fd)
+        try:
+            rows = await self._export_partition(conn, name, path)
+            if not await minio_client.upload_local_file(object_name, path, "application/gzip"):
+                raise RuntimeError(f"upload of {object_name} failed")
+            
+            await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            await conn.execute(text(f"DROP TABLE {name}"))
+            await conn.commit()
+            logger.info("Archived audit partition %s (%s rows) to %s", name, rows, object_name)
+            return {"partition": name, "rows": rows, "object": object_name}
+        finally:
+            os.remove(path)
+    
+    @staticmethod
+    async def _export_partition(conn, name: str, path: str) -> int:
+        """按时间顺序流式导出分区（服务端游标，分块压缩写入临时文件）"""
+        rows = 0
+        with gzip.open(path, "wb") as f:
+            result = await conn.stream(text(f"SELECT * FROM {name} ORDER BY created_at, id"))
+            async for partition in result.mappings().partitions(EXPORT_CHUNK_ROWS):
+                chunk = "".join(
+                    json.dumps(dict(row), ensure_ascii=False, default=str) + "\n" for row in partition
+                ).encode("utf-8")
+                await asyncio.to_thread(f.write, chunk)
+                rows += len(partition)
+        await conn.commit()
+        return rows
+
+
+# 全局实例
+audit_partition_service = AuditPartitionService()
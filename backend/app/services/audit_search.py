@@ -0,0 +1,58 @@
+"""
+审计日志关键词搜索
+
+details（JSONB）中所有字符串、数字值拼接为小写文本 audit_search_text(details)，
+再切成相邻两字的 bigram 数组 audit_search_grams(details)，在该表达式上建 GIN 索引（迁移 005）：
+1. 关键词切成 bigram，用 audit_search_grams(details) @> 关键词 bigram 走索引筛出候选行
+2. 再用 audit_search_text(details) LIKE '%关键词%' 复核，保证是连续子串
+
+使用 bigram 而不是 pg_trgm：pg_trgm 在 C 等区域设置下会忽略中文字符，且少于 3 个字的关键词无法使用索引，
+而两个字的中文词很常见。单个字的关键词没有 bigram，只能在其他筛选条件的范围内逐行匹配。
+
+关键词写成 字段=值（如 file_id=12、format=pdf）时按 details @> {"字段": 值} 精确匹配，使用 details 的 GIN 索引
+"""
+from typing import List, Any
+import re
+
+from sqlalchemy import func, or_, literal
+from sqlalchemy.dialects.postgresql import ARRAY, TEXT
+
+from app.models.audit_log import AuditLog
+
+FIELD_PATTERN = re.compile(r"^([A-Za-z_][A-Za-z0-9_]*)=(.+)$")
+
+
+def keyword_grams(keyword: str) -> List[str]:
+    """关键词的 bigram（与数据库函数 audit_search_grams 的切分方式一致）"""
+    text = keyword.lower()
+    return sorted({text[i:i + 2] for i in range(len(text) - 1)})
+
+
+def keyword_conditions(keyword: str) -> List[Any]:
+    """
+    关键词对应的查询条件
+    
+    Args:
+        keyword: 关键词，或 字段=值
+    
+    Returns:
+        条件列表（与其他筛选条件 AND 组合）
+    """
+    keyword = keyword.strip()
+    if not keyword:
+        return []
+    
+    match = FIELD_PATTERN.match(keyword)
+    if match:
+        field, value = match.groups()
+        candidates = [AuditLog.details.contains({field: value})]
+        if value.lstrip("-").isdigit():
+            candidates.append(AuditLog.details.contains({field: int(value)}))
+        return [or_(*candidates)]
+    
+    conditions = []
+    grams = keyword_grams(keyword)
+    if grams:
+        conditions.append(func.audit_search_grams(AuditLog.details).op("@>")(literal(grams, ARRAY(TEXT))))
+    conditions.append(func.audit_search_text(AuditLog.details).contains(keyword.lower(), autoescape=True))
+    return conditions
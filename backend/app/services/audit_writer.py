@@ -0,0 +1,352 @@
+"""
+审计日志异步批量写入
+
+接口只把审计记录放入进程内缓冲区，不再在请求事务中写审计表：
+1. 后台任务在缓冲区达到 AUDIT_BATCH_SIZE 条或每隔 AUDIT_FLUSH_INTERVAL 秒批量 INSERT
+2. 写入失败或超过 AUDIT_INSERT_TIMEOUT 时，把这一批（及缓冲区剩余记录）追加到本地落盘文件；
+   缓冲区超过 AUDIT_BUFFER_MAX 条（数据库持续变慢）时同样落盘，内存占用有上限
+3. 写入审计表的同一事务中，把这一批按 (小时, 用户, 操作, 资源类型) 累加到 audit_stats_hourly，统计接口只读汇总表
+4. 数据库恢复后（距上次失败超过 AUDIT_SPILL_RETRY_INTERVAL 秒）把落盘文件重新写入数据库
+5. 应用关闭时写完缓冲区，写不进数据库的记录落盘，下次启动后补写
+
+每个进程写自己的落盘文件（audit-<pid>.jsonl），补写时先把文件改名认领，多个 worker 不会重复补写同一文件；
+其他 worker 只认领所属进程已退出的文件，不会把仍在追加的文件改名后删除。
+补写过程中进程崩溃，重启后会重新补写该文件，可能产生少量重复记录（至少一次）
+"""
+from typing import Optional, List, Dict, Any, Callable, Awaitable
+from collections import Counter
+from datetime import datetime, timezone
+import asyncio
+import contextvars
+import glob
+import json
+import logging
+import os
+import time
+import uuid
+
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.models.audit_log import AuditLog, AuditStatsHourly
+
+logger = logging.getLogger(__name__)
+
+SPILL_SUFFIX = ".jsonl"
+REPLAY_SUFFIX = ".replaying"
+
+
+def _pid_alive(pid: int) -> bool:
+    """进程是否存在"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # 进程存在但属于其他用户
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def owner_pid(path: str) -> Optional[int]:
+    """
+    解析落盘文件所属的进程
+    
+    Args:
+        path: 落盘文件（audit-<pid>.jsonl）或认领中的文件（<落盘文件>.<pid>.replaying）
+    
+    Returns:
+        写入或认领该文件的进程 ID，恢复出来的文件（audit-recovered-*）没有所属进程，返回 None
+    """
+    name = os.path.basename(path)
+    if name.endswith(REPLAY_SUFFIX):
+        pid = name[:-len(REPLAY_SUFFIX)].rsplit(".", 1)[-1]
+    else:
+        pid = name[:-len(SPILL_SUFFIX)].rsplit("-", 1)[-1]
+    return int(pid) if pid.isdigit() else None
+
+
+def rollup_counts(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    按 (小时, 用户, 操作, 资源类型) 汇总一批审计记录
+    
+    Args:
+        rows: 审计记录
+    
+    Returns:
+        汇总行，按主键排序（多个 worker 同时累加时按相同顺序加锁，避免死锁）
+    """
+    counts = Counter(
+        (
+            row["created_at"].astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0),
+            row["user_id"],
+            row["action"],
+            row["resource_type"] or ""
+        )
+        for row in rows
+    )
+    return [
+        {"bucket": bucket, "user_id": user_id, "action": action, "resource_type": resource_type, "count": count}
+        for (bucket, user_id, action, resource_type), count in sorted(counts.items())
+    ]
+
+
+async def _insert_rows(rows: List[Dict[str, Any]]):
+    """批量写入审计表（executemany，由驱动合并为多行 INSERT），并在同一事务中累加小时汇总"""
+    from app.core.database import AsyncSessionLocal
+    async with AsyncSessionLocal() as session:
+        await session.execute(insert(AuditLog), rows)
+        
+        stmt = pg_insert(AuditStatsHourly).values(rollup_counts(rows))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["bucket", "user_id", "action", "resource_type"],
+            set_={"count": AuditStatsHourly.count + stmt.excluded["count"]}
+        )
+        await session.execute(stmt)
+        await session.commit()
+
+
+class AuditWriter:
+    """审计日志缓冲写入"""
+    
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        buffer_max: Optional[int] = None,
+        insert_timeout: Optional[float] = None,
+        spill_dir: Optional[str] = None,
+        insert_rows: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None
+    ):
+        self.batch_size = batch_size or settings.AUDIT_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.AUDIT_FLUSH_INTERVAL
+        self.buffer_max = buffer_max or settings.AUDIT_BUFFER_MAX
+        self.insert_timeout = insert_timeout or settings.AUDIT_INSERT_TIMEOUT
+        self.spill_dir = spill_dir or settings.AUDIT_SPILL_DIR
+        self.spill_retry_interval = settings.AUDIT_SPILL_RETRY_INTERVAL
+        self._insert_rows = insert_rows or _insert_rows
+        
+        self._buffer: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._spill_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._tasks: set = set()  # 持有落盘任务引用
+        self._last_failure = 0.0
+        self.stats = {
+            "recorded": 0, "written": 0, "batches": 0, "failed_batches": 0,
+            "spilled": 0, "replayed": 0, "last_batch_ms": None
+        }
+    
+    @property
+    def spill_path(self) -> str:
+        """本进程的落盘文件"""
+        return os.path.join(self.spill_dir, f"audit-{os.getpid()}{SPILL_SUFFIX}")
+    
+    def start(self):
+        """启动后台写入任务（在空白上下文中运行，写入不计入触发它的请求）"""
+        if self._task and not self._task.done():
+            return
+        self._recover_claimed()
+        self._task = asyncio.get_running_loop().create_task(self._run(), context=contextvars.Context())
+    
+    async def stop(self):
+        """停止后台任务并写完缓冲区"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush(replay=False)
+    
+    def record(
+        self,
+        user_id: int,
+        action: str,
+        resource_type: Optional[str] = None,
+        resource_id: Optional[int] = None,
+        details: Optional[dict] = None,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None
+    ):
+        """
+        记录一条审计日志（只放入缓冲区，立即返回）
+        
+        审计记录独立于业务事务写入，应在业务 commit 成功之后调用，避免事务回滚时留下未发生操作的记录
+        
+        Args:
+            user_id: 用户 ID
+            action: 操作类型
+            resource_type: 资源类型
+            resource_id: 资源 ID
+            details: 操作详情
+            ip_address: 客户端 IP
+            user_agent: 客户端 User-Agent
+        """
+        self._buffer.append({
+            "user_id": user_id,
+            "action": action,
+            "resource_type": resource_type,
+            "resource_id": resource_id,
+            "details": details,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            # 记录时的时间，而不是批量写入时的时间
+            "created_at": datetime.now(timezone.utc)
+        })
+        self.stats["recorded"] += 1
+        self.start()
+        
+        if len(self._buffer) >= self.buffer_max:
+            # 数据库跟不上，缓冲区整体落盘
+            rows, self._buffer = self._buffer, []
+            logger.warning("Audit buffer full, spilling %s rows to disk", len(rows))
+            task = asyncio.get_running_loop().create_task(self._spill(rows), context=contextvars.Context())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Audit flush error: %s", e)
+    
+    async def flush(self, replay: bool = True):
+        """
+        写出缓冲区
+        
+        Args:
+            replay: 写入正常时是否补写落盘文件
+        """
+        async with self._flush_lock:
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:self.batch_size]
+                if not await self._write_batch(batch):
+                    # 数据库不可用，剩余记录一起落盘，避免逐批等待超时
+                    rows, self._buffer = batch + self._buffer, []
+                    await self._spill(rows)
+                    return
+            
+            if replay and time.time() - self._last_failure >= self.spill_retry_interval:
+                await self._replay_spilled()
+    
+    async def _write_batch(self, rows: List[Dict[str, Any]]) -> bool:
+        """写入一批，返回是否成功"""
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._insert_rows(rows), self.insert_timeout)
+        except Exception as e:
+            self._last_failure = time.time()
+            self.stats["failed_batches"] += 1
+            logger.warning("Audit batch of %s rows failed: %s", len(rows), e or type(e).__name__)
+            return False
+        
+        self.stats["batches"] += 1
+        self.stats["written"] += len(rows)
+        self.stats["last_batch_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return True
+    
+    async def _spill(self, rows: List[Dict[str, Any]]):
+        """追加到本进程的落盘文件"""
+        try:
+            async with self._spill_lock:
+                await asyncio.to_thread(self._append_spill, self.spill_path, rows)
+            self.stats["spilled"] += len(rows)
+        except OSError as e:
+            logger.error("Failed to spill %s audit rows: %s", len(rows), e)
+    
+    @staticmethod
+    def _append_spill(path: str, rows: List[Dict[str, Any]]):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps({**row, "created_at": row["created_at"].isoformat()}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    @staticmethod
+    def _load_spill(path: str) -> List[Dict[str, Any]]:
+        rows = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程在写入一行时退出，最后一行可能不完整
+                    logger.warning("Skipping malformed audit spill line in %s", path)
+                    continue
+                row["created_at"] = datetime.fromisoformat(row["created_at"])
+                rows.append(row)
+        return rows
+    
+    def _is_live_owner(self, path: str) -> bool:
+        """文件是否属于其他仍在运行的进程"""
+        pid = owner_pid(path)
+        return pid is not None and pid != os.getpid() and _pid_alive(pid)
+    
+    def _recover_claimed(self):
+        """把补写到一半、认领进程已退出的文件恢复为待补写"""
+        for path in glob.glob(os.path.join(self.spill_dir, f"*{REPLAY_SUFFIX}")):
+            if self._is_live_owner(path):
+                continue
+            try:
+                os.rename(path, os.path.join(self.spill_dir, f"audit-recovered-{uuid.uuid4().hex[:8]}{SPILL_SUFFIX}"))
+            except OSError:
+                pass
+    
+    async def _replay_spilled(self):
+        """认领并补写落盘文件（本进程的，以及已退出进程留下的）"""
+        self._recover_claimed()
+        for path in glob.glob(os.path.join(self.spill_dir, f"*{SPILL_SUFFIX}")):
+            # 其他 worker 仍可能向自己的文件追加，改名后追加的记录会随文件删除而丢失
+            if self._is_live_owner(path):
+                continue
+            claimed = f"{path}.{os.getpid()}{REPLAY_SUFFIX}"
+            try:
+                # 改名是原子操作，只有一个进程能认领成功；持锁避免本进程正在追加
+                async with self._spill_lock:
+                    os.rename(path, claimed)
+            except OSError:
+                continue
+            
+            rows = await asyncio.to_thread(self._load_spill, claimed)
+            for offset in range(0, len(rows), self.batch_size):
+                batch = rows[offset:offset + self.batch_size]
+                if not await self._write_batch(batch):
+                    await self._spill(rows[offset:])
+                    os.remove(claimed)
+                    return
+                self.stats["replayed"] += len(batch)
+            
+            os.remove(claimed)
+            logger.info("Replayed %s spilled audit rows from %s", len(rows), path)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """写入统计"""
+        return {
+            **self.stats,
+            "buffered": len(self._buffer),
+            "spill_files": len(glob.glob(os.path.join(self.spill_dir, f"*{SPILL_SUFFIX}")))
+        }
+
+
+# 全局实例
+audit_writer = AuditWriter()
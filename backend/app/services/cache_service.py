@@ -1,12 +1,29 @@
 """
 缓存服务
 提供统一的缓存接口和策略
+
+缓存分两级：
+1. 进程内 LRU（短 TTL，命中时无需网络往返）
+2. Redis（多个 worker 共享）
+
+缓存值过期后在一段宽限期内仍可返回旧值，同时在后台刷新（stale-while-revalidate）；
+同一个键同时未命中时只有一个请求执行查询（进程内单飞 + Redis 分布式锁），避免缓存击穿；
+缓存项可以打标签，写操作后按标签批量失效（Redis 集合记录标签下的键）
 """
-from typing import Optional, Any, Callable
+from typing import Optional, Any, Callable, Dict, List, Tuple
+from collections import OrderedDict
 from functools import wraps
+import asyncio
+import fnmatch
 import hashlib
+import inspect
 import json
+import logging
+import time
 from app.core.redis import redis_client
+from app.core.metrics import CACHE_EVENTS
+
+logger = logging.getLogger(__name__)
 
 class CacheService:
     """缓存服务"""
@@ -18,70 +35,431 @@ class CacheService:
         "file_list": 60,            # 文件列表：1分钟
         "user_info": 600,           # 用户信息：10分钟
         "audit_stats": 300,         # 审计统计：5分钟
+        "audit_count": 30,          # 审计日志列表总数：30秒
         "classifications": 3600,    # 密级选项：1小时
     }
     
+    DEFAULT_TTL = 300           # 未配置前缀的默认过期时间
+    STALE_TTL = 60              # 过期后仍可返回旧值的宽限期（秒）
+    LOCAL_TTL = 5               # 进程内缓存最长保留时间（秒），其他 worker 的失效最多延迟这么久
+    LOCAL_MAX_ENTRIES = 1024    # 进程内缓存最大条目数
+    LOCK_TTL = 10               # 分布式锁过期时间（秒）
+    LOCK_WAIT = 2.0             # 未拿到锁时等待其他 worker 写入缓存的最长时间（秒）
+    
+    KEY_PREFIX = "cache"
+    TAG_PREFIX = "cache_tag"
+    TAG_VERSION_PREFIX = "cache_tag_ver"
+    
+    def __init__(self):
+        # 进程内缓存：键 -> (JSON 字符串, 新鲜截止时间, 可用截止时间, 标签)
+        self._local: "OrderedDict[str, Tuple[str, float, float, List[str]]]" = OrderedDict()
+        # 正在计算的键 -> Future，同一进程内并发未命中共享一次计算
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: set = set()  # 正在后台刷新的键
+        self._tasks: set = set()  # 持有后台刷新任务引用
+        
+        self.stats = {"local_hits": 0, "redis_hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+    
+    def _record(self, event: str):
+        """记录缓存访问结果（进程内统计 + 监控指标）"""
+        self.stats[event] += 1
+        CACHE_EVENTS.labels(event=event).inc()
+    
+    @property
+    def _redis(self):
+        return redis_client.redis
+    
     @staticmethod
     def generate_key(prefix: str, *args, **kwargs) -> str:
         """生成缓存键"""
-        # 将参数转换为字符串
-        params = f"{args}_{kwargs}"
+        # 稳定序列化参数：关键字参数排序，不可序列化的对象使用字符串表示
+        params = json.dumps([args, kwargs], sort_keys=True, ensure_ascii=False, default=str)
         # 生成哈希值
-        hash_value = hashlib.md5(params.encode()).hexdigest()[:8]
-        return f"{prefix}:{hash_value}"
+        hash_value = hashlib.sha1(params.encode()).hexdigest()[:16]
+        return f"{CacheService.KEY_PREFIX}:{prefix}:{hash_value}"
     
     @staticmethod
-    async def get(key: str) -> Optional[Any]:
-        """获取缓存"""
-        return await redis_client.get_json(key)
+    def get_ttl(prefix: str) -> int:
+        """获取前缀对应的过期时间"""
+        return CacheService.CACHE_TTL.get(prefix, CacheService.DEFAULT_TTL)
     
-    @staticmethod
-    async def set(key: str, value: Any, ttl: int = 300):
+    async def get(self, key: str) -> Optional[Any]:
+        """获取缓存（过期的旧值不返回）"""
+        entry = await self._read(key)
+        if entry and entry[1] > time.time():
+            return redis_client.codec.loads(entry[0])
+        return None
+    
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        批量获取缓存（过期的旧值不返回）
+        
+        进程内未命中的键通过一次 MGET 从 Redis 读取
+        
+        Args:
+            keys: 缓存键列表
+        
+        Returns:
+            与键顺序一致的值列表，未命中为 None
+        """
+        now = time.time()
+        results: List[Optional[Any]] = [None] * len(keys)
+        missing = []
+        
+        for position, key in enumerate(keys):
+            entry = self._local.get(key)
+            if entry and entry[1] > now:
+                self._record("local_hits")
+                results[position] = redis_client.codec.loads(entry[0])
+            else:
+                missing.append(position)
+        
+        if missing and self._redis:
+            envelopes = await redis_client.mget_json([keys[position] for position in missing])
+            for position, data in zip(missing, envelopes):
+                if not data or data.get("fresh_until", 0) <= now:
+                    continue
+                entry = (data["v"], data["fresh_until"], data["stale_until"], data.get("tags", []))
+                self._record("redis_hits")
+                self._put_local(keys[position], entry)
+                results[position] = redis_client.codec.loads(entry[0])
+        
+        return results
+    
+    async def set(self, key: str, value: Any, ttl: int = 300, tags: Optional[List[str]] = None):
         """设置缓存"""
-        await redis_client.set_json(key, value, expire=ttl)
+        await self._write(key, redis_client.codec.dumps(value), ttl, tags or [])
     
-    @staticmethod
-    async def delete(key: str):
+    async def delete(self, key: str):
         """删除缓存"""
+        self._local.pop(key, None)
         await redis_client.delete(key)
     
-    @staticmethod
-    async def clear_pattern(pattern: str):
-        """清除匹配模式的缓存（需要 Redis 支持）"""
-        # 注意：这需要 Redis SCAN 命令支持
-        # 简化实现，实际生产环境需要更复杂的逻辑
-        pass
+    async def invalidate_tags(self, *tags: str):
+        """
+        按标签失效缓存
+        
+        删除标签集合中记录的所有键，并递增标签版本号，
+        让失效前已开始、失效后才完成的查询结果不再写入缓存
+        
+        Args:
+            tags: 标签列表
+        """
+        tag_set = set(tags)
+        for key in [k for k, entry in self._local.items() if tag_set.intersection(entry[3])]:
+            del self._local[key]
+        
+        if not self._redis:
+            return
+        
+        try:
+            deleted = await redis_client.delete_by_tags([f"{self.TAG_PREFIX}:{tag}" for tag in tags])
+
+            pipe = self._redis.pipeline(transaction=False)
+            for tag in tags:
+                pipe.incr(f"{self.TAG_VERSION_PREFIX}:{tag}")
+            await pipe.execute()
+
+            logger.debug("Invalidated tags %s: %s keys", list(tags), deleted)
+        except Exception as e:
+            logger.error("Invalidate tags error: %s", e)
+
+    async def clear_pattern(self, pattern: str):
+        """
+        清除匹配模式的缓存
+        
+        使用 SCAN 分批遍历，避免 KEYS 阻塞 Redis
+        
+        Args:
+            pattern: glob 模式，如 cache:template_list:*
+        """
+        for key in [k for k in self._local if fnmatch.fnmatchcase(k, pattern)]:
+            del self._local[key]
+        
+        if not self._redis:
+            return
+        
+        try:
+            batch = []
+            deleted = 0
+            async for key in self._redis.scan_iter(match=pattern, count=500):
+                batch.append(key)
+                if len(batch) >= 500:
+                    deleted += await self._redis.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += await self._redis.unlink(*batch)
+            logger.debug("Cleared %s keys matching %s", deleted, pattern)
+        except Exception as e:
+            logger.error("Clear pattern error: %s", e)
+    
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: int,
+        tags: Optional[List[str]] = None,
+        refresh: Optional[Callable[[], Any]] = None
+    ) -> Any:
+        """
+        读取缓存，未命中时计算并写入
+        
+        Args:
+            key: 缓存键
+            compute: 计算函数（协程函数，无参数）
+            ttl: 过期时间（秒）
+            tags: 标签列表
+            refresh: 后台刷新使用的计算函数（不可复用请求内资源时单独提供），默认为 compute
+        
+        Returns:
+            缓存值（JSON 反序列化后的结果）
+        """
+        tags = tags or []
+        entry = await self._read(key)
+        now = time.time()
+        
+        if entry:
+            raw, fresh_until, _, _ = entry
+            if fresh_until > now:
+                return redis_client.codec.loads(raw)
+            
+            # 已过期但在宽限期内：先返回旧值，后台刷新
+            self._record("stale_hits")
+            logger.debug("Stale: %s", key)
+            self._schedule_refresh(key, refresh or compute, ttl, tags)
+            return redis_client.codec.loads(raw)
+        
+        self._record("misses")
+        logger.debug("Miss: %s", key)
+        
+        # 同一进程内已有请求在计算，等待其结果
+        inflight = self._inflight.get(key)
+        if inflight:
+            return redis_client.codec.loads(await asyncio.shield(inflight))
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            raw = await self._compute_with_lock(key, compute, ttl, tags)
+            future.set_result(raw)
+            return redis_client.codec.loads(raw)
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+    
+    async def _compute_with_lock(self, key: str, compute: Callable[[], Any], ttl: int, tags: List[str]) -> str:
+        """在分布式锁保护下计算缓存值，未拿到锁时等待其他 worker 写入"""
+        lock_key = f"{key}:lock"
+        locked = await self._acquire_lock(lock_key)
+        
+        if not locked:
+            deadline = time.time() + self.LOCK_WAIT
+            while time.time() < deadline:
+                await asyncio.sleep(0.05)
+                entry = await self._read(key)
+                if entry:
+                    return entry[0]
+        
+        try:
+            versions = await self._get_tag_versions(tags)
+            value = await compute()
+            raw = redis_client.codec.dumps(value)
+            
+            # 计算期间标签被失效，结果可能是旧数据，不写入缓存
+            if versions == await self._get_tag_versions(tags):
+                await self._write(key, raw, ttl, tags)
+            else:
+                logger.debug("Skip write for %s: invalidated during compute", key)
+            
+            return raw
+        finally:
+            if locked:
+                await self._release_lock(lock_key)
+    
+    def _schedule_refresh(self, key: str, compute: Callable[[], Any], ttl: int, tags: List[str]):
+        """后台刷新缓存值"""
+        if key in self._refreshing:
+            return
+        
+        self._refreshing.add(key)
+        
+        async def refresh():
+            lock_key = f"{key}:lock"
+            try:
+                # 其他 worker 正在刷新时跳过
+                if not await self._acquire_lock(lock_key):
+                    return
+                try:
+                    versions = await self._get_tag_versions(tags)
+                    raw = redis_client.codec.dumps(await compute())
+                    if versions == await self._get_tag_versions(tags):
+                        await self._write(key, raw, ttl, tags)
+                    self._record("refreshes")
+                finally:
+                    await self._release_lock(lock_key)
+            except Exception as e:
+                logger.error("Refresh error for %s: %s", key, e)
+            finally:
+                self._refreshing.discard(key)
+        
+        task = asyncio.create_task(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _read(self, key: str) -> Optional[Tuple[str, float, float, List[str]]]:
+        """按 进程内 -> Redis 的顺序读取缓存项，返回 (JSON 字符串, 新鲜截止时间, 可用截止时间, 标签)"""
+        now = time.time()
+        local_entry = self._local.get(key)
+        if local_entry and local_entry[1] > now:
+            self._local.move_to_end(key)
+            self._record("local_hits")
+            return local_entry
+        
+        entry = await self._read_redis(key)
+        if entry:
+            if entry[1] > now:
+                self._record("redis_hits")
+                self._put_local(key, entry)
+            return entry
+        
+        # Redis 不可用或已无此键时，进程内的旧值仍可在宽限期内使用
+        if local_entry:
+            if local_entry[2] > now:
+                return local_entry
+            self._local.pop(key, None)
+        return None
+    
+    async def _read_redis(self, key: str) -> Optional[Tuple[str, float, float, List[str]]]:
+        if not self._redis:
+            return None
+        
+        envelope = await redis_client.get(key)
+        if not envelope:
+            return None
+        
+        try:
+            data = redis_client.codec.loads(envelope)
+            return (data["v"], data["fresh_until"], data["stale_until"], data.get("tags", []))
+        except (ValueError, KeyError, TypeError):
+            return None
+    
+    async def _write(self, key: str, raw: str, ttl: int, tags: List[str]):
+        """写入两级缓存，并把键登记到标签集合"""
+        now = time.time()
+        entry = (raw, now + ttl, now + ttl + self.STALE_TTL, tags)
+        self._put_local(key, entry)
+        
+        if not self._redis:
+            return
+        
+        expire = ttl + self.STALE_TTL
+        envelope = redis_client.codec.dumps(
+            {"v": raw, "fresh_until": entry[1], "stale_until": entry[2], "tags": tags}
+        )
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.set(key, envelope, ex=expire)
+            for tag in tags:
+                tag_key = f"{self.TAG_PREFIX}:{tag}"
+                pipe.sadd(tag_key, key)
+                pipe.expire(tag_key, expire)
+            await pipe.execute()
+        except Exception as e:
+            logger.error("Redis set error: %s", e)
+    
+    def _put_local(self, key: str, entry: Tuple[str, float, float, List[str]]):
+        """写入进程内缓存，Redis 可用时保留时间不超过 LOCAL_TTL"""
+        if self._redis:
+            raw, fresh_until, stale_until, tags = entry
+            local_until = time.time() + self.LOCAL_TTL
+            entry = (raw, min(fresh_until, local_until), min(stale_until, local_until), tags)
+        self._local[key] = entry
+        self._local.move_to_end(key)
+        while len(self._local) > self.LOCAL_MAX_ENTRIES:
+            self._local.popitem(last=False)
+    
+    async def _get_tag_versions(self, tags: List[str]) -> List[Optional[str]]:
+        if not self._redis or not tags:
+            return []
+        try:
+            return await self._redis.mget([f"{self.TAG_VERSION_PREFIX}:{tag}" for tag in tags])
+        except Exception:
+            return []
+    
+    async def _acquire_lock(self, lock_key: str) -> bool:
+        if not self._redis:
+            return True
+        try:
+            return bool(await self._redis.set(lock_key, "1", nx=True, ex=self.LOCK_TTL))
+        except Exception:
+            return True
+    
+    async def _release_lock(self, lock_key: str):
+        if not self._redis:
+            return
+        try:
+            await self._redis.delete(lock_key)
+        except Exception:
+            pass
 
-def cache_result(prefix: str, ttl: int = 300):
+def cache_result(prefix: str, ttl: Optional[int] = None, tags: Optional[List[str]] = None):
     """
     缓存装饰器
     
+    缓存键由函数参数生成，AsyncSession 参数不参与；
+    后台刷新时 AsyncSession 参数替换为新建的会话（请求的会话可能已关闭）。
+    返回值需要可 JSON 序列化（datetime 会转为字符串）。
+    
+    Args:
+        prefix: 缓存前缀，未指定 ttl 时从 CACHE_TTL 读取过期时间
+        ttl: 过期时间（秒）
+        tags: 标签模板，用函数参数格式化，如 "template_list:{user_id}"
+    
     使用示例：
-    @cache_result("template_list", ttl=300)
-    async def get_template_list(user_id: int):
+    @cache_result("template_list", tags=["template_list:{user_id}"])
+    async def get_template_list(db: AsyncSession, user_id: int):
         ...
     """
     def decorator(func: Callable):
+        signature = inspect.signature(func)
+        expire = ttl or CacheService.get_ttl(prefix)
+        
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # 生成缓存键
-            cache_key = CacheService.generate_key(prefix, *args, **kwargs)
+            from sqlalchemy.ext.asyncio import AsyncSession
             
-            # 尝试从缓存获取
-            cached_value = await CacheService.get(cache_key)
-            if cached_value is not None:
-                print(f"[Cache] Hit: {cache_key}")
-                return cached_value
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            
+            # 生成缓存键
+            key_params = {
+                name: value for name, value in arguments.items()
+                if not isinstance(value, AsyncSession)
+            }
+            cache_key = CacheService.generate_key(prefix, **key_params)
+            cache_tags = [tag.format(**arguments) for tag in (tags or [])]
             
-            # 缓存未命中，执行函数
-            print(f"[Cache] Miss: {cache_key}")
-            result = await func(*args, **kwargs)
+            async def compute():
+                return await func(**arguments)
             
-            # 存入缓存
-            if result is not None:
-                await CacheService.set(cache_key, result, ttl)
+            async def refresh():
+                from app.core.database import AsyncSessionLocal
+                async with AsyncSessionLocal() as session:
+                    refresh_arguments = {
+                        name: session if isinstance(value, AsyncSession) else value
+                        for name, value in arguments.items()
+                    }
+                    return await func(**refresh_arguments)
             
-            return result
+            has_session = len(key_params) < len(arguments)
+            return await cache_service.get_or_compute(
+                cache_key, compute, expire, tags=cache_tags, refresh=refresh if has_session else None
+            )
         return wrapper
     return decorator
 
@@ -0,0 +1,273 @@
+"""
+对话上下文构建服务
+
+功能：
+1. 估算文本 token 数
+2. 按 token 预算裁剪历史对话和参考文件内容
+3. 较早的对话压缩为滚动摘要，摘要在请求之外异步刷新并缓存
+
+生成请求只读取已缓存的摘要，不等待摘要刷新，会话变长时生成延迟保持稳定
+"""
+from typing import List, Dict, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import logging
+import re
+
+from app.core.config import settings
+from app.core.redis import redis_client
+from app.services.conversation_service import conversation_service
+from app.services.deepseek_service import deepseek_service
+
+logger = logging.getLogger(__name__)
+
+# 中文字符（含全角标点）约 0.6 token，其他字符约 0.3 token
+CJK_PATTERN = re.compile(r"[　-〿一-鿿＀-￯]")
+CJK_TOKEN_RATIO = 0.6
+OTHER_TOKEN_RATIO = 0.3
+MESSAGE_OVERHEAD_TOKENS = 4  # 每条消息的角色、分隔符开销
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本 token 数
+    
+    Args:
+        text: 文本
+    
+    Returns:
+        估算的 token 数
+    """
+    if not text:
+        return 0
+    cjk_count = len(CJK_PATTERN.findall(text))
+    other_count = len(text) - cjk_count
+    return int(cjk_count * CJK_TOKEN_RATIO + other_count * OTHER_TOKEN_RATIO) + 1
+
+
+def estimate_message_tokens(message: Dict) -> int:
+    """估算单条消息的 token 数"""
+    return estimate_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    截断文本使其不超过 token 预算
+    
+    Args:
+        text: 文本
+        max_tokens: token 上限
+    
+    Returns:
+        截断后的文本
+    """
+    if max_tokens <= 0 or not text:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    
+    used = 0.0
+    for index, char in enumerate(text):
+        used += CJK_TOKEN_RATIO if CJK_PATTERN.match(char) else OTHER_TOKEN_RATIO
+        if used > max_tokens:
+            return text[:index]
+    return text
+
+
+class ContextBuilderService:
+    """对话上下文构建服务"""
+    
+    def __init__(self):
+        # 摘要本地缓存（Redis 不可用时使用）：摘要键 -> 摘要数据
+        self._summaries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._refreshing: set = set()  # 本进程正在刷新的摘要键
+        self._tasks: set = set()  # 持有后台任务引用，避免被回收
+        
+        self.max_local_summaries = 1024
+        self.summary_lock_seconds = 120  # 跨 worker 刷新锁的过期时间
+    
+    @property
+    def token_budget(self) -> int:
+        return settings.CONTEXT_TOKEN_BUDGET
+    
+    @property
+    def summary_max_tokens(self) -> int:
+        return settings.CONTEXT_SUMMARY_MAX_TOKENS
+    
+    @staticmethod
+    def _summary_key(user_id: int, session_id: Optional[str]) -> str:
+        # 与 conversation_service 的会话键对应，会话追加消息时刷新 TTL，清除会话时一并删除
+        return f"conv_summary:{user_id}:{session_id or 'default'}"
+    
+    def forget_summary(self, summary_key: str):
+        """丢弃本进程缓存的摘要（会话被清除时调用）"""
+        self._summaries.pop(summary_key, None)
+    
+    def allocate_budget(self, prompt: str, system_text: str = "") -> Tuple[int, int]:
+        """
+        分配 token 预算
+        
+        系统提示和本轮输入必须完整发送，先从总预算中扣除，剩余部分再分给参考文件和历史对话
+        
+        Args:
+            prompt: 本轮用户输入
+            system_text: 系统提示
+        
+        Returns:
+            (参考文件最多可用的 token 数, 参考文件和历史对话共用的 token 数)
+        """
+        fixed = estimate_message_tokens({"content": prompt})
+        if system_text:
+            fixed += estimate_message_tokens({"content": system_text})
+        available = max(self.token_budget - fixed, 0)
+        # 参考文件最多占用剩余预算的固定比例
+        return int(available * settings.CONTEXT_FILE_BUDGET_RATIO), available
+    
+    async def build(
+        self,
+        user_id: int,
+        session_id: Optional[str],
+        prompt: str,
+        file_context: str = "",
+        system_text: str = ""
+    ) -> Tuple[List[Dict], str]:
+        """
+        构建发送给 AI 的上下文
+        
+        Args:
+            user_id: 用户ID
+            session_id: 会话ID
+            prompt: 本轮用户输入（单独发送，不计入历史，但占用预算）
+            file_context: 参考文件内容
+            system_text: 调用方发送的系统提示（占用预算）
+        
+        Returns:
+            (上下文消息列表, 裁剪后的参考文件内容)
+        """
+        file_budget, available = self.allocate_budget(prompt, system_text)
+        file_context = truncate_to_tokens(file_context or "", file_budget)
+        if file_context:
+            # 参考文件作为单独的系统消息发送
+            available -= estimate_message_tokens({"content": file_context})
+        history_budget = max(available, 0)
+        
+        history = await conversation_service.get_history(user_id, session_id)
+        
+        # 本轮输入已写入历史，调用方会单独追加，这里去掉避免重复
+        if history and history[-1]["role"] == "user" and history[-1]["content"] == prompt:
+            history = history[:-1]
+        
+        message_tokens = [estimate_message_tokens(msg) for msg in history]
+        
+        # 全部历史放得下时直接返回，无需摘要
+        if sum(message_tokens) <= history_budget:
+            return self._strip(history), file_context
+        
+        summary_key = self._summary_key(user_id, session_id)
+        summary = await self._get_summary(summary_key)
+        
+        summary_message = None
+        if summary and summary.get("summary"):
+            summary_message = {
+                "role": "system",
+                "content": f"此前对话摘要：\n{summary['summary']}"
+            }
+            history_budget -= estimate_message_tokens(summary_message)
+        
+        # 从最新的消息开始倒序放入，直到预算用完
+        start = len(history)
+        used = 0
+        while start > 0 and used + message_tokens[start - 1] <= history_budget:
+            start -= 1
+            used += message_tokens[start]
+        
+        older = history[:start]
+        covered_until = summary.get("covered_until") if summary else None
+        
+        # 摘要之后、窗口之前的消息既不在摘要中也未放入上下文，需要刷新摘要
+        pending = [msg for msg in older if not covered_until or msg.get("timestamp", "") > covered_until]
+        if pending:
+            self._schedule_refresh(summary_key, summary, pending)
+        
+        context = self._strip(history[start:])
+        if summary_message:
+            context.insert(0, summary_message)
+        
+        logger.debug(
+            "%s messages, %s verbatim, %s summarized, ~%s history tokens, pending summary: %s",
+            len(history), len(history) - start, len(older), used, len(pending)
+        )
+        
+        return context, file_context
+    
+    @staticmethod
+    def _strip(messages: List[Dict]) -> List[Dict]:
+        """只保留 role 和 content 字段"""
+        return [{"role": msg["role"], "content": msg["content"]} for msg in messages]
+    
+    async def _get_summary(self, summary_key: str) -> Optional[Dict]:
+        """读取已缓存的摘要"""
+        if redis_client.redis:
+            summary = await redis_client.get_json(summary_key)
+            if summary:
+                return summary
+        return self._summaries.get(summary_key)
+    
+    async def _save_summary(self, summary_key: str, summary: Dict):
+        """保存摘要（与会话同样的过期时间）"""
+        ttl = int(conversation_service.session_timeout.total_seconds())
+        if redis_client.redis:
+            await redis_client.set_json(summary_key, summary, expire=ttl)
+        
+        self._summaries[summary_key] = summary
+        self._summaries.move_to_end(summary_key)
+        while len(self._summaries) > self.max_local_summaries:
+            self._summaries.popitem(last=False)
+    
+    def _schedule_refresh(self, summary_key: str, summary: Optional[Dict], pending: List[Dict]):
+        """在后台刷新摘要，不阻塞当前请求"""
+        if summary_key in self._refreshing:
+            return
+        
+        self._refreshing.add(summary_key)
+        task = asyncio.create_task(self._refresh_summary(summary_key, summary, pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _refresh_summary(self, summary_key: str, summary: Optional[Dict], pending: List[Dict]):
+        """把待压缩的消息合并进滚动摘要"""
+        lock_key = f"{summary_key}:lock"
+        locked = False
+        try:
+            # 多个 worker 同时刷新同一会话时只允许一个调用 AI
+            if redis_client.redis:
+                locked = await redis_client.redis.set(lock_key, "1", nx=True, ex=self.summary_lock_seconds)
+                if not locked:
+                    return
+            
+            new_summary = await deepseek_service.summarize_conversation(
+                self._strip(pending),
+                previous_summary=summary.get("summary") if summary else None,
+                max_length=self.summary_max_tokens
+            )
+            if not new_summary:
+                return
+            
+            await self._save_summary(summary_key, {
+                "summary": truncate_to_tokens(new_summary, self.summary_max_tokens),
+                "covered_until": pending[-1].get("timestamp", "")
+            })
+            logger.info("Summary refreshed for %s, %s messages compressed", summary_key, len(pending))
+        except Exception as e:
+            logger.warning("Summary refresh failed for %s: %s", summary_key, e)
+        finally:
+            self._refreshing.discard(summary_key)
+            if locked:
+                try:
+                    await redis_client.redis.delete(lock_key)
+                except Exception:
+                    pass
+
+
+# 全局单例
+context_builder_service = ContextBuilderService()
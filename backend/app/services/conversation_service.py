@@ -6,26 +6,79 @@
 2. 存储和检索对话上下文
 3. 支持对话清除
 4. 支持文件引用
+
+存储：
+- Redis 可用时使用 Redis（多个 worker 共享），每个会话一个定长列表，
+  依靠键的 TTL 自动过期，追加和截断在同一事务中完成
+- Redis 不可用时回退到进程内存储
+- 进程内保留最近活跃会话的读缓存，通过会话版本号校验是否过期；
+  版本校验和（过期时的）消息读取由 Lua 脚本在一次往返中完成。
+  版本号由会话纪元（会话元数据创建时生成的随机串）和写入计数组成，
+  会话被清除或过期后计数从头开始，但纪元不同，其他 worker 的旧缓存不会误命中
 """
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from collections import OrderedDict
 from datetime import datetime, timedelta
-import json
+import logging
+import time
+import uuid
+
+from app.core.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1]: 会话元数据键  KEYS[2]: 消息列表键
+# ARGV[1]: 读缓存中的版本号（无缓存时为空字符串）
+# 返回: {版本号}（与缓存一致）或 {版本号, 消息列表}，会话不存在时版本号为 false
+LOAD_MESSAGES_SCRIPT = """
+local meta = redis.call('HMGET', KEYS[1], 'epoch', 'version')
+local version = false
+if meta[1] and meta[2] then
+    version = meta[1] .. ':' .. meta[2]
+end
+if version and version == ARGV[1] then
+    return {version}
+end
+return {version, redis.call('LRANGE', KEYS[2], 0, -1)}
+"""
+
+
+def _version(epoch: str, counter: int) -> str:
+    """会话版本号：纪元:写入计数"""
+    return f"{epoch}:{counter}"
 
 
 class ConversationService:
     """对话上下文管理服务"""
     
     def __init__(self):
-        # 使用内存存储（生产环境应使用 Redis）
+        # 进程内存储（Redis 不可用时使用）
         self._conversations: Dict[str, List[Dict]] = {}
         self._file_references: Dict[str, List[int]] = {}  # 对话ID -> 文件ID列表
-        self._last_activity: Dict[str, datetime] = {}
+        # 按最后活动时间排序，最早的在前，过期清理只需从头部弹出
+        self._last_activity: "OrderedDict[str, datetime]" = OrderedDict()
+        
+        # 活跃会话读缓存：对话键 -> (版本号, 消息列表)
+        self._read_cache: "OrderedDict[str, Tuple[str, List[Dict]]]" = OrderedDict()
         
         # 配置
         self.max_history_length = 50  # 最多保留50轮对话
         self.context_window = 20  # 发送给 AI 的上下文窗口（最近20轮）
         self.session_timeout = timedelta(hours=2)  # 2小时无活动自动清除
+        self.read_cache_size = 256  # 读缓存最多保留的会话数
+        
+        self._load_script = None
+        self._load_script_client = None
+    
+    @property
+    def _redis(self):
+        """Redis 连接（未连接时为 None）"""
+        return redis_client.redis
+    
+    @property
+    def _session_ttl(self) -> int:
+        return int(self.session_timeout.total_seconds())
     
     def _get_conversation_key(self, user_id: int, session_id: Optional[str] = None) -> str:
         """生成对话键"""
@@ -33,7 +86,20 @@ class ConversationService:
             return f"conv:{user_id}:{session_id}"
         return f"conv:{user_id}:default"
     
-    def add_message(
+    @staticmethod
+    def _files_key(key: str) -> str:
+        return f"{key}:files"
+    
+    @staticmethod
+    def _meta_key(key: str) -> str:
+        return f"{key}:meta"
+    
+    @staticmethod
+    def _summary_key(key: str) -> str:
+        """滚动摘要的键（由 context_builder_service 写入，随会话一起过期和清除）"""
+        return "conv_summary:" + key[len("conv:"):]
+    
+    async def add_message(
         self,
         user_id: int,
         role: str,
@@ -50,19 +116,27 @@ class ConversationService:
             content: 消息内容
             session_id: 会话ID（可选）
             metadata: 元数据（可选）
-            
+        
         Returns:
             消息对象
         """
         key = self._get_conversation_key(user_id, session_id)
+        now = datetime.now()
         
         message = {
             "role": role,
             "content": content,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             "metadata": metadata or {}
         }
         
+        if self._redis:
+            try:
+                await self._redis_append(key, message, now)
+                return message
+            except Exception as e:
+                logger.warning("Redis append error: %s, using local store", e)
+        
         if key not in self._conversations:
             self._conversations[key] = []
         
@@ -73,13 +147,13 @@ class ConversationService:
             self._conversations[key] = self._conversations[key][-self.max_history_length:]
         
         # 更新活动时间
-        self._last_activity[key] = datetime.now()
+        self._touch(key, now)
         
-        print(f"[Conversation] Added {role} message to {key}, total: {len(self._conversations[key])}")
+        logger.debug("Added %s message to %s, total: %s", role, key, len(self._conversations[key]))
         
         return message
     
-    def get_history(
+    async def get_history(
         self,
         user_id: int,
         session_id: Optional[str] = None,
@@ -92,23 +166,30 @@ class ConversationService:
             user_id: 用户ID
             session_id: 会话ID（可选）
             limit: 限制返回数量（可选）
-            
+        
         Returns:
-            消息列表
+            消息列表（副本，修改不影响读缓存）
         """
         key = self._get_conversation_key(user_id, session_id)
         
-        # 清理过期会话
-        self._cleanup_expired_sessions()
+        history = None
+        if self._redis:
+            try:
+                history = await self._redis_load_messages(key)
+            except Exception as e:
+                logger.warning("Redis read error: %s, using local store", e)
         
-        history = self._conversations.get(key, [])
+        if history is None:
+            # 清理过期会话
+            self._cleanup_expired_sessions()
+            history = self._conversations.get(key, [])
         
         if limit:
             return history[-limit:]
         
-        return history
+        return list(history)
     
-    def get_context_for_ai(
+    async def get_context_for_ai(
         self,
         user_id: int,
         session_id: Optional[str] = None
@@ -119,11 +200,11 @@ class ConversationService:
         Args:
             user_id: 用户ID
             session_id: 会话ID（可选）
-            
+        
         Returns:
             上下文消息列表
         """
-        history = self.get_history(user_id, session_id)
+        history = await self.get_history(user_id, session_id)
         
         # 只返回最近的对话
         context = history[-self.context_window:]
@@ -134,7 +215,7 @@ class ConversationService:
             for msg in context
         ]
     
-    def clear_history(
+    async def clear_history(
         self,
         user_id: int,
         session_id: Optional[str] = None
@@ -145,15 +226,29 @@ class ConversationService:
         Args:
             user_id: 用户ID
             session_id: 会话ID（可选）
-            
+        
         Returns:
             是否成功
         """
         key = self._get_conversation_key(user_id, session_id)
         
+        self._read_cache.pop(key, None)
+        
+        # 清除后的新对话不应再带上旧对话的摘要
+        from app.services.context_builder_service import context_builder_service
+        context_builder_service.forget_summary(self._summary_key(key))
+        
+        if self._redis:
+            try:
+                await self._redis.delete(key, self._files_key(key), self._meta_key(key), self._summary_key(key))
+                logger.debug("Cleared history for %s", key)
+            except Exception as e:
+                logger.error("Redis clear error: %s", e)
+                return False
+        
         if key in self._conversations:
             del self._conversations[key]
-            print(f"[Conversation] Cleared history for {key}")
+            logger.debug("Cleared history for %s", key)
         
         if key in self._file_references:
             del self._file_references[key]
@@ -163,7 +258,7 @@ class ConversationService:
         
         return True
     
-    def add_file_reference(
+    async def add_file_reference(
         self,
         user_id: int,
         file_id: int,
@@ -179,14 +274,28 @@ class ConversationService:
         """
         key = self._get_conversation_key(user_id, session_id)
         
+        if self._redis:
+            try:
+                files_key = self._files_key(key)
+                pipe = self._redis.pipeline(transaction=True)
+                # 有序集合去重并保留首次引用顺序
+                pipe.zadd(files_key, {str(file_id): time.time()}, nx=True)
+                pipe.expire(files_key, self._session_ttl)
+                added, _ = await pipe.execute()
+                if added:
+                    logger.debug("Added file reference %s to %s", file_id, key)
+                return
+            except Exception as e:
+                logger.warning("Redis file reference error: %s, using local store", e)
+        
         if key not in self._file_references:
             self._file_references[key] = []
         
         if file_id not in self._file_references[key]:
             self._file_references[key].append(file_id)
-            print(f"[Conversation] Added file reference {file_id} to {key}")
+            logger.debug("Added file reference %s to %s", file_id, key)
     
-    def get_file_references(
+    async def get_file_references(
         self,
         user_id: int,
         session_id: Optional[str] = None
@@ -197,33 +306,122 @@ class ConversationService:
         Args:
             user_id: 用户ID
             session_id: 会话ID（可选）
-            
+        
         Returns:
             文件ID列表
         """
         key = self._get_conversation_key(user_id, session_id)
+        
+        if self._redis:
+            try:
+                file_ids = await self._redis.zrange(self._files_key(key), 0, -1)
+                return [int(file_id) for file_id in file_ids]
+            except Exception as e:
+                logger.warning("Redis file reference read error: %s, using local store", e)
+        
         return self._file_references.get(key, [])
     
+    def _touch(self, key: str, now: datetime):
+        """更新本地会话活动时间，并移到队尾"""
+        self._last_activity[key] = now
+        self._last_activity.move_to_end(key)
+    
     def _cleanup_expired_sessions(self):
-        """清理过期的会话"""
+        """
+        清理过期的会话（仅本地存储）
+        
+        活动时间队列按时间有序，只需从头部弹出过期项，
+        每个会话最多被清理一次，单次调用的均摊开销为常数
+        """
         now = datetime.now()
-        expired_keys = []
-        
-        for key, last_time in self._last_activity.items():
-            if now - last_time > self.session_timeout:
-                expired_keys.append(key)
-        
-        for key in expired_keys:
-            if key in self._conversations:
-                del self._conversations[key]
-            if key in self._file_references:
-                del self._file_references[key]
-            if key in self._last_activity:
-                del self._last_activity[key]
+        
+        while self._last_activity:
+            key, last_time = next(iter(self._last_activity.items()))
+            if now - last_time <= self.session_timeout:
+                break
             
-            print(f"[Conversation] Cleaned up expired session: {key}")
+            self._last_activity.popitem(last=False)
+            self._conversations.pop(key, None)
+            self._file_references.pop(key, None)
+            self._read_cache.pop(key, None)
+            
+            logger.debug("Cleaned up expired session: %s", key)
     
-    def get_session_info(
+    async def _redis_append(self, key: str, message: Dict, now: datetime):
+        """
+        在 Redis 中追加消息
+        
+        追加、截断、版本号递增和 TTL 刷新在同一事务中完成，
+        会话过期完全交给 Redis 的键过期机制；元数据不存在（新会话、被清除或已过期）时生成新的纪元
+        """
+        meta_key = self._meta_key(key)
+        ttl = self._session_ttl
+        
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.rpush(key, redis_client.codec.dumps(message))
+        pipe.ltrim(key, -self.max_history_length, -1)
+        pipe.hsetnx(meta_key, "epoch", uuid.uuid4().hex)
+        pipe.hget(meta_key, "epoch")
+        pipe.hincrby(meta_key, "version", 1)
+        pipe.hset(meta_key, "last_activity", now.isoformat())
+        pipe.expire(key, ttl)
+        pipe.expire(meta_key, ttl)
+        pipe.expire(self._files_key(key), ttl)
+        pipe.expire(self._summary_key(key), ttl)
+        results = await pipe.execute()
+        
+        total, epoch, counter = results[0], results[3], results[4]
+        version = _version(epoch, counter)
+        
+        # 本进程写入时同步更新读缓存，避免下次读取整表
+        cached = self._read_cache.get(key)
+        if cached and cached[0] == _version(epoch, counter - 1):
+            messages = (cached[1] + [message])[-self.max_history_length:]
+            self._cache_put(key, version, messages)
+        else:
+            self._read_cache.pop(key, None)
+        
+        logger.debug("Added %s message to %s, total: %s", message['role'], key, min(total, self.max_history_length))
+    
+    async def _redis_load_messages(self, key: str) -> List[Dict]:
+        """
+        从 Redis 读取完整对话历史
+        
+        一次往返：读缓存版本号与 Redis 一致时只返回版本号，否则同时返回消息列表
+        """
+        client = self._redis
+        if self._load_script is None or self._load_script_client is not client:
+            # 脚本对象绑定客户端，重连后重新注册
+            self._load_script = client.register_script(LOAD_MESSAGES_SCRIPT)
+            self._load_script_client = client
+        
+        cached = self._read_cache.get(key)
+        reply = await self._load_script(
+            keys=[self._meta_key(key), key],
+            args=[cached[0] if cached else ""]
+        )
+        version = reply[0] if reply and reply[0] is not None else None
+        
+        if len(reply) == 1:
+            self._read_cache.move_to_end(key)
+            return cached[1]
+        
+        messages = [redis_client.codec.loads(raw) for raw in reply[1]]
+        if version is not None:
+            self._cache_put(key, version, messages)
+        else:
+            self._read_cache.pop(key, None)
+        
+        return messages
+    
+    def _cache_put(self, key: str, version: str, messages: List[Dict]):
+        """写入读缓存（LRU 淘汰）"""
+        self._read_cache[key] = (version, messages)
+        self._read_cache.move_to_end(key)
+        while len(self._read_cache) > self.read_cache_size:
+            self._read_cache.popitem(last=False)
+    
+    async def get_session_info(
         self,
         user_id: int,
         session_id: Optional[str] = None
@@ -234,12 +432,30 @@ class ConversationService:
         Args:
             user_id: 用户ID
             session_id: 会话ID（可选）
-            
+        
         Returns:
             会话信息
         """
         key = self._get_conversation_key(user_id, session_id)
         
+        if self._redis:
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                pipe.llen(key)
+                pipe.zcard(self._files_key(key))
+                pipe.hget(self._meta_key(key), "last_activity")
+                message_count, file_reference_count, last_activity = await pipe.execute()
+                
+                return {
+                    "session_key": key,
+                    "message_count": message_count,
+                    "file_reference_count": file_reference_count,
+                    "last_activity": last_activity,
+                    "is_active": message_count > 0
+                }
+            except Exception as e:
+                logger.warning("Redis session info error: %s, using local store", e)
+        
         history = self._conversations.get(key, [])
         file_refs = self._file_references.get(key, [])
         last_activity = self._last_activity.get(key)
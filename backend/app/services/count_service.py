@@ -0,0 +1,127 @@
+"""
+列表总数统计
+
+大表上带筛选条件的 count(*) 需要扫描全部命中行，往往比取一页数据慢得多。按统计方式返回总数：
+1. exact：精确 count(*)
+2. estimate：执行 EXPLAIN 取查询计划的估算行数（不扫描数据，依赖 ANALYZE 统计信息）
+3. auto：先取估算行数，不超过 COUNT_EXACT_THRESHOLD 时再精确统计，否则返回估算值
+4. none：不统计，只由分页结果判断是否有下一页
+
+exact / estimate / auto 的结果按 查询语句 + 参数 缓存 COUNT_CACHE_TTL 秒，同一筛选条件连续翻页时只统计一次
+"""
+from typing import Dict, Any, List
+import json
+import logging
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.elements import ClauseElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+from app.core.config import settings
+from app.services.cache_service import cache_service
+
+logger = logging.getLogger(__name__)
+
+COUNT_MODES = ("auto", "exact", "estimate", "none")
+
+
+async def _exact_count(db: AsyncSession, model, conditions: List[Any]) -> int:
+    """精确统计"""
+    result = await db.execute(select(func.count()).select_from(model).where(*conditions))
+    return result.scalar() or 0
+
+
+class Explain(Executable, ClauseElement):
+    """
+    EXPLAIN (FORMAT JSON) <查询>
+    
+    作为 SQLAlchemy 语句执行，参数经过列类型的绑定处理（如 JSONB 条件中的 dict 会先序列化），
+    直接拼接 SQL 交给驱动时驱动无法适配这类参数
+    """
+    inherit_cache = True
+    _traverse_internals = [("statement", InternalTraversal.dp_clauseelement)]
+    
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def _estimate_count(db: AsyncSession, model, conditions: List[Any]) -> int:
+    """查询计划的估算行数"""
+    result = await db.execute(Explain(select(model.id).where(*conditions)))
+    return parse_plan_rows(result.scalar())
+
+
+def parse_plan_rows(plan: Any) -> int:
+    """
+    从 EXPLAIN (FORMAT JSON) 的结果中取出顶层节点的估算行数
+    
+    Args:
+        plan: 驱动返回的 JSON（已解析的列表或字符串）
+    
+    Returns:
+        估算行数
+    """
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_rows(
+    db: AsyncSession,
+    model,
+    conditions: List[Any],
+    mode: str = "auto",
+    cache_prefix: str = "row_count"
+) -> Dict[str, Any]:
+    """
+    按统计方式统计查询命中的行数
+    
+    Args:
+        db: 数据库会话
+        model: 模型（需有 id 列）
+        conditions: 筛选条件
+        mode: 统计方式 auto / exact / estimate / none
+        cache_prefix: 缓存前缀（过期时间从 CacheService.CACHE_TTL 读取，未配置时使用 COUNT_CACHE_TTL）
+    
+    Returns:
+        {"total": 总数（none 模式为 None）, "exact": 是否为精确值}
+    """
+    if mode not in COUNT_MODES:
+        raise ValueError(f"Unknown count mode: {mode}")
+    if mode == "none":
+        return {"total": None, "exact": False}
+    
+    # 相同筛选条件（编译后的语句和参数）共享同一缓存
+    compiled = select(func.count()).select_from(model).where(*conditions).compile(dialect=postgresql.dialect())
+    cache_key = cache_service.generate_key(cache_prefix, mode, str(compiled), compiled.params)
+    ttl = cache_service.CACHE_TTL.get(cache_prefix, settings.COUNT_CACHE_TTL)
+    
+    async def compute_with(session: AsyncSession) -> Dict[str, Any]:
+        if mode == "exact":
+            return {"total": await _exact_count(session, model, conditions), "exact": True}
+        
+        estimate = await _estimate_count(session, model, conditions)
+        logger.debug("Estimated %s rows in %s", estimate, model.__tablename__)
+        if mode == "auto" and estimate <= settings.COUNT_EXACT_THRESHOLD:
+            return {"total": await _exact_count(session, model, conditions), "exact": True}
+        return {"total": estimate, "exact": False}
+    
+    async def compute():
+        return await compute_with(db)
+    
+    async def refresh():
+        # 后台刷新时请求的会话已关闭，另开会话
+        from app.core.database import AsyncSessionLocal
+        async with AsyncSessionLocal() as session:
+            return await compute_with(session)
+    
+    return await cache_service.get_or_compute(cache_key, compute, ttl, refresh=refresh)
@@ -1,8 +1,15 @@
 
 import httpx
 import asyncio
+import logging
+import time
 from typing import Optional, Dict, Any
 from app.core.config import settings
+from app.core.metrics import LLM_REQUEST_DURATION, LLM_TOKENS, LLM_RETRIES, LLM_FAILURES
+from app.core.tracing import span, current_span
+from app.services.llm_replay_service import llm_replay_service
+
+logger = logging.getLogger(__name__)
 
 class DeepSeekService:
     """DeepSeek API 服务"""
@@ -29,10 +36,13 @@ class DeepSeekService:
             "stream": False
         }
         
+        start = time.perf_counter()
+        outcome = "error"
         try:
-            print(f"[DeepSeek] Calling API: {self.api_base}/chat/completions")
-            print(f"[DeepSeek] Model: {self.model}, Temperature: {temperature}")
-            print(f"[DeepSeek] Messages count: {len(messages)}")
+            logger.debug(
+                "Calling API: %s/chat/completions, model: %s, temperature: %s, messages: %s",
+                self.api_base, self.model, temperature, len(messages)
+            )
             
             async with httpx.AsyncClient(timeout=self.timeout) as client:
                 response = await client.post(
@@ -41,56 +51,78 @@ class DeepSeekService:
                     json=payload
                 )
                 
-                print(f"[DeepSeek] Response status: {response.status_code}")
+                logger.debug("Response status: %s", response.status_code)
                 
                 if response.status_code == 200:
                     result = response.json()
                     content = result["choices"][0]["message"]["content"]
-                    print(f"[DeepSeek] Success: {len(content)} characters")
+                    usage = result.get("usage") or {}
+                    logger.info("Success: %s characters, usage: %s", len(content), usage)
+                    
+                    LLM_TOKENS.labels(type="prompt").inc(usage.get("prompt_tokens", 0))
+                    LLM_TOKENS.labels(type="completion").inc(usage.get("completion_tokens", 0))
+                    llm_span = current_span()
+                    if llm_span and llm_span.name == "llm.chat":
+                        llm_span.set_attribute("llm.prompt_tokens", usage.get("prompt_tokens", 0))
+                        llm_span.set_attribute("llm.completion_tokens", usage.get("completion_tokens", 0))
+                    outcome = "success"
                     return content
                 else:
                     error_msg = f"API call failed: {response.status_code} - {response.text}"
-                    print(f"[DeepSeek] Error: {error_msg}")
+                    logger.error("Error: %s", error_msg)
                     raise Exception(error_msg)
         except httpx.TimeoutException as e:
+            outcome = "timeout"
             error_msg = f"API call timeout after {self.timeout} seconds"
-            print(f"[DeepSeek] Timeout: {error_msg}")
+            logger.error("Timeout: %s", error_msg)
             raise Exception(error_msg)
         except httpx.ConnectError as e:
             error_msg = f"Connection error: {str(e)}"
-            print(f"[DeepSeek] Connection error: {error_msg}")
+            logger.error("Connection error: %s", error_msg)
             raise Exception(error_msg)
         except Exception as e:
             error_msg = f"Unexpected error: {str(e)}"
-            print(f"[DeepSeek] Unexpected error: {error_msg}")
+            logger.error("Unexpected error: %s", error_msg)
             raise
+        finally:
+            LLM_REQUEST_DURATION.labels(outcome=outcome).observe(time.perf_counter() - start)
     
     async def call_with_retry(self, messages: list, temperature: float = 0.7) -> Optional[str]:
-        """带重试机制的 API 调用"""
+        """带重试机制的 API 调用（LLM_REPLAY_MODE 为 record / replay 时录制或回放响应）"""
+        if llm_replay_service.replaying:
+            with span("llm.chat", model=self.model, replay=True, messages=len(messages)):
+                hit, result = await llm_replay_service.replay(self.model, messages, temperature)
+            if hit or llm_replay_service.on_miss != "passthrough":
+                return result
+        
         last_error = None
         for attempt in range(self.retry_times):
             try:
-                result = await self._call_api(messages, temperature)
+                start = time.perf_counter()
+                with span("llm.chat", model=self.model, attempt=attempt + 1, messages=len(messages)):
+                    result = await self._call_api(messages, temperature)
+                if llm_replay_service.recording and result is not None:
+                    await llm_replay_service.record(
+                        self.model, messages, temperature, result, (time.perf_counter() - start) * 1000
+                    )
                 return result
             except Exception as e:
                 last_error = e
                 error_type = type(e).__name__
                 error_msg = str(e) if str(e) else repr(e)
-                print(f"API call attempt {attempt + 1} failed: [{error_type}] {error_msg}")
-                
-                # 打印详细的错误信息
-                import traceback
-                traceback.print_exc()
+                logger.warning("API call attempt %s failed: [%s] %s", attempt + 1, error_type, error_msg, exc_info=True)
                 
                 if attempt < self.retry_times - 1:
                     delay = self.retry_delays[attempt] / 1000  # 转换为秒
-                    print(f"Retrying in {delay} seconds...")
+                    logger.warning("Retrying in %s seconds...", delay)
+                    LLM_RETRIES.inc()
                     await asyncio.sleep(delay)
         
         # 所有重试都失败了
+        LLM_FAILURES.inc()
         error_type = type(last_error).__name__ if last_error else "Unknown"
         error_msg = str(last_error) if last_error and str(last_error) else repr(last_error)
-        print(f"All {self.retry_times} API call attempts failed. Last error: [{error_type}] {error_msg}")
+        logger.error("All %s API call attempts failed. Last error: [%s] %s", self.retry_times, error_type, error_msg)
         return None
     
     async def review_document(self, content: str) -> Optional[str]:
@@ -134,19 +166,14 @@ class DeepSeekService:
                 result = result[:-3]
             result = result.strip()
             
-            print(f"[DeepSeek] Cleaned result: {result[:200]}...")
+            logger.debug("Cleaned result: %s...", result[:200])
         
         return result
     
-    async def generate_document(
-        self, 
-        prompt: str, 
-        template_info: Dict[str, Any], 
-        context: list = None,
-        file_context: str = None
-    ) -> Optional[str]:
-        """生成文书（支持多轮对话和文件引用）- 返回JSON格式"""
-        system_prompt = f"""你是信访文书生成专家，严格遵循《党政机关公文格式》规范。
+    @staticmethod
+    def generate_system_prompt(template_info: Dict[str, Any]) -> str:
+        """生成文书的系统提示（上下文构建时计入 token 预算）"""
+        return f"""你是信访文书生成专家，严格遵循《党政机关公文格式》规范。
 
 当前使用模板：{template_info.get('name', '未知模板')}
 模板类型：{template_info.get('document_type', '未知类型')}
@@ -189,6 +216,16 @@ class DeepSeekService:
 - suggestions: 改进建议列表（可选）
 - 如发现需求信息不足，在chat_message中说明
 - 如有参考文件，结合参考内容生成"""
+    
+    async def generate_document(
+        self, 
+        prompt: str, 
+        template_info: Dict[str, Any], 
+        context: list = None,
+        file_context: str = None
+    ) -> Optional[str]:
+        """生成文书（支持多轮对话和文件引用）- 返回JSON格式"""
+        system_prompt = self.generate_system_prompt(template_info)
         
         messages = [{"role": "system", "content": system_prompt}]
         
@@ -199,9 +236,9 @@ class DeepSeekService:
                 "content": f"用户提供的参考文件内容：\n{file_context}"
             })
         
-        # 添加历史对话上下文（最多20条消息）
+        # 添加历史对话上下文（已由上下文构建服务按 token 预算裁剪）
         if context:
-            messages.extend(context[-20:])
+            messages.extend(context)
         
         messages.append({"role": "user", "content": prompt})
         
@@ -218,10 +255,52 @@ class DeepSeekService:
                 result = result[:-3]
             result = result.strip()
             
-            print(f"[DeepSeek] Cleaned generate result: {result[:200]}...")
+            logger.debug("Cleaned generate result: %s...", result[:200])
         
         return result
     
+    async def summarize_conversation(
+        self,
+        messages: list,
+        previous_summary: str = None,
+        max_length: int = 800
+    ) -> Optional[str]:
+        """
+        压缩对话历史为滚动摘要
+        
+        Args:
+            messages: 需要压缩的历史消息（role/content）
+            previous_summary: 之前的摘要，新摘要需要覆盖其内容
+            max_length: 摘要最大字数
+            
+        Returns:
+            摘要文本
+        """
+        system_prompt = f"""你是对话摘要助手。请把信访文书生成对话压缩为一段摘要，供后续生成时作为上下文。
+
+要求：
+1. 保留用户提出的关键事实、诉求、人名、日期、编号、单位等具体信息
+2. 保留用户对文书内容和格式的修改要求，以及已确认的结论
+3. 省略寒暄和重复内容
+4. 不超过 {max_length} 字，只输出摘要正文"""
+        
+        dialogue = "\n".join(
+            f"{'用户' if msg['role'] == 'user' else '助手'}：{msg['content']}"
+            for msg in messages
+        )
+        
+        user_content = f"新增对话：\n{dialogue}"
+        if previous_summary:
+            user_content = f"已有摘要：\n{previous_summary}\n\n{user_content}"
+        
+        llm_messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ]
+        
+        result = await self.call_with_retry(llm_messages, temperature=0.3)
+        return result.strip() if result else None
+    
     async def extract_template(self, content: str, file_type: str) -> Optional[Dict[str, Any]]:
         """提取模板结构"""
         system_prompt = """你是信访文书模板提取专家。请分析文书并提取模板结构。
@@ -353,28 +432,14 @@ class DeepSeekService:
                 data["success"] = True
                 return data
             except json.JSONDecodeError as e:
-                print(f"[DeepSeek] JSON parse error: {e}")
+                logger.error("JSON parse error: %s", e)
                 return {"success": False, "error": "AI 返回格式错误"}
         
         return {"success": False, "error": "AI 调用失败"}
     
-    async def generate_field_values(
-        self, 
-        fields: Dict[str, Any], 
-        prompt: str, 
-        context: list = None
-    ) -> Optional[Dict[str, Any]]:
-        """
-        根据用户需求和对话上下文生成字段值
-        
-        Args:
-            fields: 模板字段定义
-            prompt: 用户输入的需求
-            context: 对话历史
-            
-        Returns:
-            字段值字典
-        """
+    @staticmethod
+    def field_values_system_prompt(fields: Dict[str, Any]) -> str:
+        """生成字段值的系统提示（上下文构建时计入 token 预算）"""
         # 构建字段说明
         field_descriptions = []
         for name, info in fields.items():
@@ -383,7 +448,7 @@ class DeepSeekService:
             required = "必填" if info.get("required") else "选填"
             field_descriptions.append(f"- {name} ({label}): {field_type}, {required}")
         
-        system_prompt = f"""你是信访文书生成助手。根据用户需求生成文书字段值。
+        return f"""你是信访文书生成助手。根据用户需求生成文书字段值。
 
 **需要填写的字段：**
 {chr(10).join(field_descriptions)}
@@ -404,11 +469,30 @@ class DeepSeekService:
 2. 如果用户提供的信息不足以填写所有必填字段，在 chat_message 中询问
 3. complete 表示是否所有必填字段都已填写
 4. 日期格式使用：XXXX年XX月XX日"""
+    
+    async def generate_field_values(
+        self, 
+        fields: Dict[str, Any], 
+        prompt: str, 
+        context: list = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        根据用户需求和对话上下文生成字段值
+        
+        Args:
+            fields: 模板字段定义
+            prompt: 用户输入的需求
+            context: 对话历史
+            
+        Returns:
+            字段值字典
+        """
+        system_prompt = self.field_values_system_prompt(fields)
         
         messages = [{"role": "system", "content": system_prompt}]
         
         if context:
-            messages.extend(context[-10:])  # 最多保留10条历史
+            messages.extend(context)  # 已由上下文构建服务按 token 预算裁剪
         
         messages.append({"role": "user", "content": prompt})
         
@@ -16,6 +16,8 @@ from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 import traceback
 
+from app.core.performance import PerformanceMonitor
+
 
 class DocumentExportService:
     """文档导出服务类"""
@@ -29,6 +31,7 @@ class DocumentExportService:
         except:
             pass
     
+    @PerformanceMonitor.measure_time("export_pdf")
     async def export_to_pdf(
         self,
         content: str,
@@ -139,6 +142,7 @@ class DocumentExportService:
             traceback.print_exc()
             raise
     
+    @PerformanceMonitor.measure_time("export_docx")
     async def export_to_docx(
         self,
         content: str,
@@ -0,0 +1,160 @@
+"""
+PDF / Word 文本提取
+
+只依赖 python-docx 和 PyPDF2，不依赖应用配置，离线脚本（benchmark_rules.py）可以直接使用；
+应用中通过 file_parser_service 在线程中调用
+"""
+import io
+from typing import Dict, Any
+from docx import Document
+from PyPDF2 import PdfReader
+import logging
+import traceback
+
+logger = logging.getLogger(__name__)
+
+
+def parse_pdf(file_content: bytes) -> Dict[str, Any]:
+    """
+    解析 PDF 文件
+    
+    Args:
+        file_content: PDF 文件二进制内容
+        
+    Returns:
+        解析结果字典
+    """
+    try:
+        # 创建 PDF 读取器
+        pdf_file = io.BytesIO(file_content)
+        pdf_reader = PdfReader(pdf_file)
+        
+        # 提取元数据
+        metadata = {
+            'num_pages': len(pdf_reader.pages),
+            'author': pdf_reader.metadata.get('/Author', '') if pdf_reader.metadata else '',
+            'title': pdf_reader.metadata.get('/Title', '') if pdf_reader.metadata else '',
+            'subject': pdf_reader.metadata.get('/Subject', '') if pdf_reader.metadata else '',
+        }
+        
+        # 提取文本内容
+        text_content = []
+        structure = []
+        
+        for page_num, page in enumerate(pdf_reader.pages, 1):
+            try:
+                page_text = page.extract_text()
+                if page_text:
+                    text_content.append(page_text)
+                    structure.append({
+                        'page': page_num,
+                        'text_length': len(page_text),
+                        'has_content': bool(page_text.strip())
+                    })
+            except Exception as e:
+                logger.error("Error extracting page %s: %s", page_num, e)
+                structure.append({
+                    'page': page_num,
+                    'error': str(e),
+                    'has_content': False
+                })
+        
+        full_text = '\n\n'.join(text_content)
+        
+        logger.info("PDF parsed successfully: %s pages, %s characters", len(pdf_reader.pages), len(full_text))
+        
+        return {
+            'text': full_text,
+            'metadata': metadata,
+            'structure': structure,
+            'format': 'pdf'
+        }
+        
+    except Exception as e:
+        logger.error("PDF parsing error: %s", e)
+        traceback.print_exc()
+        raise
+
+
+def parse_word(file_content: bytes) -> Dict[str, Any]:
+    """
+    解析 Word 文档
+    
+    Args:
+        file_content: Word 文件二进制内容
+        
+    Returns:
+        解析结果字典
+    """
+    try:
+        # 检查是否为旧版 .doc 格式
+        doc_file = io.BytesIO(file_content)
+        
+        # 尝试检测文件头
+        file_header = file_content[:8]
+        if file_header[:4] == b'\xd0\xcf\x11\xe0':  # OLE2 格式（旧版 .doc）
+            logger.warning("检测到旧版 Word 格式（.doc），不支持解析")
+            raise ValueError("不支持旧版 Word 格式（.doc），请转换为 .docx 格式后重试")
+        
+        # 创建 Word 文档对象
+        document = Document(doc_file)
+        
+        # 提取元数据
+        core_properties = document.core_properties
+        metadata = {
+            'author': core_properties.author or '',
+            'title': core_properties.title or '',
+            'subject': core_properties.subject or '',
+            'created': str(core_properties.created) if core_properties.created else '',
+            'modified': str(core_properties.modified) if core_properties.modified else '',
+        }
+        
+        # 提取文本内容和结构
+        text_content = []
+        structure = []
+        
+        # 提取段落
+        for para_num, paragraph in enumerate(document.paragraphs, 1):
+            if paragraph.text.strip():
+                text_content.append(paragraph.text)
+                structure.append({
+                    'type': 'paragraph',
+                    'index': para_num,
+                    'text_length': len(paragraph.text),
+                    'style': paragraph.style.name if paragraph.style else 'Normal'
+                })
+        
+        # 提取表格
+        for table_num, table in enumerate(document.tables, 1):
+            table_text = []
+            for row in table.rows:
+                row_text = []
+                for cell in row.cells:
+                    row_text.append(cell.text.strip())
+                table_text.append(' | '.join(row_text))
+            
+            if table_text:
+                table_content = '\n'.join(table_text)
+                text_content.append(f"\n[表格 {table_num}]\n{table_content}\n")
+                structure.append({
+                    'type': 'table',
+                    'index': table_num,
+                    'rows': len(table.rows),
+                    'columns': len(table.columns) if table.rows else 0
+                })
+        
+        full_text = '\n'.join(text_content)
+        
+        logger.info("Word document parsed successfully: %s paragraphs, %s tables, %s characters", len(document.paragraphs), len(document.tables), len(full_text))
+        
+        return {
+            'text': full_text,
+            'metadata': metadata,
+            'structure': structure,
+            'format': 'docx'
+        }
+        
+    except Exception as e:
+        logger.error("Word parsing error: %s", e)
+        traceback.print_exc()
+        raise
@@ -6,6 +6,8 @@ import io
 from typing import Dict, Any, Optional
 from docxtpl import DocxTemplate
 
+from app.core.performance import PerformanceMonitor
+
 
 class DocxRenderService:
     """docxtpl 渲染服务"""
@@ -13,6 +15,7 @@ class DocxRenderService:
     def __init__(self):
         pass
     
+    @PerformanceMonitor.measure_time("docx_render")
     async def render_template(
         self,
         template_bytes: bytes,
@@ -12,9 +12,9 @@ import httpx
 
 from app.models.validation import HealthStatus
 from app.core.config import settings
+from app.services.llm_replay_service import llm_replay_service
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 class HealthMonitorService:
     """健康监控服务"""
@@ -66,6 +66,10 @@ class HealthMonitorService:
         Returns:
             是否健康
         """
+        # 回放模式下不访问大模型服务，视为健康，避免离线压测时进入降级
+        if llm_replay_service.replaying:
+            return True
+        
         try:
             # 使用轻量级的健康检查请求
             async with httpx.AsyncClient(timeout=self.timeout) as client:
@@ -0,0 +1,283 @@
+"""
+增量规则验证器
+
+文档编辑保存时，按段落对比新旧内容，只重新执行受变更影响的规则，
+未变更区域的结果直接复用上一次验证保存在 ai_annotations 中的索引
+"""
+import hashlib
+import json
+import re
+import time
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+from app.models.validation import Rule, RuleType, ValidationError
+from app.services.rule_executor import RuleExecutor, RuleResult
+
+logger = logging.getLogger(__name__)
+
+
+# 规则作用域
+SCOPE_PARAGRAPH = "paragraph"  # 可按段落拆分执行，结果按段落汇总
+SCOPE_FIELD = "field"  # 只依赖元数据中的某个字段
+SCOPE_DOCUMENT = "document"  # 依赖全文，任何段落变化都需重新执行
+
+# 保存在 ai_annotations 中的索引键（仅服务端使用，不返回给客户端）
+INDEX_KEY = "local_rules_index"
+# 编辑保存后本地规则重新验证的结果，与研判时的 errors/summary 分开保存
+LOCAL_RULES_KEY = "local_rules"
+
+
+def public_annotations(annotations: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """返回给客户端的标注（去掉增量索引）"""
+    if not isinstance(annotations, dict) or INDEX_KEY not in annotations:
+        return annotations
+    return {key: value for key, value in annotations.items() if key != INDEX_KEY}
+
+
+def merge_local_review(
+    annotations: Optional[Dict[str, Any]],
+    review: Dict[str, Any],
+    rules_index: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    把重新验证的结果合并到已有标注
+    
+    Args:
+        annotations: 已保存的 ai_annotations（研判时的 errors/summary 保持不变）
+        review: 本地规则验证结果 {"errors", "summary"}
+        rules_index: 新的增量索引
+    
+    Returns:
+        新的 ai_annotations
+    """
+    merged = {key: value for key, value in (annotations or {}).items() if key != INDEX_KEY}
+    merged[LOCAL_RULES_KEY] = review
+    if rules_index:
+        merged[INDEX_KEY] = rules_index
+    return merged
+
+
+def split_paragraphs(content: str) -> List[str]:
+    """按换行拆分段落（解析服务以换行连接段落）"""
+    return content.split("\n") if content else []
+
+
+def _digest(text: str) -> str:
+    """计算文本摘要"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class IncrementalValidator:
+    """增量规则验证器"""
+    
+    def __init__(self, executor: RuleExecutor):
+        """
+        初始化增量验证器
+        
+        Args:
+            executor: 规则执行器（与全量验证共用，保持执行统计一致）
+        """
+        self.executor = executor
+    
+    @staticmethod
+    def get_ruleset_signature(rules: List[Rule]) -> str:
+        """
+        计算规则集签名，规则变更后旧索引失效
+        
+        Args:
+            rules: 启用的规则列表
+        
+        Returns:
+            签名字符串
+        """
+        payload = json.dumps(
+            [rule.dict() for rule in rules],
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str
+        )
+        return _digest(payload)
+    
+    @staticmethod
+    def get_rule_scope(rule: Rule, context: Dict[str, Any]) -> str:
+        """
+        判断规则作用域
+        
+        Args:
+            rule: 规则对象
+            context: 元数据
+        
+        Returns:
+            作用域（paragraph/field/document）
+        """
+        if rule.rule_type == RuleType.KEYWORD:
+            keywords = rule.parameters.get('keywords', [])
+            # 关键词不跨段落时，全文命中等价于任一段落命中
+            if not any("\n" in keyword for keyword in keywords):
+                return SCOPE_PARAGRAPH
+        
+        if rule.rule_type == RuleType.PATTERN:
+            field = rule.parameters.get('field')
+            if field and field in context:
+                return SCOPE_FIELD
+            # 正则可能跨行匹配，只有显式声明时才按段落执行
+            if rule.parameters.get('scope') == SCOPE_PARAGRAPH:
+                return SCOPE_PARAGRAPH
+        
+        return SCOPE_DOCUMENT
+    
+    @staticmethod
+    def _get_rule_digest(rule: Rule, scope: str, content: str, context: Dict[str, Any]) -> str:
+        """计算规则输入摘要，摘要不变则可复用上次结果"""
+        if scope == SCOPE_FIELD:
+            return _digest(str(context[rule.parameters['field']]))
+        if rule.rule_type == RuleType.LENGTH:
+            return str(len(content))
+        return _digest(content)
+    
+    def _scan_paragraph(self, rule: Rule, paragraph: str) -> Any:
+        """
+        在单个段落上执行段落级规则
+        
+        Returns:
+            关键词规则返回命中的关键词列表，正则规则返回是否匹配
+        """
+        if rule.rule_type == RuleType.KEYWORD:
+            keywords = rule.parameters.get('keywords', [])
+            return [keyword for keyword in keywords if keyword in paragraph]
+        
+        try:
+            return bool(re.search(rule.parameters.get('pattern'), paragraph))
+        except re.error as e:
+            logger.error(f"正则表达式错误 {rule.id}: {e}")
+            return True
+    
+    def _scan_changed(self, rule: Rule, changed: Dict[str, str], findings: Dict[str, Dict[str, Any]]):
+        """扫描变更段落，把命中结果写入段落索引"""
+        for paragraph_hash, paragraph in changed.items():
+            finding = self._scan_paragraph(rule, paragraph)
+            if finding:
+                findings.setdefault(paragraph_hash, {})[rule.id] = finding
+    
+    def _build_paragraph_errors(self, rule: Rule, findings: List[Any]) -> List[ValidationError]:
+        """汇总各段落的命中结果生成规则错误"""
+        if rule.rule_type == RuleType.KEYWORD:
+            found_keywords = []
+            for finding in findings:
+                found_keywords.extend(finding)
+            return self.executor.build_keyword_errors(rule, found_keywords)
+        
+        # 段落级正则规则：任一段落匹配即通过
+        if any(findings):
+            return []
+        return [ValidationError(
+            type=rule.error_type,
+            level=rule.error_level,
+            description=rule.description,
+            suggestion=rule.suggestion,
+            reference=rule.id
+        )]
+    
+    async def validate(
+        self,
+        rules: List[Rule],
+        content: str,
+        context: Dict[str, Any],
+        previous_index: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[RuleResult], Dict[str, Any], Dict[str, Any]]:
+        """
+        增量执行规则集合
+        
+        Args:
+            rules: 规则列表（应已按优先级排序）
+            content: 新的文档内容
+            context: 元数据
+            previous_index: 上次验证保存的索引，为空或规则集变化时执行全量验证
+        
+        Returns:
+            (规则执行结果列表, 新索引, 增量统计)
+        """
+        signature = self.get_ruleset_signature(rules)
+        if not previous_index or previous_index.get("ruleset") != signature:
+            previous_index = {}
+        
+        previous_paragraphs = set(previous_index.get("paragraphs", []))
+        previous_findings = previous_index.get("findings", {})
+        previous_rules = previous_index.get("rules", {})
+        
+        paragraphs = split_paragraphs(content)
+        paragraph_hashes = [_digest(paragraph) for paragraph in paragraphs]
+        
+        # 段落对比：只有新出现的段落需要重新扫描
+        changed = {}
+        for paragraph, paragraph_hash in zip(paragraphs, paragraph_hashes):
+            if paragraph_hash not in previous_paragraphs:
+                changed[paragraph_hash] = paragraph
+        
+        unique_hashes = set(paragraph_hashes)
+        findings: Dict[str, Dict[str, Any]] = {}
+        for paragraph_hash in unique_hashes:
+            if paragraph_hash not in changed and paragraph_hash in previous_findings:
+                findings[paragraph_hash] = previous_findings[paragraph_hash]
+        
+        results: List[RuleResult] = []
+        rules_index: Dict[str, Any] = {}
+        rules_reused = 0
+        
+        for position, rule in enumerate(rules):
+            scope = self.get_rule_scope(rule, context)
+            
+            if scope == SCOPE_PARAGRAPH:
+                start_time = time.time()
+                self._scan_changed(rule, changed, findings)
+                
+                rule_findings = [
+                    findings[paragraph_hash][rule.id]
+                    for paragraph_hash in unique_hashes
+                    if rule.id in findings.get(paragraph_hash, {})
+                ]
+                errors = self._build_paragraph_errors(rule, rule_findings)
+                result = RuleResult(rule, len(errors) == 0, errors, time.time() - start_time)
+            else:
+                digest = self._get_rule_digest(rule, scope, content, context)
+                cached = previous_rules.get(rule.id)
+                
+                if cached and cached.get("digest") == digest:
+                    errors = [ValidationError(**error) for error in cached.get("errors", [])]
+                    result = RuleResult(rule, len(errors) == 0, errors, 0.0)
+                    rules_reused += 1
+                else:
+                    result = await self.executor.execute_rule(rule, content, context)
+                
+                rules_index[rule.id] = {
+                    "digest": digest,
+                    "errors": [error.dict() for error in result.errors]
+                }
+            
+            results.append(result)
+            
+            # 与全量验证一致：关键错误立即停止
+            if rule.critical and not result.passed:
+                logger.warning(f"检测到关键错误，停止执行: {rule.id}")
+                # 剩余段落级规则仍需扫描变更段落，否则索引会把这些段落记为无命中
+                for remaining in rules[position + 1:]:
+                    if self.get_rule_scope(remaining, context) == SCOPE_PARAGRAPH:
+                        self._scan_changed(remaining, changed, findings)
+                break
+        
+        new_index = {
+            "ruleset": signature,
+            "paragraphs": paragraph_hashes,
+            "findings": findings,
+            "rules": rules_index
+        }
+        
+        stats = {
+            "full_validation": not previous_index,
+            "total_paragraphs": len(paragraphs),
+            "changed_paragraphs": len(changed),
+            "rules_reused": rules_reused
+        }
+        
+        return results, new_index, stats
@@ -0,0 +1,160 @@
+"""
+大模型调用录制/回放服务
+
+用于在不受大模型服务波动影响的情况下测量解析、渲染、导出、数据库等环节的开销：
+1. record：DeepSeekService.call_with_retry 每次成功调用后，把 请求哈希 → 响应内容、调用耗时 追加到录制文件
+2. replay：按请求哈希从录制文件返回响应，不访问大模型服务；
+   可按 LLM_REPLAY_LATENCY_SCALE 倍数模拟录制时的耗时（0 为立即返回，1 为重现线上耗时分布）
+
+请求哈希由 模型、消息列表、temperature 计算，相同请求被录制多次时按录制顺序依次回放（循环），
+保证同一批请求每次回放的结果一致
+"""
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LLMReplayService:
+    """大模型调用录制/回放"""
+    
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        store_path: Optional[str] = None,
+        latency_scale: Optional[float] = None,
+        on_miss: Optional[str] = None
+    ):
+        self.mode = (mode or settings.LLM_REPLAY_MODE).lower()
+        self.store_path = store_path or settings.LLM_REPLAY_STORE
+        self.latency_scale = settings.LLM_REPLAY_LATENCY_SCALE if latency_scale is None else latency_scale
+        self.on_miss = on_miss or settings.LLM_REPLAY_ON_MISS
+        
+        # 请求哈希 -> 录制的响应列表（按录制顺序）
+        self._entries: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._cursors: Dict[str, int] = {}
+        self._write_lock = threading.Lock()
+        self.stats = {"recorded": 0, "hits": 0, "misses": 0}
+    
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+    
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+    
+    @staticmethod
+    def request_key(model: str, messages: list, temperature: float) -> str:
+        """请求哈希（消息内容、顺序、模型、temperature 任一不同即不同）"""
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature},
+            ensure_ascii=False, sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _load(self) -> Dict[str, List[Dict[str, Any]]]:
+        """首次使用时读取录制文件"""
+        if self._entries is not None:
+            return self._entries
+        
+        entries: Dict[str, List[Dict[str, Any]]] = {}
+        if os.path.exists(self.store_path):
+            with open(self.store_path, "r", encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning("Skipping malformed replay entry at %s:%s", self.store_path, line_number)
+                        continue
+                    entries.setdefault(entry["key"], []).append(entry)
+        
+        logger.info("Loaded %s recorded LLM requests from %s", sum(len(v) for v in entries.values()), self.store_path)
+        self._entries = entries
+        return entries
+    
+    def _append(self, entry: Dict[str, Any]):
+        with self._write_lock:
+            with open(self.store_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    
+    async def record(self, model: str, messages: list, temperature: float, response: str, latency_ms: float):
+        """
+        录制一次成功的调用（写入失败只记日志，不影响业务）
+        
+        Args:
+            model: 模型名称
+            messages: 消息列表
+            temperature: 温度参数
+            response: 响应内容
+            latency_ms: 调用耗时（毫秒）
+        """
+        key = self.request_key(model, messages, temperature)
+        entry = {
+            "key": key,
+            "model": model,
+            "temperature": temperature,
+            "messages": len(messages),
+            "response": response,
+            "latency_ms": round(latency_ms, 1),
+            "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        try:
+            await asyncio.to_thread(self._append, entry)
+        except OSError as e:
+            logger.error("Failed to record LLM response: %s", e)
+            return
+        self._load().setdefault(key, []).append(entry)
+        self.stats["recorded"] += 1
+    
+    async def replay(self, model: str, messages: list, temperature: float) -> Tuple[bool, Optional[str]]:
+        """
+        回放录制的响应
+        
+        Args:
+            model: 模型名称
+            messages: 消息列表
+            temperature: 温度参数
+        
+        Returns:
+            (是否命中, 响应内容)
+        """
+        key = self.request_key(model, messages, temperature)
+        recorded = self._load().get(key)
+        if not recorded:
+            self.stats["misses"] += 1
+            logger.warning("No recorded LLM response for request %s", key[:12])
+            return False, None
+        
+        cursor = self._cursors.get(key, 0)
+        self._cursors[key] = cursor + 1
+        entry = recorded[cursor % len(recorded)]
+        self.stats["hits"] += 1
+        
+        if self.latency_scale > 0:
+            await asyncio.sleep(entry.get("latency_ms", 0) / 1000 * self.latency_scale)
+        return True, entry["response"]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """录制/回放统计"""
+        return {
+            "mode": self.mode,
+            "store_path": self.store_path,
+            "latency_scale": self.latency_scale,
+            "stored_requests": sum(len(v) for v in self._entries.values()) if self._entries is not None else None,
+            **self.stats
+        }
+
+
+# 全局实例
+llm_replay_service = LLMReplayService()
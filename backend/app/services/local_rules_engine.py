@@ -4,11 +4,12 @@
 负责使用本地规则进行文档验证，作为 AI 服务的降级方案
 """
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple
 import logging
 
 from app.core.rules_config import RulesConfigManager
 from app.services.rule_executor import RuleExecutor
+from app.services.incremental_validator import IncrementalValidator
 from app.models.validation import ValidationResult, ValidationError
 
 logger = logging.getLogger(__name__)
@@ -26,6 +27,7 @@ class LocalRulesEngine:
         """
         self.config_manager = config_manager
         self.executor = RuleExecutor()
+        self.incremental_validator = IncrementalValidator(self.executor)
         self.validation_count = 0
         self.total_execution_time = 0.0
     
@@ -92,26 +94,7 @@ class LocalRulesEngine:
         self.total_execution_time += execution_time
         
         # 生成摘要
-        if not all_errors:
-            summary = "文档验证通过，未发现问题"
-            success = True
-        else:
-            error_count = len(all_errors)
-            error_levels = {}
-            for error in all_errors:
-                level = error.level
-                error_levels[level] = error_levels.get(level, 0) + 1
-            
-            summary_parts = [f"发现 {error_count} 个问题"]
-            if error_levels.get("error", 0) > 0:
-                summary_parts.append(f"{error_levels['error']} 个错误")
-            if error_levels.get("warning", 0) > 0:
-                summary_parts.append(f"{error_levels['warning']} 个警告")
-            if error_levels.get("info", 0) > 0:
-                summary_parts.append(f"{error_levels['info']} 个提示")
-            
-            summary = "，".join(summary_parts)
-            success = error_levels.get("error", 0) == 0
+        summary, success = self._build_summary(all_errors)
         
         logger.info(f"本地规则验证完成: {summary}, 执行时间: {execution_time:.2f}s")
         
@@ -123,6 +106,105 @@ class LocalRulesEngine:
             rules_executed=len(results)
         )
     
+    async def validate_document_incremental(
+        self,
+        content: str,
+        metadata: Dict[str, Any] = None,
+        previous_index: Optional[Dict[str, Any]] = None
+    ) -> Tuple[ValidationResult, Optional[Dict[str, Any]]]:
+        """
+        增量验证文档
+        
+        按段落对比上次验证的索引，只重新执行受变更影响的规则，
+        没有索引或规则集已变化时退化为全量验证
+        
+        Args:
+            content: 文档内容
+            metadata: 元数据（可能包含结构化数据）
+            previous_index: 上次验证返回的索引（保存在 ai_annotations 中）
+            
+        Returns:
+            (验证结果, 新索引)
+        """
+        start_time = time.time()
+        
+        if metadata is None:
+            metadata = {}
+        
+        rules = self.config_manager.get_enabled_rules()
+        
+        if not rules:
+            logger.warning("没有启用的规则")
+            return ValidationResult(
+                success=True,
+                errors=[],
+                summary="没有启用的规则，跳过验证",
+                execution_time=0.0,
+                rules_executed=0
+            ), None
+        
+        try:
+            results, index, stats = await self.incremental_validator.validate(
+                rules, content, metadata, previous_index
+            )
+        except Exception as e:
+            logger.error(f"增量验证失败，改为全量验证: {e}")
+            return await self.validate_document(content, metadata), None
+        
+        all_errors = []
+        for result in results:
+            all_errors.extend(result.errors)
+        
+        execution_time = time.time() - start_time
+        
+        self.validation_count += 1
+        self.total_execution_time += execution_time
+        
+        summary, success = self._build_summary(all_errors)
+        
+        logger.info(
+            f"本地规则增量验证完成: {summary}, 变更段落: {stats['changed_paragraphs']}/{stats['total_paragraphs']}, "
+            f"复用规则: {stats['rules_reused']}, 执行时间: {execution_time:.2f}s"
+        )
+        
+        return ValidationResult(
+            success=success,
+            errors=all_errors,
+            summary=summary,
+            execution_time=execution_time,
+            rules_executed=len(results),
+            incremental_stats=stats
+        ), index
+    
+    def _build_summary(self, all_errors: List[ValidationError]) -> Tuple[str, bool]:
+        """
+        生成验证摘要
+        
+        Args:
+            all_errors: 所有错误
+            
+        Returns:
+            (摘要, 是否通过)
+        """
+        if not all_errors:
+            return "文档验证通过，未发现问题", True
+        
+        error_count = len(all_errors)
+        error_levels = {}
+        for error in all_errors:
+            level = error.level
+            error_levels[level] = error_levels.get(level, 0) + 1
+        
+        summary_parts = [f"发现 {error_count} 个问题"]
+        if error_levels.get("error", 0) > 0:
+            summary_parts.append(f"{error_levels['error']} 个错误")
+        if error_levels.get("warning", 0) > 0:
+            summary_parts.append(f"{error_levels['warning']} 个警告")
+        if error_levels.get("info", 0) > 0:
+            summary_parts.append(f"{error_levels['info']} 个提示")
+        
+        return "，".join(summary_parts), error_levels.get("error", 0) == 0
+    
     def get_performance_metrics(self) -> Dict[str, Any]:
         """
         获取性能指标
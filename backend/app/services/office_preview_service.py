@@ -1,7 +1,10 @@
 import httpx
 from typing import Optional
+import logging
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 class OfficePreviewService:
     """华为云 Office 预览服务"""
     
@@ -25,7 +28,7 @@ class OfficePreviewService:
         }
         
         try:
-            print(f"[Preview Service] Requesting preview for URL: {file_url}")
+            logger.debug("Requesting preview for URL: %s", file_url)
             async with httpx.AsyncClient(timeout=30) as client:
                 response = await client.post(
                     self.api_url,
@@ -33,8 +36,7 @@ class OfficePreviewService:
                     json=payload
                 )
                 
-                print(f"[Preview Service] Response status: {response.status_code}")
-                print(f"[Preview Service] Response body: {response.text}")
+                logger.debug("Response status: %s, body: %s", response.status_code, response.text)
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -43,18 +45,16 @@ class OfficePreviewService:
                     preview_url = result.get("view_url") or result.get("preview_url")
                     
                     if not preview_url:
-                        print(f"[Preview Service] Warning: preview_url is empty in response")
+                        logger.warning("preview_url is empty in response")
                         return None
                     
-                    print(f"[Preview Service] Success: {preview_url}")
+                    logger.debug("Preview URL: %s", preview_url)
                     return preview_url
                 else:
-                    print(f"[Preview Service] Error: {response.status_code} - {response.text}")
+                    logger.error("Preview request failed: %s - %s", response.status_code, response.text)
                     return None
         except Exception as e:
-            print(f"[Preview Service] Exception: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Preview request error: %s", e)
             return None
 
 office_preview_service = OfficePreviewService()
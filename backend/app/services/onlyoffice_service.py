@@ -3,10 +3,13 @@ ONLYOFFICE文档服务（无JWT版本）
 提供文档预览和编辑功能
 """
 import hashlib
+import logging
 from datetime import datetime
 from typing import Optional, Dict, Any
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 
 class OnlyOfficeService:
     """ONLYOFFICE文档服务（无JWT版本）"""
@@ -17,12 +20,10 @@ class OnlyOfficeService:
         self.backend_public_url = settings.BACKEND_PUBLIC_URL
         self.jwt_enabled = settings.ONLYOFFICE_JWT_ENABLED
         
-        # 调试日志
-        print(f"[OnlyOfficeService] Initialized with:")
-        print(f"  - server_url: {self.server_url}")
-        print(f"  - callback_url: {self.callback_url}")
-        print(f"  - backend_public_url: {self.backend_public_url}")
-        print(f"  - jwt_enabled: {self.jwt_enabled}")
+        logger.info(
+            "Initialized: server_url=%s, callback_url=%s, backend_public_url=%s, jwt_enabled=%s",
+            self.server_url, self.callback_url, self.backend_public_url, self.jwt_enabled
+        )
     
     def generate_document_key(self, file_id: int, updated_at: datetime) -> str:
         """生成文档唯一key（用于缓存和版本控制）"""
@@ -84,13 +85,10 @@ class OnlyOfficeService:
         # 优先使用BACKEND_PUBLIC_URL，如果没有配置则使用Docker内部网络
         if self.backend_public_url and not self.backend_public_url.startswith('http://petition-backend'):
             file_url = f"{self.backend_public_url}/api/v1/onlyoffice/download/file/{file_id}"
-            print(f"[OnlyOfficeService] Generated file URL: {file_url}")
-            print(f"  - Using public URL for ONLYOFFICE access")
+            logger.debug("Generated file URL for file %s (public URL): %s", file_id, file_url)
         else:
             file_url = f"http://petition-backend:8000/api/v1/onlyoffice/download/file/{file_id}"
-            print(f"[OnlyOfficeService] Generated file URL: {file_url}")
-            print(f"  - Using Docker internal network")
-        print(f"  - file_id: {file_id}")
+            logger.debug("Generated file URL for file %s (Docker internal network): %s", file_id, file_url)
         
         # 配置（无JWT版本，更简单）
         config = {
@@ -175,9 +173,7 @@ class OnlyOfficeService:
         # 注意：ONLYOFFICE服务器通过Docker内部网络访问后端
         file_url = f"http://petition-backend:8000/api/v1/onlyoffice/download/document/{document_id}"
         
-        print(f"[OnlyOfficeService] Generated document URL: {file_url}")
-        print(f"  - Using Docker internal network")
-        print(f"  - document_id: {document_id}")
+        logger.debug("Generated document URL for document %s (Docker internal network): %s", document_id, file_url)
         
         # 配置（无JWT版本）
         config = {
@@ -252,7 +248,7 @@ class OnlyOfficeService:
         """
         status = callback_data.get('status')
         
-        print(f"[OnlyOffice] Callback received, status: {status}, file_id: {file_id}, document_id: {document_id}")
+        logger.info("Callback received, status: %s, file_id: %s, document_id: %s", status, file_id, document_id)
         
         # 状态2或6表示需要保存
         if status in [2, 6]:
@@ -260,7 +256,7 @@ class OnlyOfficeService:
             if not download_url:
                 return {"error": 1, "message": "Download URL not provided"}
             
-            print(f"[OnlyOffice] Document ready to save, download URL: {download_url}")
+            logger.debug("Document ready to save, download URL: %s", download_url)
             
             # 返回成功，实际保存逻辑在API端点中处理
             return {
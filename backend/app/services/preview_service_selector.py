@@ -3,10 +3,13 @@
 根据配置优先使用ONLYOFFICE服务，失败时降级到华为云服务
 """
 from typing import Optional, Dict, Any
+import logging
 from app.core.config import settings
 from app.services.onlyoffice_service import onlyoffice_service
 from app.services.office_preview_service import office_preview_service
 
+logger = logging.getLogger(__name__)
+
 
 class PreviewServiceSelector:
     """预览服务选择器，实现ONLYOFFICE优先，华为云降级的策略"""
@@ -35,41 +38,41 @@ class PreviewServiceSelector:
         
         # 1. 优先尝试ONLYOFFICE服务（如果已启用）
         if settings.ONLYOFFICE_ENABLED and settings.ONLYOFFICE_SERVER_URL:
-            print(f"[PreviewSelector] 尝试使用ONLYOFFICE服务...")
+            logger.debug("尝试使用ONLYOFFICE服务")
             try:
                 # ONLYOFFICE使用前端组件，返回特殊标记
                 service_type = "onlyoffice"
-                print(f"[PreviewSelector] ONLYOFFICE服务可用")
+                logger.debug("ONLYOFFICE服务可用")
                 return {
                     "preview_url": "use_onlyoffice_component",  # 前端识别此标记使用ONLYOFFICE组件
                     "service_type": service_type,
                     "file_url": file_url
                 }
             except Exception as e:
-                print(f"[PreviewSelector] ONLYOFFICE服务异常: {e}，尝试降级...")
+                logger.warning("ONLYOFFICE服务异常: %s，尝试降级", e)
         else:
-            print(f"[PreviewSelector] ONLYOFFICE服务未启用（ONLYOFFICE_ENABLED={settings.ONLYOFFICE_ENABLED}）")
+            logger.debug("ONLYOFFICE服务未启用（ONLYOFFICE_ENABLED=%s）", settings.ONLYOFFICE_ENABLED)
         
         # 2. 降级到华为云服务
-        print(f"[PreviewSelector] 使用华为云预览服务...")
+        logger.debug("使用华为云预览服务")
         try:
             preview_url = await office_preview_service.get_preview_url(file_url)
             
             if preview_url:
                 service_type = "huawei"
-                print(f"[PreviewSelector] 华为云服务成功: {preview_url}")
+                logger.debug("华为云服务成功: %s", preview_url)
                 return {
                     "preview_url": preview_url,
                     "service_type": service_type,
                     "file_url": file_url
                 }
             else:
-                print(f"[PreviewSelector] 华为云服务返回空URL")
+                logger.warning("华为云服务返回空URL")
         except Exception as e:
-            print(f"[PreviewSelector] 华为云服务异常: {e}")
+            logger.warning("华为云服务异常: %s", e)
         
         # 3. 所有服务都失败
-        print(f"[PreviewSelector] 所有预览服务都失败，返回直接URL")
+        logger.warning("所有预览服务都失败，返回直接URL")
         
         # 对于PDF文件，可以直接在浏览器中预览
         if file_name.lower().endswith('.pdf'):
@@ -109,21 +112,19 @@ class PreviewServiceSelector:
         """
         # 1. 优先使用ONLYOFFICE编辑功能
         if settings.ONLYOFFICE_ENABLED and settings.ONLYOFFICE_SERVER_URL:
-            print(f"[PreviewSelector] 使用ONLYOFFICE编辑服务...")
+            logger.debug("使用ONLYOFFICE编辑服务")
             try:
                 # ONLYOFFICE使用前端组件，返回特殊标记
-                print(f"[PreviewSelector] ONLYOFFICE编辑服务可用")
+                logger.debug("ONLYOFFICE编辑服务可用")
                 return {
                     "edit_url": "use_onlyoffice_component",  # 前端识别此标记使用ONLYOFFICE组件
                     "service_type": "onlyoffice",
                     "file_url": file_url
                 }
             except Exception as e:
-                print(f"[PreviewSelector] ONLYOFFICE编辑服务异常: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception("ONLYOFFICE编辑服务异常: %s", e)
         else:
-            print(f"[PreviewSelector] ONLYOFFICE服务未启用，无法提供编辑功能")
+            logger.debug("ONLYOFFICE服务未启用，无法提供编辑功能")
         
         # 2. 编辑功能不支持降级（华为云仅支持预览）
         return None
@@ -0,0 +1,249 @@
+"""
+参考文件片段检索服务
+
+功能：
+1. 将参考文件切分为片段
+2. 中文按字符 n-gram、英文和数字按单词切分
+3. 使用 BM25 对片段打分，只选取与用户输入最相关的前 k 个片段
+
+索引在每次请求时对引用文件临时构建，不依赖外部检索服务
+"""
+from typing import List, Dict, Tuple, Any, Callable, Awaitable, Optional
+from collections import Counter
+import asyncio
+import logging
+import math
+import re
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CJK_RUN_PATTERN = re.compile(r"[一-鿿]+")
+WORD_PATTERN = re.compile(r"[a-zA-Z0-9]+")
+
+
+def tokenize(text: str, ngram: int = 2) -> List[str]:
+    """
+    切分检索词
+    
+    中文连续片段按字符 n-gram 切分（单字片段保留单字），
+    英文和数字按单词切分并转为小写
+    
+    Args:
+        text: 文本
+        ngram: 中文 n-gram 长度
+    
+    Returns:
+        检索词列表
+    """
+    tokens = []
+    for run in CJK_RUN_PATTERN.findall(text):
+        if len(run) < ngram:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + ngram] for i in range(len(run) - ngram + 1))
+    tokens.extend(word.lower() for word in WORD_PATTERN.findall(text))
+    return tokens
+
+
+def split_chunks(text: str, chunk_size: int = 400) -> List[str]:
+    """
+    将文本切分为片段
+    
+    按段落合并到接近 chunk_size 字符，超长段落按 chunk_size 硬切分
+    
+    Args:
+        text: 文本
+        chunk_size: 片段目标长度（字符数）
+    
+    Returns:
+        片段列表
+    """
+    chunks = []
+    current = ""
+    
+    for paragraph in text.split("\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        
+        while len(paragraph) > chunk_size:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:chunk_size])
+            paragraph = paragraph[chunk_size:]
+        
+        if current and len(current) + len(paragraph) + 1 > chunk_size:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{paragraph}" if current else paragraph
+    
+    if current:
+        chunks.append(current)
+    
+    return chunks
+
+
+class BM25Index:
+    """BM25 索引"""
+    
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            documents: 已切分检索词的文档列表
+            k1: 词频饱和参数
+            b: 文档长度归一化参数
+        """
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(doc) for doc in documents]
+        self.doc_lengths = [len(doc) for doc in documents]
+        self.avg_length = sum(self.doc_lengths) / len(documents) if documents else 0
+        
+        doc_freqs = Counter()
+        for freqs in self.term_freqs:
+            doc_freqs.update(freqs.keys())
+        
+        total = len(documents)
+        self.idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in doc_freqs.items()
+        }
+    
+    def score(self, query: List[str]) -> List[float]:
+        """
+        计算查询对每个文档的得分
+        
+        Args:
+            query: 查询检索词列表
+        
+        Returns:
+            与文档顺序一致的得分列表
+        """
+        query_terms = [term for term in set(query) if term in self.idf]
+        scores = []
+        
+        for freqs, length in zip(self.term_freqs, self.doc_lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            score = 0.0
+            for term in query_terms:
+                tf = freqs.get(term, 0)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(score)
+        
+        return scores
+
+
+class RetrievalService:
+    """参考文件片段检索服务"""
+    
+    async def load_documents(
+        self,
+        files: List[Any],
+        loader: Callable[[Any], Awaitable[Optional[str]]]
+    ) -> List[Tuple[str, str]]:
+        """
+        并发加载参考文件文本
+        
+        单个文件下载或解析失败时跳过该文件，不影响其他文件
+        
+        Args:
+            files: 文件对象（需有 file_name 属性）
+            loader: 加载单个文件文本的协程函数，无内容时返回 None
+        
+        Returns:
+            (文件名, 文本) 列表，保持 files 的顺序
+        """
+        texts = await asyncio.gather(*[loader(file) for file in files], return_exceptions=True)
+        
+        documents = []
+        for file, text in zip(files, texts):
+            if isinstance(text, Exception):
+                logger.warning("Failed to load reference file %s: %s", file.file_name, text)
+            elif text:
+                documents.append((file.file_name, text))
+        return documents
+    
+    def select_excerpts(
+        self,
+        query: str,
+        documents: List[Tuple[str, str]],
+        top_k: int = None,
+        chunk_size: int = None
+    ) -> List[Dict]:
+        """
+        从参考文件中选取与查询最相关的片段
+        
+        Args:
+            query: 查询文本（用户输入）
+            documents: (文件名, 文本) 列表
+            top_k: 选取片段数
+            chunk_size: 片段长度
+        
+        Returns:
+            片段列表，每项包含 file_name、index、text、score，
+            按文件顺序和片段在文件中的位置排序
+        """
+        top_k = top_k or settings.RETRIEVAL_TOP_K
+        chunk_size = chunk_size or settings.RETRIEVAL_CHUNK_SIZE
+        
+        chunks = []
+        for doc_index, (file_name, text) in enumerate(documents):
+            for chunk_index, chunk in enumerate(split_chunks(text or "", chunk_size)):
+                chunks.append({
+                    "file_name": file_name,
+                    "doc_index": doc_index,
+                    "index": chunk_index,
+                    "text": chunk
+                })
+        
+        if not chunks:
+            return []
+        
+        index = BM25Index([tokenize(chunk["text"]) for chunk in chunks])
+        scores = index.score(tokenize(query))
+        for chunk, score in zip(chunks, scores):
+            chunk["score"] = score
+        
+        if any(score > 0 for score in scores):
+            # 得分相同时靠前的片段优先
+            ranked = sorted(chunks, key=lambda c: -c["score"])
+            selected = [chunk for chunk in ranked[:top_k] if chunk["score"] > 0]
+        else:
+            # 查询与文件没有共同检索词时，按顺序轮流取每个文件的开头片段
+            selected = sorted(chunks, key=lambda c: (c["index"], c["doc_index"]))[:top_k]
+        
+        selected.sort(key=lambda c: (c["doc_index"], c["index"]))
+        
+        logger.debug("Selected %s/%s chunks from %s files", len(selected), len(chunks), len(documents))
+        
+        return [
+            {"file_name": c["file_name"], "index": c["index"], "text": c["text"], "score": c["score"]}
+            for c in selected
+        ]
+    
+    def format_excerpts(self, excerpts: List[Dict]) -> str:
+        """
+        将片段格式化为提示词中的参考文件内容
+        
+        Args:
+            excerpts: select_excerpts 返回的片段列表
+        
+        Returns:
+            参考文件内容文本
+        """
+        file_context = ""
+        current_file = None
+        for excerpt in excerpts:
+            if excerpt["file_name"] != current_file:
+                current_file = excerpt["file_name"]
+                file_context += f"\n\n--- 参考文件：{current_file} ---"
+            file_context += f"\n{excerpt['text']}"
+        return file_context
+
+
+# 全局单例
+retrieval_service = RetrievalService()
@@ -165,16 +165,32 @@ class RuleExecutor:
     
     async def _execute_keyword_rule(self, rule: Rule, content: str, context: Dict[str, Any]) -> List[ValidationError]:
         """执行关键词检查规则"""
+        keywords = rule.parameters.get('keywords', [])
+        found_keywords = [keyword for keyword in keywords if keyword in content]
+        return self.build_keyword_errors(rule, found_keywords)
+    
+    def build_keyword_errors(self, rule: Rule, found_keywords: List[str]) -> List[ValidationError]:
+        """
+        根据已命中的关键词生成关键词规则的错误
+        
+        增量验证按段落汇总命中的关键词后也通过此方法生成错误，
+        保证与全量验证的输出一致
+        
+        Args:
+            rule: 关键词规则
+            found_keywords: 文档中出现的关键词
+            
+        Returns:
+            错误列表
+        """
         errors = []
         keywords = rule.parameters.get('keywords', [])
         mode = rule.parameters.get('mode', 'required')  # required, prohibited, any_of
+        found = set(found_keywords)
         
         if mode == 'required':
             # 检查必需关键词
-            missing_keywords = []
-            for keyword in keywords:
-                if keyword not in content:
-                    missing_keywords.append(keyword)
+            missing_keywords = [keyword for keyword in keywords if keyword not in found]
             
             if missing_keywords:
                 errors.append(ValidationError(
@@ -187,23 +203,19 @@ class RuleExecutor:
         
         elif mode == 'prohibited':
             # 检查禁用关键词
-            found_keywords = []
-            for keyword in keywords:
-                if keyword in content:
-                    found_keywords.append(keyword)
+            prohibited_found = [keyword for keyword in keywords if keyword in found]
             
-            if found_keywords:
+            if prohibited_found:
                 errors.append(ValidationError(
                     type=rule.error_type,
                     level=rule.error_level,
-                    description=f"{rule.description}：发现 {', '.join(found_keywords)}",
+                    description=f"{rule.description}：发现 {', '.join(prohibited_found)}",
                     suggestion=rule.suggestion,
                     reference=rule.id
                 ))
         
         elif mode == 'any_of':
             # 检查是否包含任意一个关键词
-            found = any(keyword in content for keyword in keywords)
             if not found:
                 errors.append(ValidationError(
                     type=rule.error_type,
@@ -0,0 +1,607 @@
+"""
+端到端压测
+
+按配置的并发驱动 上传 → 研判 → 生成 → 预览（含 ONLYOFFICE 打开与保存回调）→ 下载 的业务流程，
+统计每个场景的吞吐量、各步骤延迟分位数、错误数以及后端进程的 CPU / 内存占用。
+大模型、MinIO、ONLYOFFICE 由 benchmark_stubs.py 中的本地替身服务代替，整个过程不访问外网，
+只需要本地的 PostgreSQL（Redis 可选），用于在发版前发现性能退化。
+
+默认由本脚本启动后端（uvicorn 子进程，指向替身服务，关闭限流），压测结束后停止。
+
+使用示例：
+  # 全流程，并发 1/8/32 各跑 30 秒
+  python benchmark_load.py --scenarios workflow --concurrency 1,8,32 --duration 30
+  
+  # 单独压测研判和生成，大模型延迟 2 秒，保存为基线
+  python benchmark_load.py --scenarios review,generate --llm-latency-ms 2000 --save-baseline load_baseline.json
+  
+  # 与基线对比，吞吐量或 P95 延迟退化超过 20% 时返回非零退出码
+  python benchmark_load.py --baseline load_baseline.json
+  
+  # 压测已在运行的后端（需已按 python benchmark_stubs.py 输出的环境变量启动）
+  python benchmark_load.py --target http://127.0.0.1:8000 --onlyoffice-url http://127.0.0.1:40001
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_rules import _percentile
+from benchmark_stubs import StubServers
+
+API_PREFIX = "/api/v1"
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# 合成信访文书（模板字段与 benchmark_stubs.TEMPLATE_REPLACEMENTS 对应）
+PETITION_PARAGRAPHS = [
+    "关于信访事项的答复意见",
+    "张三：",
+    "您反映的住房补贴问题已收悉，现将处理情况答复如下。",
+    "经调查，信访人所反映的住房补贴问题属实，相关部门已按政策予以落实。",
+    "处理依据：《信访工作条例》第三十一条、第三十二条。",
+    "如对本答复意见不服，可在收到本意见之日起三十日内向上一级机关请求复查。",
+    "某市信访局",
+    "2024年1月2日",
+]
+
+# 各场景：setup 为每个虚拟用户开始前执行一次（不计入统计），steps 为每轮执行的步骤
+SCENARIOS = {
+    "upload": {"setup": [], "steps": ["upload"]},
+    "review": {"setup": ["upload"], "steps": ["review"]},
+    "generate": {"setup": ["upload"], "steps": ["generate"]},
+    "preview": {"setup": ["generate"], "steps": ["preview", "onlyoffice"]},
+    "download": {"setup": ["generate"], "steps": ["download"]},
+    "workflow": {"setup": [], "steps": ["upload", "review", "generate", "preview", "onlyoffice", "download"]},
+}
+
+
+def build_docx(paragraphs: List[str], repeat: int = 1) -> bytes:
+    """
+    生成 Word 文档
+    
+    Args:
+        paragraphs: 段落内容
+        repeat: 正文段落重复次数，用于调整文档大小
+    
+    Returns:
+        docx 文件内容
+    """
+    from docx import Document
+    
+    document = Document()
+    document.add_heading(paragraphs[0], level=1)
+    for _ in range(repeat):
+        for paragraph in paragraphs[1:-2]:
+            document.add_paragraph(paragraph)
+    for paragraph in paragraphs[-2:]:
+        document.add_paragraph(paragraph)
+    
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+class ResourceSampler:
+    """
+    定时采样后端进程（含 worker 子进程）的 CPU 和内存占用
+    
+    读取 /proc，仅支持 Linux；其他平台或未指定进程时不统计
+    """
+    
+    def __init__(self, pid: Optional[int], interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.enabled = pid is not None and os.path.exists(f"/proc/{pid}")
+        self.cpu_samples: List[float] = []
+        self.rss_samples: List[float] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _pids(self) -> List[int]:
+        pids = [self.pid]
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # 进程名可能包含空格，从最后一个 ")" 之后取字段
+                    fields = f.read().rsplit(")", 1)[1].split()
+                if int(fields[1]) == self.pid:
+                    pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+        return pids
+    
+    def _read(self):
+        """(累计 CPU 秒数, 常驻内存字节数)"""
+        cpu_ticks = 0
+        rss_pages = 0
+        for pid in self._pids():
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                cpu_ticks += int(fields[11]) + int(fields[12])
+                with open(f"/proc/{pid}/statm") as f:
+                    rss_pages += int(f.read().split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+        return cpu_ticks / os.sysconf("SC_CLK_TCK"), rss_pages * os.sysconf("SC_PAGE_SIZE")
+    
+    def _run(self):
+        last_cpu, _ = self._read()
+        last_time = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            cpu, rss = self._read()
+            now = time.perf_counter()
+            self.cpu_samples.append((cpu - last_cpu) / (now - last_time) * 100)
+            self.rss_samples.append(rss / 1024 / 1024)
+            last_cpu, last_time = cpu, now
+    
+    def start(self):
+        if self.enabled:
+            self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self) -> Optional[Dict[str, float]]:
+        """停止采样，返回汇总（未启用或没有样本时返回 None）"""
+        if self._thread is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        if not self.cpu_samples:
+            return None
+        return {
+            "cpu_percent_avg": sum(self.cpu_samples) / len(self.cpu_samples),
+            "cpu_percent_max": max(self.cpu_samples),
+            "rss_mb_max": max(self.rss_samples),
+        }
+
+
+class VirtualUser:
+    """一个虚拟用户：按场景步骤依次调用接口，记录每步耗时"""
+    
+    def __init__(self, client: httpx.AsyncClient, onlyoffice_url: Optional[str], template_id: int, upload_bytes: bytes):
+        self.client = client
+        self.onlyoffice_url = onlyoffice_url
+        self.template_id = template_id
+        self.upload_bytes = upload_bytes
+        self.file_id: Optional[int] = None
+        self.document_id: Optional[int] = None
+        self.session_id = uuid.uuid4().hex
+    
+    async def upload(self) -> httpx.Response:
+        files = {"file": (f"petition_{uuid.uuid4().hex[:8]}.docx", self.upload_bytes, DOCX_CONTENT_TYPE)}
+        response = await self.client.post(f"{API_PREFIX}/files/upload", files=files)
+        if response.status_code == 200:
+            self.file_id = response.json()["id"]
+        return response
+    
+    async def review(self) -> httpx.Response:
+        return await self.client.post(f"{API_PREFIX}/documents/review", json={"file_id": self.file_id})
+    
+    async def generate(self) -> httpx.Response:
+        payload = {
+            "template_id": self.template_id,
+            "prompt": "请根据参考文件生成住房补贴问题的答复意见，信访人张三",
+            "session_id": self.session_id,
+            "file_references": [self.file_id] if self.file_id else None
+        }
+        response = await self.client.post(f"{API_PREFIX}/documents/generate", json=payload)
+        if response.status_code == 200:
+            self.document_id = response.json()["id"]
+        return response
+    
+    async def preview(self) -> httpx.Response:
+        return await self.client.get(f"{API_PREFIX}/documents/{self.document_id}/preview")
+    
+    async def onlyoffice(self) -> httpx.Response:
+        """取编辑器配置，再由模拟的 ONLYOFFICE 从后端拉取文档并回调保存"""
+        response = await self.client.post(
+            f"{API_PREFIX}/onlyoffice/config", json={"document_id": self.document_id, "mode": "edit"}
+        )
+        if response.status_code != 200 or not self.onlyoffice_url:
+            return response
+        return await self.client.post(
+            f"{self.onlyoffice_url}/coauthoring/open", json={"config": response.json(), "save": True}
+        )
+    
+    async def download(self) -> httpx.Response:
+        return await self.client.get(f"{API_PREFIX}/documents/{self.document_id}/download", params={"format": "pdf"})
+
+
+async def _run_user(
+    user: VirtualUser,
+    scenario: Dict[str, List[str]],
+    deadline: float,
+    iterations: int,
+    samples: Dict[str, Dict[str, Any]]
+) -> int:
+    """执行一个虚拟用户，返回完成的轮数"""
+    for step in scenario["setup"]:
+        response = await getattr(user, step)()
+        if response.status_code >= 400:
+            raise RuntimeError(f"准备步骤 {step} 失败: HTTP {response.status_code} {response.text[:200]}")
+    
+    completed = 0
+    while time.perf_counter() < deadline and (not iterations or completed < iterations):
+        succeeded = True
+        for step in scenario["steps"]:
+            record = samples[step]
+            start = time.perf_counter()
+            try:
+                response = await getattr(user, step)()
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            record["latencies"].append(time.perf_counter() - start)
+            if not isinstance(status, int) or status >= 400:
+                record["errors"][str(status)] = record["errors"].get(str(status), 0) + 1
+                succeeded = False
+                break
+        if succeeded:
+            completed += 1
+    return completed
+
+
+async def run_scenario(
+    base_url: str,
+    token: str,
+    onlyoffice_url: Optional[str],
+    template_id: int,
+    name: str,
+    concurrency: int,
+    duration: float,
+    iterations: int,
+    server_pid: Optional[int],
+    doc_repeat: int = 1
+) -> Dict[str, Any]:
+    """
+    以指定并发执行一个场景
+    
+    Args:
+        base_url: 后端地址
+        token: 访问令牌
+        onlyoffice_url: 模拟 ONLYOFFICE 地址，为空时只请求编辑器配置
+        template_id: 生成使用的模板
+        name: 场景名称
+        concurrency: 虚拟用户数
+        duration: 持续时间（秒）
+        iterations: 每个虚拟用户的轮数上限（0 表示只按时间）
+        server_pid: 后端进程号，用于统计资源占用
+        doc_repeat: 上传文档的正文重复次数
+    
+    Returns:
+        场景报告
+    """
+    scenario = SCENARIOS[name]
+    upload_bytes = build_docx(PETITION_PARAGRAPHS, doc_repeat)
+    samples = {step: {"latencies": [], "errors": {}} for step in scenario["steps"]}
+    
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+    async with httpx.AsyncClient(
+        base_url=base_url, headers={"Authorization": f"Bearer {token}"}, timeout=300, limits=limits
+    ) as client:
+        users = [VirtualUser(client, onlyoffice_url, template_id, upload_bytes) for _ in range(concurrency)]
+        sampler = ResourceSampler(server_pid).start()
+        start = time.perf_counter()
+        completed = await asyncio.gather(*[
+            _run_user(user, scenario, start + duration, iterations, samples) for user in users
+        ])
+        elapsed = time.perf_counter() - start
+        resources = sampler.stop()
+    
+    steps = {}
+    total_requests = 0
+    total_errors = 0
+    for step, record in samples.items():
+        latencies = record["latencies"]
+        errors = sum(record["errors"].values())
+        total_requests += len(latencies)
+        total_errors += errors
+        steps[step] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "error_codes": record["errors"],
+            "latency_ms": {
+                "p50": _percentile(latencies, 50) * 1000,
+                "p95": _percentile(latencies, 95) * 1000,
+                "p99": _percentile(latencies, 99) * 1000,
+                "max": max(latencies) * 1000 if latencies else 0.0,
+            }
+        }
+    
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "elapsed": elapsed,
+        "iterations": sum(completed),
+        "iterations_per_sec": sum(completed) / elapsed if elapsed > 0 else 0.0,
+        "requests": total_requests,
+        "requests_per_sec": total_requests / elapsed if elapsed > 0 else 0.0,
+        "errors": total_errors,
+        "steps": steps,
+        "resources": resources,
+    }
+
+
+async def prepare_account(base_url: str, username: str, password: str) -> Dict[str, Any]:
+    """
+    注册（已存在时跳过）并登录压测用户，上传并确认一个 Word 模板
+    
+    Returns:
+        {"token": 访问令牌, "template_id": 模板 ID}
+    """
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        await client.post(f"{API_PREFIX}/auth/register", json={
+            "username": username, "email": f"{username}@benchmark.local", "password": password
+        })
+        response = await client.post(f"{API_PREFIX}/auth/login", data={"username": username, "password": password})
+        response.raise_for_status()
+        token = response.json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        
+        response = await client.post(f"{API_PREFIX}/templates/upload", files={
+            "file": ("benchmark_template.docx", build_docx(PETITION_PARAGRAPHS), DOCX_CONTENT_TYPE)
+        })
+        response.raise_for_status()
+        preview = response.json()
+        response = await client.post(f"{API_PREFIX}/templates/confirm", json={
+            "name": f"压测模板_{uuid.uuid4().hex[:6]}",
+            "document_type": "答复意见",
+            "temp_template_path": preview["temp_template_path"],
+            "temp_original_path": preview["temp_original_path"],
+            "fields": preview.get("fields") or {}
+        })
+        response.raise_for_status()
+        return {"token": token, "template_id": response.json()["id"]}
+
+
+def _free_port(host: str) -> int:
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def start_backend(host: str, port: int, workers: int, env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    """
+    启动后端（uvicorn 子进程），等待 /health 可用
+    
+    Args:
+        host: 监听地址
+        port: 端口
+        workers: worker 进程数
+        env: 附加环境变量（覆盖 .env 中的配置）
+        log_path: 后端输出写入的文件
+    
+    Returns:
+        后端进程
+    """
+    log_file = open(log_path, "w", encoding="utf-8")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", host, "--port", str(port),
+         "--workers", str(workers), "--no-access-log"],
+        cwd=str(Path(__file__).parent),
+        env={**os.environ, **env},
+        stdout=log_file,
+        stderr=subprocess.STDOUT
+    )
+    
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"后端启动失败，日志: {log_path}")
+        try:
+            if httpx.get(f"http://{host}:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    
+    process.terminate()
+    raise RuntimeError(f"后端启动超时，日志: {log_path}")
+
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    与基线对比，返回退化项（按 场景 + 并发 匹配）
+    
+    Args:
+        report: 本次报告
+        baseline: 基线报告
+        threshold: 允许的退化比例（0.2 表示 20%）
+    
+    Returns:
+        退化描述列表
+    """
+    regressions = []
+    baseline_results = {(r["scenario"], r["concurrency"]): r for r in baseline.get("results", [])}
+    
+    for result in report["results"]:
+        key = (result["scenario"], result["concurrency"])
+        base = baseline_results.get(key)
+        if not base:
+            continue
+        label = f"{result['scenario']} ×{result['concurrency']}"
+        
+        if base["iterations_per_sec"] and result["iterations_per_sec"] < base["iterations_per_sec"] * (1 - threshold):
+            regressions.append(
+                f"{label} 吞吐量: {result['iterations_per_sec']:.2f} 轮/s（基线 {base['iterations_per_sec']:.2f} 轮/s）"
+            )
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{label} 错误数: {result['errors']}（基线 {base['errors']}）")
+        
+        for step, stats in result["steps"].items():
+            base_p95 = base["steps"].get(step, {}).get("latency_ms", {}).get("p95")
+            if base_p95 and stats["latency_ms"]["p95"] > base_p95 * (1 + threshold):
+                regressions.append(
+                    f"{label} {step} P95: {stats['latency_ms']['p95']:.0f} ms（基线 {base_p95:.0f} ms）"
+                )
+    
+    return regressions
+
+
+def print_report(report: Dict[str, Any]):
+    """打印压测报告"""
+    print("=" * 72)
+    print("端到端压测")
+    print("=" * 72)
+    config = report["config"]
+    print(f"后端: {config['target']}（worker {config['workers']}）")
+    print(f"大模型替身: 延迟 {config['llm_latency_ms']:.0f}±{config['llm_jitter_ms']:.0f} ms，"
+          f"失败率 {config['llm_failure_rate']:.0%}")
+    
+    for result in report["results"]:
+        print(f"\n场景 {result['scenario']}，并发 {result['concurrency']}，耗时 {result['elapsed']:.1f}s")
+        print(f"  完成 {result['iterations']} 轮，{result['iterations_per_sec']:.2f} 轮/s，"
+              f"{result['requests_per_sec']:.1f} 请求/s，错误 {result['errors']}")
+        resources = result.get("resources")
+        if resources:
+            print(f"  后端资源: CPU 平均 {resources['cpu_percent_avg']:.0f}%，峰值 {resources['cpu_percent_max']:.0f}%，"
+                  f"内存峰值 {resources['rss_mb_max']:.0f} MB")
+        print(f"  {'步骤':<12} {'请求数':<8} {'错误':<6} {'P50(ms)':<10} {'P95(ms)':<10} {'P99(ms)':<10} {'最大(ms)':<10}")
+        for step, stats in result["steps"].items():
+            latency = stats["latency_ms"]
+            print(f"  {step:<12} {stats['requests']:<8} {stats['errors']:<6} {latency['p50']:<10.1f} "
+                  f"{latency['p95']:<10.1f} {latency['p99']:<10.1f} {latency['max']:<10.1f}")
+            if stats["error_codes"]:
+                print(f"    错误: {stats['error_codes']}")
+    
+    if report.get("stub_stats"):
+        print(f"\n替身服务请求统计: {json.dumps(report['stub_stats'], ensure_ascii=False)}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="端到端离线压测（大模型、MinIO、ONLYOFFICE 使用本地替身）")
+    parser.add_argument("--scenarios", default="workflow", help=f"场景（逗号分隔）: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,8", help="并发档位（逗号分隔）")
+    parser.add_argument("--duration", type=float, default=30, help="每个场景、每档并发的持续时间（秒）")
+    parser.add_argument("--iterations", type=int, default=0, help="每个虚拟用户的轮数上限（0 表示只按时间）")
+    parser.add_argument("--doc-repeat", type=int, default=5, help="上传文档正文段落的重复次数")
+    parser.add_argument("--target", help="压测已运行的后端，不指定时由本脚本启动")
+    parser.add_argument("--onlyoffice-url", help="配合 --target 使用的模拟 ONLYOFFICE 地址")
+    parser.add_argument("--server-pid", type=int, help="配合 --target 使用，统计该进程的资源占用")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="启动后端的端口（0 表示自动分配）")
+    parser.add_argument("--workers", type=int, default=1, help="启动后端的 worker 数")
+    parser.add_argument("--server-env", action="append", default=[], help="启动后端的附加环境变量 KEY=VALUE，可重复")
+    parser.add_argument("--server-log", default="benchmark_server.log", help="启动后端的输出文件")
+    parser.add_argument("--llm-latency-ms", type=float, default=500, help="大模型替身响应延迟")
+    parser.add_argument("--llm-jitter-ms", type=float, default=100, help="大模型替身延迟抖动")
+    parser.add_argument("--llm-chunk-interval-ms", type=float, default=20, help="大模型替身流式输出块间隔")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="大模型替身返回 503 的比例")
+    parser.add_argument("--s3-latency-ms", type=float, default=0, help="对象存储替身每次请求的附加延迟")
+    parser.add_argument("--username", default="benchmark_user")
+    parser.add_argument("--password", default="benchmark_password")
+    parser.add_argument("--baseline", help="基线报告路径，用于检测性能退化")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的退化比例")
+    parser.add_argument("--save-baseline", help="将本次报告保存为基线")
+    parser.add_argument("--json", action="store_true", help="以 JSON 格式输出报告")
+    args = parser.parse_args(argv)
+    
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        print(f"❌ 未知场景: {', '.join(unknown)}")
+        return 1
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+    
+    stubs = None
+    server = None
+    try:
+        if args.target:
+            base_url = args.target.rstrip("/")
+            onlyoffice_url = args.onlyoffice_url
+            server_pid = args.server_pid
+        else:
+            stubs = StubServers(
+                args.host, args.llm_latency_ms, args.llm_jitter_ms, args.llm_chunk_interval_ms,
+                args.llm_failure_rate, args.s3_latency_ms
+            ).start()
+            port = args.port or _free_port(args.host)
+            base_url = f"http://{args.host}:{port}"
+            env = stubs.backend_env(base_url)
+            # 压测关注处理能力，关闭限流；准入控制保持默认，被拒绝的请求计为错误
+            env["RATE_LIMIT_ENABLED"] = "false"
+            for item in args.server_env:
+                name, _, value = item.partition("=")
+                env[name] = value
+            server = start_backend(args.host, port, args.workers, env, args.server_log)
+            onlyoffice_url = stubs.url("onlyoffice")
+            server_pid = server.pid
+        
+        account = asyncio.run(prepare_account(base_url, args.username, args.password))
+        
+        results = []
+        for name in scenarios:
+            for concurrency in concurrency_levels:
+                print(f"→ {name} ×{concurrency} ...", file=sys.stderr)
+                results.append(asyncio.run(run_scenario(
+                    base_url, account["token"], onlyoffice_url, account["template_id"], name,
+                    concurrency, args.duration, args.iterations, server_pid, args.doc_repeat
+                )))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        if stubs is not None:
+            stubs.stop()
+    
+    report = {
+        "config": {
+            "target": base_url,
+            "workers": args.workers if not args.target else None,
+            "duration": args.duration,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_jitter_ms": args.llm_jitter_ms,
+            "llm_failure_rate": args.llm_failure_rate,
+            "s3_latency_ms": args.s3_latency_ms,
+        },
+        "results": results,
+        "stub_stats": stubs.stats.snapshot() if stubs else None,
+    }
+    
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+    
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ 检测到性能退化（阈值 {args.threshold:.0%}）:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            exit_code = 1
+        else:
+            print(f"\n✓ 未检测到性能退化（阈值 {args.threshold:.0%}）")
+    
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n✓ 基线已保存: {args.save_baseline}")
+    
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
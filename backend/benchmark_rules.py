@@ -0,0 +1,351 @@
+"""
+本地规则引擎基准测试
+
+离线测量 LocalRulesEngine 的吞吐量和各规则耗时，用于在上线前评估
+validation_rules.json 的修改对性能的影响。不依赖 PostgreSQL、Redis 和 MinIO。
+
+使用示例：
+  # 生成语料并测试当前规则配置
+  python benchmark_rules.py --generate 200 --sizes 2000,20000,100000
+  
+  # 使用真实语料目录（.txt/.docx/.pdf），保存为基线
+  python benchmark_rules.py --corpus ./corpus --save-baseline baseline.json
+  
+  # 与基线对比，吞吐量或规则耗时退化超过 20% 时返回非零退出码
+  python benchmark_rules.py --rules config/validation_rules.new.json --baseline baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_RULES_PATH = str(Path(__file__).parent / "config" / "validation_rules.json")
+
+# 合成语料使用的段落素材
+PARAGRAPH_SAMPLES = [
+    "关于信访事项的答复意见",
+    "主送单位：市信访局",
+    "信访人反映的问题经调查核实，现将处理情况答复如下。",
+    "正文：经调查，信访人所反映的住房补贴问题属实，相关部门已按政策予以落实。",
+    "处理依据：《信访工作条例》第三十一条、第三十二条。",
+    "如对本答复意见不服，可在收到本意见之日起三十日内向上一级机关请求复查。",
+    "联系方式：0571-88888888，地址：某市某区某路1号。",
+    "附件：调查材料清单",
+    "抄送：区信访办",
+    "落款：某市信访局",
+    "签发人：张某（签字）（盖章）",
+    "2024年1月2日",
+]
+
+
+def generate_corpus(count: int, sizes: List[int], seed: int = 42) -> List[str]:
+    """
+    生成合成信访文书语料
+    
+    Args:
+        count: 文档数量
+        sizes: 文档长度档位（字符数），按顺序循环使用
+        seed: 随机种子，保证多次运行语料一致
+    
+    Returns:
+        文档内容列表
+    """
+    rng = random.Random(seed)
+    corpus = []
+    
+    for i in range(count):
+        target_size = sizes[i % len(sizes)]
+        paragraphs = [PARAGRAPH_SAMPLES[0], PARAGRAPH_SAMPLES[1]]
+        length = sum(len(p) for p in paragraphs)
+        
+        while length < target_size:
+            paragraph = rng.choice(PARAGRAPH_SAMPLES[2:])
+            paragraphs.append(paragraph)
+            length += len(paragraph) + 1
+        
+        corpus.append("\n".join(paragraphs))
+    
+    return corpus
+
+
+def load_corpus(corpus_dir: str) -> List[str]:
+    """
+    从目录加载语料（支持 .txt、.docx、.pdf）
+    
+    Args:
+        corpus_dir: 语料目录
+    
+    Returns:
+        文档内容列表
+    """
+    corpus = []
+    
+    for path in sorted(Path(corpus_dir).rglob("*")):
+        suffix = path.suffix.lower().lstrip(".")
+        if suffix == "txt":
+            corpus.append(path.read_text(encoding="utf-8"))
+        elif suffix in ("docx", "pdf"):
+            # document_parser 不依赖应用配置，没有 .env 也能解析
+            from app.services.document_parser import parse_pdf, parse_word
+            parse = parse_pdf if suffix == "pdf" else parse_word
+            try:
+                parsed = parse(path.read_bytes())
+            except Exception as e:
+                print(f"跳过无法解析的文件 {path}: {e}", file=sys.stderr)
+                continue
+            if parsed.get("text"):
+                corpus.append(parsed["text"])
+    
+    return corpus
+
+
+def _validate_chunk(rules_path: str, texts: List[str], iterations: int) -> Dict[str, Any]:
+    """
+    在工作进程中验证一批文档
+    
+    Args:
+        rules_path: 规则配置文件路径
+        texts: 文档内容列表
+        iterations: 每个文档重复验证次数
+    
+    Returns:
+        每个文档的耗时和每条规则的耗时汇总
+    """
+    from app.core.rules_config import RulesConfigManager
+    from app.services.local_rules_engine import LocalRulesEngine
+    
+    async def run() -> Dict[str, Any]:
+        engine = LocalRulesEngine(RulesConfigManager(rules_path))
+        if not await engine.config_manager.load_config():
+            raise RuntimeError(f"规则配置加载失败: {rules_path}")
+        
+        # 预热：编译正则等一次性开销不计入结果
+        await engine.validate_document(texts[0])
+        engine.executor.execution_times.clear()
+        
+        doc_times = []
+        validation_start = time.perf_counter()
+        for _ in range(iterations):
+            for text in texts:
+                start_time = time.perf_counter()
+                await engine.validate_document(text)
+                doc_times.append(time.perf_counter() - start_time)
+        
+        rule_costs = dict(engine.executor.execution_times)
+        return {
+            "doc_times": doc_times,
+            "rule_costs": rule_costs,
+            "elapsed": time.perf_counter() - validation_start
+        }
+    
+    return asyncio.run(run())
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_benchmark(rules_path: str, corpus: List[str], workers: int, iterations: int) -> Dict[str, Any]:
+    """
+    并行执行基准测试
+    
+    Args:
+        rules_path: 规则配置文件路径
+        corpus: 文档内容列表
+        workers: 工作进程数
+        iterations: 每个文档重复验证次数
+    
+    Returns:
+        基准测试报告
+    """
+    workers = max(1, min(workers, len(corpus)))
+    chunks = [corpus[i::workers] for i in range(workers)]
+    
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_validate_chunk, rules_path, chunk, iterations) for chunk in chunks]
+        chunk_results = [future.result() for future in futures]
+    wall_time = time.perf_counter() - start_time
+    
+    doc_times = []
+    rule_times: Dict[str, List[float]] = {}
+    for chunk_result in chunk_results:
+        doc_times.extend(chunk_result["doc_times"])
+        for rule_id, times in chunk_result["rule_costs"].items():
+            rule_times.setdefault(rule_id, []).extend(times)
+    
+    # 单条规则耗时在微秒级，使用中位数对比以减少调度噪声的影响
+    rule_costs = {
+        rule_id: {
+            "executions": len(times),
+            "total_time": sum(times),
+            "avg_time_ms": sum(times) / len(times) * 1000,
+            "p50_time_ms": _percentile(times, 50) * 1000,
+        }
+        for rule_id, times in rule_times.items()
+        if times
+    }
+    
+    total_docs = len(doc_times)
+    total_chars = sum(len(text) for text in corpus) * iterations
+    # 吞吐量以最慢工作进程的验证耗时计算，排除进程启动和规则加载开销
+    busy_time = max(chunk_result["elapsed"] for chunk_result in chunk_results)
+    
+    return {
+        "rules_path": rules_path,
+        "workers": workers,
+        "documents": total_docs,
+        "total_chars": total_chars,
+        "wall_time": wall_time,
+        "busy_time": busy_time,
+        "docs_per_sec": total_docs / busy_time if busy_time > 0 else 0.0,
+        "chars_per_sec": total_chars / busy_time if busy_time > 0 else 0.0,
+        "latency_ms": {
+            "p50": _percentile(doc_times, 50) * 1000,
+            "p95": _percentile(doc_times, 95) * 1000,
+            "p99": _percentile(doc_times, 99) * 1000,
+            "max": max(doc_times) * 1000 if doc_times else 0.0,
+        },
+        "rule_costs": rule_costs,
+    }
+
+
+def compare_with_baseline(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float,
+    min_delta_ms: float = 0.05
+) -> List[str]:
+    """
+    与基线对比，返回退化项
+    
+    Args:
+        report: 本次报告
+        baseline: 基线报告
+        threshold: 允许的退化比例（0.2 表示 20%）
+        min_delta_ms: 规则平均耗时的最小退化绝对值，低于此值视为测量噪声
+    
+    Returns:
+        退化描述列表
+    """
+    regressions = []
+    
+    if baseline.get("docs_per_sec") and report["docs_per_sec"] < baseline["docs_per_sec"] * (1 - threshold):
+        regressions.append(
+            f"吞吐量: {report['docs_per_sec']:.1f} docs/s（基线 {baseline['docs_per_sec']:.1f} docs/s）"
+        )
+    
+    baseline_p95 = baseline.get("latency_ms", {}).get("p95")
+    if baseline_p95 and report["latency_ms"]["p95"] > baseline_p95 * (1 + threshold):
+        regressions.append(
+            f"P95 延迟: {report['latency_ms']['p95']:.2f} ms（基线 {baseline_p95:.2f} ms）"
+        )
+    
+    baseline_rules = baseline.get("rule_costs", {})
+    for rule_id, cost in report["rule_costs"].items():
+        baseline_cost = baseline_rules.get(rule_id)
+        if not baseline_cost:
+            regressions.append(f"新增规则 {rule_id}: {cost['p50_time_ms']:.3f} ms/次")
+            continue
+        baseline_time = baseline_cost["p50_time_ms"]
+        delta = cost["p50_time_ms"] - baseline_time
+        if delta > min_delta_ms and cost["p50_time_ms"] > baseline_time * (1 + threshold):
+            regressions.append(
+                f"规则 {rule_id}: {cost['p50_time_ms']:.3f} ms/次（基线 {baseline_time:.3f} ms/次）"
+            )
+    
+    return regressions
+
+
+def print_report(report: Dict[str, Any], top: int = 10):
+    """打印基准测试报告"""
+    print("=" * 60)
+    print("本地规则引擎基准测试")
+    print("=" * 60)
+    print(f"规则配置: {report['rules_path']}")
+    print(f"工作进程: {report['workers']}")
+    print(f"文档数量: {report['documents']}，总字符数: {report['total_chars']}")
+    print(f"总耗时: {report['wall_time']:.2f}s（验证耗时 {report['busy_time']:.2f}s）")
+    print(f"吞吐量: {report['docs_per_sec']:.1f} docs/s，{report['chars_per_sec'] / 1000:.1f} K字符/s")
+    latency = report["latency_ms"]
+    print(f"单文档延迟: P50 {latency['p50']:.2f} ms，P95 {latency['p95']:.2f} ms，"
+          f"P99 {latency['p99']:.2f} ms，最大 {latency['max']:.2f} ms")
+    
+    print("\n规则耗时（按总耗时降序）")
+    print("-" * 60)
+    print(f"{'规则ID':<20} {'执行次数':<10} {'中位数(ms)':<12} {'平均(ms)':<12} {'总耗时(s)':<10}")
+    ranked = sorted(report["rule_costs"].items(), key=lambda item: item[1]["total_time"], reverse=True)
+    for rule_id, cost in ranked[:top]:
+        print(f"{rule_id:<20} {cost['executions']:<10} {cost['p50_time_ms']:<12.3f} "
+              f"{cost['avg_time_ms']:<12.3f} {cost['total_time']:<10.3f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="本地规则引擎离线基准测试")
+    parser.add_argument("--rules", default=DEFAULT_RULES_PATH, help="规则配置文件路径")
+    parser.add_argument("--corpus", help="语料目录（.txt/.docx/.pdf），不指定时生成合成语料")
+    parser.add_argument("--generate", type=int, default=100, help="生成的合成文档数量")
+    parser.add_argument("--sizes", default="2000,20000,100000", help="合成文档长度档位（字符数，逗号分隔）")
+    parser.add_argument("--seed", type=int, default=42, help="合成语料随机种子")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并行工作进程数")
+    parser.add_argument("--iterations", type=int, default=1, help="每个文档重复验证次数")
+    parser.add_argument("--baseline", help="基线报告路径，用于检测性能退化")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的退化比例")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="规则耗时退化的最小绝对值（毫秒）")
+    parser.add_argument("--save-baseline", help="将本次报告保存为基线")
+    parser.add_argument("--json", action="store_true", help="以 JSON 格式输出报告")
+    args = parser.parse_args(argv)
+    
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        sizes = [int(size) for size in args.sizes.split(",")]
+        corpus = generate_corpus(args.generate, sizes, args.seed)
+    
+    if not corpus:
+        print("❌ 语料为空")
+        return 1
+    
+    report = run_benchmark(args.rules, corpus, args.workers, args.iterations)
+    
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+    
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n❌ 检测到性能退化（阈值 {args.threshold:.0%}）:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            exit_code = 1
+        else:
+            print(f"\n✓ 未检测到性能退化（阈值 {args.threshold:.0%}）")
+    
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n✓ 基线已保存: {args.save_baseline}")
+    
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
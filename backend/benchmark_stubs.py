@@ -0,0 +1,579 @@
+"""
+压测用的本地替身服务
+
+benchmark_load.py 用这些服务代替外部依赖，使压测完全离线、结果可复现：
+1. StubLLMHandler：OpenAI 兼容的 /chat/completions 和 /models，可配置延迟、抖动、失败率，
+   支持 stream=True（SSE 分块输出，首块延迟 + 块间隔）；按系统提示词返回研判、生成、模板字段等固定格式的 JSON
+2. StubS3Handler：内存中的 S3 兼容对象存储，覆盖 minio SDK 用到的接口（存储桶、上传、分片上传、下载、删除）
+3. FakeOnlyOfficeHandler：模拟 ONLYOFFICE 文档服务器打开文档的过程：按编辑器配置中的地址从后端拉取文档，
+   编辑模式下再回调后端保存（回调中的下载地址指向本服务缓存的文档）
+
+单独运行（用于手工联调，后端按输出的环境变量启动即可）：
+  python benchmark_stubs.py --llm-latency-ms 800 --llm-chunk-interval-ms 30
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import urllib.request
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, List
+from urllib.parse import urlsplit, parse_qs, unquote
+
+# 合成文档中可被识别为模板字段的内容（与 benchmark_load.py 生成的文档一致）
+TEMPLATE_REPLACEMENTS = {
+    "张三": "{{ petitioner_name }}",
+    "2024年1月2日": "{{ petition_date }}",
+    "住房补贴问题": "{{ petition_subject }}",
+}
+TEMPLATE_FIELDS = {
+    "petitioner_name": {"label": "信访人", "type": "text", "required": True, "description": "信访人姓名"},
+    "petition_date": {"label": "日期", "type": "date", "required": True, "description": "答复日期"},
+    "petition_subject": {"label": "信访事项", "type": "text", "required": True, "description": "反映的问题"},
+}
+
+GENERATED_CONTENT = (
+    "关于信访事项的答复意见\n\n"
+    "　　张三：\n\n"
+    "　　您反映的住房补贴问题已收悉。经调查核实，相关部门已按政策予以落实。\n\n"
+    "　　处理依据：《信访工作条例》第三十一条、第三十二条。\n\n"
+    "　　如对本答复意见不服，可在收到本意见之日起三十日内向上一级机关请求复查。\n\n"
+    "                                                    某市信访局\n"
+    "                                                    2024年1月2日"
+)
+
+S3_NAMESPACE = "http://s3.amazonaws.com/doc/2006-03-01/"
+
+
+class StubStats:
+    """各替身服务的请求计数（线程安全）"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+    
+    def incr(self, key: str, amount: int = 1):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + amount
+    
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    """不输出访问日志、支持 keep-alive 的请求处理基类"""
+    
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+    
+    def _send(self, status: int, body: bytes = b"", content_type: str = "application/json",
+              headers: Optional[Dict[str, str]] = None, content_length: Optional[int] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        # HEAD 响应不带正文，但 Content-Length 需要是对象大小
+        self.send_header("Content-Length", str(len(body) if content_length is None else content_length))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+    
+    def _send_json(self, status: int, data: Any):
+        self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+
+# ==================== 大模型 ====================
+
+def build_llm_reply(messages: List[Dict[str, Any]]) -> str:
+    """
+    按系统提示词选择与 DeepSeekService 各方法约定格式一致的回复
+    
+    Args:
+        messages: 请求中的消息列表
+    
+    Returns:
+        回复内容
+    """
+    system_prompt = "\n".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    
+    if "文书审核专家" in system_prompt:
+        return json.dumps({
+            "summary": "文书整体结构完整，存在少量格式问题。",
+            "errors": [
+                {"description": "落款日期格式不规范", "suggestion": "使用“YYYY年MM月DD日”格式", "reference": "《党政机关公文格式》"}
+            ]
+        }, ensure_ascii=False)
+    
+    if "模板分析专家" in system_prompt:
+        return json.dumps({"fields": TEMPLATE_FIELDS, "replacements": TEMPLATE_REPLACEMENTS}, ensure_ascii=False)
+    
+    if "field_values" in system_prompt:
+        # 字段说明格式："- petitioner_name (信访人): text, 必填"
+        names = re.findall(r"^- (\w+) \(", system_prompt, re.MULTILINE)
+        values = {name: f"{name}_值" for name in names}
+        values.update({"petitioner_name": "张三", "petition_date": "2024年1月2日", "petition_subject": "住房补贴问题"})
+        return json.dumps({
+            "chat_message": "已根据您的需求填写全部字段。",
+            "field_values": {name: values[name] for name in names} or values,
+            "complete": True
+        }, ensure_ascii=False)
+    
+    if "文书生成专家" in system_prompt:
+        return json.dumps({
+            "chat_message": "已生成信访事项答复意见，请核对事实部分。",
+            "document_content": GENERATED_CONTENT,
+            "summary": "对住房补贴问题的答复意见。",
+            "suggestions": ["补充调查过程", "注明联系方式"]
+        }, ensure_ascii=False)
+    
+    return "用户此前咨询了信访事项答复意见的生成，已生成一份答复意见草稿。"
+
+
+class StubLLMHandler(_QuietHandler):
+    """OpenAI 兼容的大模型接口"""
+    
+    # 由 StubServers 在启动时设置
+    latency_ms = 500.0
+    jitter_ms = 100.0
+    chunk_interval_ms = 20.0
+    chunk_chars = 16
+    failure_rate = 0.0
+    stats: StubStats = None
+    rng = random.Random(42)
+    rng_lock = threading.Lock()
+    
+    def _delay(self):
+        """本次请求的延迟（秒）和是否模拟失败"""
+        with self.rng_lock:
+            jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+            failed = self.rng.random() < self.failure_rate
+        return max(self.latency_ms + jitter, 0) / 1000, failed
+    
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "deepseek-chat", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+    
+    def do_POST(self):
+        body = self._read_body()
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        
+        payload = json.loads(body or b"{}")
+        messages = payload.get("messages", [])
+        delay, failed = self._delay()
+        self.stats.incr("llm_requests")
+        
+        time.sleep(delay)
+        if failed:
+            self.stats.incr("llm_failures")
+            self._send_json(503, {"error": {"message": "stub failure", "type": "server_error"}})
+            return
+        
+        reply = build_llm_reply(messages)
+        prompt_chars = sum(len(m.get("content", "")) for m in messages)
+        usage = {
+            "prompt_tokens": prompt_chars // 2,
+            "completion_tokens": len(reply) // 2,
+            "total_tokens": (prompt_chars + len(reply)) // 2
+        }
+        self.stats.incr("llm_prompt_tokens", usage["prompt_tokens"])
+        self.stats.incr("llm_completion_tokens", usage["completion_tokens"])
+        
+        if payload.get("stream"):
+            self._stream(payload, reply, usage)
+            return
+        
+        self._send_json(200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "deepseek-chat"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": usage
+        })
+    
+    def _stream(self, payload: Dict[str, Any], reply: str, usage: Dict[str, int]):
+        """SSE 分块输出：首块在 latency 之后，之后每块间隔 chunk_interval_ms"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        
+        def write_event(data: Dict[str, Any]):
+            event = f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+            self.wfile.flush()
+        
+        model = payload.get("model", "deepseek-chat")
+        for index in range(0, len(reply), self.chunk_chars):
+            if index:
+                time.sleep(self.chunk_interval_ms / 1000)
+            write_event({
+                "id": "chatcmpl-stub", "object": "chat.completion.chunk", "model": model,
+                "choices": [{"index": 0, "delta": {"content": reply[index:index + self.chunk_chars]}, "finish_reason": None}]
+            })
+        write_event({
+            "id": "chatcmpl-stub", "object": "chat.completion.chunk", "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage
+        })
+        done = b"data: [DONE]\n\n"
+        self.wfile.write(f"{len(done):x}\r\n".encode() + done + b"\r\n0\r\n\r\n")
+        self.wfile.flush()
+
+
+# ==================== 对象存储 ====================
+
+class StubS3Handler(_QuietHandler):
+    """内存中的 S3 兼容对象存储（不校验签名）"""
+    
+    buckets: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    uploads: Dict[str, Dict[int, bytes]] = {}
+    latency_ms = 0.0
+    stats: StubStats = None
+    lock = threading.Lock()
+    
+    def _parse(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query, keep_blank_values=True)
+        path = unquote(parts.path).lstrip("/")
+        bucket, _, key = path.partition("/")
+        return bucket, key, query
+    
+    def _error(self, status: int, code: str, resource: str):
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            f"<Error><Code>{code}</Code><Message>{code}</Message><Resource>/{resource}</Resource>"
+            "<RequestId>stub</RequestId><HostId>stub</HostId></Error>"
+        ).encode()
+        self._send(status, body, "application/xml")
+    
+    def _before(self, operation: str):
+        self.stats.incr(f"s3_{operation}")
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+    
+    def do_HEAD(self):
+        bucket, key, _ = self._parse()
+        self._before("head")
+        with self.lock:
+            objects = self.buckets.get(bucket)
+            obj = objects.get(key) if objects is not None and key else None
+        if objects is None or (key and obj is None):
+            self._send(404, b"", "application/xml")
+        elif obj is not None:
+            self._send(200, b"", obj["content_type"], self._object_headers(obj), len(obj["data"]))
+        else:
+            self._send(200, b"", "application/xml")
+    
+    def do_GET(self):
+        bucket, key, query = self._parse()
+        if "location" in query:
+            body = f'<?xml version="1.0" encoding="UTF-8"?><LocationConstraint xmlns="{S3_NAMESPACE}"></LocationConstraint>'
+            self._send(200, body.encode(), "application/xml")
+            return
+        
+        self._before("get")
+        with self.lock:
+            obj = self.buckets.get(bucket, {}).get(key)
+        if obj is None:
+            self._error(404, "NoSuchKey", f"{bucket}/{key}")
+            return
+        self.stats.incr("s3_bytes_out", len(obj["data"]))
+        self._send(200, obj["data"], obj["content_type"], self._object_headers(obj))
+    
+    def do_PUT(self):
+        bucket, key, query = self._parse()
+        body = self._read_body()
+        self._before("put")
+        
+        if not key:
+            with self.lock:
+                self.buckets.setdefault(bucket, {})
+            self._send(200, b"", "application/xml")
+            return
+        
+        etag = hashlib.md5(body).hexdigest()
+        if "uploadId" in query:
+            with self.lock:
+                self.uploads[query["uploadId"][0]][int(query["partNumber"][0])] = body
+            self._send(200, b"", "application/xml", {"ETag": f'"{etag}"'})
+            return
+        
+        self._store(bucket, key, body, self.headers.get("Content-Type") or "application/octet-stream")
+        self._send(200, b"", "application/xml", {"ETag": f'"{etag}"'})
+    
+    def do_POST(self):
+        bucket, key, query = self._parse()
+        self._read_body()
+        
+        if "uploads" in query:
+            upload_id = hashlib.md5(f"{bucket}/{key}/{time.time()}".encode()).hexdigest()
+            with self.lock:
+                self.uploads[upload_id] = {}
+            body = (
+                f'<?xml version="1.0" encoding="UTF-8"?><InitiateMultipartUploadResult xmlns="{S3_NAMESPACE}">'
+                f"<Bucket>{bucket}</Bucket><Key>{key}</Key><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+            )
+            self._send(200, body.encode(), "application/xml")
+            return
+        
+        if "uploadId" in query:
+            with self.lock:
+                parts = self.uploads.pop(query["uploadId"][0], {})
+            data = b"".join(parts[number] for number in sorted(parts))
+            self._store(bucket, key, data, "application/octet-stream")
+            etag = hashlib.md5(data).hexdigest()
+            body = (
+                f'<?xml version="1.0" encoding="UTF-8"?><CompleteMultipartUploadResult xmlns="{S3_NAMESPACE}">'
+                f"<Bucket>{bucket}</Bucket><Key>{key}</Key><ETag>&quot;{etag}&quot;</ETag></CompleteMultipartUploadResult>"
+            )
+            self._send(200, body.encode(), "application/xml")
+            return
+        
+        self._error(400, "InvalidRequest", f"{bucket}/{key}")
+    
+    def do_DELETE(self):
+        bucket, key, query = self._parse()
+        self._before("delete")
+        with self.lock:
+            if "uploadId" in query:
+                self.uploads.pop(query["uploadId"][0], None)
+            else:
+                self.buckets.get(bucket, {}).pop(key, None)
+        self._send(204, b"", "application/xml")
+    
+    def _store(self, bucket: str, key: str, data: bytes, content_type: str):
+        self.stats.incr("s3_bytes_in", len(data))
+        with self.lock:
+            self.buckets.setdefault(bucket, {})[key] = {
+                "data": data,
+                "content_type": content_type,
+                "etag": hashlib.md5(data).hexdigest(),
+                "modified": time.time()
+            }
+    
+    @staticmethod
+    def _object_headers(obj: Dict[str, Any]) -> Dict[str, str]:
+        return {
+            "ETag": f'"{obj["etag"]}"',
+            "Last-Modified": formatdate(obj["modified"], usegmt=True),
+        }
+
+
+# ==================== ONLYOFFICE ====================
+
+class FakeOnlyOfficeHandler(_QuietHandler):
+    """
+    模拟 ONLYOFFICE 文档服务器
+    
+    POST /coauthoring/open  {"config": 编辑器配置, "save": 是否回调保存}
+    按配置中的 document.url 从后端拉取文档（地址中的主机替换为 backend_url），
+    save 为 true 且配置中有 callbackUrl 时，回调后端保存（status=2，url 指向本服务缓存的文档）
+    """
+    
+    backend_url = ""
+    stats: StubStats = None
+    cache: Dict[str, bytes] = {}
+    lock = threading.Lock()
+    
+    def _rewrite(self, url: str) -> str:
+        """把配置中的后端地址（Docker 内网或公网地址）替换为压测时的后端地址"""
+        parts = urlsplit(url)
+        query = f"?{parts.query}" if parts.query else ""
+        return f"{self.backend_url.rstrip('/')}{parts.path}{query}"
+    
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/healthcheck":
+            self._send(200, b"true", "text/plain")
+        elif path == "/web-apps/apps/api/documents/api.js":
+            self._send(200, b"window.DocsAPI = window.DocsAPI || {};", "application/javascript")
+        elif path.startswith("/cache/"):
+            with self.lock:
+                data = self.cache.get(path[len("/cache/"):])
+            if data is None:
+                self._send(404, b"", "text/plain")
+            else:
+                self._send(200, data, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        else:
+            self._send(404, b"", "text/plain")
+    
+    def do_POST(self):
+        body = self._read_body()
+        if urlsplit(self.path).path != "/coauthoring/open":
+            self._send(404, b"", "text/plain")
+            return
+        
+        request = json.loads(body or b"{}")
+        config = request.get("config") or {}
+        document = config.get("document", {})
+        key = document.get("key", "unknown")
+        self.stats.incr("onlyoffice_opens")
+        
+        try:
+            with urllib.request.urlopen(self._rewrite(document["url"]), timeout=60) as response:
+                data = response.read()
+        except Exception as e:
+            self._send_json(502, {"error": 1, "message": f"download failed: {e}"})
+            return
+        with self.lock:
+            self.cache[key] = data
+        
+        result = {"error": 0, "bytes": len(data), "saved": False}
+        callback_url = config.get("editorConfig", {}).get("callbackUrl")
+        if request.get("save") and callback_url:
+            host, port = self.server.server_address[:2]
+            callback = json.dumps({"key": key, "status": 2, "url": f"http://{host}:{port}/cache/{key}"}).encode()
+            callback_request = urllib.request.Request(
+                self._rewrite(callback_url), data=callback, headers={"Content-Type": "application/json"}
+            )
+            try:
+                with urllib.request.urlopen(callback_request, timeout=60) as response:
+                    result["saved"] = json.loads(response.read() or b"{}").get("error") == 0
+                self.stats.incr("onlyoffice_saves")
+            except Exception as e:
+                result.update({"error": 1, "message": f"callback failed: {e}"})
+        
+        self._send_json(200 if result["error"] == 0 else 502, result)
+
+
+# ==================== 启动 ====================
+
+class StubServers:
+    """
+    在后台线程中启动全部替身服务（端口自动分配）
+    
+    使用示例：
+    with StubServers(llm_latency_ms=800) as stubs:
+        env = stubs.backend_env("http://127.0.0.1:18000")
+    """
+    
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        llm_latency_ms: float = 500,
+        llm_jitter_ms: float = 100,
+        llm_chunk_interval_ms: float = 20,
+        llm_failure_rate: float = 0.0,
+        s3_latency_ms: float = 0,
+        seed: int = 42
+    ):
+        self.host = host
+        self.stats = StubStats()
+        
+        llm_handler = type("LLMHandler", (StubLLMHandler,), {
+            "latency_ms": llm_latency_ms,
+            "jitter_ms": llm_jitter_ms,
+            "chunk_interval_ms": llm_chunk_interval_ms,
+            "failure_rate": llm_failure_rate,
+            "stats": self.stats,
+            "rng": random.Random(seed),
+            "rng_lock": threading.Lock(),
+        })
+        s3_handler = type("S3Handler", (StubS3Handler,), {
+            "buckets": {}, "uploads": {}, "latency_ms": s3_latency_ms,
+            "stats": self.stats, "lock": threading.Lock(),
+        })
+        onlyoffice_handler = type("OnlyOfficeHandler", (FakeOnlyOfficeHandler,), {
+            "stats": self.stats, "cache": {}, "lock": threading.Lock(),
+        })
+        self.onlyoffice_handler = onlyoffice_handler
+        
+        self.servers = {
+            "llm": ThreadingHTTPServer((host, 0), llm_handler),
+            "s3": ThreadingHTTPServer((host, 0), s3_handler),
+            "onlyoffice": ThreadingHTTPServer((host, 0), onlyoffice_handler),
+        }
+        for server in self.servers.values():
+            server.daemon_threads = True
+        self._threads: List[threading.Thread] = []
+    
+    def url(self, name: str) -> str:
+        host, port = self.servers[name].server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self):
+        for name, server in self.servers.items():
+            thread = threading.Thread(target=server.serve_forever, name=f"stub-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+    
+    def stop(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc):
+        self.stop()
+    
+    def backend_env(self, backend_url: str) -> Dict[str, str]:
+        """
+        后端使用替身服务所需的环境变量
+        
+        Args:
+            backend_url: 后端地址，用于 ONLYOFFICE 回调与拉取文档
+        
+        Returns:
+            环境变量字典
+        """
+        self.onlyoffice_handler.backend_url = backend_url
+        s3_host, s3_port = self.servers["s3"].server_address[:2]
+        return {
+            "DEEPSEEK_API_BASE": self.url("llm"),
+            "DEEPSEEK_API_KEY": "stub-key",
+            "MINIO_ENDPOINT": f"{s3_host}:{s3_port}",
+            "MINIO_SECURE": "false",
+            "ONLYOFFICE_ENABLED": "true",
+            "ONLYOFFICE_SERVER_URL": self.url("onlyoffice"),
+            "ONLYOFFICE_CALLBACK_URL": f"{backend_url}/api/v1/onlyoffice/callback",
+            "BACKEND_PUBLIC_URL": backend_url,
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="启动压测用的大模型、对象存储、ONLYOFFICE 替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--backend-url", default="http://127.0.0.1:8000", help="后端地址（ONLYOFFICE 回调用）")
+    parser.add_argument("--llm-latency-ms", type=float, default=500, help="大模型响应延迟（流式时为首块延迟）")
+    parser.add_argument("--llm-jitter-ms", type=float, default=100, help="大模型延迟抖动")
+    parser.add_argument("--llm-chunk-interval-ms", type=float, default=20, help="流式输出的块间隔")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="大模型返回 503 的比例")
+    parser.add_argument("--s3-latency-ms", type=float, default=0, help="对象存储每次请求的附加延迟")
+    args = parser.parse_args(argv)
+    
+    stubs = StubServers(
+        args.host, args.llm_latency_ms, args.llm_jitter_ms, args.llm_chunk_interval_ms,
+        args.llm_failure_rate, args.s3_latency_ms
+    ).start()
+    print("替身服务已启动，后端环境变量：")
+    for name, value in stubs.backend_env(args.backend_url).items():
+        print(f"  {name}={value}")
+    try:
+        while True:
+            time.sleep(10)
+    except KeyboardInterrupt:
+        stubs.stop()
+        print(f"\n请求统计: {json.dumps(stubs.stats.snapshot(), ensure_ascii=False)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -92,9 +92,9 @@ CREATE TABLE IF NOT EXISTS versions (
 
 CREATE INDEX IF NOT EXISTS idx_versions_document_id ON versions(document_id);
 
--- 审计日志表
+-- 审计日志表（按月分区，分区由应用启动后的定时任务创建）
 CREATE TABLE IF NOT EXISTS audit_logs (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     user_id INTEGER NOT NULL REFERENCES users(id),
     action VARCHAR(50) NOT NULL,
     resource_type VARCHAR(50),
@@ -102,12 +102,41 @@ CREATE TABLE IF NOT EXISTS audit_logs (
     details JSONB,
     ip_address VARCHAR(50),
     user_agent VARCHAR(500),
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
 
 CREATE INDEX IF NOT EXISTS idx_audit_logs_user_id ON audit_logs(user_id);
 CREATE INDEX IF NOT EXISTS idx_audit_logs_action ON audit_logs(action);
-CREATE INDEX IF NOT EXISTS idx_audit_logs_created_at ON audit_logs(created_at);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_created_brin ON audit_logs USING brin (created_at);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_created_id ON audit_logs(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_user_created_id ON audit_logs(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_details_gin ON audit_logs USING gin (details jsonb_path_ops);
+
+-- 审计日志关键词搜索：details 中的值拼接为小写文本，切成 bigram 建 GIN 索引（支持中文子串）
+CREATE OR REPLACE FUNCTION audit_search_text(details jsonb) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT lower(coalesce(string_agg(value #>> '{}', ' '), ''))
+    FROM jsonb_path_query(details, 'strict $.** ? (@.type() == "string" || @.type() == "number")') AS value
+$$;
+
+CREATE OR REPLACE FUNCTION audit_search_grams(details jsonb) RETURNS text[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(array_agg(DISTINCT substr(t, i, 2)), '{}')
+    FROM (SELECT audit_search_text(details) AS t) AS s, generate_series(1, length(t) - 1) AS i
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_audit_logs_search_grams ON audit_logs USING gin (audit_search_grams(details));
+
+-- 审计日志小时汇总（审计写入时增量累加，统计接口读取）
+CREATE TABLE IF NOT EXISTS audit_stats_hourly (
+    bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+    user_id INTEGER NOT NULL,
+    action VARCHAR(50) NOT NULL,
+    resource_type VARCHAR(50) NOT NULL DEFAULT '',
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, user_id, action, resource_type)
+);
 """
 
 async def create_tables():
@@ -138,6 +167,7 @@ async def create_tables():
         print("  - documents (文书表)")
         print("  - versions (版本表)")
         print("  - audit_logs (审计日志表)")
+        print("  - audit_stats_hourly (审计日志小时汇总)")
         print()
         print("=" * 60)
         print("数据库初始化完成！")
@@ -0,0 +1,113 @@
+"""
+准入控制 - 测试
+
+验证并发限制、排队期限和过载时的快速拒绝
+"""
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.admission import (
+    AdmissionController, AdmissionControlMiddleware, ConcurrencyLimiter, ShedError, classify_route
+)
+from app.core.loop_monitor import loop_monitor
+from app.core.proxy import client_host, parse_networks
+from app.core.rate_limiter import rate_limiter
+
+
+class TestAdmission:
+    """测试准入控制"""
+    
+    def test_classify_route(self):
+        """测试路由类别划分"""
+        print("\n=== 测试1: 路由类别 ===")
+        
+        assert classify_route("POST", "/api/v1/documents/generate") == "ai"
+        assert classify_route("POST", "/api/v1/files/batch-upload") == "upload"
+        assert classify_route("GET", "/api/v1/templates/list") == "read"
+        assert classify_route("PUT", "/api/v1/documents/1") == "write"
+        print("  ✓ 类别划分正确")
+    
+    @pytest.mark.asyncio
+    async def test_queue_handoff_and_deadline(self):
+        """测试超出并发的请求排队，名额释放时转交，超过期限被拒绝"""
+        print("\n=== 测试2: 排队与期限 ===")
+        limiter = ConcurrencyLimiter("test", limit=1, max_queue=1, queue_timeout=0.1)
+        
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        
+        # 队列已满
+        with pytest.raises(ShedError) as exc_info:
+            await limiter.acquire()
+        assert exc_info.value.reason == "queue_full"
+        
+        # 释放后名额转交给等待者
+        limiter.release()
+        await waiter
+        assert limiter.in_flight == 1
+        
+        # 无人释放时排队超时
+        with pytest.raises(ShedError) as exc_info:
+            await limiter.acquire()
+        assert exc_info.value.reason == "queue_timeout"
+        assert limiter.queue_depth == 0
+        
+        limiter.release()
+        assert limiter.in_flight == 0
+        print(f"  ✓ 统计: {limiter.get_stats()}")
+    
+    def test_shed_on_loop_lag(self, monkeypatch):
+        """测试事件循环延迟过高时返回 503 + Retry-After，健康检查不受影响"""
+        print("\n=== 测试3: 过载快速拒绝 ===")
+        monkeypatch.setattr(rate_limiter, "enabled", False)
+        
+        app = FastAPI()
+        controller = AdmissionController()
+        controller.enabled = True
+        app.add_middleware(AdmissionControlMiddleware, controller=controller)
+        
+        @app.get("/api/v1/documents/list")
+        async def list_documents():
+            return []
+        
+        @app.get("/health")
+        async def health():
+            return {"status": "healthy"}
+        
+        client = TestClient(app)
+        assert client.get("/api/v1/documents/list").status_code == 200
+        
+        # 单次阻塞（平滑值未超限）不拒绝
+        monkeypatch.setattr(loop_monitor, "last_lag_ms", controller.max_loop_lag_ms * 10)
+        monkeypatch.setattr(loop_monitor, "smoothed_lag_ms", 0.0)
+        assert client.get("/api/v1/documents/list").status_code == 200
+        
+        monkeypatch.setattr(loop_monitor, "smoothed_lag_ms", controller.max_loop_lag_ms + 100)
+        response = client.get("/api/v1/documents/list")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == str(controller.retry_after)
+        assert client.get("/health").status_code == 200
+        
+        assert controller.limiters["read"].get_stats()["shed"] == {"loop_lag": 1}
+        print("  ✓ 过载时返回 503，健康检查正常")
+    
+    def test_client_host_behind_trusted_proxy(self):
+        """测试只有受信任代理转发的请求才按 X-Forwarded-For 识别客户端"""
+        print("\n=== 测试4: 代理后的客户端 IP ===")
+        networks = parse_networks("127.0.0.1, 172.16.0.0/12, invalid")
+        
+        def scope(peer, forwarded=None):
+            headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+            return {"client": (peer, 50000), "headers": headers}
+        
+        assert client_host(scope("172.18.0.5", "203.0.113.7"), networks) == "203.0.113.7"
+        assert client_host(scope("172.18.0.5", "1.1.1.1, 203.0.113.7, 172.18.0.9"), networks) == "203.0.113.7"
+        print("  ✓ 代理转发时取最右侧的非代理地址")
+        
+        assert client_host(scope("198.51.100.2", "1.1.1.1"), networks) == "198.51.100.2"
+        assert client_host(scope("172.18.0.5"), networks) == "172.18.0.5"
+        assert client_host({"headers": []}, networks) == "unknown"
+        print("  ✓ 直连请求伪造的 X-Forwarded-For 被忽略")
@@ -0,0 +1,85 @@
+"""
+审计日志流式导出 - 测试
+
+按服务端游标的批次逐块生成 CSV，gzip 压缩后内容不变
+"""
+import csv
+import gzip
+import io
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core import database
+from app.models.audit_log import AuditLog
+from app.services.audit_export_service import iter_csv, export_query, CSV_HEADER
+
+
+def _row(i):
+    return SimpleNamespace(
+        id=i, username="张三", action="upload", resource_type="file", resource_id=i,
+        ip_address=None, created_at=datetime(2026, 3, 1, 8, 0, i, tzinfo=timezone.utc), details={"file_name": f"报告{i}.docx"}
+    )
+
+
+class FakeStreamResult:
+    def __init__(self, batches):
+        self.batches = batches
+    
+    async def partitions(self):
+        for batch in self.batches:
+            yield batch
+
+
+class FakeSession:
+    """按批返回结果的会话（记录收到的 yield_per）"""
+    
+    def __init__(self, batches):
+        self.batches = batches
+        self.yield_per = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        return False
+    
+    async def stream(self, query):
+        self.yield_per = query.get_execution_options().get("yield_per")
+        return FakeStreamResult(self.batches)
+
+
+class TestAuditExport:
+    """测试流式导出"""
+    
+    @pytest.mark.asyncio
+    async def test_streams_batches(self, monkeypatch):
+        """测试逐批输出 CSV，gzip 解压后与未压缩一致"""
+        print("\n=== 测试1: 流式导出 ===")
+        batches = [[_row(1), _row(2)], [_row(3)]]
+        session = FakeSession(batches)
+        monkeypatch.setattr(database, "AsyncSessionLocal", lambda: session)
+        query = export_query([AuditLog.action == "upload"])
+        
+        chunks = [chunk async for chunk in iter_csv(query)]
+        assert len(chunks) == 3
+        assert session.yield_per == 1000
+        lines = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+        assert lines[0] == CSV_HEADER
+        assert [line[0] for line in lines[1:]] == ["1", "2", "3"]
+        assert lines[1][1] == "张三" and "报告1.docx" in lines[1][7]
+        print("  ✓ 表头 + 每批一块")
+        
+        compressed = b"".join([chunk async for chunk in iter_csv(query, compress=True)])
+        assert gzip.decompress(compressed) == b"".join(chunks)
+        print("  ✓ gzip 压缩内容一致")
+    
+    def test_export_query_uses_keyset_order(self):
+        """测试导出查询只取导出列，按 (created_at, id) 倒序"""
+        print("\n=== 测试2: 导出查询 ===")
+        sql = str(export_query([]).compile(dialect=postgresql.dialect()))
+        assert "ORDER BY audit_logs.created_at DESC, audit_logs.id DESC" in sql
+        assert "LIMIT" not in sql and "audit_logs.user_agent" not in sql
+        print("  ✓ 不限制条数，不读取多余列")
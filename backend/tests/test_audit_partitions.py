@@ -0,0 +1,43 @@
+"""
+审计日志分区维护 - 测试
+
+月分区命名与边界、需要提前创建和按保留期归档的分区
+"""
+from datetime import date
+
+from app.services.audit_partition_service import (
+    add_months, partition_name, partition_month, partition_ddl, expired_partitions
+)
+
+
+class TestAuditPartitions:
+    """测试分区计算"""
+    
+    def test_partition_naming_and_bounds(self):
+        """测试分区名与跨年边界"""
+        print("\n=== 测试1: 分区命名与边界 ===")
+        assert add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+        assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+        assert partition_name(date(2026, 3, 1)) == "audit_logs_y2026m03"
+        assert partition_month("audit_logs_y2026m03") == date(2026, 3, 1)
+        assert partition_month("audit_logs_legacy") is None
+        print("  ✓ 月份计算和分区名互相转换")
+        
+        ddl = partition_ddl(date(2026, 12, 1))
+        assert "audit_logs_y2026m12 PARTITION OF audit_logs" in ddl
+        assert "FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')" in ddl
+        print("  ✓ 分区边界为 UTC 月初，上界不包含")
+    
+    def test_expired_partitions(self):
+        """测试按保留月数选择需要归档的分区"""
+        print("\n=== 测试2: 保留期 ===")
+        names = [partition_name(date(2025, m, 1)) for m in range(9, 13)] + [
+            partition_name(date(2026, m, 1)) for m in range(1, 4)
+        ] + ["audit_logs_manual"]
+        today = date(2026, 2, 15)
+        
+        assert expired_partitions(names, today, 0) == []
+        assert expired_partitions(names, today, 3) == [
+            "audit_logs_y2025m09", "audit_logs_y2025m10", "audit_logs_y2025m11"
+        ]
+        print("  ✓ 保留当月及之前 2 个月，未来分区和非月分区不受影响")
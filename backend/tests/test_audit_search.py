@@ -0,0 +1,48 @@
+"""
+审计日志关键词搜索 - 测试
+
+关键词切分与数据库函数一致，普通关键词走 bigram 索引并复核子串，字段=值 走 JSONB 包含
+"""
+from sqlalchemy import and_
+from sqlalchemy.dialects import postgresql
+
+from app.services.audit_search import keyword_grams, keyword_conditions
+
+
+def _compile(conditions):
+    compiled = and_(*conditions).compile(dialect=postgresql.dialect())
+    return str(compiled), compiled.params
+
+
+class TestAuditSearch:
+    """测试关键词条件"""
+    
+    def test_keyword_grams(self):
+        """测试 bigram 切分（小写、去重）"""
+        print("\n=== 测试1: bigram 切分 ===")
+        assert keyword_grams("信访") == ["信访"]
+        assert keyword_grams("信访事项") == sorted(["信访", "访事", "事项"])
+        assert keyword_grams("PDF") == ["df", "pd"]
+        assert keyword_grams("信") == []
+        print("  ✓ 中文两字即可使用索引，单字没有 bigram")
+    
+    def test_keyword_conditions(self):
+        """测试普通关键词和 字段=值 的查询条件"""
+        print("\n=== 测试2: 查询条件 ===")
+        sql, params = _compile(keyword_conditions("答复意见_%"))
+        assert "audit_search_grams(audit_logs.details) @>" in sql
+        assert "audit_search_text(audit_logs.details) LIKE" in sql and "ESCAPE" in sql
+        assert "答复" in list(params.values())[0]
+        assert r"答复意见/_/%" in list(params.values())[1]
+        print("  ✓ bigram 索引筛选 + 子串复核，通配符被转义")
+        
+        sql, params = _compile(keyword_conditions("信"))
+        assert "@>" not in sql and "LIKE" in sql
+        print("  ✓ 单字关键词只做子串匹配")
+        
+        sql, params = _compile(keyword_conditions("file_id=12"))
+        assert sql.count("audit_logs.details @>") == 2
+        assert list(params.values()) == [{"file_id": "12"}, {"file_id": 12}]
+        print("  ✓ 字段=值 按 JSONB 包含匹配，数字同时匹配字符串和整数")
+        
+        assert keyword_conditions("   ") == []
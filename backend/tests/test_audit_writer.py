@@ -0,0 +1,133 @@
+"""
+审计日志异步批量写入 - 测试
+
+按批量写入；数据库不可用时落盘，恢复后补写；关闭时写完缓冲区；按小时汇总；不认领运行中进程的落盘文件
+"""
+import asyncio
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+import pytest
+
+from app.services.audit_writer import AuditWriter, owner_pid, rollup_counts
+
+
+class TestAuditWriter:
+    """测试审计日志缓冲写入"""
+    
+    @pytest.mark.asyncio
+    async def test_batches_by_size_and_flushes_on_stop(self, tmp_path):
+        """测试达到批量条数时写入，关闭时写完剩余记录"""
+        print("\n=== 测试1: 批量写入 ===")
+        batches = []
+        
+        async def insert_rows(rows):
+            batches.append(rows)
+        
+        writer = AuditWriter(batch_size=3, flush_interval=60, spill_dir=str(tmp_path), insert_rows=insert_rows)
+        for i in range(7):
+            writer.record(user_id=1, action="upload", resource_type="file", details={"n": i})
+        assert batches == []
+        print("  ✓ 记录时不等待写入")
+        
+        await asyncio.sleep(0.05)
+        assert [len(batch) for batch in batches] == [3, 3, 1]
+        print("  ✓ 达到批量条数后台分批写入")
+        
+        writer.record(user_id=1, action="delete", resource_type="file", details={"n": 7})
+        await writer.stop()
+        assert [len(batch) for batch in batches] == [3, 3, 1, 1]
+        assert [row["details"]["n"] for batch in batches for row in batch] == list(range(8))
+        assert batches[0][0]["created_at"] <= batches[3][0]["created_at"]
+        assert writer.get_stats()["written"] == 8
+        print("  ✓ 关闭时写完缓冲区，保留记录时间和顺序")
+    
+    @pytest.mark.asyncio
+    async def test_spill_and_replay(self, tmp_path):
+        """测试写入失败时落盘，恢复后补写"""
+        print("\n=== 测试2: 落盘与补写 ===")
+        written = []
+        database_up = False
+        
+        async def insert_rows(rows):
+            if not database_up:
+                raise ConnectionError("database unavailable")
+            written.extend(rows)
+        
+        writer = AuditWriter(batch_size=2, flush_interval=60, spill_dir=str(tmp_path), insert_rows=insert_rows)
+        writer.spill_retry_interval = 0
+        for i in range(5):
+            writer.record(user_id=2, action="review", details={"n": i})
+        await writer.flush()
+        
+        stats = writer.get_stats()
+        assert stats["spilled"] == 5 and stats["buffered"] == 0 and stats["spill_files"] == 1
+        print("  ✓ 数据库不可用时落盘")
+        
+        database_up = True
+        writer.record(user_id=2, action="review", details={"n": 5})
+        await writer.flush()
+        await writer.stop()
+        
+        assert sorted(row["details"]["n"] for row in written) == list(range(6))
+        assert all(row["created_at"].tzinfo is not None for row in written)
+        assert writer.get_stats()["replayed"] == 5
+        assert os.listdir(tmp_path) == []
+        print("  ✓ 恢复后补写落盘记录并删除落盘文件")
+    
+    def test_rollup_counts(self):
+        """测试按 (小时, 用户, 操作, 资源类型) 汇总，时间换算到 UTC"""
+        print("\n=== 测试3: 小时汇总 ===")
+        beijing = timezone(timedelta(hours=8))
+        rows = [
+            {"created_at": datetime(2026, 3, 1, 9, 5, tzinfo=beijing), "user_id": 1, "action": "upload", "resource_type": "file"},
+            {"created_at": datetime(2026, 3, 1, 9, 55, tzinfo=beijing), "user_id": 1, "action": "upload", "resource_type": "file"},
+            {"created_at": datetime(2026, 3, 1, 10, 0, tzinfo=beijing), "user_id": 1, "action": "upload", "resource_type": "file"},
+            {"created_at": datetime(2026, 3, 1, 9, 30, tzinfo=beijing), "user_id": 2, "action": "review", "resource_type": None},
+        ]
+        
+        assert rollup_counts(rows) == [
+            {"bucket": datetime(2026, 3, 1, 1, tzinfo=timezone.utc), "user_id": 1, "action": "upload", "resource_type": "file", "count": 2},
+            {"bucket": datetime(2026, 3, 1, 1, tzinfo=timezone.utc), "user_id": 2, "action": "review", "resource_type": "", "count": 1},
+            {"bucket": datetime(2026, 3, 1, 2, tzinfo=timezone.utc), "user_id": 1, "action": "upload", "resource_type": "file", "count": 1},
+        ]
+        print("  ✓ 同一小时累加，无资源类型记为空字符串")
+    
+    @pytest.mark.asyncio
+    async def test_replay_skips_live_workers(self, tmp_path):
+        """测试只认领已退出进程的落盘文件和补写中断的文件"""
+        print("\n=== 测试4: 多 worker 补写 ===")
+        written = []
+        
+        async def insert_rows(rows):
+            written.extend(rows)
+        
+        live = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        try:
+            writer = AuditWriter(batch_size=10, flush_interval=60, spill_dir=str(tmp_path), insert_rows=insert_rows)
+            row = {"user_id": 1, "action": "upload", "created_at": datetime.now(timezone.utc)}
+            files = {
+                "live": os.path.join(tmp_path, f"audit-{live.pid}.jsonl"),
+                "dead": os.path.join(tmp_path, f"audit-{dead.pid}.jsonl"),
+                "live_claimed": os.path.join(tmp_path, f"audit-1.jsonl.{live.pid}.replaying"),
+                "dead_claimed": os.path.join(tmp_path, f"audit-2.jsonl.{dead.pid}.replaying"),
+            }
+            for name, path in files.items():
+                AuditWriter._append_spill(path, [{**row, "details": {"file": name}}])
+            
+            assert owner_pid(files["live"]) == live.pid
+            assert owner_pid(files["dead_claimed"]) == dead.pid
+            assert owner_pid(os.path.join(tmp_path, "audit-recovered-1a2b3c4d.jsonl")) is None
+            
+            await writer.flush()
+            
+            assert sorted(row["details"]["file"] for row in written) == ["dead", "dead_claimed"]
+            assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(files[name]) for name in ("live", "live_claimed"))
+            print("  ✓ 运行中 worker 的落盘文件和认领文件保持不动")
+            print("  ✓ 已退出进程的文件被认领补写")
+        finally:
+            live.kill()
+            live.wait()
@@ -0,0 +1,104 @@
+"""
+两级缓存 - 测试
+
+在无 Redis 的情况下验证单飞、标签失效和过期旧值后台刷新；批量读取使用 fakeredis
+"""
+import asyncio
+import pytest
+
+from app.core.redis import redis_client
+from app.services.cache_service import cache_result, cache_service, CacheService
+
+
+class TestCacheService:
+    """测试缓存服务"""
+    
+    def setup_method(self):
+        redis_client.redis = None
+        cache_service._local.clear()
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_compute_once(self):
+        """测试并发未命中时只执行一次查询"""
+        print("\n=== 测试1: 并发未命中单飞 ===")
+        calls = []
+        
+        @cache_result("test_singleflight", ttl=60)
+        async def query(user_id: int):
+            calls.append(user_id)
+            await asyncio.sleep(0.05)
+            return {"user_id": user_id}
+        
+        results = await asyncio.gather(*[query(1) for _ in range(10)])
+        
+        assert len(calls) == 1
+        assert all(result == {"user_id": 1} for result in results)
+        print("  ✓ 10 个并发请求只查询 1 次")
+    
+    @pytest.mark.asyncio
+    async def test_tag_invalidation(self):
+        """测试按标签失效只影响对应用户"""
+        print("\n=== 测试2: 标签失效 ===")
+        calls = []
+        
+        @cache_result("test_tags", ttl=60, tags=["test_tags:{user_id}"])
+        async def query(user_id: int, skip: int = 0):
+            calls.append(user_id)
+            return [len(calls)]
+        
+        await query(1)
+        await query(1, skip=20)
+        await query(2)
+        await cache_service.invalidate_tags("test_tags:1")
+        await query(1)
+        await query(1, skip=20)
+        await query(2)
+        
+        assert calls == [1, 1, 2, 1, 1]
+        print("  ✓ 用户1的两页缓存失效，用户2不受影响")
+    
+    @pytest.mark.asyncio
+    async def test_stale_while_revalidate(self, monkeypatch):
+        """测试过期后先返回旧值，并在后台刷新"""
+        print("\n=== 测试3: 过期旧值后台刷新 ===")
+        monkeypatch.setattr(CacheService, "STALE_TTL", 60)
+        version = {"value": 1}
+        
+        @cache_result("test_swr", ttl=0.2)
+        async def query():
+            return version["value"]
+        
+        assert await query() == 1
+        version["value"] = 2
+        await asyncio.sleep(0.3)
+        
+        assert await query() == 1, "过期后应先返回旧值"
+        await asyncio.sleep(0.05)
+        assert await query() == 2, "后台刷新后返回新值"
+        print("  ✓ 旧值立即返回，后台刷新完成后返回新值")
+    
+    @pytest.mark.asyncio
+    async def test_get_many_reads_missing_keys_in_one_mget(self):
+        """测试批量读取：进程内命中的直接返回，其余键一次 MGET 从 Redis 读取"""
+        print("\n=== 测试4: 批量读取 ===")
+        fakeredis = pytest.importorskip("fakeredis")
+        redis_client.redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        service = CacheService()
+        try:
+            await service.set("batch:a", {"n": 1}, ttl=60)
+            await service.set("batch:b", [2], ttl=60)
+            service._local.pop("batch:b")
+            
+            assert await service.get_many(["batch:a", "batch:b", "batch:missing"]) == [{"n": 1}, [2], None]
+            assert service.stats["local_hits"] == 1 and service.stats["redis_hits"] == 1
+            print("  ✓ 进程内命中 1 个，Redis 命中 1 个，未命中返回 None")
+            
+            assert await service.get_many(["batch:b"]) == [[2]]
+            assert service.stats["local_hits"] == 2
+            print("  ✓ Redis 读到的值回填进程内缓存")
+            
+            redis_client.redis = None
+            assert await service.get_many(["batch:a", "batch:c"]) == [{"n": 1}, None]
+            print("  ✓ Redis 不可用时只读进程内缓存")
+        finally:
+            redis_client.redis = None
@@ -0,0 +1,99 @@
+"""
+对话上下文构建 - 测试
+
+token 估算与截断、预算分配（扣除系统提示和本轮输入），以及滚动摘要的后台刷新
+"""
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.core.redis import redis_client
+from app.services import context_builder_service as builder_module
+from app.services.context_builder_service import (
+    ContextBuilderService, estimate_tokens, estimate_message_tokens, truncate_to_tokens
+)
+from app.services.conversation_service import conversation_service
+
+SYSTEM_TEXT = "你是信访文书生成专家。" * 50
+PROMPT = "请根据以上情况起草一份答复意见书。"
+
+
+def _request_tokens(context, file_context):
+    tokens = estimate_message_tokens({"content": SYSTEM_TEXT}) + estimate_message_tokens({"content": PROMPT})
+    if file_context:
+        tokens += estimate_message_tokens({"content": file_context})
+    return tokens + sum(estimate_message_tokens(msg) for msg in context)
+
+
+class TestContextBuilder:
+    """测试上下文构建"""
+    
+    def setup_method(self):
+        redis_client.redis = None
+    
+    def test_estimate_and_truncate(self):
+        """测试 token 估算与按预算截断"""
+        print("\n=== 测试1: token 估算与截断 ===")
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("信访事项") == int(4 * 0.6) + 1
+        assert estimate_tokens("abcdefghij") == int(10 * 0.3) + 1
+        print("  ✓ 中文与其他字符按不同比例估算")
+        
+        text = "经调查核实，信访人反映的问题属实。" * 100
+        truncated = truncate_to_tokens(text, 50)
+        assert text.startswith(truncated) and estimate_tokens(truncated) <= 51
+        assert truncate_to_tokens("短文本", 50) == "短文本"
+        assert truncate_to_tokens(text, 0) == ""
+        print(f"  ✓ 截断为 {len(truncated)} 字")
+    
+    def test_allocate_budget_subtracts_fixed_parts(self, monkeypatch):
+        """测试系统提示和本轮输入先从预算中扣除"""
+        print("\n=== 测试2: 预算分配 ===")
+        monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGET", 1000)
+        monkeypatch.setattr(settings, "CONTEXT_FILE_BUDGET_RATIO", 0.5)
+        service = ContextBuilderService()
+        
+        fixed = estimate_message_tokens({"content": SYSTEM_TEXT}) + estimate_message_tokens({"content": PROMPT})
+        file_budget, available = service.allocate_budget(PROMPT, SYSTEM_TEXT)
+        assert available == 1000 - fixed
+        assert file_budget == int((1000 - fixed) * 0.5)
+        
+        monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGET", 10)
+        assert service.allocate_budget(PROMPT, SYSTEM_TEXT) == (0, 0)
+        print(f"  ✓ 固定部分 {fixed} tokens 不参与分配")
+    
+    @pytest.mark.asyncio
+    async def test_context_fits_budget_and_summary_refreshes(self, monkeypatch):
+        """测试构建结果不超过预算，较早的对话在后台压缩为摘要"""
+        print("\n=== 测试3: 预算与滚动摘要 ===")
+        monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGET", 1200)
+        calls = []
+        
+        async def summarize(messages, previous_summary=None, max_length=None):
+            calls.append((len(messages), previous_summary))
+            return f"共 {len(messages)} 条较早的对话"
+        
+        monkeypatch.setattr(builder_module.deepseek_service, "summarize_conversation", summarize)
+        service = ContextBuilderService()
+        user_id, session_id = 29001, "budget"
+        await conversation_service.clear_history(user_id, session_id)
+        for i in range(40):
+            await conversation_service.add_message(user_id, "user", f"第{i}轮：信访人补充了新的情况说明。" * 3, session_id)
+        
+        file_text = "参考文件内容。" * 1000
+        context, file_context = await service.build(user_id, session_id, PROMPT, file_text, SYSTEM_TEXT)
+        assert _request_tokens(context, file_context) <= 1200
+        assert 0 < len(context) < 40 and len(file_context) < len(file_text)
+        print(f"  ✓ 保留最近 {len(context)} 条，请求总量不超过预算")
+        
+        await asyncio.gather(*service._tasks)
+        assert len(calls) == 1 and calls[0][1] is None
+        
+        context, file_context = await service.build(user_id, session_id, PROMPT, file_text, SYSTEM_TEXT)
+        assert context[0]["role"] == "system" and "此前对话摘要" in context[0]["content"]
+        assert _request_tokens(context, file_context) <= 1200
+        assert not service._tasks, "摘要已覆盖较早的对话，不需要再次刷新"
+        print("  ✓ 摘要刷新后放在上下文开头")
+        
+        await conversation_service.clear_history(user_id, session_id)
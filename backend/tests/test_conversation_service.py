@@ -0,0 +1,146 @@
+"""
+对话存储 - 测试
+
+Redis 存储（fakeredis）的追加截断、TTL 刷新、读缓存版本校验（含会话清除后重新开始），以及 Redis 不可用时的进程内回退
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.redis import redis_client
+from app.services.conversation_service import ConversationService
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def fake_redis():
+    previous = redis_client.redis
+    redis_client.redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    yield redis_client.redis
+    redis_client.redis = previous
+
+
+class TestConversationService:
+    """测试对话存储"""
+    
+    @pytest.mark.asyncio
+    async def test_redis_append_trims_and_refreshes_ttl(self, fake_redis):
+        """测试追加时截断历史并刷新会话 TTL"""
+        print("\n=== 测试1: Redis 追加与 TTL ===")
+        service = ConversationService()
+        service.max_history_length = 3
+        
+        for i in range(5):
+            await service.add_message(1, "user", f"消息{i}", session_id="s1")
+        history = await service.get_history(1, session_id="s1")
+        assert [m["content"] for m in history] == ["消息2", "消息3", "消息4"]
+        print("  ✓ 只保留最近 3 条")
+        
+        key = "conv:1:s1"
+        await fake_redis.expire(key, 10)
+        await service.add_message(1, "assistant", "回复", session_id="s1")
+        assert await fake_redis.ttl(key) > 10
+        assert await fake_redis.ttl(f"{key}:meta") > 10
+        print("  ✓ 写入时刷新消息列表和元数据的 TTL")
+    
+    @pytest.mark.asyncio
+    async def test_read_cache_validated_in_one_round_trip(self, fake_redis):
+        """测试读缓存命中时不读取消息列表，其他 worker 写入后重新读取"""
+        print("\n=== 测试2: 读缓存版本校验 ===")
+        service = ConversationService()
+        other_worker = ConversationService()
+        
+        await service.add_message(2, "user", "你好")
+        first = await service.get_history(2)
+        first.append({"role": "user", "content": "调用方修改"})
+        assert [m["content"] for m in await service.get_history(2)] == ["你好"]
+        print("  ✓ 版本一致时返回缓存副本，调用方修改不影响缓存")
+        
+        await other_worker.add_message(2, "assistant", "您好")
+        history = await service.get_history(2)
+        assert [m["content"] for m in history] == ["你好", "您好"]
+        print("  ✓ 其他进程写入后读取最新历史")
+        
+        calls = []
+        original = service._load_script
+        
+        async def counting_script(**kwargs):
+            calls.append(kwargs)
+            return await original(**kwargs)
+        
+        service._load_script = counting_script
+        await service.get_history(2)
+        await other_worker.add_message(2, "user", "第三条")
+        assert len(await service.get_history(2)) == 3
+        assert len(calls) == 2
+        print("  ✓ 每次读取一次往返")
+        
+        await service.clear_history(2)
+        assert await service.get_history(2) == []
+        print("  ✓ 清除后历史为空")
+    
+    @pytest.mark.asyncio
+    async def test_local_fallback_expires_sessions(self):
+        """测试 Redis 不可用时使用进程内存储，并清理过期会话"""
+        print("\n=== 测试3: 进程内回退 ===")
+        previous = redis_client.redis
+        redis_client.redis = None
+        try:
+            service = ConversationService()
+            await service.add_message(3, "user", "旧会话", session_id="old")
+            await service.add_message(3, "user", "新会话", session_id="new")
+            await service.add_file_reference(3, 7, session_id="new")
+            await service.add_file_reference(3, 7, session_id="new")
+            assert await service.get_file_references(3, session_id="new") == [7]
+            
+            service._last_activity["conv:3:old"] = datetime.now() - timedelta(hours=3)
+            service._last_activity.move_to_end("conv:3:old", last=False)
+            
+            assert await service.get_history(3, session_id="old") == []
+            assert [m["content"] for m in await service.get_history(3, session_id="new")] == ["新会话"]
+            print("  ✓ 过期会话被清理，活跃会话保留")
+        finally:
+            redis_client.redis = previous
+    
+    @pytest.mark.asyncio
+    async def test_cleared_session_not_served_from_other_worker_cache(self, fake_redis):
+        """测试会话被清除后重新开始，其他 worker 的旧缓存不会因计数相同而命中"""
+        print("\n=== 测试4: 清除后版本不复用 ===")
+        worker_a = ConversationService()
+        worker_b = ConversationService()
+        
+        await worker_a.add_message(4, "user", "旧消息", session_id="s")
+        assert [m["content"] for m in await worker_b.get_history(4, session_id="s")] == ["旧消息"]
+        
+        await worker_a.clear_history(4, session_id="s")
+        await worker_a.add_message(4, "user", "新消息", session_id="s")
+        assert [m["content"] for m in await worker_b.get_history(4, session_id="s")] == ["新消息"]
+        print("  ✓ 清除后写入新消息，其他 worker 读到新历史")
+        
+        await worker_b.get_history(4, session_id="s")
+        await fake_redis.delete("conv:4:s", "conv:4:s:meta")
+        await worker_a.add_message(4, "user", "过期后", session_id="s")
+        assert [m["content"] for m in await worker_b.get_history(4, session_id="s")] == ["过期后"]
+        print("  ✓ 会话过期后重新开始同样不会误命中")
+    
+    @pytest.mark.asyncio
+    async def test_summary_follows_session_lifetime(self, fake_redis):
+        """测试滚动摘要随会话刷新 TTL，清除会话时一并删除"""
+        print("\n=== 测试5: 摘要随会话清除 ===")
+        from app.services.context_builder_service import context_builder_service
+        
+        service = ConversationService()
+        summary_key = context_builder_service._summary_key(5, "s")
+        await service.add_message(5, "user", "旧对话", session_id="s")
+        await context_builder_service._save_summary(summary_key, {"summary": "旧摘要", "covered_until": ""})
+        
+        await fake_redis.expire(summary_key, 10)
+        await service.add_message(5, "assistant", "回复", session_id="s")
+        assert await fake_redis.ttl(summary_key) > 10
+        print("  ✓ 会话写入时刷新摘要 TTL")
+        
+        await service.clear_history(5, session_id="s")
+        assert not await fake_redis.exists(summary_key)
+        assert await context_builder_service._get_summary(summary_key) is None
+        print("  ✓ 清除会话后 Redis 和本进程的摘要都被删除")
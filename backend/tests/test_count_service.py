@@ -0,0 +1,100 @@
+"""
+列表总数统计 - 测试
+
+auto 模式按估算行数选择精确统计或估算值，结果按筛选条件缓存；
+估算查询的参数经过列类型的绑定处理，驱动能够适配 JSONB 条件
+"""
+import pytest
+from sqlalchemy.dialects.postgresql import psycopg as pg_psycopg
+
+from app.core.redis import redis_client
+from app.models.audit_log import AuditLog
+from app.services import count_service
+from app.services.audit_search import keyword_conditions
+from app.services.cache_service import cache_service
+from app.services.count_service import count_rows, parse_plan_rows
+
+
+class TestCountService:
+    """测试总数统计方式"""
+    
+    def setup_method(self):
+        redis_client.redis = None
+        cache_service._local.clear()
+    
+    @pytest.mark.asyncio
+    async def test_count_modes(self, monkeypatch):
+        """测试各统计方式及按筛选条件缓存"""
+        print("\n=== 测试1: 统计方式 ===")
+        calls = []
+        estimates = {"upload": 50, "review": 2_000_000}
+        
+        async def fake_exact(db, model, conditions):
+            calls.append(("exact", conditions[0].right.value))
+            return 42
+        
+        async def fake_estimate(db, model, conditions):
+            calls.append(("estimate", conditions[0].right.value))
+            return estimates[conditions[0].right.value]
+        
+        monkeypatch.setattr(count_service, "_exact_count", fake_exact)
+        monkeypatch.setattr(count_service, "_estimate_count", fake_estimate)
+        small = [AuditLog.action == "upload"]
+        large = [AuditLog.action == "review"]
+        
+        assert await count_rows(None, AuditLog, small, "auto") == {"total": 42, "exact": True}
+        assert await count_rows(None, AuditLog, large, "auto") == {"total": 2_000_000, "exact": False}
+        print("  ✓ auto 模式小结果集精确统计，大结果集返回估算值")
+        
+        assert await count_rows(None, AuditLog, [AuditLog.action == "upload"], "auto") == {"total": 42, "exact": True}
+        assert calls == [("estimate", "upload"), ("exact", "upload"), ("estimate", "review")]
+        print("  ✓ 相同筛选条件命中缓存")
+        
+        assert await count_rows(None, AuditLog, large, "none") == {"total": None, "exact": False}
+        assert len(calls) == 3
+        with pytest.raises(ValueError):
+            await count_rows(None, AuditLog, large, "fast")
+        print("  ✓ none 模式不查询数据库")
+    
+    def test_parse_plan_rows(self):
+        """测试解析 EXPLAIN (FORMAT JSON) 的估算行数"""
+        print("\n=== 测试2: 解析查询计划 ===")
+        plan = [{"Plan": {"Node Type": "Index Only Scan", "Plan Rows": 1234, "Total Cost": 88.5}}]
+        assert parse_plan_rows(plan) == 1234
+        assert parse_plan_rows('[{"Plan": {"Plan Rows": 7}}]') == 7
+        print("  ✓ 支持已解析和字符串形式的结果")
+    
+    @pytest.mark.asyncio
+    async def test_estimate_binds_jsonb_parameters(self):
+        """测试估算查询按 SQLAlchemy 语句执行，JSONB 条件的 dict 参数经过绑定处理后交给驱动"""
+        print("\n=== 测试3: 估算查询参数 ===")
+        psycopg_adapt = pytest.importorskip("psycopg.adapt")
+        dialect = pg_psycopg.dialect()
+        executed = []
+        
+        class FakeResult:
+            def scalar(self):
+                return [{"Plan": {"Plan Rows": 3}}]
+        
+        class FakeSession:
+            async def execute(self, statement):
+                # 与执行时一样：编译语句，参数经过列类型的绑定处理，再由 psycopg 适配
+                compiled = statement.compile(dialect=dialect)
+                params = compiled.construct_params()
+                transformer = psycopg_adapt.Transformer()
+                for bind, name in compiled.bind_names.items():
+                    processor = bind.type.bind_processor(dialect)
+                    value = processor(params[name]) if processor else params[name]
+                    transformer.get_dumper(value, psycopg_adapt.PyFormat.AUTO)
+                executed.append(compiled.string)
+                return FakeResult()
+        
+        conditions = keyword_conditions("file_id=12")
+        assert await count_service._estimate_count(FakeSession(), AuditLog, conditions) == 3
+        assert executed[0].startswith("EXPLAIN (FORMAT JSON) SELECT audit_logs.id")
+        assert "@>" in executed[0]
+        print("  ✓ 字段=值 条件的 dict 参数可以被驱动适配")
+        
+        result = await count_rows(FakeSession(), AuditLog, conditions, "estimate")
+        assert result == {"total": 3, "exact": False}
+        print("  ✓ estimate 模式返回查询计划的估算行数")
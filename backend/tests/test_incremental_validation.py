@@ -0,0 +1,126 @@
+"""
+本地规则库增量验证 - 测试
+
+验证增量验证与全量验证结果一致，并且只重新扫描变更段落
+"""
+import pytest
+
+from app.services.local_rules_engine import init_local_rules_engine
+from app.services.incremental_validator import INDEX_KEY, LOCAL_RULES_KEY, merge_local_review, public_annotations
+
+
+BASE_CONTENT = "\n".join([
+    "关于信访事项的答复",
+    "主送单位：市信访局",
+    "信访人反映的问题经调查核实。",
+    "处理意见如下：依法依规办理。",
+] + [f"第{i}段：经核查，相关情况已按程序处理完毕。" for i in range(200)] + [
+    "XX单位",
+    "2024年1月2日",
+])
+
+
+async def _load_engine():
+    engine = init_local_rules_engine("backend/config/validation_rules.json")
+    await engine.config_manager.load_config()
+    return engine
+
+
+def _error_signature(result):
+    return [(error.reference, error.description) for error in result.errors]
+
+
+class TestIncrementalValidation:
+    """测试增量验证"""
+    
+    @pytest.mark.asyncio
+    async def test_first_run_matches_full_validation(self):
+        """测试无索引时增量验证等价于全量验证"""
+        print("\n=== 测试1: 首次增量验证与全量验证一致 ===")
+        
+        engine = await _load_engine()
+        
+        full_result = await engine.validate_document(BASE_CONTENT)
+        incremental_result, index = await engine.validate_document_incremental(BASE_CONTENT)
+        
+        assert _error_signature(incremental_result) == _error_signature(full_result)
+        assert incremental_result.summary == full_result.summary
+        assert incremental_result.incremental_stats["full_validation"] is True
+        assert index is not None, "应该返回增量索引"
+        print(f"  ✓ 结果一致: {incremental_result.summary}")
+    
+    @pytest.mark.asyncio
+    async def test_edit_only_rescans_changed_paragraphs(self):
+        """测试编辑后只重新扫描变更段落，且结果与全量验证一致"""
+        print("\n=== 测试2: 编辑后只扫描变更段落 ===")
+        
+        engine = await _load_engine()
+        _, index = await engine.validate_document_incremental(BASE_CONTENT)
+        
+        # 修改一个段落并插入一个包含禁用词的段落
+        paragraphs = BASE_CONTENT.split("\n")
+        paragraphs[10] = "第6段：补充说明，相关材料已归档。"
+        paragraphs.insert(20, "该段落包含敏感词1，需要修改。")
+        edited_content = "\n".join(paragraphs)
+        
+        full_result = await engine.validate_document(edited_content)
+        incremental_result, _ = await engine.validate_document_incremental(edited_content, previous_index=index)
+        
+        stats = incremental_result.incremental_stats
+        assert stats["full_validation"] is False
+        assert stats["changed_paragraphs"] == 2, "只有两个段落发生变化"
+        assert _error_signature(incremental_result) == _error_signature(full_result)
+        print(f"  ✓ 变更段落: {stats['changed_paragraphs']}/{stats['total_paragraphs']}")
+        print(f"  ✓ 结果一致: {incremental_result.summary}")
+    
+    @pytest.mark.asyncio
+    async def test_field_rules_reused_when_metadata_unchanged(self):
+        """测试元数据字段未变化时复用字段规则结果"""
+        print("\n=== 测试3: 字段规则结果复用 ===")
+        
+        engine = await _load_engine()
+        metadata = {"date": "2024年1月2日", "title": "关于信访事项的通知"}
+        _, index = await engine.validate_document_incremental(BASE_CONTENT, metadata)
+        
+        edited_content = BASE_CONTENT + "\n附件：调查材料"
+        incremental_result, _ = await engine.validate_document_incremental(edited_content, metadata, index)
+        full_result = await engine.validate_document(edited_content, metadata)
+        
+        assert incremental_result.incremental_stats["rules_reused"] >= 2, "字段规则应复用上次结果"
+        assert _error_signature(incremental_result) == _error_signature(full_result)
+        print(f"  ✓ 复用规则: {incremental_result.incremental_stats['rules_reused']} 个")
+    
+    @pytest.mark.asyncio
+    async def test_ruleset_change_invalidates_index(self):
+        """测试规则集变化后索引失效"""
+        print("\n=== 测试4: 规则变更后重新全量验证 ===")
+        
+        engine = await _load_engine()
+        _, index = await engine.validate_document_incremental(BASE_CONTENT)
+        
+        rule = engine.config_manager.get_enabled_rules()[0]
+        engine.config_manager.toggle_rule(rule.id, False)
+        
+        result, _ = await engine.validate_document_incremental(BASE_CONTENT, previous_index=index)
+        
+        assert result.incremental_stats["full_validation"] is True
+        print("  ✓ 规则集变化后执行全量验证")
+    
+    def test_annotations_keep_review_and_hide_index(self):
+        """测试重新验证不覆盖研判结果，增量索引不返回给客户端"""
+        print("\n=== 测试5: 标注合并 ===")
+        
+        ai_review = {"errors": [{"description": "AI 意见"}], "summary": "AI 研判", INDEX_KEY: {"old": 1}}
+        local_review = {"errors": [], "summary": "本地规则验证通过"}
+        merged = merge_local_review(ai_review, local_review, {"new": 1})
+        
+        assert merged["errors"] == ai_review["errors"] and merged["summary"] == "AI 研判"
+        assert merged[LOCAL_RULES_KEY] == local_review
+        assert merged[INDEX_KEY] == {"new": 1}
+        print("  ✓ 研判结果保留，本地规则结果单独保存")
+        
+        public = public_annotations(merged)
+        assert INDEX_KEY not in public and public[LOCAL_RULES_KEY] == local_review
+        assert INDEX_KEY in merged
+        assert public_annotations(None) is None
+        print("  ✓ 响应中去掉增量索引")
@@ -0,0 +1,75 @@
+"""
+大模型调用录制/回放 - 测试
+
+录制模式下把真实调用的响应写入录制文件，回放模式下从文件返回且不调用接口
+"""
+import json
+import pytest
+
+from app.services.deepseek_service import DeepSeekService
+from app.services import deepseek_service as deepseek_module
+from app.services.llm_replay_service import LLMReplayService
+
+
+class TestLLMReplay:
+    """测试录制与回放"""
+    
+    @pytest.mark.asyncio
+    async def test_record_then_replay(self, tmp_path, monkeypatch):
+        """测试录制的响应可按请求回放，相同请求按录制顺序依次返回"""
+        print("\n=== 测试1: 录制后回放 ===")
+        store = str(tmp_path / "replay.jsonl")
+        service = DeepSeekService()
+        replies = iter(["第一次响应", "第二次响应", "另一个请求的响应"])
+        calls = []
+        
+        async def fake_call_api(messages, temperature=0.7):
+            calls.append(messages)
+            return next(replies)
+        
+        monkeypatch.setattr(service, "_call_api", fake_call_api)
+        monkeypatch.setattr(deepseek_module, "llm_replay_service", LLMReplayService("record", store))
+        messages = [{"role": "user", "content": "生成答复意见"}]
+        assert await service.call_with_retry(messages) == "第一次响应"
+        assert await service.call_with_retry(messages) == "第二次响应"
+        assert await service.call_with_retry([{"role": "user", "content": "研判"}], 0.3) == "另一个请求的响应"
+        
+        with open(store, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        assert len(entries) == 3
+        assert all(entry["latency_ms"] >= 0 for entry in entries)
+        
+        replay = LLMReplayService("replay", store)
+        monkeypatch.setattr(deepseek_module, "llm_replay_service", replay)
+        calls.clear()
+        assert await service.call_with_retry(messages) == "第一次响应"
+        assert await service.call_with_retry(messages) == "第二次响应"
+        assert await service.call_with_retry(messages) == "第一次响应"
+        assert await service.call_with_retry([{"role": "user", "content": "研判"}], 0.3) == "另一个请求的响应"
+        assert calls == []
+        assert replay.get_stats()["hits"] == 4
+        print(f"  ✓ 回放统计: {replay.get_stats()}")
+    
+    @pytest.mark.asyncio
+    async def test_replay_miss(self, tmp_path, monkeypatch):
+        """测试回放未命中时按配置返回失败或调用真实接口"""
+        print("\n=== 测试2: 回放未命中 ===")
+        store = str(tmp_path / "empty.jsonl")
+        service = DeepSeekService()
+        calls = []
+        
+        async def fake_call_api(messages, temperature=0.7):
+            calls.append(messages)
+            return "真实响应"
+        
+        monkeypatch.setattr(service, "_call_api", fake_call_api)
+        messages = [{"role": "user", "content": "未录制的请求"}]
+        
+        monkeypatch.setattr(deepseek_module, "llm_replay_service", LLMReplayService("replay", store, on_miss="fail"))
+        assert await service.call_with_retry(messages) is None
+        assert calls == []
+        
+        monkeypatch.setattr(deepseek_module, "llm_replay_service", LLMReplayService("replay", store, on_miss="passthrough"))
+        assert await service.call_with_retry(messages) == "真实响应"
+        assert len(calls) == 1
+        print("  ✓ fail 返回 None，passthrough 调用真实接口")
@@ -0,0 +1,84 @@
+"""
+日志配置 - 测试
+
+验证请求 ID 关联和队列满时丢弃日志
+"""
+import logging
+import queue
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.logging_config import DroppingQueueHandler, RequestIdFilter, RequestIdMiddleware, parse_levels
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+    
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestLoggingConfig:
+    """测试日志配置"""
+    
+    def test_request_id_correlation(self):
+        """测试同一请求的日志带有相同的 request_id，并在响应头中返回"""
+        print("\n=== 测试1: 请求 ID 关联 ===")
+        handler = ListHandler()
+        handler.addFilter(RequestIdFilter())
+        logger = logging.getLogger("test.request_id")
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        
+        app = FastAPI()
+        app.add_middleware(RequestIdMiddleware)
+        
+        @app.get("/ping")
+        async def ping():
+            logger.info("handling ping")
+            return {"ok": True}
+        
+        client = TestClient(app)
+        try:
+            response = client.get("/ping", headers={"X-Request-ID": "abc-123"})
+            assert response.headers["x-request-id"] == "abc-123"
+            assert handler.records[-1].request_id == "abc-123"
+            
+            # 非法的请求 ID 被替换为新生成的
+            response = client.get("/ping", headers={"X-Request-ID": "bad id\nforged"})
+            generated = response.headers["x-request-id"]
+            assert generated != "bad id\nforged" and len(generated) == 32
+            assert handler.records[-1].request_id == generated
+            
+            # 请求之外的日志
+            logger.info("outside request")
+            assert handler.records[-1].request_id == "-"
+        finally:
+            logger.removeHandler(handler)
+        print("  ✓ request_id 沿用合法的请求头，非法时重新生成")
+    
+    def test_queue_handler_drops_when_full(self):
+        """测试队列满时丢弃日志而不阻塞"""
+        print("\n=== 测试2: 队列满时丢弃 ===")
+        handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+        logger = logging.getLogger("test.dropping")
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            for i in range(5):
+                logger.warning("message %s", i)
+        finally:
+            logger.removeHandler(handler)
+        
+        assert handler.queue.qsize() == 2
+        assert handler.dropped == 3
+        print(f"  ✓ 丢弃 {handler.dropped} 条")
+    
+    def test_parse_levels(self):
+        """测试按模块设置级别的解析"""
+        print("\n=== 测试3: 模块级别解析 ===")
+        levels = parse_levels("sqlalchemy.engine=warning, app.services.cache_service=DEBUG,invalid")
+        assert levels == {"sqlalchemy.engine": "WARNING", "app.services.cache_service": "DEBUG"}
+        print(f"  ✓ {levels}")
@@ -0,0 +1,57 @@
+"""
+事件循环阻塞检测 - 测试
+
+用同步 sleep 阻塞事件循环，验证阻塞事件和调用栈热点被记录
+"""
+import asyncio
+import time
+import pytest
+
+from app.core.loop_monitor import LoopLagMonitor
+
+
+def _blocking_call():
+    time.sleep(0.3)
+
+
+class TestLoopMonitor:
+    """测试事件循环延迟监控"""
+    
+    @pytest.mark.asyncio
+    async def test_detects_blocking_call_with_stack(self):
+        """测试检测到阻塞，并定位到阻塞的函数"""
+        print("\n=== 测试1: 阻塞检测与调用栈采样 ===")
+        monitor = LoopLagMonitor(interval=0.02, block_threshold_ms=50, debug=True)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.1)
+            _blocking_call()
+            await asyncio.sleep(0.1)
+        finally:
+            await monitor.stop()
+        
+        report = monitor.get_blocking_report()
+        
+        assert monitor.block_count >= 1
+        assert monitor.max_lag_ms >= 250
+        event = report["recent_events"][0]
+        assert event["ongoing"] is False
+        assert event["duration_ms"] >= 250
+        assert any("_blocking_call" in hotspot["site"] for hotspot in report["hotspots"])
+        print(f"  ✓ 热点: {report['hotspots'][0]}")
+    
+    @pytest.mark.asyncio
+    async def test_no_blocking_under_normal_load(self):
+        """测试正常异步等待不记为阻塞"""
+        print("\n=== 测试2: 正常负载无阻塞 ===")
+        monitor = LoopLagMonitor(interval=0.02, block_threshold_ms=100, debug=True)
+        monitor.start()
+        try:
+            await asyncio.gather(*[asyncio.sleep(0.05) for _ in range(100)])
+            await asyncio.sleep(0.1)
+        finally:
+            await monitor.stop()
+        
+        assert monitor.block_count == 0
+        assert monitor.get_lag_histogram()["count"] == monitor.samples
+        print(f"  ✓ 延迟统计: {monitor.get_stats()}")
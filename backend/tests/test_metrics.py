@@ -0,0 +1,94 @@
+"""
+Prometheus 指标 - 测试
+
+验证 PerformanceMonitor 装饰器和请求中间件写入指标，以及多进程模式下的汇总
+"""
+import os
+import subprocess
+import sys
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.core.metrics import MetricsMiddleware
+from app.core.performance import PerformanceMonitor
+
+
+def _sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetrics:
+    """测试监控指标"""
+    
+    @pytest.mark.asyncio
+    async def test_measure_time_feeds_histogram(self):
+        """测试 measure_time 装饰器按操作名和结果记录耗时"""
+        print("\n=== 测试1: measure_time 写入直方图 ===")
+        
+        @PerformanceMonitor.measure_time("test_operation")
+        async def succeed():
+            return "ok"
+        
+        @PerformanceMonitor.measure_time("test_operation")
+        async def fail():
+            raise ValueError("boom")
+        
+        success_before = _sample("operation_duration_seconds_count", {"operation": "test_operation", "outcome": "success"})
+        error_before = _sample("operation_duration_seconds_count", {"operation": "test_operation", "outcome": "error"})
+        
+        assert await succeed() == "ok"
+        with pytest.raises(ValueError):
+            await fail()
+        
+        assert _sample("operation_duration_seconds_count", {"operation": "test_operation", "outcome": "success"}) == success_before + 1
+        assert _sample("operation_duration_seconds_count", {"operation": "test_operation", "outcome": "error"}) == error_before + 1
+        print("  ✓ 成功和失败分别计数")
+    
+    def test_middleware_uses_route_template(self):
+        """测试请求耗时按路由模板（而不是实际路径）记录"""
+        print("\n=== 测试2: 请求指标使用路由模板 ===")
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+        
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: int):
+            return {"id": item_id}
+        
+        labels = {"method": "GET", "route": "/items/{item_id}", "status": "200"}
+        before = _sample("http_request_duration_seconds_count", labels)
+        unmatched_before = _sample("http_request_duration_seconds_count", {"method": "GET", "route": "unmatched", "status": "404"})
+        
+        client = TestClient(app)
+        for item_id in range(3):
+            assert client.get(f"/items/{item_id}").status_code == 200
+        assert client.get("/missing").status_code == 404
+        
+        assert _sample("http_request_duration_seconds_count", labels) == before + 3
+        assert _sample("http_request_duration_seconds_count", {"method": "GET", "route": "unmatched", "status": "404"}) == unmatched_before + 1
+        print("  ✓ 3 个不同路径记录在同一标签下，未匹配的路由单独归类")
+    
+    def test_multiprocess_aggregation(self, tmp_path):
+        """测试多进程模式下汇总所有 worker 的计数"""
+        print("\n=== 测试3: 多进程汇总 ===")
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+        worker = (
+            "from app.core.metrics import LLM_RETRIES\n"
+            "LLM_RETRIES.inc(2)\n"
+        )
+        for _ in range(3):
+            subprocess.run([sys.executable, "-c", worker], env=env, check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+        
+        reader = (
+            "from app.core.metrics import render_latest\n"
+            "content, _ = render_latest()\n"
+            "print([line for line in content.decode().splitlines() if line.startswith('llm_retries_total')][0])\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", reader], env=env, check=True, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.dirname(__file__))
+        ).stdout.strip().splitlines()[-1]
+        
+        assert output.endswith(" 6.0")
+        print(f"  ✓ {output}")
@@ -0,0 +1,55 @@
+"""
+游标分页 - 测试
+
+游标可往返编解码，按游标翻页时使用 (created_at, id) 行比较而不是 OFFSET
+"""
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.core.pagination import encode_cursor, decode_cursor, apply_keyset, split_page
+from app.models.document import Document
+
+
+class TestKeysetPagination:
+    """测试游标编解码与查询条件"""
+    
+    def test_cursor_round_trip(self):
+        """测试游标往返，错误游标返回 400"""
+        print("\n=== 测试1: 游标编解码 ===")
+        created_at = datetime(2026, 3, 1, 8, 30, 15, 123456, tzinfo=timezone.utc)
+        assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+        print("  ✓ 游标往返一致")
+        
+        for bad in ["not-a-cursor", encode_cursor(created_at, 1)[:-3]]:
+            with pytest.raises(HTTPException) as exc:
+                decode_cursor(bad)
+            assert exc.value.status_code == 400
+        print("  ✓ 错误游标返回 400")
+    
+    def test_keyset_query_and_split(self):
+        """测试按游标翻页不使用 OFFSET，多取的一行用于生成下一页游标"""
+        print("\n=== 测试2: 查询条件与分页 ===")
+        dialect = postgresql.dialect()
+        cursor = encode_cursor(datetime(2026, 3, 1, tzinfo=timezone.utc), 7)
+        
+        sql = str(apply_keyset(select(Document), Document, cursor, 100, 20).compile(dialect=dialect))
+        assert "(documents.created_at, documents.id) <" in sql
+        assert "OFFSET" not in sql
+        assert "ORDER BY documents.created_at DESC, documents.id DESC" in sql
+        print("  ✓ 游标模式使用行比较")
+        
+        sql = str(apply_keyset(select(Document), Document, None, 100, 20).compile(dialect=dialect))
+        assert "OFFSET" in sql and "<" not in sql
+        print("  ✓ 无游标时兼容 skip")
+        
+        rows = [SimpleNamespace(created_at=datetime(2026, 3, 1, 12 - i, tzinfo=timezone.utc), id=10 - i) for i in range(3)]
+        page, next_cursor = split_page(rows, 2)
+        assert page == rows[:2]
+        assert decode_cursor(next_cursor) == (rows[1].created_at, rows[1].id)
+        assert split_page(rows, 3) == (rows, None)
+        print("  ✓ 最后一页没有下一页游标")
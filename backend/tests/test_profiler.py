@@ -0,0 +1,89 @@
+"""
+采样分析器 - 测试
+
+在请求中执行 CPU 密集函数和挂起等待，验证折叠栈能定位到函数和路由，且同一时间只允许一次采样
+"""
+import asyncio
+import time
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from app.core.profiler import ProfilerMiddleware, ProfilerBusyError, SamplingProfiler, profiler, to_collapsed, top_frames
+
+
+def _busy_work(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(i * i for i in range(1000))
+
+
+async def _slow_io():
+    await asyncio.sleep(0.5)
+
+
+def create_test_app() -> FastAPI:
+    app = FastAPI()
+    
+    @app.get("/busy/{item_id}")
+    async def busy(item_id: int):
+        _busy_work(0.3)
+        return {"id": item_id}
+    
+    @app.get("/waiting")
+    async def waiting():
+        await _slow_io()
+        return {"ok": True}
+    
+    app.add_middleware(ProfilerMiddleware)
+    return app
+
+
+class TestProfiler:
+    """测试采样分析器"""
+    
+    @pytest.mark.asyncio
+    async def test_collapsed_stacks_with_routes(self):
+        """测试 CPU 热点和挂起中的任务都归到对应路由"""
+        print("\n=== 测试1: 折叠栈与路由归类 ===")
+        app = create_test_app()
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            profile_task = asyncio.create_task(profiler.profile(0.8, interval_ms=5, mode="async"))
+            await asyncio.sleep(0.05)
+            await asyncio.gather(client.get("/busy/1"), client.get("/waiting"))
+            result = await profile_task
+        
+        collapsed = to_collapsed(result["stacks"])
+        assert result["samples"] > 10
+        assert result["overhead"] < 0.5
+        assert any(
+            line.startswith("event-loop;[GET /busy/{item_id}]") and "_busy_work" in line
+            for line in collapsed.splitlines()
+        )
+        assert any(
+            line.startswith("await;[GET /waiting]") and "_slow_io" in line
+            for line in collapsed.splitlines()
+        )
+        assert result["routes"]["[GET /busy/{item_id}]"] > 0
+        assert not profiler.running
+        print(f"  ✓ {result['samples']} 个样本，开销 {result['overhead']:.2%}，热点: {top_frames(result['stacks'], 1)}")
+    
+    @pytest.mark.asyncio
+    async def test_single_session_and_duration_cap(self):
+        """测试同一时间只允许一次采样，且时长不超过上限"""
+        print("\n=== 测试2: 并发拒绝与时长上限 ===")
+        sampler = SamplingProfiler()
+        sampler.max_seconds = 0.3
+        
+        start = time.perf_counter()
+        first = asyncio.create_task(sampler.profile(100, interval_ms=1))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ProfilerBusyError):
+            await sampler.profile(1)
+        result = await first
+        
+        assert time.perf_counter() - start < 2
+        assert result["duration_s"] <= 0.5
+        assert result["final_interval_ms"] >= 5
+        assert not sampler.running
+        print(f"  ✓ 采样 {result['duration_s']}s 后自动停止")
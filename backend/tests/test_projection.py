@@ -0,0 +1,76 @@
+"""
+列表字段投影 - 测试
+
+列表默认只读取摘要列，正文等大字段只在 fields 中指定时读取
+"""
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.core.projection import parse_fields, load_columns
+from app.models.document import Document
+from app.models.version import Version
+
+# 与 documents / versions 接口的字段定义一致（接口模块导入时会连接 MinIO）
+DOCUMENT_LIST_FIELDS = (
+    "id", "title", "document_type", "status", "classification", "file_id", "template_id",
+    "created_at", "updated_at", "content", "structured_content", "ai_annotations"
+)
+DOCUMENT_SUMMARY_FIELDS = ("id", "title", "document_type", "status", "classification", "created_at", "updated_at")
+VERSION_SUMMARY_FIELDS = (
+    "id", "document_id", "version_number", "change_description", "is_rollback", "rollback_from_version", "created_at"
+)
+
+
+def document_list_query(fields):
+    return select(Document).options(load_columns(Document, fields, "id", "created_at"))
+
+
+def version_list_query(fields):
+    return select(Version).options(load_columns(Version, fields, "id", "version_number"))
+
+
+def _columns(query) -> str:
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    return sql.split(" FROM ")[0]
+
+
+class TestProjection:
+    """测试列表字段投影"""
+    
+    def test_parse_fields(self):
+        """测试 fields 参数解析"""
+        print("\n=== 测试1: fields 参数 ===")
+        assert parse_fields(None, DOCUMENT_LIST_FIELDS, DOCUMENT_SUMMARY_FIELDS) == list(DOCUMENT_SUMMARY_FIELDS)
+        assert parse_fields("content, title", DOCUMENT_LIST_FIELDS, DOCUMENT_SUMMARY_FIELDS) == ["id", "title", "content"]
+        print("  ✓ 默认摘要字段，指定字段时按固定顺序并包含 id")
+        
+        with pytest.raises(HTTPException) as exc:
+            parse_fields("title,password", DOCUMENT_LIST_FIELDS, DOCUMENT_SUMMARY_FIELDS)
+        assert exc.value.status_code == 400 and "password" in exc.value.detail
+        print("  ✓ 不支持的字段返回 400")
+    
+    def test_document_list_loads_summary_columns(self):
+        """测试文书列表只读取请求的列"""
+        print("\n=== 测试2: 文书列表 ===")
+        columns = _columns(document_list_query(list(DOCUMENT_SUMMARY_FIELDS)))
+        assert "documents.title" in columns and "documents.classification" in columns
+        for heavy in ("content", "structured_content", "ai_annotations"):
+            assert f"documents.{heavy}" not in columns
+        print("  ✓ 默认不读取正文和 JSON 字段")
+        
+        columns = _columns(document_list_query(["id", "content"]))
+        assert "documents.content" in columns and "documents.created_at" in columns
+        assert "documents.title" not in columns
+        print("  ✓ 指定字段时读取正文（保留游标分页需要的 created_at）")
+    
+    def test_version_list_loads_summary_columns(self):
+        """测试版本列表默认不读取正文"""
+        print("\n=== 测试3: 版本列表 ===")
+        columns = _columns(version_list_query(list(VERSION_SUMMARY_FIELDS)))
+        assert "versions.version_number" in columns
+        assert "versions.content" not in columns and "versions.structured_content" not in columns
+        assert "versions.diff_data" not in columns
+        assert "versions.content" in _columns(version_list_query(["id", "content"]))
+        print("  ✓ 正文只在 fields 中指定时读取")
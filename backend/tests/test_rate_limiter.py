@@ -0,0 +1,64 @@
+"""
+GCRA 限流器 - 测试
+
+在无 Redis 的情况下验证进程内回退实现
+"""
+import pytest
+
+from app.core.redis import redis_client
+from app.core.rate_limiter import SimpleRateLimiter
+
+
+class TestRateLimiter:
+    """测试限流器"""
+    
+    def setup_method(self):
+        redis_client.redis = None
+    
+    @pytest.mark.asyncio
+    async def test_burst_then_reject_with_retry_after(self):
+        """测试突发额度用完后拒绝，并给出 Retry-After"""
+        print("\n=== 测试1: 突发额度与 Retry-After ===")
+        limiter = SimpleRateLimiter()
+        
+        results = [await limiter.hit("ai:user:1", "5/minute") for _ in range(6)]
+        
+        assert [r.allowed for r in results] == [True] * 5 + [False]
+        assert [r.remaining for r in results[:5]] == [4, 3, 2, 1, 0]
+        
+        headers = results[-1].headers()
+        assert headers["X-RateLimit-Limit"] == "5"
+        assert headers["Retry-After"] == "12", "每 12 秒恢复一个额度"
+        print(f"  ✓ 响应头: {headers}")
+    
+    @pytest.mark.asyncio
+    async def test_keys_are_independent(self):
+        """测试不同用户、不同 scope 的额度互不影响"""
+        print("\n=== 测试2: 键隔离 ===")
+        limiter = SimpleRateLimiter()
+        
+        for _ in range(2):
+            await limiter.hit("ai:user:1", "2/minute")
+        
+        assert not (await limiter.hit("ai:user:1", "2/minute")).allowed
+        assert (await limiter.hit("ai:user:2", "2/minute")).allowed
+        assert (await limiter.hit("upload:user:1", "2/minute")).allowed
+        print("  ✓ 额度按键独立计算")
+    
+    @pytest.mark.asyncio
+    async def test_idle_keys_evicted(self, monkeypatch):
+        """测试额度恢复后的空闲键被淘汰"""
+        print("\n=== 测试3: 空闲键淘汰 ===")
+        limiter = SimpleRateLimiter()
+        clock = {"now": 1000.0}
+        monkeypatch.setattr("app.core.rate_limiter.time.monotonic", lambda: clock["now"])
+        
+        for user_id in range(100):
+            await limiter.hit(f"user:{user_id}", "10/second")
+        assert len(limiter._local_tat) == 100
+        
+        clock["now"] += 1
+        await limiter.hit("user:new", "10/second")
+        
+        assert list(limiter._local_tat) == ["user:new"]
+        print("  ✓ 空闲键已淘汰")
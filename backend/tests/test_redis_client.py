@@ -0,0 +1,122 @@
+"""
+Redis 客户端 - 测试
+
+编解码器兼容性、断线后的指数退避重连、批量读写删除和按标签批量删除（fakeredis）
+"""
+import json
+from datetime import datetime
+
+import pytest
+
+from app.core import redis as redis_module
+from app.core.config import settings
+from app.core.redis import RedisClient, JSONCodec, OrjsonCodec, get_codec
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class TestRedisClient:
+    """测试 Redis 客户端"""
+    
+    def test_codecs_are_interchangeable(self):
+        """测试 orjson 与 json 编码互相可读"""
+        print("\n=== 测试1: 编解码器 ===")
+        value = {"title": "答复意见书", "count": 3, "items": [1.5, None, True], "at": datetime(2026, 1, 2, 3, 4, 5)}
+        
+        codecs = [JSONCodec()]
+        if redis_module.orjson is not None:
+            codecs.append(OrjsonCodec())
+        for codec in codecs:
+            raw = codec.dumps(value)
+            assert isinstance(raw, str) and "答复意见书" in raw
+            decoded = json.loads(raw)
+            assert decoded["at"].startswith("2026-01-02")
+            for reader in codecs:
+                assert reader.loads(raw) == decoded
+            print(f"  ✓ {codec.name} 输出为 JSON 文本")
+        
+        assert get_codec("msgpack").name == "json"
+        assert get_codec("json").name == "json"
+        print("  ✓ 未知编解码器回退到 json")
+    
+    @pytest.mark.asyncio
+    async def test_reconnect_backoff(self, monkeypatch):
+        """测试连接失败后按指数退避重连，间隔有上限"""
+        print("\n=== 测试2: 退避重连 ===")
+        monkeypatch.setattr(settings, "REDIS_RECONNECT_MAX_BACKOFF", 4)
+        client = RedisClient()
+        delays = []
+        attempts = {"count": 0}
+        
+        async def fake_sleep(delay):
+            delays.append(delay)
+        
+        async def fake_try_connect():
+            attempts["count"] += 1
+            if attempts["count"] < 5:
+                return False
+            client.redis = object()
+            return True
+        
+        monkeypatch.setattr(redis_module.asyncio, "sleep", fake_sleep)
+        monkeypatch.setattr(client, "_try_connect", fake_try_connect)
+        
+        await client._reconnect_loop()
+        assert delays == [1, 2, 4, 4, 4]
+        assert client.redis is not None
+        print(f"  ✓ 重连间隔: {delays}")
+        
+        client.redis = None
+        client._closing = True
+        delays.clear()
+        await client._reconnect_loop()
+        assert delays == []
+        print("  ✓ 关闭后不再重连")
+    
+    @pytest.mark.asyncio
+    async def test_delete_by_tags(self):
+        """测试按标签批量删除键和标签集合"""
+        print("\n=== 测试3: 按标签批量删除 ===")
+        client = RedisClient()
+        client.redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        
+        await client.redis.mset({"cache:a": "1", "cache:b": "2", "cache:c": "3"})
+        await client.redis.sadd("cache_tag:list:1", "cache:a", "cache:b")
+        await client.redis.sadd("cache_tag:list:2", "cache:b")
+        
+        deleted = await client.delete_by_tags(["cache_tag:list:1", "cache_tag:list:2"])
+        
+        assert deleted == 2
+        assert await client.redis.exists("cache:a", "cache:b", "cache_tag:list:1", "cache_tag:list:2") == 0
+        assert await client.get("cache:c") == "3"
+        assert client.get_metrics()["commands"]["delete_by_tags"]["count"] == 1
+        assert await client.delete_by_tags([]) == 0
+        print("  ✓ 标签下的键和标签集合被删除，其他键保留")
+    
+    @pytest.mark.asyncio
+    async def test_batch_commands(self):
+        """测试批量读取、带过期时间的批量写入和批量删除"""
+        print("\n=== 测试4: 批量读写删除 ===")
+        client = RedisClient()
+        client.redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        
+        await client.mset_json({"batch:a": {"n": 1}, "batch:b": [1, 2]})
+        assert await client.ttl("batch:a") == -1
+        await client.mset_json({"batch:c": "三"}, expire=60)
+        assert 0 < await client.ttl("batch:c") <= 60
+        print("  ✓ 不带过期时间用 MSET，带过期时间逐个 SET EX")
+        
+        await client.redis.set("batch:bad", "{not json")
+        values = await client.mget_json(["batch:a", "batch:missing", "batch:b", "batch:bad", "batch:c"])
+        assert values == [{"n": 1}, None, [1, 2], None, "三"]
+        assert client.get_metrics()["commands"]["mget"]["count"] == 1
+        print("  ✓ 一次 MGET 按键顺序返回，不存在或无法解析的为 None")
+        
+        assert await client.delete_many(iter(["batch:a", "batch:b", "batch:missing"])) == 2
+        assert await client.exists("batch:a") is False
+        assert await client.delete_many([]) == 0
+        print("  ✓ 批量删除返回实际删除的键数")
+        
+        client.redis = None
+        assert await client.mget_json(["batch:a", "batch:b"]) == [None, None]
+        print("  ✓ 未连接时返回与键数相同的 None 列表")
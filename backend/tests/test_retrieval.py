@@ -0,0 +1,84 @@
+"""
+参考文件片段检索 - 测试
+
+验证中文 n-gram 切分、片段切分和 BM25 相关片段选取
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.retrieval_service import tokenize, split_chunks, retrieval_service
+
+
+class TestRetrieval:
+    """测试参考文件片段检索"""
+    
+    def test_tokenize_chinese_bigrams(self):
+        """测试中文按二元组切分，英文数字按单词切分"""
+        print("\n=== 测试1: 检索词切分 ===")
+        
+        tokens = tokenize("信访事项 Case 2024")
+        
+        assert tokens == ["信访", "访事", "事项", "case", "2024"]
+        print(f"  ✓ 检索词: {tokens}")
+    
+    def test_split_chunks_respects_size(self):
+        """测试片段不超过目标长度且不丢失内容"""
+        print("\n=== 测试2: 片段切分 ===")
+        
+        text = "\n".join(["段落内容" * 20] * 10 + ["超长段落" * 200])
+        chunks = split_chunks(text, chunk_size=200)
+        
+        assert all(len(chunk) <= 200 for chunk in chunks)
+        assert "".join(chunks).replace("\n", "") == text.replace("\n", "")
+        print(f"  ✓ 切分为 {len(chunks)} 个片段")
+    
+    def test_select_relevant_excerpts(self):
+        """测试只选取与用户输入相关的片段，并按原文顺序排列"""
+        print("\n=== 测试3: 相关片段选取 ===")
+        
+        filler = "\n".join(f"第{i}条：会议记录，讨论了年度工作安排。" for i in range(50))
+        documents = [
+            ("会议纪要.docx", filler),
+            ("信访材料.pdf", filler + "\n信访人反映小区供暖不足，要求物业整改。\n" + filler),
+        ]
+        
+        excerpts = retrieval_service.select_excerpts(
+            "请根据供暖问题起草答复", documents, top_k=2, chunk_size=100
+        )
+        
+        assert excerpts, "应该选出相关片段"
+        assert "供暖" in excerpts[0]["text"]
+        assert excerpts[0]["file_name"] == "信访材料.pdf"
+        assert len(excerpts) <= 2
+        
+        file_context = retrieval_service.format_excerpts(excerpts)
+        assert "--- 参考文件：信访材料.pdf ---" in file_context
+        print(f"  ✓ 选中片段: {[e['index'] for e in excerpts]}")
+    
+    def test_fallback_to_leading_chunks(self):
+        """测试与文件无共同检索词时取各文件开头片段"""
+        print("\n=== 测试4: 无匹配时的回退 ===")
+        
+        documents = [("a.docx", "甲方内容。\n" * 50), ("b.docx", "乙方内容。\n" * 50)]
+        excerpts = retrieval_service.select_excerpts("xyz", documents, top_k=2, chunk_size=50)
+        
+        assert [(e["file_name"], e["index"]) for e in excerpts] == [("a.docx", 0), ("b.docx", 0)]
+        print("  ✓ 回退为各文件开头片段")
+    
+    @pytest.mark.asyncio
+    async def test_failed_file_is_skipped(self):
+        """测试单个引用文件加载失败时跳过该文件"""
+        print("\n=== 测试5: 引用文件加载失败 ===")
+        
+        files = [SimpleNamespace(file_name=name) for name in ("a.docx", "损坏.pdf", "空白.docx", "b.docx")]
+        
+        async def loader(file):
+            if file.file_name == "损坏.pdf":
+                raise ValueError("parse failed")
+            return None if file.file_name == "空白.docx" else f"{file.file_name} 的内容"
+        
+        documents = await retrieval_service.load_documents(files, loader)
+        
+        assert documents == [("a.docx", "a.docx 的内容"), ("b.docx", "b.docx 的内容")]
+        print("  ✓ 其他文件正常加载")
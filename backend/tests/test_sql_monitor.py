@@ -0,0 +1,71 @@
+"""
+SQL 监控 - 测试
+
+验证语句指纹、每请求查询统计、N+1 检测和慢查询记录
+"""
+from sqlalchemy import create_engine, text
+
+from app.core.sql_monitor import SQLMonitor, fingerprint
+
+
+class TestSQLMonitor:
+    """测试 SQL 监控"""
+    
+    def test_fingerprint(self):
+        """测试参数不同的同一语句得到相同指纹"""
+        print("\n=== 测试1: 语句指纹 ===")
+        first = fingerprint("SELECT * FROM files\n  WHERE files.id = %(id_1)s AND name = 'a.pdf' LIMIT 10")
+        second = fingerprint("SELECT * FROM files WHERE files.id = %(id_1)s AND name = 'b''s.pdf' LIMIT 20")
+        assert first == second == "SELECT * FROM files WHERE files.id = ? AND name = ? LIMIT ?"
+        
+        in_list = fingerprint("SELECT * FROM files WHERE files.id IN (%(id_1_1)s, %(id_1_2)s, %(id_1_3)s)")
+        assert in_list == "SELECT * FROM files WHERE files.id IN (...)"
+        print(f"  ✓ {first}")
+    
+    def test_request_stats_and_n_plus_one(self):
+        """测试同一请求内重复执行同一语句被记为 N+1 候选"""
+        print("\n=== 测试2: 每请求统计与 N+1 检测 ===")
+        monitor = SQLMonitor()
+        monitor.n_plus_one_threshold = 3
+        monitor.slow_query_ms = 10_000
+        engine = create_engine("sqlite://")
+        monitor.instrument(engine)
+        
+        with engine.connect() as conn:
+            conn.execute(text("CREATE TABLE files (id INTEGER, name TEXT)"))
+            
+            stats, token = monitor.start_request()
+            conn.execute(text("SELECT * FROM files"))
+            for file_id in range(5):
+                conn.execute(text("SELECT * FROM files WHERE id = :id"), {"id": file_id})
+            monitor.end_request(stats, token, "/api/v1/documents/review")
+            
+            # 请求之外的查询不计入
+            conn.execute(text("SELECT * FROM files"))
+        
+        assert stats.count == 6
+        assert stats.total_ms > 0
+        report = monitor.get_report()
+        assert report["requests"] == 1
+        assert len(report["n_plus_one"]) == 1
+        candidate = report["n_plus_one"][0]
+        assert candidate["route"] == "/api/v1/documents/review"
+        assert candidate["max_repeats"] == 5
+        assert candidate["fingerprint"] == "SELECT * FROM files WHERE id = ?"
+        print(f"  ✓ N+1 候选: {candidate}")
+    
+    def test_slow_query_log(self):
+        """测试超过阈值的语句记入慢查询日志"""
+        print("\n=== 测试3: 慢查询记录 ===")
+        monitor = SQLMonitor()
+        monitor.slow_query_ms = 0
+        engine = create_engine("sqlite://")
+        monitor.instrument(engine)
+        
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        
+        report = monitor.get_report()
+        assert report["slow_queries"][0]["fingerprint"] == "SELECT ?"
+        assert report["statements"][0]["count"] == 1
+        print(f"  ✓ {report['slow_queries'][0]}")
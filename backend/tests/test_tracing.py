@@ -0,0 +1,90 @@
+"""
+链路追踪 - 测试
+
+验证请求内的 span 树、SQL 钩子、慢请求保留和导出
+"""
+import asyncio
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.core.performance import PerformanceMonitor
+from app.core.tracing import Tracer, TracingMiddleware, instrument_engine, span, summarize, to_otlp
+import app.core.tracing as tracing_module
+
+
+class TestTracing:
+    """测试链路追踪"""
+    
+    def test_request_span_tree(self, tmp_path, monkeypatch):
+        """测试请求内的嵌套 span，慢请求被保留并导出到文件"""
+        print("\n=== 测试1: 请求 span 树与慢请求导出 ===")
+        test_tracer = Tracer()
+        test_tracer.slow_ms = 50
+        test_tracer.sample_rate = 0
+        test_tracer.export_file = str(tmp_path / "traces.jsonl")
+        monkeypatch.setattr(tracing_module, "tracer", test_tracer)
+        
+        @PerformanceMonitor.measure_time("docx_render")
+        async def render():
+            await asyncio.sleep(0.01)
+        
+        app = FastAPI()
+        app.add_middleware(TracingMiddleware)
+        
+        @app.get("/documents/{document_id}")
+        async def generate(document_id: int, slow: bool = False):
+            with span("llm.chat", model="test"):
+                await asyncio.sleep(0.06 if slow else 0)
+            await render()
+            return {"id": document_id}
+        
+        client = TestClient(app)
+        client.get("/documents/1")
+        client.get("/documents/2", params={"slow": True})
+        test_tracer.shutdown()
+        
+        assert test_tracer.stats["traces"] == 2
+        slow_traces = test_tracer.get_slow_traces()
+        assert len(slow_traces) == 1
+        trace = slow_traces[0]
+        assert trace["name"] == "GET /documents/{document_id}"
+        assert trace["attributes"]["http.status_code"] == 200
+        assert [child["name"] for child in trace["children"]] == ["llm.chat", "docx_render"]
+        assert trace["summary"]["llm.chat"]["total_ms"] >= 50
+        
+        exported = [json.loads(line) for line in open(tmp_path / "traces.jsonl", encoding="utf-8")]
+        assert len(exported) == 1 and exported[0]["trace_id"] == trace["trace_id"]
+        print(f"  ✓ 慢请求耗时分布: {trace['summary']}")
+    
+    def test_sql_spans_and_otlp(self):
+        """测试 SQL 与提交钩子，以及 OTLP 格式转换"""
+        print("\n=== 测试2: SQL span 与 OTLP 格式 ===")
+        engine = create_engine("sqlite://")
+        instrument_engine(engine)
+        test_tracer = Tracer()
+        
+        # 请求之外不记录
+        with Session(engine) as session:
+            session.execute(text("SELECT 1"))
+        
+        root, token = test_tracer.start_trace("GET /test")
+        with Session(engine) as session:
+            session.execute(text("CREATE TABLE t (id INTEGER)"))
+            session.execute(text("INSERT INTO t VALUES (1)"))
+            session.commit()
+        test_tracer.end_trace(root, token)
+        
+        summary = summarize(root)
+        assert summary["db.query"]["count"] >= 2
+        assert summary["db.commit"]["count"] == 1
+        
+        otlp = to_otlp(root)
+        spans = otlp["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert len(spans) == len(list(root.iter_spans()))
+        assert all(item["traceId"] == root.trace_id for item in spans)
+        assert all(item.get("parentSpanId") for item in spans[1:])
+        print(f"  ✓ {summary}")